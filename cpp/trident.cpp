@@ -8,6 +8,31 @@
 #include <iostream>
 #include <algorithm>
 #include <unordered_map>
+#include <unordered_set>
+#include <string_view>
+#include <cstring>
+#include <limits>
+#include <cmath>
+#include <cstdio>
+#include <cstdlib>
+#include <cstdint>
+#include <random>
+#include <functional>
+#include <memory>
+#include <thread>
+#include <mutex>
+#include <condition_variable>
+#include <deque>
+#include <atomic>
+#ifdef TRIDENT_WITH_ZLIB
+#include <zlib.h>
+#endif
+#ifdef TRIDENT_WITH_ZSTD
+#include <zstd.h>
+#endif
+#ifdef TRIDENT_WITH_HDF5
+#include <hdf5.h>
+#endif
 
 namespace py = pybind11;
 
@@ -36,53 +61,727 @@ static inline std::string strip_quotes(const std::string& s) {
     return s;
 }
 
-std::vector<std::string> parse_csv_line(const std::string& line) {
+// Splitting stops after max_fields fields, and fields not marked in wanted
+// are left empty without being copied, so the columns a load does not need
+// cost only a scan for the delimiters.
+std::vector<std::string> parse_csv_line(const std::string& line,
+                                        size_t max_fields = std::numeric_limits<size_t>::max(),
+                                        const std::vector<bool>* wanted = nullptr) {
     std::vector<std::string> fields;
     std::string field;
     bool in_quotes = false;
-    
+    auto is_wanted = [&](size_t col) { return !wanted || (col < wanted->size() && (*wanted)[col]); };
+    if (wanted) fields.reserve(wanted->size());
+
+    // Lines without quotes (the common case) are split with memchr-based finds
+    if (line.find('"') == std::string::npos) {
+        size_t start = 0;
+        while (true) {
+            const size_t end = line.find(',', start);
+            size_t b = start, e = end == std::string::npos ? line.size() : end;
+            if (is_wanted(fields.size())) {
+                while (b < e && std::isspace(static_cast<unsigned char>(line[b]))) ++b;
+                while (e > b && std::isspace(static_cast<unsigned char>(line[e - 1]))) --e;
+                fields.emplace_back(line, b, e - b);
+            } else {
+                fields.emplace_back();
+            }
+            if (end == std::string::npos || fields.size() == max_fields) return fields;
+            start = end + 1;
+        }
+    }
+
+    bool keep = is_wanted(0);
     for (size_t i = 0; i < line.length(); ++i) {
         char c = line[i];
         if (c == '"') {
             in_quotes = !in_quotes;
         } else if (c == ',' && !in_quotes) {
-            fields.push_back(trim(field));
+            fields.push_back(keep ? trim(field) : std::string());
             field.clear();
-        } else {
+            if (fields.size() == max_fields) return fields;
+            keep = is_wanted(fields.size());
+        } else if (keep) {
             field += c;
         }
     }
-    fields.push_back(trim(field));
+    fields.push_back(keep ? trim(field) : std::string());
     return fields;
 }
 
-class TRIDENTDataLoader {
+// Numeric columns keep the text of their first TEXT_PREFIX_ROWS cells, so
+// that a non-numeric cell among them turns the column categorical in memory.
+// A later one makes parse_csv_file read the earlier cells again instead.
+static const size_t TEXT_PREFIX_ROWS = 4096;
+
+// One parsed output column, converted cell by cell while reading: float
+// values as long as every non-empty cell is a number, int32 category codes
+// (first appearance order) once one is not.
+struct ParsedColumn {
+    bool categorical = false;
+    std::vector<float> values;                     // numeric columns
+    std::vector<int32_t> codes;                    // categorical columns
+    std::unordered_map<std::string, int> cat_map;  // category name -> code
+    bool has_missing = false;
+    size_t reread_rows = 0;                        // leading cells to read again (see reread)
+    std::string text;                              // numeric cells of the text prefix
+    std::vector<uint32_t> lengths;
+
+    // Add a cell; true when it turns the column categorical
+    bool add(const std::string& cell) {
+        const std::string s = strip_quotes(cell);
+        if (!categorical) {
+            float v = std::numeric_limits<float>::quiet_NaN();
+            if (s.empty() || parse_float(s, v)) {
+                values.push_back(v);
+                if (lengths.size() < TEXT_PREFIX_ROWS) {
+                    text += cell;
+                    lengths.push_back(static_cast<uint32_t>(cell.size()));
+                }
+                return false;
+            }
+            to_categorical();
+            add_code(cell, false);
+            return true;
+        }
+        add_code(cell, s.empty());
+        return false;
+    }
+
+    // After a type change past the text prefix, the first reread_rows
+    // cells are given again in row order; end_reread() then numbers their
+    // categories first, as if the column had been read in one pass.
+    void reread_cell(size_t row, const std::string& cell) {
+        const bool missing = strip_quotes(cell).empty();
+        has_missing |= missing;
+        codes[row] = missing ? -1 : leading_map_.try_emplace(cell, static_cast<int>(leading_map_.size())).first->second;
+    }
+
+    void end_reread() {
+        std::vector<const std::string*> later(cat_map.size());
+        for (const auto& kv : cat_map) later[kv.second] = &kv.first;
+        std::vector<int32_t> remap(later.size());
+        for (size_t c = 0; c < later.size(); ++c) {
+            remap[c] = leading_map_.try_emplace(*later[c], static_cast<int>(leading_map_.size())).first->second;
+        }
+        for (size_t r = reread_rows; r < codes.size(); ++r) {
+            if (codes[r] >= 0) codes[r] = remap[codes[r]];
+        }
+        cat_map = std::move(leading_map_);
+        leading_map_.clear();
+        reread_rows = 0;
+    }
+
+    // Missing cells get the "nan" category, added last and only if needed
+    void finish() {
+        if (categorical && has_missing) {
+            const int nan_id = cat_map.try_emplace("nan", static_cast<int>(cat_map.size())).first->second;
+            for (auto& c : codes) {
+                if (c < 0) c = nan_id;
+            }
+        }
+        std::string().swap(text);
+        std::vector<uint32_t>().swap(lengths);
+    }
+
+private:
+    std::unordered_map<std::string, int> leading_map_;
+
+    void add_code(const std::string& cell, bool missing) {
+        if (missing) {
+            has_missing = true;
+            codes.push_back(-1);
+            return;
+        }
+        codes.push_back(cat_map.try_emplace(cell, static_cast<int>(cat_map.size())).first->second);
+    }
+
+    void to_categorical() {
+        categorical = true;
+        codes.reserve(values.size() + 1);
+        if (lengths.size() == values.size()) {
+            size_t pos = 0;
+            for (uint32_t len : lengths) {
+                const std::string cell = text.substr(pos, len);
+                pos += len;
+                add_code(cell, strip_quotes(cell).empty());
+            }
+        } else {
+            // Past the text prefix: placeholders until the cells are read again
+            reread_rows = values.size();
+            codes.assign(reread_rows, -1);
+        }
+        std::vector<float>().swap(values);
+        std::string().swap(text);
+        std::vector<uint32_t>().swap(lengths);
+    }
+};
+
+// Intermediate parse result, one typed column per output column. Built
+// without touching Python objects so that the whole parse can run with the
+// GIL released.
+struct ParsedCSV {
+    std::vector<std::string> headers;
+    std::vector<size_t> col_indices;
+    std::vector<ParsedColumn> columns;
+    std::vector<bool> is_categorical;
+    std::vector<std::string> keys;  // per-row index values, only with a key column
+    size_t rows = 0;
+};
+
+// Resolve a key column by header name, or by position if the name is an integer
+static size_t find_key_column(const std::vector<std::string>& headers,
+                              const std::unordered_map<std::string, size_t>& header_map,
+                              const std::string& key_column) {
+    auto it = header_map.find(key_column);
+    if (it != header_map.end()) return it->second;
+
+    char* end = nullptr;
+    long pos = std::strtol(key_column.c_str(), &end, 10);
+    if (end && *end == '\0' && !key_column.empty() && pos >= 0 && static_cast<size_t>(pos) < headers.size()) {
+        return static_cast<size_t>(pos);
+    }
+    throw std::runtime_error("Key column not found: " + key_column);
+}
+
+// Row predicate evaluated while parsing: the cell of `column` must be one of
+// `values` (string or numeric equality), or a number in [lo, hi].
+struct Predicate {
+    enum Op { IN, RANGE };
+    std::string column;
+    size_t col = 0;
+    Op op = IN;
+    std::unordered_set<std::string> values;
+    std::vector<float> numbers;  // sorted numeric spellings of values
+    float lo = -std::numeric_limits<float>::infinity();
+    float hi = std::numeric_limits<float>::infinity();
+
+    bool matches(const std::string& cell) const {
+        const std::string s = strip_quotes(cell);
+        float v;
+        if (op == RANGE) {
+            return !s.empty() && parse_float(s, v) && v >= lo && v <= hi;
+        }
+        if (values.count(s)) return true;
+        return !numbers.empty() && !s.empty() && parse_float(s, v) &&
+               std::binary_search(numbers.begin(), numbers.end(), v);
+    }
+};
+
+// Reproducible stratified sampler over the rows of one file, by random keys:
+// every row draws a key from the seeded generator and the sample is, per
+// stratum (the value of `column`, or a single stratum without one), the rows
+// with the smallest keys, i.e. a uniform sample of the stratum. Two bounded
+// heaps hold the candidates: a global one of the max_points smallest keys,
+// and per stratum a reserve of its min_per_stratum smallest keys, so rare
+// categories survive. finish() takes every reserve and fills the rest of
+// max_points with the smallest remaining keys, which shares it out in
+// proportion to stratum size. Memory is at most max_points +
+// strata * min_per_stratum rows, however large a stratum is.
+struct ReservoirSampler {
+    struct Entry {
+        size_t position;
+        std::vector<std::string> cells;
+        std::string key;
+        bool taken = false;
+    };
+    struct Keyed {
+        uint64_t u;
+        size_t position;
+        std::shared_ptr<Entry> entry;
+        bool operator<(const Keyed& other) const {
+            return u != other.u ? u < other.u : position < other.position;
+        }
+    };
+    // Max-heap of the `cap` smallest keys offered
+    struct Heap {
+        std::vector<Keyed> items;
+        bool wants(const Keyed& k, size_t cap) const {
+            return cap > 0 && (items.size() < cap || k < items.front());
+        }
+        void push(Keyed&& k, size_t cap) {
+            items.push_back(std::move(k));
+            std::push_heap(items.begin(), items.end());
+            if (items.size() > cap) {
+                std::pop_heap(items.begin(), items.end());
+                items.pop_back();
+            }
+        }
+    };
+    struct Stratum {
+        size_t seen = 0;
+        Heap reserve;
+    };
+
+    size_t max_points = 0;
+    size_t min_per_stratum = 0;
+    std::string column;
+    size_t col = 0;
+    std::mt19937_64 rng;
+    std::unordered_map<std::string, size_t> stratum_index;
+    std::vector<Stratum> strata;
+    Heap pool;
+
+    void offer(size_t position, const std::vector<std::string>& cells,
+               std::vector<std::string>&& proj, const std::string* key) {
+        size_t s = 0;
+        if (!column.empty()) {
+            std::string value = col < cells.size() ? strip_quotes(cells[col]) : "";
+            auto it = stratum_index.try_emplace(std::move(value), strata.size()).first;
+            s = it->second;
+        }
+        if (s == strata.size()) strata.emplace_back();
+
+        Stratum& st = strata[s];
+        ++st.seen;
+        Keyed k{rng(), position, nullptr};
+        const bool to_reserve = st.reserve.wants(k, min_per_stratum);
+        const bool to_pool = pool.wants(k, max_points);
+        if (!to_reserve && !to_pool) return;
+
+        k.entry = std::make_shared<Entry>(Entry{position, std::move(proj), key ? *key : std::string()});
+        if (to_reserve) st.reserve.push(Keyed(k), min_per_stratum);
+        if (to_pool) pool.push(std::move(k), max_points);
+    }
+
+    // Sampled rows in file order
+    std::vector<Entry> finish() {
+        std::vector<Entry> out;
+        auto take = [&out](const Keyed& k) {
+            k.entry->taken = true;
+            out.push_back(std::move(*k.entry));
+        };
+        for (auto& st : strata) {
+            for (const auto& k : st.reserve.items) take(k);
+            std::vector<Keyed>().swap(st.reserve.items);
+        }
+        std::sort(pool.items.begin(), pool.items.end());
+        for (const auto& k : pool.items) {
+            if (out.size() >= max_points) break;
+            if (!k.entry->taken) take(k);
+        }
+        std::vector<Keyed>().swap(pool.items);
+        std::sort(out.begin(), out.end(),
+                  [](const Entry& a, const Entry& b) { return a.position < b.position; });
+        return out;
+    }
+};
+
+// Row selection applied while reading a file, so that rejected rows are
+// never stored: rows failing the predicates (on this file's columns), rows
+// not kept by position, or rows whose key was not kept in another file.
+struct RowSelection {
+    std::vector<Predicate> predicates;
+    const std::vector<bool>* keep_positions = nullptr;
+    const std::unordered_set<std::string>* keep_keys = nullptr;
+    ReservoirSampler* sampler = nullptr;         // samples the accepted rows
+
+    // Filled while reading
+    std::vector<bool> kept;                      // per row read, with predicates or sampling
+    std::unordered_set<std::string> kept_keys;   // keys of the kept rows
+    std::vector<int64_t> sampled;                // sampled row positions, in file order
+    size_t rows_read = 0;
+    size_t rows_kept = 0;
+
+    bool accept(const std::vector<std::string>& cells, const std::string* key) {
+        // Position of the row, counting data rows of the file from 0
+        const size_t row = rows_read++;
+        bool keep = true;
+        if (keep_positions) {
+            keep = row < keep_positions->size() && (*keep_positions)[row];
+        }
+        if (keep && keep_keys && key) {
+            keep = keep_keys->count(*key) > 0;
+        }
+        if (!predicates.empty()) {
+            for (const auto& p : predicates) {
+                if (!p.matches(p.col < cells.size() ? cells[p.col] : std::string())) {
+                    keep = false;
+                    break;
+                }
+            }
+            kept.push_back(keep);
+            if (keep && key) kept_keys.insert(*key);
+        }
+        rows_kept += keep;
+        return keep;
+    }
+
+    // Whether rows may be rejected
+    bool active() const {
+        return !predicates.empty() || keep_positions || keep_keys || sampler;
+    }
+
+    // Take the sample: record its positions and keys, return its rows in file order
+    std::vector<ReservoirSampler::Entry> finish_sample(bool has_key) {
+        auto entries = sampler->finish();
+        kept.assign(rows_read, false);
+        kept_keys.clear();
+        sampled.clear();
+        for (const auto& e : entries) {
+            kept[e.position] = true;
+            sampled.push_back(static_cast<int64_t>(e.position));
+            if (has_key) kept_keys.insert(e.key);
+        }
+        rows_kept = entries.size();
+        return entries;
+    }
+};
+
+// Predicates from Python dicts: {"column", "op": "==" | "in" | "range",
+// "value" / "values" / "min", "max"}. Needs the GIL.
+static std::vector<Predicate> predicates_from_python(const py::object& filters) {
+    std::vector<Predicate> out;
+    if (filters.is_none()) return out;
+
+    for (auto item : filters) {
+        py::dict d = py::reinterpret_borrow<py::dict>(item);
+        Predicate p;
+        p.column = py::str(d["column"]);
+        const std::string op = d.contains("op") ? std::string(py::str(d["op"])) : "==";
+
+        if (op == "range") {
+            p.op = Predicate::RANGE;
+            if (d.contains("min") && !d["min"].is_none()) p.lo = d["min"].cast<float>();
+            if (d.contains("max") && !d["max"].is_none()) p.hi = d["max"].cast<float>();
+        } else if (op == "==" || op == "in") {
+            p.op = Predicate::IN;
+            py::list values;
+            if (op == "==") values.append(d["value"]);
+            else values = py::list(d["values"]);
+            for (auto v : values) {
+                std::string s = py::str(v);
+                float num;
+                if (py::isinstance<py::float_>(v) || py::isinstance<py::int_>(v)) {
+                    p.numbers.push_back(v.cast<float>());
+                } else if (parse_float(s, num)) {
+                    p.numbers.push_back(num);
+                }
+                p.values.insert(std::move(s));
+            }
+            std::sort(p.numbers.begin(), p.numbers.end());
+        } else {
+            throw std::runtime_error("Unknown filter op: " + op + " (expected '==', 'in' or 'range')");
+        }
+        out.push_back(std::move(p));
+    }
+    return out;
+}
+
+// Sampler from a Python dict {"max_points", "stratify" (obs column or ""),
+// "seed", "min_per_stratum"}, or null for None. Needs the GIL.
+static std::unique_ptr<ReservoirSampler> sampler_from_python(const py::object& sample) {
+    if (sample.is_none()) return nullptr;
+    py::dict d = py::reinterpret_borrow<py::dict>(sample);
+    auto sampler = std::make_unique<ReservoirSampler>();
+    sampler->max_points = d["max_points"].cast<size_t>();
+    if (sampler->max_points == 0) {
+        throw std::runtime_error("Sampling needs max_points > 0");
+    }
+    if (d.contains("stratify") && !d["stratify"].is_none()) sampler->column = py::str(d["stratify"]);
+    if (d.contains("min_per_stratum")) sampler->min_per_stratum = d["min_per_stratum"].cast<size_t>();
+    sampler->rng.seed(d.contains("seed") ? d["seed"].cast<uint64_t>() : 0);
+    return sampler;
+}
+
+// ============================================================================
+// LINE READER - plain, gzip and zstd input
+// ============================================================================
+// Compressed files are recognised by their magic bytes, not their extension.
+// They are decompressed in chunks on a producer thread and handed to the
+// parser through a small bounded queue, so decompression overlaps with
+// parsing and no temporary file is written.
+class LineReader {
 public:
-    // Returns (numpy.float32 array [rows, cols], list[dict] mappings, list[bool] is_categorical)
-    py::tuple load_csv(const std::string& filepath,
-                       const std::vector<std::string>& labels = {}) {
-        std::ifstream file(filepath);
-        if (!file.is_open()) {
+    enum Format { PLAIN, GZIP, ZSTD };
+
+    static constexpr size_t CHUNK_BYTES = 4 << 20;
+    static constexpr size_t QUEUE_CHUNKS = 4;
+
+    explicit LineReader(const std::string& filepath) : filepath_(filepath) {
+        file_ = std::fopen(filepath.c_str(), "rb");
+        if (!file_) {
             throw std::runtime_error("Cannot open file: " + filepath);
         }
+        std::fseek(file_, 0, SEEK_END);
+        file_size_ = static_cast<uint64_t>(std::ftell(file_));
+        std::fseek(file_, 0, SEEK_SET);
+
+        unsigned char magic[4] = {0, 0, 0, 0};
+        const size_t n = std::fread(magic, 1, sizeof(magic), file_);
+        std::fseek(file_, 0, SEEK_SET);
+        if (n >= 2 && magic[0] == 0x1f && magic[1] == 0x8b) {
+            format_ = GZIP;
+        } else if (n == 4 && magic[0] == 0x28 && magic[1] == 0xb5 && magic[2] == 0x2f && magic[3] == 0xfd) {
+            format_ = ZSTD;
+        }
+
+        if (format_ == GZIP) {
+#ifndef TRIDENT_WITH_ZLIB
+            close();
+            throw std::runtime_error("gzip input needs TRIDENT built with zlib: " + filepath);
+#endif
+        } else if (format_ == ZSTD) {
+#ifndef TRIDENT_WITH_ZSTD
+            close();
+            throw std::runtime_error("zstd input needs TRIDENT built with zstd: " + filepath);
+#endif
+        }
+        if (format_ != PLAIN) {
+            producer_ = std::thread([this] { produce(); });
+        }
+    }
+
+    ~LineReader() {
+        if (producer_.joinable()) {
+            {
+                std::lock_guard<std::mutex> lock(mutex_);
+                stop_ = true;
+            }
+            cv_.notify_all();
+            producer_.join();
+        }
+        close();
+    }
+
+    LineReader(const LineReader&) = delete;
+    LineReader& operator=(const LineReader&) = delete;
+
+    // Next line without its '\n', like std::getline. False at end of input.
+    bool getline(std::string& line) {
+        line.clear();
+        for (;;) {
+            if (pos_ < buf_.size()) {
+                const char* start = buf_.data() + pos_;
+                const size_t left = buf_.size() - pos_;
+                const char* nl = static_cast<const char*>(std::memchr(start, '\n', left));
+                if (nl) {
+                    line.append(start, nl - start);
+                    pos_ += (nl - start) + 1;
+                    return true;
+                }
+                line.append(start, left);
+                pos_ = buf_.size();
+            }
+            if (!next_chunk()) return !line.empty();
+        }
+    }
+
+    bool eof() {
+        return pos_ >= buf_.size() && !next_chunk();
+    }
+
+    Format format() const { return format_; }
+    const char* format_name() const {
+        return format_ == GZIP ? "gzip" : format_ == ZSTD ? "zstd" : "plain";
+    }
+    uint64_t file_size() const { return file_size_; }
+
+    // Decompressed bytes per file byte so far (1 for plain files)
+    double expansion() const {
+        const uint64_t in = bytes_in_.load();
+        return in ? static_cast<double>(bytes_out_.load()) / in : 1.0;
+    }
+
+private:
+    void close() {
+        if (file_) std::fclose(file_);
+        file_ = nullptr;
+    }
+
+    // Replace the exhausted buffer with the next chunk
+    bool next_chunk() {
+        buf_.clear();
+        pos_ = 0;
+        if (format_ == PLAIN) {
+            buf_.resize(CHUNK_BYTES);
+            const size_t n = std::fread(&buf_[0], 1, CHUNK_BYTES, file_);
+            buf_.resize(n);
+            return n > 0;
+        }
+
+        std::unique_lock<std::mutex> lock(mutex_);
+        cv_.wait(lock, [this] { return !queue_.empty() || done_; });
+        if (queue_.empty()) {
+            if (!error_.empty()) {
+                throw std::runtime_error("Cannot decompress " + filepath_ + ": " + error_);
+            }
+            return false;
+        }
+        buf_ = std::move(queue_.front());
+        queue_.pop_front();
+        lock.unlock();
+        cv_.notify_all();
+        return true;
+    }
+
+    // Producer side: false when the reader is being destroyed. `consumed` is
+    // the number of file bytes the decompressor has used up so far.
+    bool push(std::string&& chunk, uint64_t consumed) {
+        bytes_in_ = consumed;
+        bytes_out_ += chunk.size();
+        std::unique_lock<std::mutex> lock(mutex_);
+        cv_.wait(lock, [this] { return queue_.size() < QUEUE_CHUNKS || stop_; });
+        if (stop_) return false;
+        queue_.push_back(std::move(chunk));
+        lock.unlock();
+        cv_.notify_all();
+        return true;
+    }
+
+    void produce() {
+        try {
+            if (format_ == GZIP) inflate_gzip();
+            else inflate_zstd();
+        } catch (const std::exception& e) {
+            std::lock_guard<std::mutex> lock(mutex_);
+            error_ = e.what();
+        }
+        {
+            std::lock_guard<std::mutex> lock(mutex_);
+            done_ = true;
+        }
+        cv_.notify_all();
+    }
+
+    void inflate_gzip() {
+#ifdef TRIDENT_WITH_ZLIB
+        z_stream zs{};
+        // 15 + 32: zlib or gzip header, detected automatically
+        if (inflateInit2(&zs, 15 + 32) != Z_OK) throw std::runtime_error("inflateInit2 failed");
+        std::vector<unsigned char> in(1 << 20);
+        std::string out;
+        uint64_t read = 0;
+        bool pending = false;  // output was full, inflate may hold more
+        bool ended = false;    // the last member ended cleanly, nothing read since
+        for (;;) {
+            if (zs.avail_in == 0 && !pending) {
+                zs.avail_in = static_cast<uInt>(std::fread(in.data(), 1, in.size(), file_));
+                zs.next_in = in.data();
+                read += zs.avail_in;
+                if (zs.avail_in == 0) break;
+            }
+            out.resize(CHUNK_BYTES);
+            zs.next_out = reinterpret_cast<Bytef*>(&out[0]);
+            zs.avail_out = static_cast<uInt>(out.size());
+            const int ret = inflate(&zs, Z_NO_FLUSH);
+            if (ret != Z_OK && ret != Z_STREAM_END && ret != Z_BUF_ERROR) {
+                inflateEnd(&zs);
+                throw std::runtime_error(zs.msg ? zs.msg : "corrupt gzip data");
+            }
+            pending = zs.avail_out == 0;
+            out.resize(out.size() - zs.avail_out);
+            // Concatenated gzip members (e.g. from parallel compressors)
+            if (ret == Z_STREAM_END) {
+                ended = true;
+                inflateReset(&zs);
+            } else if (ret == Z_OK) {
+                ended = false;
+            }
+            // Z_BUF_ERROR made no progress (e.g. the extra call after a member
+            // filled the output exactly), so it says nothing about the end
+            if (!out.empty() && !push(std::move(out), read - zs.avail_in)) break;
+            out = std::string();
+        }
+        inflateEnd(&zs);
+        if (!ended && !stop_) throw std::runtime_error("truncated gzip data");
+#endif
+    }
+
+    void inflate_zstd() {
+#ifdef TRIDENT_WITH_ZSTD
+        ZSTD_DStream* ds = ZSTD_createDStream();
+        if (!ds) throw std::runtime_error("ZSTD_createDStream failed");
+        std::vector<char> in(ZSTD_DStreamInSize());
+        std::string out;
+        uint64_t read = 0;
+        bool pending = false;  // output was full, the stream may hold more
+        bool ended = false;    // the last frame is complete, nothing read since
+        ZSTD_inBuffer input{in.data(), 0, 0};
+        for (;;) {
+            if (input.pos == input.size && !pending) {
+                input.size = std::fread(in.data(), 1, in.size(), file_);
+                input.pos = 0;
+                read += input.size;
+                if (input.size == 0) break;
+            }
+            out.resize(CHUNK_BYTES);
+            ZSTD_outBuffer output{&out[0], out.size(), 0};
+            const size_t consumed = input.pos;
+            const size_t ret = ZSTD_decompressStream(ds, &output, &input);
+            if (ZSTD_isError(ret)) {
+                ZSTD_freeDStream(ds);
+                throw std::runtime_error(ZSTD_getErrorName(ret));
+            }
+            // ret is 0 once a frame is complete; a call that made no progress
+            // (the extra call after a frame filled the output) leaves it as is
+            if (input.pos != consumed || output.pos != 0) ended = ret == 0;
+            pending = output.pos == output.size;
+            out.resize(output.pos);
+            if (!out.empty() && !push(std::move(out), read - (input.size - input.pos))) break;
+            out = std::string();
+        }
+        ZSTD_freeDStream(ds);
+        if (!ended && !stop_) throw std::runtime_error("truncated zstd data");
+#endif
+    }
+
+    std::string filepath_;
+    std::FILE* file_ = nullptr;
+    uint64_t file_size_ = 0;
+    Format format_ = PLAIN;
+
+    std::string buf_;
+    size_t pos_ = 0;
+
+    std::thread producer_;
+    std::mutex mutex_;
+    std::condition_variable cv_;
+    std::deque<std::string> queue_;
+    bool done_ = false;
+    std::atomic<bool> stop_{false};
+    std::string error_;
+    std::atomic<uint64_t> bytes_in_{0};
+    std::atomic<uint64_t> bytes_out_{0};
+};
+
+// Data rows of a CSV file, split into cells. The header is read on
+// construction; label, key, filter and stratification columns are resolved
+// by name, and only those are copied out of each line. With a selection,
+// rows it rejects are skipped right after splitting.
+class CsvRows {
+public:
+    std::vector<std::string> headers;
+    std::vector<size_t> col_indices;  // file column of every output column
+    bool has_key = false;
+
+    CsvRows(const std::string& filepath, const std::vector<std::string>& labels,
+            const std::string& key_column, RowSelection* selection)
+        : file_(filepath), selection_(selection) {
+        if (file_.format() != LineReader::PLAIN) {
+            std::cout << "[TRIDENT C++] Streaming " << file_.format_name() << " input: " << filepath << "\n";
+        }
 
         std::string line;
-        if (!std::getline(file, line)) {
+        if (!file_.getline(line)) {
             throw std::runtime_error("CSV file is empty: " + filepath);
         }
 
         // Parse the header first and map it
-        std::vector<std::string> headers = parse_csv_line(line);
+        headers = parse_csv_line(line);
         std::unordered_map<std::string, size_t> header_map;
         for (size_t i = 0; i < headers.size(); ++i) header_map[headers[i]] = i;
 
+        // Optional index column (e.g. cell barcode) used for key-based joins
+        has_key = !key_column.empty();
+        key_idx_ = has_key ? find_key_column(headers, header_map, key_column) : 0;
+
         // Pick columns based on selected labels
-        std::vector<size_t> col_indices;
         if (!labels.empty()) {
             std::cout << "[DEBUG] Looking for labels: ";
             for (const auto& lbl : labels) std::cout << "'" << lbl << "' ";
             std::cout << "\n";
-            
+
             for (const auto& lbl : labels) {
                 auto it = header_map.find(lbl);
                 if (it == header_map.end()) {
@@ -93,270 +792,2297 @@ public:
                 col_indices.push_back(it->second);
             }
         } else {
-            for (size_t i = 0; i < headers.size(); ++i) col_indices.push_back(i);
+            for (size_t i = 0; i < headers.size(); ++i) {
+                if (has_key && i == key_idx_) continue;
+                col_indices.push_back(i);
+            }
         }
-        
+
         std::cout << "[DEBUG] Selected column indices: ";
         for (auto idx : col_indices) std::cout << idx << " ";
         std::cout << "\n";
-        
+
         std::cout << "[DEBUG] Selected column names: ";
         for (auto idx : col_indices) std::cout << "'" << headers[idx] << "' ";
         std::cout << "\n";
-        const size_t out_cols = col_indices.size();
-
-        // Read all rows as strings
-        std::vector<std::vector<std::string>> rows_str;
-        while (std::getline(file, line)) {
-            if (line.empty()) continue;
-            auto cells = parse_csv_line(line);
-            
-            // Project parsed fields to selected columns
-            std::vector<std::string> proj(out_cols);
-            for (size_t j = 0; j < out_cols; ++j) {
-                size_t col = col_indices[j];
-                proj[j] = (col < cells.size() ? cells[col] : "");
-            }
-            rows_str.emplace_back(std::move(proj));
-        }
-        if (rows_str.empty()) {
-            throw std::runtime_error("No data rows in CSV file");
-        }
-        const size_t out_rows = rows_str.size();
-
-        // Decide per-column: numeric vs categorical
-        std::vector<bool> is_categorical(out_cols, false);
-        for (size_t j = 0; j < out_cols; ++j) {
-            bool numeric = true;
-            for (size_t i = 0; i < out_rows; ++i) {
-                const std::string& orig = rows_str[i][j];
-                std::string s = strip_quotes(orig);  
-                if (s.empty()) continue; 
-                float tmp;
-                if (!parse_float(s, tmp)) { 
-                    numeric = false; 
-                    std::cout << "[DEBUG] Non-numeric value in column " << j 
-                              << " (actual column " << col_indices[j] << ", '" 
-                              << headers[col_indices[j]] << "'): '" << s << "'\n";
-                    break; 
-                }
-            }
-            is_categorical[j] = !numeric;
-        }
 
-        // Build mappings for categorical columns and numeric columns (for potential categorical override)
-        std::vector<std::unordered_map<std::string, int>> cat_maps(out_cols);
-        const int MAX_CATEGORICAL_VALUES = 1000;
-        
-        for (size_t j = 0; j < out_cols; ++j) {
-            auto& cmap = cat_maps[j];
-            
-            if (is_categorical[j]) {
-                int next_id = 0;
-                
-                // Collect all non-empty values
-                for (size_t i = 0; i < out_rows; ++i) {
-                    const std::string& s = rows_str[i][j];
-                    if (!s.empty() && cmap.find(s) == cmap.end()) {
-                        cmap[s] = next_id++;
-                    }
-                }
-                
-                // Check if there are any empty values
-                bool has_missing = false;
-                for (size_t i = 0; i < out_rows; ++i) {
-                    if (rows_str[i][j].empty()) {
-                        has_missing = true;
-                        break;
-                    }
-                }
-                
-                // Only add "nan" if there are missing values
-                if (has_missing) {
-                    cmap["nan"] = next_id++;
-                }
-            } else {
-                // Numeric column - create mapping for categorical override possibility
-                std::unordered_map<std::string, int> value_map;
-                int next_id = 0;
-                bool overflow = false;
-                
-                // Collect unique numeric values
-                for (size_t i = 0; i < out_rows; ++i) {
-                    const std::string& orig = rows_str[i][j];
-                    std::string s = strip_quotes(orig);
-                    
-                    if (s.empty()) continue;
-                    
-                    float tmp;
-                    if (parse_float(s, tmp)) {
-                        if (value_map.find(s) == value_map.end()) {
-                            if (next_id >= MAX_CATEGORICAL_VALUES) {
-                                overflow = true;
-                                break;
-                            }
-                            value_map[s] = next_id++;
-                        }
-                    }
+        // Filter and stratification columns are resolved by name, like labels
+        ReservoirSampler* sampler = selection ? selection->sampler : nullptr;
+        if (selection) {
+            for (auto& p : selection->predicates) {
+                auto it = header_map.find(p.column);
+                if (it == header_map.end()) {
+                    throw std::runtime_error("Filter column not found: " + p.column);
                 }
-                
-                if (overflow) {
-                    std::cout << "[TRIDENT C++] Column " << j << " ('" << headers[col_indices[j]] 
-                              << "') has >" << MAX_CATEGORICAL_VALUES 
-                              << " unique values (threshold exceeded). Marking as overflow.\n";
-                    cmap.clear();
-                    cmap["Overflow"] = -1;
-                    cmap["Too Many"] = -2;
-                } else if (next_id > 0) {
-                    std::cout << "[TRIDENT C++] Column " << j << " ('" << headers[col_indices[j]] 
-                              << "') has " << next_id << " unique numeric values. Creating mapping for potential categorical override.\n";
-                    cmap = std::move(value_map);
-                    
-                    // Check for missing values
-                    bool has_missing = false;
-                    for (size_t i = 0; i < out_rows; ++i) {
-                        const std::string& orig = rows_str[i][j];
-                        std::string s = strip_quotes(orig);
-                        if (s.empty()) {
-                            has_missing = true;
-                            break;
-                        }
-                    }
-                    
-                    if (has_missing) {
-                        cmap["nan"] = next_id++;
-                    }
+                p.col = it->second;
+            }
+            if (sampler && !sampler->column.empty()) {
+                auto it = header_map.find(sampler->column);
+                if (it == header_map.end()) {
+                    throw std::runtime_error("Stratification column not found: " + sampler->column);
                 }
+                sampler->col = it->second;
             }
         }
 
-        // Allocate result array
-        auto result = py::array_t<float>({out_rows, out_cols},
-                                         {sizeof(float)*out_cols, sizeof(float)});
-        auto buf = result.request();
-        float* ptr = static_cast<float*>(buf.ptr);
-        const float NaN = std::numeric_limits<float>::quiet_NaN();
+        // Only the referenced columns are copied out of each line
+        std::vector<size_t> referenced(col_indices);
+        if (has_key) referenced.push_back(key_idx_);
+        if (selection) {
+            for (const auto& p : selection->predicates) referenced.push_back(p.col);
+            if (sampler && !sampler->column.empty()) referenced.push_back(sampler->col);
+        }
+        for (size_t col : referenced) max_fields_ = std::max(max_fields_, col + 1);
+        wanted_.assign(max_fields_, false);
+        for (size_t col : referenced) wanted_[col] = true;
+    }
 
-        // Fill array
-        for (size_t i = 0; i < out_rows; ++i) {
-            for (size_t j = 0; j < out_cols; ++j) {
-                float v = NaN;
-                const std::string& orig = rows_str[i][j];
-                std::string s = strip_quotes(orig);
-                
-                if (is_categorical[j]) {
-                    const auto& cmap = cat_maps[j];
-                    if (s.empty()) {
-                        auto nan_it = cmap.find("nan");
-                        v = (nan_it != cmap.end()) ? static_cast<float>(nan_it->second) : NaN;
-                    } else {
-                        auto it = cmap.find(orig);
-                        v = (it == cmap.end()) ? NaN : static_cast<float>(it->second);
-                    }
-                } else {
-                    // Numeric columns
-                    if (s.empty()) {
-                        v = NaN;
-                    } else {
-                        if (!parse_float(s, v)) {
-                            v = NaN;
-                        }
-                    }
-                }
-                ptr[i*out_cols + j] = v;
+    // Next accepted row: its cells (by file column) and key
+    bool next(std::vector<std::string>& cells, std::string& key) {
+        while (file_.getline(line_)) {
+            if (line_.empty()) continue;
+            cells = parse_csv_line(line_, max_fields_, &wanted_);
+            if (has_key) {
+                key = key_idx_ < cells.size() ? strip_quotes(cells[key_idx_]) : "";
             }
+            if (selection_ && !selection_->accept(cells, has_key ? &key : nullptr)) continue;
+            return true;
         }
+        return false;
+    }
 
-        // Build Python-side mappings and flags
-        py::list py_maps;
-        for (size_t j = 0; j < out_cols; ++j) {
-            if (cat_maps[j].empty()) {
-                py_maps.append(py::none());
-            } else if (cat_maps[j].size() == 2 && 
-                       cat_maps[j].find("Overflow") != cat_maps[j].end() &&
-                       cat_maps[j].find("Too Many") != cat_maps[j].end()) {
-                py::dict d;
-                d[py::str("Overflow")] = py::str("Too Many");
-                py_maps.append(std::move(d));
-            } else {
-                py::dict d;
-                for (const auto& kv : cat_maps[j]) {
-                    d[py::str(kv.first)] = py::int_(kv.second);
-                }
-                py_maps.append(std::move(d));
-            }
+    // Cell of output column j
+    const std::string& cell(const std::vector<std::string>& cells, size_t j) const {
+        static const std::string empty;
+        const size_t col = col_indices[j];
+        return col < cells.size() ? cells[col] : empty;
+    }
+
+private:
+    LineReader file_;
+    RowSelection* selection_;
+    size_t key_idx_ = 0;
+    size_t max_fields_ = 0;
+    std::vector<bool> wanted_;
+    std::string line_;
+};
+
+// Numeric value of a cell, NaN if empty or not a number
+static inline float cell_value(const std::string& cell) {
+    float v = std::numeric_limits<float>::quiet_NaN();
+    const std::string s = strip_quotes(cell);
+    if (!s.empty() && !parse_float(s, v)) v = std::numeric_limits<float>::quiet_NaN();
+    return v;
+}
+
+// Parse a CSV file into typed columns, converting every cell as it is read.
+// With a sampler, the sampled rows are converted once the file is read.
+static ParsedCSV parse_csv_file(const std::string& filepath,
+                                const std::vector<std::string>& labels,
+                                const std::string& key_column = "",
+                                RowSelection* selection = nullptr) {
+    CsvRows reader(filepath, labels, key_column, selection);
+    ReservoirSampler* sampler = selection ? selection->sampler : nullptr;
+
+    ParsedCSV parsed;
+    const size_t out_cols = reader.col_indices.size();
+    parsed.columns.resize(out_cols);
+    auto add = [&](size_t j, const std::string& cell) {
+        if (parsed.columns[j].add(cell)) {
+            const size_t col = reader.col_indices[j];
+            std::cout << "[DEBUG] Non-numeric value in column " << j
+                      << " (actual column " << col << ", '"
+                      << reader.headers[col] << "'): '" << strip_quotes(cell) << "'\n";
         }
+    };
 
-        py::list py_is_cat;
-        for (bool b : is_categorical) py_is_cat.append(py::bool_(b));
+    std::vector<std::string> cells;
+    std::string key;
+    while (reader.next(cells, key)) {
+        if (sampler) {
+            std::vector<std::string> proj(out_cols);
+            for (size_t j = 0; j < out_cols; ++j) proj[j] = reader.cell(cells, j);
+            sampler->offer(selection->rows_read - 1, cells, std::move(proj),
+                           reader.has_key ? &key : nullptr);
+            continue;
+        }
+        for (size_t j = 0; j < out_cols; ++j) add(j, reader.cell(cells, j));
+        if (reader.has_key) parsed.keys.push_back(key);
+        ++parsed.rows;
+    }
+    std::vector<ReservoirSampler::Entry> sample;
+    if (sampler) {
+        sample = selection->finish_sample(reader.has_key);
+        for (auto& e : sample) {
+            for (size_t j = 0; j < out_cols; ++j) add(j, e.cells[j]);
+            if (reader.has_key) parsed.keys.push_back(std::move(e.key));
+            ++parsed.rows;
+        }
+    }
+    if (parsed.rows == 0) {
+        throw std::runtime_error(selection && selection->active() && selection->rows_read > 0
+                                 ? "No rows pass the row filters in " + filepath
+                                 : "No data rows in CSV file");
+    }
 
-        std::cout << "[TRIDENT C++] Loaded CSV (rows=" << out_rows
-                  << ", cols=" << out_cols << ")\n";
+    // Columns that turned categorical past their text prefix: their earlier
+    // cells are taken from the sample, or read again from the file (once,
+    // with the same row filters)
+    size_t reread_rows = 0;
+    for (const auto& column : parsed.columns) reread_rows = std::max(reread_rows, column.reread_rows);
+    if (reread_rows) {
+        auto reread_row = [&](size_t r, const std::vector<std::string>& row_cells, bool projected) {
+            for (size_t j = 0; j < out_cols; ++j) {
+                ParsedColumn& column = parsed.columns[j];
+                if (r < column.reread_rows) column.reread_cell(r, projected ? row_cells[j] : reader.cell(row_cells, j));
+            }
+        };
+        if (sampler) {
+            for (size_t r = 0; r < reread_rows; ++r) reread_row(r, sample[r].cells, true);
+        } else {
+            RowSelection again;
+            if (selection) again.predicates = selection->predicates;
+            CsvRows rows(filepath, labels, key_column, selection ? &again : nullptr);
+            for (size_t r = 0; r < reread_rows && rows.next(cells, key); ++r) reread_row(r, cells, false);
+        }
+        for (auto& column : parsed.columns) {
+            if (column.reread_rows) column.end_reread();
+        }
+    }
 
-        // return (array, mappings, is_categorical)
-        return py::make_tuple(result, py_maps, py_is_cat);
+    for (auto& column : parsed.columns) {
+        column.finish();
+        parsed.is_categorical.push_back(column.categorical);
     }
+    parsed.headers = std::move(reader.headers);
+    parsed.col_indices = std::move(reader.col_indices);
+    return parsed;
+}
 
-    // Getter for shape
-    std::tuple<size_t, size_t> get_shape(py::array_t<float> array) {
-        auto buf = array.request();
-        return std::make_tuple(buf.shape[0], buf.shape[1]);
+// Write the parsed columns as floats (category ids for categorical columns)
+// into `out`: element (row r, column c) goes to
+// out[r * row_stride + c * col_stride], for columns starting at `col_offset`.
+// Row-major buffers use (cols, 1), column-major buffers (1, rows).
+// With `rows` given, output row r takes source row rows[r], or NaN where
+// rows[r] < 0. Needs no GIL.
+static void fill_columns(const ParsedCSV& parsed, float* out, size_t row_stride, size_t col_stride,
+                         size_t col_offset, const std::vector<int64_t>* rows = nullptr) {
+    const size_t out_rows = rows ? rows->size() : parsed.rows;
+    const float NaN = std::numeric_limits<float>::quiet_NaN();
+
+    for (size_t j = 0; j < parsed.columns.size(); ++j) {
+        const ParsedColumn& column = parsed.columns[j];
+        float* dst = out + (col_offset + j) * col_stride;
+        for (size_t r = 0; r < out_rows; ++r) {
+            const int64_t i = rows ? (*rows)[r] : static_cast<int64_t>(r);
+            float v = NaN;
+            if (i >= 0) {
+                v = column.categorical ? static_cast<float>(column.codes[i]) : column.values[i];
+            }
+            dst[r * row_stride] = v;
+        }
     }
+}
 
-    py::array_t<float> merge_data(py::array_t<float> data, py::array_t<float> obs) {
-        // Get shapes
-        auto data_buf = data.request();
-        auto obs_buf = obs.request();
+// Python-side (mappings, is_categorical) lists of a parsed file
+static std::pair<py::list, py::list> maps_to_python(const ParsedCSV& parsed) {
+    const auto& is_categorical = parsed.is_categorical;
 
-        if (data_buf.shape[0] != obs_buf.shape[0]) {
-            throw std::runtime_error("Incompatible array shapes: different number of rows");
+    // Build Python-side mappings and flags
+    py::list py_maps;
+    for (const auto& column : parsed.columns) {
+        if (column.cat_map.empty()) {
+            py_maps.append(py::none());
+        } else {
+            py::dict d;
+            for (const auto& kv : column.cat_map) {
+                d[py::str(kv.first)] = py::int_(kv.second);
+            }
+            py_maps.append(std::move(d));
         }
+    }
 
-        size_t rows = data_buf.shape[0];
-        size_t data_cols = data_buf.shape[1];
-        size_t obs_cols = obs_buf.shape[1];
-        size_t merged_cols = data_cols + obs_cols;
+    py::list py_is_cat;
+    for (bool b : is_categorical) py_is_cat.append(py::bool_(b));
 
-        // Create merged array
-        py::array_t<float> merged({rows, merged_cols});
-        auto merged_buf = merged.request();
-        float* merged_ptr = static_cast<float*>(merged_buf.ptr);
+    return {py_maps, py_is_cat};
+}
+
+// Per-column statistics computed once at load time, so color updates and
+// legends never rescan the data. Value counts are kept for columns with at
+// most MAX_TRACKED_VALUES distinct values (category ids for categorical
+// columns); the histogram has HISTOGRAM_BINS equal-width bins over [min, max].
+static const size_t MAX_TRACKED_VALUES = 1000;
+static const size_t HISTOGRAM_BINS = 32;
+
+struct ColumnStats {
+    float min = std::numeric_limits<float>::quiet_NaN();
+    float max = std::numeric_limits<float>::quiet_NaN();
+    size_t count = 0;       // non-NaN values
+    size_t nan_count = 0;
+    size_t distinct = 0;
+    bool counts_complete = false;
+    std::vector<std::pair<float, int64_t>> value_counts;  // sorted by value
+    std::vector<int64_t> histogram;
+};
+
+// Statistics of n values col[0], col[stride], ... Needs no GIL.
+static ColumnStats compute_column_stats(const float* col, size_t n, size_t stride) {
+    ColumnStats st;
+    std::unordered_map<float, int64_t> counts;
+    bool tracking = true;
+
+    for (size_t i = 0; i < n; ++i) {
+        const float v = col[i * stride];
+        if (std::isnan(v)) {
+            ++st.nan_count;
+            continue;
+        }
+        if (st.count == 0 || v < st.min) st.min = v;
+        if (st.count == 0 || v > st.max) st.max = v;
+        ++st.count;
+        if (tracking) {
+            ++counts[v];
+            if (counts.size() > MAX_TRACKED_VALUES) {
+                tracking = false;
+                counts.clear();
+            }
+        }
+    }
 
-        const float* data_ptr = static_cast<const float*>(data_buf.ptr);
-        const float* obs_ptr = static_cast<const float*>(obs_buf.ptr);
+    if (tracking) {
+        st.counts_complete = true;
+        st.distinct = counts.size();
+        st.value_counts.assign(counts.begin(), counts.end());
+        std::sort(st.value_counts.begin(), st.value_counts.end());
+    } else {
+        // Too many values to count individually: exact distinct count by sorting a copy
+        std::vector<float> values;
+        values.reserve(st.count);
+        for (size_t i = 0; i < n; ++i) {
+            const float v = col[i * stride];
+            if (!std::isnan(v)) values.push_back(v);
+        }
+        std::sort(values.begin(), values.end());
+        st.distinct = static_cast<size_t>(std::unique(values.begin(), values.end()) - values.begin());
+    }
 
-        // Copy row by row
-        for (size_t i = 0; i < rows; ++i) {
-            // Copy data row
-            std::memcpy(
-                merged_ptr + i * merged_cols,
-                data_ptr + i * data_cols,
-                data_cols * sizeof(float)
-            );
-            // Copy obs row
-            std::memcpy(
-                merged_ptr + i * merged_cols + data_cols,
-                obs_ptr + i * obs_cols,
-                obs_cols * sizeof(float)
-            );
+    if (st.count > 0) {
+        st.histogram.assign(HISTOGRAM_BINS, 0);
+        const double range = static_cast<double>(st.max) - st.min;
+        for (size_t i = 0; i < n; ++i) {
+            const float v = col[i * stride];
+            if (std::isnan(v)) continue;
+            size_t bin = range > 0 ? static_cast<size_t>((v - st.min) / range * HISTOGRAM_BINS) : 0;
+            st.histogram[std::min(bin, HISTOGRAM_BINS - 1)]++;
         }
+    }
+    return st;
+}
+
+// Statistics of columns [first, first + cols) of a [rows, *] buffer
+static std::vector<ColumnStats> compute_table_stats(const float* ptr, size_t rows, size_t row_stride,
+                                                    size_t col_stride, size_t first, size_t cols) {
+    std::vector<ColumnStats> out;
+    out.reserve(cols);
+    for (size_t j = first; j < first + cols; ++j) {
+        out.push_back(compute_column_stats(ptr + j * col_stride, rows, row_stride));
+    }
+    return out;
+}
 
-        return merged;
+// Python-side list of per-column statistics dicts. "values"/"counts" are
+// None when the column has more than MAX_TRACKED_VALUES distinct values.
+static py::list stats_to_python(const std::vector<ColumnStats>& stats) {
+    py::list out;
+    for (const auto& st : stats) {
+        py::dict d;
+        d["min"] = st.count ? py::object(py::float_(st.min)) : py::object(py::none());
+        d["max"] = st.count ? py::object(py::float_(st.max)) : py::object(py::none());
+        d["count"] = st.count;
+        d["nan_count"] = st.nan_count;
+        d["distinct"] = st.distinct;
+        if (st.counts_complete) {
+            py::list values, counts;
+            for (const auto& vc : st.value_counts) {
+                values.append(py::float_(vc.first));
+                counts.append(py::int_(vc.second));
+            }
+            d["values"] = values;
+            d["counts"] = counts;
+        } else {
+            d["values"] = py::none();
+            d["counts"] = py::none();
+        }
+        d["histogram"] = st.histogram;
+        out.append(std::move(d));
     }
+    return out;
+}
+
+// Dictionary encoding for high-cardinality categorical columns: the distinct
+// names concatenated in sorted order into one byte arena with int64 offsets
+// (name i is arena[offsets[i]:offsets[i + 1]]), plus an int32 code per row
+// (-1 for missing). Per million rows this costs 4 MB of codes; the table
+// adds about (mean name length + 12) bytes per distinct value.
+struct Dictionary {
+    std::vector<int32_t> codes;
+    std::string arena;
+    std::vector<int64_t> offsets;
+    std::vector<float> values;   // numeric value of each name
 };
 
-PYBIND11_MODULE(_trident, m) {
-    m.doc() = "TRIDENT core - High performance data processing";
+// Shortest "%g" spelling of a float that reads back to the same value;
+// integers are written without decimals
+static std::string format_category(float v) {
+    char buf[64];
+    if (std::nearbyint(v) == v && std::fabs(v) < 1e15f) {
+        std::snprintf(buf, sizeof(buf), "%lld", static_cast<long long>(v));
+        return buf;
+    }
+    for (int precision = 6; precision < 9; ++precision) {
+        std::snprintf(buf, sizeof(buf), "%.*g", precision, v);
+        if (std::strtof(buf, nullptr) == v) return buf;
+    }
+    std::snprintf(buf, sizeof(buf), "%.9g", v);
+    return buf;
+}
 
-    py::class_<TRIDENTDataLoader>(m, "DataLoader")
-    .def(py::init<>())
-    .def("load_csv", &TRIDENTDataLoader::load_csv,
-         py::arg("filepath"),
-         py::arg("labels") = std::vector<std::string>(),
+// Dictionary-encode n float values col[0], col[stride], ... with the names
+// sorted by value. Needs no GIL.
+static Dictionary encode_float_column(const float* col, size_t n, size_t stride) {
+    Dictionary dict;
+    auto& uniq = dict.values;
+    uniq.reserve(n);
+    for (size_t i = 0; i < n; ++i) {
+        const float v = col[i * stride];
+        if (!std::isnan(v)) uniq.push_back(v);
+    }
+    std::sort(uniq.begin(), uniq.end());
+    uniq.erase(std::unique(uniq.begin(), uniq.end()), uniq.end());
+    uniq.shrink_to_fit();
+
+    dict.codes.resize(n);
+    for (size_t i = 0; i < n; ++i) {
+        const float v = col[i * stride];
+        dict.codes[i] = std::isnan(v)
+            ? -1
+            : static_cast<int32_t>(std::lower_bound(uniq.begin(), uniq.end(), v) - uniq.begin());
+    }
+
+    dict.offsets.reserve(uniq.size() + 1);
+    dict.offsets.push_back(0);
+    for (float v : uniq) {
+        dict.arena += format_category(v);
+        dict.offsets.push_back(static_cast<int64_t>(dict.arena.size()));
+    }
+    return dict;
+}
+
+// Stable palette slot of every name in a dictionary arena (FNV-1a hash of
+// the name modulo n_slots): a category keeps its color whatever other
+// categories are present. Needs no GIL.
+static std::vector<int32_t> hash_slots(const char* arena, const int64_t* offsets,
+                                       size_t n_names, uint32_t n_slots) {
+    std::vector<int32_t> slots(n_names);
+    for (size_t i = 0; i < n_names; ++i) {
+        uint32_t h = 2166136261u;
+        for (int64_t k = offsets[i]; k < offsets[i + 1]; ++k) {
+            h ^= static_cast<unsigned char>(arena[k]);
+            h *= 16777619u;
+        }
+        slots[i] = static_cast<int32_t>(h % n_slots);
+    }
+    return slots;
+}
+
+template <typename T>
+static py::array_t<T> vector_to_numpy(const std::vector<T>& v) {
+    py::array_t<T> out(static_cast<py::ssize_t>(v.size()));
+    if (!v.empty()) std::memcpy(out.request().ptr, v.data(), v.size() * sizeof(T));
+    return out;
+}
+
+static py::array_t<uint8_t> arena_to_numpy(const std::string& arena) {
+    py::array_t<uint8_t> out(static_cast<py::ssize_t>(arena.size()));
+    if (!arena.empty()) std::memcpy(out.request().ptr, arena.data(), arena.size());
+    return out;
+}
+
+// Match counts of a key join
+struct JoinStats {
+    size_t matched = 0;
+    size_t unmatched_obs = 0;
+    size_t duplicate_obs = 0;
+};
+
+// Hash index over obs keys for key-based joins (first occurrence wins).
+// match() looks up one obsm key; finish() counts the obs rows never matched.
+class KeyIndex {
+public:
+    template <typename ObsKey>
+    KeyIndex(size_t obs_rows, ObsKey obs_key, JoinStats& stats) : used_(obs_rows, false), stats_(stats) {
+        index_.reserve(obs_rows);
+        for (size_t i = 0; i < obs_rows; ++i) {
+            if (!index_.emplace(obs_key(i), static_cast<int64_t>(i)).second) {
+                ++stats_.duplicate_obs;
+            }
+        }
+    }
+
+    // obs row of an obsm key, or -1
+    int64_t match(std::string_view key) {
+        auto it = index_.find(key);
+        if (it == index_.end()) return -1;
+        used_[it->second] = true;
+        ++stats_.matched;
+        return it->second;
+    }
+
+    void finish() {
+        stats_.unmatched_obs = static_cast<size_t>(std::count(used_.begin(), used_.end(), false));
+    }
+
+private:
+    std::unordered_map<std::string_view, int64_t> index_;
+    std::vector<bool> used_;
+    JoinStats& stats_;
+};
+
+static py::dict join_stats_to_python(const JoinStats& stats, const std::string& how,
+                                     size_t rows, size_t data_rows) {
+    py::dict d;
+    d["how"] = how;
+    d["rows"] = rows;
+    d["matched"] = stats.matched;
+    d["unmatched_obsm"] = data_rows - stats.matched;
+    d["unmatched_obs"] = stats.unmatched_obs;
+    d["duplicate_obs_keys"] = stats.duplicate_obs;
+
+    std::cout << "[TRIDENT C++] Joined on key (" << how << "): " << stats.matched << "/" << data_rows
+              << " obsm rows matched, " << stats.unmatched_obs << " obs rows unmatched\n";
+    return d;
+}
+
+// float32 [rows, cols] array, C (row-major) or Fortran (column-major) ordered.
+// Column-major makes every column a contiguous block, so per-label reads
+// touch only that label's bytes.
+static py::array_t<float> alloc_table(size_t rows, size_t cols, bool column_major) {
+    if (column_major) {
+        return py::array_t<float>({rows, cols}, {sizeof(float), sizeof(float) * rows});
+    }
+    return py::array_t<float>({rows, cols}, {sizeof(float) * cols, sizeof(float)});
+}
+
+// Schema probe: header, per-column type and distinct counts of a bounded
+// sample of rows, and the row count estimated from the file size.
+struct ProbeResult {
+    std::vector<std::string> names;
+    std::vector<bool> is_categorical;
+    std::vector<size_t> cardinalities;
+    size_t rows = 0;
+    bool rows_exact = false;
+    size_t sampled_rows = 0;
+    uint64_t file_size = 0;
+    std::string compression;  // "plain", "gzip" or "zstd"
+};
+
+// Sample-based distinct count estimate (GEE, Charikar et al. 2000):
+// sqrt(N / n) * (values seen once) + (values seen more than once),
+// for a sample of n out of N values.
+static size_t estimate_distinct(const std::unordered_map<std::string, size_t>& counts,
+                                size_t n, size_t total) {
+    if (n == 0) return 0;
+    size_t once = 0, more = 0;
+    for (const auto& kv : counts) (kv.second == 1 ? once : more)++;
+    // Every sampled value distinct (ids, barcodes): assume a key column
+    if (once == n) return total;
+    const double scale = std::sqrt(static_cast<double>(total) / static_cast<double>(n));
+    const double estimate = scale * once + more;
+    return std::min(total, static_cast<size_t>(std::llround(estimate)));
+}
+
+// Needs no GIL. Reads at most sample_rows rows and sample_bytes bytes.
+static ProbeResult probe_csv_file(const std::string& filepath, size_t sample_rows, size_t sample_bytes) {
+    LineReader file(filepath);
+    ProbeResult probe;
+    probe.file_size = file.file_size();
+    probe.compression = file.format_name();
+
+    std::string line;
+    if (!file.getline(line)) {
+        throw std::runtime_error("CSV file is empty: " + filepath);
+    }
+    const uint64_t header_bytes = line.size() + 1;
+    probe.names = parse_csv_line(line);
+    const size_t cols = probe.names.size();
+
+    std::vector<std::unordered_map<std::string, size_t>> counts(cols);
+    std::vector<size_t> non_empty(cols, 0);
+    std::vector<bool> numeric(cols, true);
+    uint64_t sample_size = 0;
+    bool eof = true;
+
+    while (file.getline(line)) {
+        sample_size += line.size() + 1;
+        if (line.empty()) continue;
+        auto cells = parse_csv_line(line);
+        for (size_t j = 0; j < cols && j < cells.size(); ++j) {
+            const std::string& s = cells[j];
+            if (s.empty()) continue;
+            ++non_empty[j];
+            ++counts[j][s];
+            float tmp;
+            if (numeric[j] && !parse_float(s, tmp)) numeric[j] = false;
+        }
+        if (++probe.sampled_rows >= sample_rows || sample_size >= sample_bytes) {
+            eof = file.eof();
+            break;
+        }
+    }
+
+    probe.rows_exact = eof;
+    if (eof || probe.sampled_rows == 0) {
+        probe.rows = probe.sampled_rows;
+    } else {
+        // Compressed files: scale the size by the compression ratio seen so far
+        const double bytes_per_row = static_cast<double>(sample_size) / probe.sampled_rows;
+        const double text_size = probe.file_size * file.expansion();
+        probe.rows = static_cast<size_t>(std::max(0.0, text_size - header_bytes) / bytes_per_row);
+    }
+
+    for (size_t j = 0; j < cols; ++j) {
+        probe.is_categorical.push_back(!numeric[j]);
+        if (eof) {
+            probe.cardinalities.push_back(counts[j].size());
+        } else {
+            // Scale the non-empty count of the sample up to the whole file
+            const size_t total = static_cast<size_t>(
+                static_cast<double>(non_empty[j]) / probe.sampled_rows * probe.rows);
+            probe.cardinalities.push_back(estimate_distinct(counts[j], non_empty[j], total));
+        }
+    }
+    return probe;
+}
+
+// ============================================================================
+// INCREMENTAL CSV READS - rows appended to a plain CSV file after a load
+// ============================================================================
+
+// Byte offset just past the first `rows` data rows of a plain CSV file (the
+// header and empty lines are skipped as in parse_csv_file), or -1 if the
+// file has fewer rows. A last row without line break ends at EOF.
+static int64_t csv_rows_end(const std::string& filepath, size_t rows) {
+    std::ifstream file(filepath, std::ios::binary);
+    if (!file) throw std::runtime_error("Cannot open file: " + filepath);
+
+    std::vector<char> buf(1 << 20);
+    int64_t offset = 0, line_start = 0;
+    bool header = true;
+    size_t seen = 0;
+    while (file) {
+        file.read(buf.data(), static_cast<std::streamsize>(buf.size()));
+        const std::streamsize got = file.gcount();
+        if (got <= 0) break;
+        const char* p = buf.data();
+        const char* end = p + got;
+        while (p < end) {
+            const char* nl = static_cast<const char*>(std::memchr(p, '\n', end - p));
+            if (!nl) break;
+            const int64_t pos = offset + (nl - buf.data());
+            const bool empty = pos == line_start;
+            line_start = pos + 1;
+            p = nl + 1;
+            if (header) {
+                header = false;
+                if (rows == 0) return line_start;
+            } else if (!empty && ++seen == rows) {
+                return line_start;
+            }
+        }
+        offset += got;
+    }
+    if (!header && offset > line_start && seen + 1 == rows) return offset;
+    return -1;
+}
+
+struct CsvRange {
+    std::vector<float> values;                    // row-major [rows, cols]
+    std::vector<int64_t> ends;                    // byte offset past each row
+    size_t cols = 0;
+    std::vector<std::vector<std::string>> added;  // new category names per column
+    std::vector<std::vector<int32_t>> codes;      // category codes per column, empty for numeric columns
+};
+
+// Parse the complete lines of a plain CSV file from byte offset `start` (a
+// line start after the header) on; a last line without line break is left
+// for a later read. Categorical columns (those in `categories`, with their
+// names in code order) continue their category lists: known names keep
+// their ids, new names get the next ones, in order of appearance. Their
+// codes are also returned as int32, straight from the category lists. A value
+// that is not a number in a numeric column throws, as the column type has
+// changed.
+static CsvRange read_csv_range(const std::string& filepath, const std::vector<std::string>& labels,
+                               int64_t start,
+                               const std::unordered_map<std::string, std::vector<std::string>>& categories) {
+    std::ifstream file(filepath, std::ios::binary);
+    if (!file) throw std::runtime_error("Cannot open file: " + filepath);
+
+    std::string line;
+    if (!std::getline(file, line)) throw std::runtime_error("CSV file is empty: " + filepath);
+    const std::vector<std::string> headers = parse_csv_line(line);
+    std::unordered_map<std::string, size_t> header_map;
+    for (size_t i = 0; i < headers.size(); ++i) header_map[headers[i]] = i;
+
+    std::vector<size_t> col_indices;
+    if (labels.empty()) {
+        for (size_t i = 0; i < headers.size(); ++i) col_indices.push_back(i);
+    } else {
+        for (const auto& lbl : labels) {
+            auto it = header_map.find(lbl);
+            if (it == header_map.end()) throw std::runtime_error("Label not found: " + lbl);
+            col_indices.push_back(it->second);
+        }
+    }
+    const size_t cols = col_indices.size();
+    size_t max_fields = 0;
+    for (size_t col : col_indices) max_fields = std::max(max_fields, col + 1);
+    std::vector<bool> wanted(max_fields, false);
+    for (size_t col : col_indices) wanted[col] = true;
+
+    // Category ids of the categorical columns
+    std::vector<bool> is_categorical(cols, false);
+    std::vector<std::unordered_map<std::string, int>> cat_maps(cols);
+    std::vector<int> next_id(cols, 0);
+    for (size_t j = 0; j < cols; ++j) {
+        auto it = categories.find(labels.empty() ? headers[col_indices[j]] : labels[j]);
+        if (it == categories.end()) continue;
+        is_categorical[j] = true;
+        for (const auto& name : it->second) cat_maps[j].emplace(name, next_id[j]++);
+    }
+
+    file.seekg(0, std::ios::end);
+    const int64_t size = static_cast<int64_t>(file.tellg());
+    if (start < 0 || start > size) throw std::runtime_error("Offset past the end of " + filepath);
+    std::string text(static_cast<size_t>(size - start), '\0');
+    file.seekg(start);
+    file.read(&text[0], static_cast<std::streamsize>(text.size()));
+
+    CsvRange range;
+    range.cols = cols;
+    range.added.resize(cols);
+    range.codes.resize(cols);
+    const float NaN = std::numeric_limits<float>::quiet_NaN();
+    size_t pos = 0;
+    for (;;) {
+        const size_t nl = text.find('\n', pos);
+        if (nl == std::string::npos) break;
+        line.assign(text, pos, nl - pos);
+        pos = nl + 1;
+        if (line.empty()) continue;
+
+        const auto cells = parse_csv_line(line, max_fields, &wanted);
+        for (size_t j = 0; j < cols; ++j) {
+            const size_t col = col_indices[j];
+            const std::string& orig = col < cells.size() ? cells[col] : std::string();
+            const std::string s = strip_quotes(orig);
+            float v = NaN;
+            if (is_categorical[j]) {
+                const std::string& name = s.empty() ? std::string("nan") : orig;
+                auto it = cat_maps[j].find(name);
+                if (it == cat_maps[j].end()) {
+                    it = cat_maps[j].emplace(name, next_id[j]++).first;
+                    range.added[j].push_back(name);
+                }
+                v = static_cast<float>(it->second);
+                range.codes[j].push_back(it->second);
+            } else if (!s.empty() && !parse_float(s, v)) {
+                throw std::runtime_error("Column '" + headers[col] + "' is no longer numeric (value '" + s + "')");
+            }
+            range.values.push_back(v);
+        }
+        range.ends.push_back(start + static_cast<int64_t>(pos));
+    }
+    return range;
+}
+
+// ============================================================================
+// H5AD READER - AnnData files through HDF5 (optional, TRIDENT_WITH_HDF5)
+// ============================================================================
+// Reads only the requested datasets of an .h5ad file: one obsm array
+// (obsm/<key>, [n_obs, d]) and single obs columns. Numeric columns are read
+// as float32; pandas categoricals (a group with "codes" and "categories")
+// and string arrays come back as int32 codes and a category table, in code
+// order. Large datasets are read in row blocks.
+#ifdef TRIDENT_WITH_HDF5
+
+// The serial HDF5 library is not thread-safe; every access holds this lock
+static std::mutex h5_mutex;
+
+static constexpr hsize_t H5_BLOCK_ROWS = 1 << 16;
+
+// Owned HDF5 identifier
+class H5Id {
+public:
+    H5Id(hid_t id, herr_t (*close)(hid_t)) : id_(id), close_(close) {}
+    ~H5Id() { if (id_ >= 0) close_(id_); }
+    H5Id(H5Id&& other) noexcept : id_(other.id_), close_(other.close_) { other.id_ = -1; }
+    H5Id(const H5Id&) = delete;
+    H5Id& operator=(const H5Id&) = delete;
+    operator hid_t() const { return id_; }
+    bool valid() const { return id_ >= 0; }
+private:
+    hid_t id_;
+    herr_t (*close_)(hid_t);
+};
+
+static H5Id h5_open_file(const std::string& filepath) {
+    H5Eset_auto2(H5E_DEFAULT, nullptr, nullptr);  // errors become exceptions
+    H5Id file(H5Fopen(filepath.c_str(), H5F_ACC_RDONLY, H5P_DEFAULT), H5Fclose);
+    if (!file.valid()) {
+        throw std::runtime_error("Cannot open h5ad file: " + filepath);
+    }
+    return file;
+}
+
+// Whether every link along `path` exists
+static bool h5_exists(hid_t loc, const std::string& path) {
+    size_t pos = 0;
+    while (true) {
+        pos = path.find('/', pos + 1);
+        const std::string prefix = path.substr(0, pos);
+        if (H5Lexists(loc, prefix.c_str(), H5P_DEFAULT) <= 0) return false;
+        if (pos == std::string::npos) return true;
+    }
+}
+
+static bool h5_is_group(hid_t loc, const std::string& path) {
+    H5Id obj(H5Oopen(loc, path.c_str(), H5P_DEFAULT), H5Oclose);
+    return obj.valid() && H5Iget_type(obj) == H5I_GROUP;
+}
+
+static hsize_t h5_length(hid_t dset) {
+    H5Id space(H5Dget_space(dset), H5Sclose);
+    return static_cast<hsize_t>(H5Sget_simple_extent_npoints(space));
+}
+
+static std::vector<hsize_t> h5_shape(hid_t dset) {
+    H5Id space(H5Dget_space(dset), H5Sclose);
+    std::vector<hsize_t> dims(H5Sget_simple_extent_ndims(space));
+    H5Sget_simple_extent_dims(space, dims.data(), nullptr);
+    return dims;
+}
+
+// Strings of a dataset or attribute (read with `read`), variable or fixed length
+template <typename Read>
+static std::vector<std::string> h5_read_strings(hid_t type, size_t n, Read read) {
+    std::vector<std::string> out;
+    out.reserve(n);
+    if (H5Tis_variable_str(type) > 0) {
+        H5Id mem(H5Tcopy(H5T_C_S1), H5Tclose);
+        H5Tset_size(mem, H5T_VARIABLE);
+        H5Tset_cset(mem, H5Tget_cset(type));
+        std::vector<char*> ptrs(n, nullptr);
+        if (n && read(mem, ptrs.data()) < 0) throw std::runtime_error("Cannot read strings");
+        // The strings were allocated by the HDF5 library, which may use another
+        // C runtime (Windows) or allocator: only HDF5 can free them
+        struct Reclaim {
+            std::vector<char*>& ptrs;
+            ~Reclaim() { for (char* p : ptrs) if (p) H5free_memory(p); }
+        } reclaim{ptrs};
+        for (char* p : ptrs) out.emplace_back(p ? p : "");
+    } else {
+        const size_t size = H5Tget_size(type);
+        H5Id mem(H5Tcopy(H5T_C_S1), H5Tclose);
+        H5Tset_size(mem, size);
+        std::vector<char> buf(n * size);
+        if (n && read(mem, buf.data()) < 0) throw std::runtime_error("Cannot read strings");
+        for (size_t i = 0; i < n; ++i) {
+            const char* s = buf.data() + i * size;
+            out.emplace_back(s, strnlen(s, size));
+        }
+    }
+    return out;
+}
+
+static std::vector<std::string> h5_string_list_attr(hid_t obj, const char* name) {
+    if (H5Aexists(obj, name) <= 0) return {};
+    H5Id attr(H5Aopen(obj, name, H5P_DEFAULT), H5Aclose);
+    H5Id type(H5Aget_type(attr), H5Tclose);
+    H5Id space(H5Aget_space(attr), H5Sclose);
+    if (H5Tget_class(type) != H5T_STRING) return {};
+    const size_t n = static_cast<size_t>(H5Sget_simple_extent_npoints(space));
+    return h5_read_strings(type, n, [&](hid_t mem, void* buf) { return H5Aread(attr, mem, buf); });
+}
+
+static std::string h5_string_attr(hid_t obj, const char* name) {
+    auto values = h5_string_list_attr(obj, name);
+    return values.empty() ? "" : values[0];
+}
+
+// The first `limit` strings of a 1D dataset
+static std::vector<std::string> h5_read_string_dataset(hid_t dset,
+                                                       size_t limit = std::numeric_limits<size_t>::max()) {
+    H5Id type(H5Dget_type(dset), H5Tclose);
+    const hsize_t n = std::min<hsize_t>(h5_length(dset), limit);
+    H5Id file_space(H5Dget_space(dset), H5Sclose);
+    const hsize_t start = 0;
+    H5Sselect_hyperslab(file_space, H5S_SELECT_SET, &start, nullptr, &n, nullptr);
+    H5Id mem_space(H5Screate_simple(1, &n, nullptr), H5Sclose);
+    return h5_read_strings(type, n, [&](hid_t mem, void* buf) {
+        return H5Dread(dset, mem, mem_space, file_space, H5P_DEFAULT, buf);
+    });
+}
+
+// Rows [r0, r0 + count) and the first `cols` columns of a 1D or 2D dataset
+static void h5_read_block(hid_t dset, hid_t mem_type, hsize_t r0, hsize_t count, hsize_t cols,
+                          bool two_d, void* buf) {
+    H5Id file_space(H5Dget_space(dset), H5Sclose);
+    hsize_t start[2] = {r0, 0};
+    hsize_t size[2] = {count, cols};
+    H5Sselect_hyperslab(file_space, H5S_SELECT_SET, start, nullptr, size, nullptr);
+    H5Id mem_space(H5Screate_simple(two_d ? 2 : 1, size, nullptr), H5Sclose);
+    if (H5Dread(dset, mem_type, mem_space, file_space, H5P_DEFAULT, buf) < 0) {
+        throw std::runtime_error("Cannot read HDF5 dataset");
+    }
+}
+
+// Numeric 1D dataset as float32, read in row blocks. Booleans (h5py stores
+// them as an int8 enum) are read through their base integer type.
+static std::vector<float> h5_read_floats(hid_t dset, size_t limit = std::numeric_limits<size_t>::max()) {
+    H5Id type(H5Dget_type(dset), H5Tclose);
+    const hsize_t n = std::min<hsize_t>(h5_length(dset), limit);
+    std::vector<float> out(n);
+    if (H5Tget_class(type) == H5T_ENUM) {
+        H5Id native(H5Tget_native_type(type, H5T_DIR_ASCEND), H5Tclose);
+        const size_t size = H5Tget_size(native);
+        std::vector<char> buf(std::min(n, H5_BLOCK_ROWS) * size);
+        for (hsize_t r0 = 0; r0 < n; r0 += H5_BLOCK_ROWS) {
+            const hsize_t count = std::min(H5_BLOCK_ROWS, n - r0);
+            h5_read_block(dset, native, r0, count, 1, false, buf.data());
+            for (hsize_t i = 0; i < count; ++i) {
+                int64_t v = 0;
+                if (size == 1) v = reinterpret_cast<const int8_t*>(buf.data())[i];
+                else if (size == 2) v = reinterpret_cast<const int16_t*>(buf.data())[i];
+                else if (size == 4) v = reinterpret_cast<const int32_t*>(buf.data())[i];
+                else v = reinterpret_cast<const int64_t*>(buf.data())[i];
+                out[r0 + i] = static_cast<float>(v);
+            }
+        }
+        return out;
+    }
+    const H5T_class_t cls = H5Tget_class(type);
+    if (cls != H5T_INTEGER && cls != H5T_FLOAT) {
+        throw std::runtime_error("Unsupported HDF5 column type (expected numbers)");
+    }
+    for (hsize_t r0 = 0; r0 < n; r0 += H5_BLOCK_ROWS) {
+        const hsize_t count = std::min(H5_BLOCK_ROWS, n - r0);
+        h5_read_block(dset, H5T_NATIVE_FLOAT, r0, count, 1, false, out.data() + r0);
+    }
+    return out;
+}
+
+static std::vector<int32_t> h5_read_codes(hid_t dset) {
+    const hsize_t n = h5_length(dset);
+    std::vector<int32_t> out(n);
+    for (hsize_t r0 = 0; r0 < n; r0 += H5_BLOCK_ROWS) {
+        const hsize_t count = std::min(H5_BLOCK_ROWS, n - r0);
+        h5_read_block(dset, H5T_NATIVE_INT32, r0, count, 1, false, out.data() + r0);
+    }
+    return out;
+}
+
+// One obs column: float values, or int32 codes and category names
+struct H5Column {
+    bool categorical = false;
+    std::vector<float> values;
+    std::vector<int32_t> codes;
+    std::vector<std::string> names;
+};
+
+// Category names of a categorical's "categories" dataset (strings or numbers)
+static std::vector<std::string> h5_category_names(hid_t dset) {
+    H5Id type(H5Dget_type(dset), H5Tclose);
+    if (H5Tget_class(type) == H5T_STRING) return h5_read_string_dataset(dset);
+    std::vector<std::string> names;
+    for (float v : h5_read_floats(dset)) names.push_back(format_category(v));
+    return names;
+}
+
+// Dictionary-encode a string array, names sorted; "" is the missing value
+static void encode_strings(std::vector<std::string>&& strings, H5Column& column) {
+    std::vector<std::string> names(strings);
+    std::sort(names.begin(), names.end());
+    names.erase(std::unique(names.begin(), names.end()), names.end());
+    std::unordered_map<std::string_view, int32_t> index;
+    for (size_t i = 0; i < names.size(); ++i) index.emplace(names[i], static_cast<int32_t>(i));
+    column.codes.resize(strings.size());
+    for (size_t i = 0; i < strings.size(); ++i) column.codes[i] = index[strings[i]];
+    if (!names.empty() && names[0].empty()) names[0] = "nan";
+    column.names = std::move(names);
+    column.categorical = true;
+}
+
+static H5Column h5ad_read_obs_column(hid_t file, const std::string& name) {
+    const std::string path = "obs/" + name;
+    if (!h5_exists(file, path)) {
+        throw std::runtime_error("No obs column '" + name + "' in h5ad file");
+    }
+
+    H5Column column;
+    if (h5_is_group(file, path)) {
+        H5Id group(H5Gopen2(file, path.c_str(), H5P_DEFAULT), H5Gclose);
+        const std::string encoding = h5_string_attr(group, "encoding-type");
+        if (encoding == "categorical" || (h5_exists(group, "codes") && h5_exists(group, "categories"))) {
+            H5Id codes(H5Dopen2(group, "codes", H5P_DEFAULT), H5Dclose);
+            H5Id categories(H5Dopen2(group, "categories", H5P_DEFAULT), H5Dclose);
+            column.codes = h5_read_codes(codes);
+            column.names = h5_category_names(categories);
+            column.categorical = true;
+        } else if (encoding.rfind("nullable-", 0) == 0) {
+            // Nullable integers / booleans: values plus a mask of missing entries
+            H5Id values(H5Dopen2(group, "values", H5P_DEFAULT), H5Dclose);
+            H5Id mask(H5Dopen2(group, "mask", H5P_DEFAULT), H5Dclose);
+            column.values = h5_read_floats(values);
+            const auto missing = h5_read_floats(mask);
+            for (size_t i = 0; i < column.values.size() && i < missing.size(); ++i) {
+                if (missing[i] != 0.0f) column.values[i] = std::numeric_limits<float>::quiet_NaN();
+            }
+        } else {
+            throw std::runtime_error("Unsupported obs column encoding '" + encoding + "': " + name);
+        }
+        return column;
+    }
+
+    H5Id dset(H5Dopen2(file, path.c_str(), H5P_DEFAULT), H5Dclose);
+    if (H5Aexists(dset, "categories") > 0) {
+        throw std::runtime_error("obs column '" + name + "' uses the pre-0.7 anndata categorical layout; "
+                                 "re-save the file with a recent anndata");
+    }
+    H5Id type(H5Dget_type(dset), H5Tclose);
+    if (H5Tget_class(type) == H5T_STRING) {
+        encode_strings(h5_read_string_dataset(dset), column);
+    } else {
+        column.values = h5_read_floats(dset);
+    }
+    return column;
+}
+
+// obs column names in dataframe order
+static std::vector<std::string> h5ad_obs_names(hid_t file) {
+    H5Id obs(H5Gopen2(file, "obs", H5P_DEFAULT), H5Gclose);
+    if (!obs.valid()) throw std::runtime_error("h5ad file has no obs group");
+    auto names = h5_string_list_attr(obs, "column-order");
+    if (!names.empty() || H5Aexists(obs, "column-order") > 0) return names;
+
+    // Older files: every member except the index
+    const std::string index = h5_string_attr(obs, "_index");
+    H5G_info_t info;
+    H5Gget_info(obs, &info);
+    for (hsize_t i = 0; i < info.nlinks; ++i) {
+        char buf[1024];
+        H5Lget_name_by_idx(obs, ".", H5_INDEX_NAME, H5_ITER_INC, i, buf, sizeof(buf), H5P_DEFAULT);
+        std::string name(buf);
+        if (name != index && name != "_index" && name != "__categories") names.push_back(name);
+    }
+    return names;
+}
+
+// First `cols` columns of obsm/<key>, for all rows or the sorted `rows`
+static std::vector<float> h5ad_read_obsm(hid_t file, const std::string& key, hsize_t cols,
+                                         const std::vector<int64_t>* rows, hsize_t& n_out, hsize_t& c_out) {
+    const std::string path = "obsm/" + key;
+    if (!h5_exists(file, path) || h5_is_group(file, path)) {
+        throw std::runtime_error("No obsm array '" + key + "' in h5ad file");
+    }
+    H5Id dset(H5Dopen2(file, path.c_str(), H5P_DEFAULT), H5Dclose);
+    const auto dims = h5_shape(dset);
+    if (dims.size() != 2) throw std::runtime_error("obsm/" + key + " is not a 2D array");
+    const hsize_t n = dims[0];
+    c_out = std::min(cols, dims[1]);
+    n_out = rows ? rows->size() : n;
+
+    std::vector<float> out(n_out * c_out);
+    std::vector<float> block(std::min(n, H5_BLOCK_ROWS) * c_out);
+    size_t next = 0;  // next wanted entry of rows
+    for (hsize_t r0 = 0; r0 < n && (!rows || next < rows->size()); r0 += H5_BLOCK_ROWS) {
+        const hsize_t count = std::min(H5_BLOCK_ROWS, n - r0);
+        if (!rows) {
+            h5_read_block(dset, H5T_NATIVE_FLOAT, r0, count, c_out, true, out.data() + r0 * c_out);
+            continue;
+        }
+        // Skip blocks without selected rows
+        if (static_cast<hsize_t>((*rows)[next]) >= r0 + count) continue;
+        h5_read_block(dset, H5T_NATIVE_FLOAT, r0, count, c_out, true, block.data());
+        while (next < rows->size() && static_cast<hsize_t>((*rows)[next]) < r0 + count) {
+            const hsize_t r = static_cast<hsize_t>((*rows)[next]) - r0;
+            std::memcpy(out.data() + next * c_out, block.data() + r * c_out, c_out * sizeof(float));
+            ++next;
+        }
+    }
+    if (rows && next < rows->size()) {
+        throw std::runtime_error("Row position out of range for obsm/" + key);
+    }
+    return out;
+}
+
+#endif  // TRIDENT_WITH_HDF5
+
+static void require_hdf5() {
+#ifndef TRIDENT_WITH_HDF5
+    throw std::runtime_error("h5ad input needs TRIDENT built with HDF5");
+#endif
+}
+
+#ifdef TRIDENT_WITH_HDF5
+// Schema of an .h5ad file. Categoricals report their number of categories;
+// other columns the distinct values among their first sample_rows entries.
+struct H5adInfo {
+    ProbeResult probe;
+    std::vector<std::pair<std::string, std::pair<hsize_t, hsize_t>>> obsm;  // key, (rows, cols)
+};
+
+static H5adInfo h5ad_probe(const std::string& filepath, size_t sample_rows) {
+    std::lock_guard<std::mutex> lock(h5_mutex);
+    H5Id file = h5_open_file(filepath);
+    H5adInfo info;
+    ProbeResult& probe = info.probe;
+    probe.compression = "hdf5";
+    probe.rows_exact = true;
+
+    if (h5_exists(file, "obsm")) {
+        H5Id obsm(H5Gopen2(file, "obsm", H5P_DEFAULT), H5Gclose);
+        H5G_info_t ginfo;
+        H5Gget_info(obsm, &ginfo);
+        for (hsize_t i = 0; i < ginfo.nlinks; ++i) {
+            char buf[1024];
+            H5Lget_name_by_idx(obsm, ".", H5_INDEX_NAME, H5_ITER_INC, i, buf, sizeof(buf), H5P_DEFAULT);
+            if (h5_is_group(obsm, buf)) continue;  // sparse or dataframe entries
+            H5Id dset(H5Dopen2(obsm, buf, H5P_DEFAULT), H5Dclose);
+            const auto dims = h5_shape(dset);
+            if (dims.size() == 2) info.obsm.push_back({buf, {dims[0], dims[1]}});
+        }
+    }
+
+    probe.names = h5ad_obs_names(file);
+    for (const auto& name : probe.names) {
+        const std::string path = "obs/" + name;
+        bool categorical = false;
+        size_t cardinality = 0;
+        size_t rows = 0;
+        if (h5_is_group(file, path)) {
+            H5Id group(H5Gopen2(file, path.c_str(), H5P_DEFAULT), H5Gclose);
+            const std::string values = h5_exists(group, "codes") ? "codes" : "values";
+            H5Id dset(H5Dopen2(group, values.c_str(), H5P_DEFAULT), H5Dclose);
+            rows = h5_length(dset);
+            if (values == "codes") {
+                H5Id categories(H5Dopen2(group, "categories", H5P_DEFAULT), H5Dclose);
+                categorical = true;
+                cardinality = h5_length(categories);
+            } else {
+                auto sample = h5_read_floats(dset, sample_rows);
+                cardinality = compute_column_stats(sample.data(), sample.size(), 1).distinct;
+            }
+        } else {
+            H5Id dset(H5Dopen2(file, path.c_str(), H5P_DEFAULT), H5Dclose);
+            H5Id type(H5Dget_type(dset), H5Tclose);
+            rows = h5_length(dset);
+            if (H5Tget_class(type) == H5T_STRING) {
+                auto sample = h5_read_string_dataset(dset, sample_rows);
+                std::sort(sample.begin(), sample.end());
+                categorical = true;
+                cardinality = std::unique(sample.begin(), sample.end()) - sample.begin();
+            } else {
+                auto sample = h5_read_floats(dset, sample_rows);
+                cardinality = compute_column_stats(sample.data(), sample.size(), 1).distinct;
+            }
+        }
+        probe.is_categorical.push_back(categorical);
+        probe.cardinalities.push_back(cardinality);
+        probe.rows = std::max(probe.rows, rows);
+    }
+    if (probe.names.empty() && !info.obsm.empty()) probe.rows = info.obsm[0].second.first;
+    probe.sampled_rows = std::min(probe.rows, sample_rows);
+
+    hsize_t file_size = 0;
+    H5Fget_filesize(file, &file_size);
+    probe.file_size = file_size;
+    return info;
+}
+#endif  // TRIDENT_WITH_HDF5
+
+static py::dict probe_to_python(const ProbeResult& probe) {
+    py::list types;
+    for (bool cat : probe.is_categorical) types.append(cat ? "categorical" : "numeric");
+
+    py::dict d;
+    d["names"] = probe.names;
+    d["types"] = types;
+    d["cardinalities"] = probe.cardinalities;
+    d["rows"] = probe.rows;
+    d["rows_exact"] = probe.rows_exact;
+    d["sampled_rows"] = probe.sampled_rows;
+    d["file_size"] = probe.file_size;
+    d["compression"] = probe.compression;
+    return d;
+}
+
+// ============================================================================
+// EXPRESSION MATRIX - gene columns of sparse cells x genes matrices
+// ============================================================================
+// Coloring by a gene needs one column of a matrix that is stored by cell
+// (CSR arrays, Matrix Market files). Such matrices are transposed once into
+// a CSC layout, one contiguous run of (cell, value) pairs per gene, so a
+// gene column costs its own non-zeros plus zero-filling the output. h5ad
+// matrices that are already stored by gene (CSC or dense) are not loaded;
+// each gene is read from the file on request.
+class ExpressionMatrix {
+public:
+    enum Storage { IN_MEMORY, H5AD_CSC, H5AD_DENSE };
+
+    int64_t n_cells = 0;
+    int64_t n_genes = 0;
+    Storage storage = IN_MEMORY;
+    std::vector<int64_t> indptr;   // [n_genes + 1] run offsets (not used for dense h5ad)
+    std::vector<int32_t> cells;    // in-memory storage only
+    std::vector<float> values;
+    std::string h5_path;           // h5ad storage: file and matrix path in it
+    std::string h5_matrix;
+
+    int64_t nnz() const {
+        if (storage == H5AD_DENSE) return n_cells * n_genes;
+        return indptr.empty() ? 0 : indptr.back();
+    }
+
+    size_t nbytes() const {
+        return indptr.size() * sizeof(int64_t) + cells.size() * sizeof(int32_t) + values.size() * sizeof(float);
+    }
+
+    const char* storage_name() const {
+        return storage == IN_MEMORY ? "memory" : storage == H5AD_CSC ? "h5ad_csc" : "h5ad_dense";
+    }
+
+    // Expression of gene g in every cell (zeros included) into out[n_cells]
+    void column(int64_t g, float* out) const {
+        if (storage == IN_MEMORY) {
+            std::fill(out, out + n_cells, 0.0f);
+            for (int64_t k = indptr[g]; k < indptr[g + 1]; ++k) out[cells[k]] = values[k];
+            return;
+        }
+#ifdef TRIDENT_WITH_HDF5
+        std::lock_guard<std::mutex> lock(h5_mutex);
+        H5Id file = h5_open_file(h5_path);
+        if (storage == H5AD_DENSE) {
+            H5Id dset(H5Dopen2(file, h5_matrix.c_str(), H5P_DEFAULT), H5Dclose);
+            H5Id file_space(H5Dget_space(dset), H5Sclose);
+            hsize_t start[2] = {0, static_cast<hsize_t>(g)};
+            hsize_t size[2] = {static_cast<hsize_t>(n_cells), 1};
+            H5Sselect_hyperslab(file_space, H5S_SELECT_SET, start, nullptr, size, nullptr);
+            H5Id mem_space(H5Screate_simple(1, size, nullptr), H5Sclose);
+            if (H5Dread(dset, H5T_NATIVE_FLOAT, mem_space, file_space, H5P_DEFAULT, out) < 0) {
+                throw std::runtime_error("Cannot read " + h5_matrix + " column");
+            }
+            return;
+        }
+        std::fill(out, out + n_cells, 0.0f);
+        const hsize_t count = static_cast<hsize_t>(indptr[g + 1] - indptr[g]);
+        if (!count) return;
+        H5Id indices(H5Dopen2(file, (h5_matrix + "/indices").c_str(), H5P_DEFAULT), H5Dclose);
+        H5Id data(H5Dopen2(file, (h5_matrix + "/data").c_str(), H5P_DEFAULT), H5Dclose);
+        std::vector<int64_t> rows(count);
+        std::vector<float> vals(count);
+        h5_read_block(indices, H5T_NATIVE_INT64, indptr[g], count, 1, false, rows.data());
+        h5_read_block(data, H5T_NATIVE_FLOAT, indptr[g], count, 1, false, vals.data());
+        for (hsize_t k = 0; k < count; ++k) {
+            if (rows[k] < 0 || rows[k] >= n_cells) throw std::runtime_error("Cell index out of range in " + h5_matrix);
+            out[rows[k]] = vals[k];
+        }
+#endif
+    }
+
+    // Gene g as a float32 array, for every cell or only the cell positions `rows`
+    py::array_t<float> column_to_python(int64_t g, const py::object& rows) const {
+        if (g < 0 || g >= n_genes) {
+            throw py::index_error("Gene index out of range: " + std::to_string(g));
+        }
+        if (rows.is_none()) {
+            py::array_t<float> out(static_cast<py::ssize_t>(n_cells));
+            float* ptr = out.mutable_data();
+            py::gil_scoped_release release;
+            column(g, ptr);
+            return out;
+        }
+        auto selected = py::array_t<int64_t, py::array::c_style | py::array::forcecast>::ensure(rows);
+        if (!selected || selected.ndim() != 1) throw std::runtime_error("rows must be a 1D integer array");
+        const int64_t* sel = selected.data();
+        const size_t n = static_cast<size_t>(selected.size());
+        for (size_t i = 0; i < n; ++i) {
+            if (sel[i] >= n_cells) throw std::runtime_error("Row position out of range for the expression matrix");
+        }
+        py::array_t<float> out(static_cast<py::ssize_t>(n));
+        float* ptr = out.mutable_data();
+        {
+            py::gil_scoped_release release;
+            std::vector<float> dense(n_cells);
+            column(g, dense.data());
+            // -1: a point without obs row (left join)
+            for (size_t i = 0; i < n; ++i) ptr[i] = sel[i] < 0 ? std::numeric_limits<float>::quiet_NaN() : dense[sel[i]];
+        }
+        return out;
+    }
+};
+
+// Index a compressed matrix by its minor axis: `ptr` [n_major + 1] and
+// `minor` [nnz] are the CSR (or CSC) arrays, the result has one run per
+// minor index holding the major index and value of its entries. Counting
+// sort, two passes over the entries.
+template <typename Ptr, typename Idx>
+static void transpose_compressed(const Ptr* ptr, int64_t n_major, const Idx* minor, const float* vals,
+                                 int64_t n_minor, ExpressionMatrix& m) {
+    const int64_t nnz = static_cast<int64_t>(ptr[n_major]);
+    m.indptr.assign(n_minor + 1, 0);
+    for (int64_t k = 0; k < nnz; ++k) {
+        const int64_t j = static_cast<int64_t>(minor[k]);
+        if (j < 0 || j >= n_minor) throw std::runtime_error("Sparse index out of range");
+        ++m.indptr[j + 1];
+    }
+    for (int64_t j = 0; j < n_minor; ++j) m.indptr[j + 1] += m.indptr[j];
+
+    std::vector<int64_t> next(m.indptr.begin(), m.indptr.end() - 1);
+    m.cells.resize(nnz);
+    m.values.resize(nnz);
+    for (int64_t i = 0; i < n_major; ++i) {
+        for (int64_t k = static_cast<int64_t>(ptr[i]); k < static_cast<int64_t>(ptr[i + 1]); ++k) {
+            const int64_t pos = next[static_cast<int64_t>(minor[k])]++;
+            m.cells[pos] = static_cast<int32_t>(i);
+            m.values[pos] = vals[k];
+        }
+    }
+}
+
+// Matrix Market header: "%%MatrixMarket matrix coordinate <field> general",
+// comment lines, then "rows cols entries". Returns whether the field is
+// "pattern" (entries without values).
+static bool read_mtx_header(LineReader& reader, const std::string& filepath,
+                            int64_t& rows, int64_t& cols, int64_t& entries) {
+    std::string line;
+    if (!reader.getline(line)) throw std::runtime_error("Empty Matrix Market file: " + filepath);
+    std::string banner, object, format, field, symmetry;
+    std::istringstream header(line);
+    header >> banner >> object >> format >> field >> symmetry;
+    std::transform(format.begin(), format.end(), format.begin(), ::tolower);
+    std::transform(field.begin(), field.end(), field.begin(), ::tolower);
+    std::transform(symmetry.begin(), symmetry.end(), symmetry.begin(), ::tolower);
+    if (banner != "%%MatrixMarket" || format != "coordinate") {
+        throw std::runtime_error("Not a Matrix Market coordinate file: " + filepath);
+    }
+    if (symmetry != "general" || (field != "real" && field != "integer" && field != "pattern")) {
+        throw std::runtime_error("Unsupported Matrix Market format '" + field + " " + symmetry +
+                                 "' (expected real, integer or pattern, general): " + filepath);
+    }
+    while (reader.getline(line)) {
+        if (line.empty() || line[0] == '%') continue;
+        std::istringstream size(line);
+        if (!(size >> rows >> cols >> entries)) break;
+        return field == "pattern";
+    }
+    throw std::runtime_error("Missing Matrix Market size line: " + filepath);
+}
+
+// Entries of a Matrix Market file (plain, gzip or zstd) indexed by gene.
+// genes_on_rows picks the gene axis; 10x Genomics files store genes x cells.
+static void read_mtx(const std::string& filepath, bool genes_on_rows, ExpressionMatrix& m) {
+    LineReader reader(filepath);
+    int64_t rows = 0, cols = 0, entries = 0;
+    const bool pattern = read_mtx_header(reader, filepath, rows, cols, entries);
+    m.n_genes = genes_on_rows ? rows : cols;
+    m.n_cells = genes_on_rows ? cols : rows;
+    if (m.n_cells > std::numeric_limits<int32_t>::max()) {
+        throw std::runtime_error("Too many cells for the expression index: " + filepath);
+    }
+
+    // Entries as (gene, cell, value), then counting-sorted by gene. Genes
+    // and cells are 1-based in the file.
+    std::vector<int32_t> genes, cell_of;
+    std::vector<float> vals;
+    genes.reserve(entries);
+    cell_of.reserve(entries);
+    vals.reserve(entries);
+    std::string line;
+    size_t line_no = 0;
+    while (reader.getline(line)) {
+        ++line_no;
+        const char* p = line.c_str();
+        while (*p == ' ' || *p == '\t') ++p;
+        if (!*p || *p == '%' || *p == '\r') continue;
+        char* end = nullptr;
+        const long long i = std::strtoll(p, &end, 10);
+        bool ok = end != p;
+        const char* q = end;
+        const long long j = std::strtoll(q, &end, 10);
+        ok = ok && end != q;
+        float v = 1.0f;
+        if (ok && !pattern) {
+            const char* r = end;
+            v = std::strtof(r, &end);
+            ok = end != r;
+        }
+        if (!ok || i < 1 || i > rows || j < 1 || j > cols) {
+            throw std::runtime_error("Invalid Matrix Market entry on data line " + std::to_string(line_no) +
+                                     ": " + filepath);
+        }
+        genes.push_back(static_cast<int32_t>((genes_on_rows ? i : j) - 1));
+        cell_of.push_back(static_cast<int32_t>((genes_on_rows ? j : i) - 1));
+        vals.push_back(v);
+    }
+    if (static_cast<int64_t>(genes.size()) != entries) {
+        throw std::runtime_error("Matrix Market file has " + std::to_string(genes.size()) + " entries, header says " +
+                                 std::to_string(entries) + ": " + filepath);
+    }
+
+    m.indptr.assign(m.n_genes + 1, 0);
+    for (int32_t g : genes) ++m.indptr[g + 1];
+    for (int64_t g = 0; g < m.n_genes; ++g) m.indptr[g + 1] += m.indptr[g];
+    std::vector<int64_t> next(m.indptr.begin(), m.indptr.end() - 1);
+    m.cells.resize(genes.size());
+    m.values.resize(genes.size());
+    for (size_t k = 0; k < genes.size(); ++k) {
+        const int64_t pos = next[genes[k]]++;
+        m.cells[pos] = cell_of[k];
+        m.values[pos] = vals[k];
+    }
+}
+
+#ifdef TRIDENT_WITH_HDF5
+static std::vector<int64_t> h5_int_list_attr(hid_t obj, const char* name) {
+    if (H5Aexists(obj, name) <= 0) return {};
+    H5Id attr(H5Aopen(obj, name, H5P_DEFAULT), H5Aclose);
+    H5Id space(H5Aget_space(attr), H5Sclose);
+    std::vector<int64_t> out(static_cast<size_t>(H5Sget_simple_extent_npoints(space)));
+    if (!out.empty() && H5Aread(attr, H5T_NATIVE_INT64, out.data()) < 0) {
+        throw std::runtime_error(std::string("Cannot read attribute ") + name);
+    }
+    return out;
+}
+
+// An .h5ad matrix (X, raw/X or layers/<name>), cells x genes. CSR groups are
+// transposed in blocks (only the CSC arrays are held in memory); CSC groups
+// and dense datasets stay on disk and are read per gene.
+static void open_h5ad_matrix(const std::string& filepath, const std::string& matrix, ExpressionMatrix& m) {
+    std::lock_guard<std::mutex> lock(h5_mutex);
+    H5Id file = h5_open_file(filepath);
+    if (!h5_exists(file, matrix)) {
+        throw std::runtime_error("No matrix '" + matrix + "' in h5ad file");
+    }
+    m.h5_path = filepath;
+    m.h5_matrix = matrix;
+
+    if (!h5_is_group(file, matrix)) {
+        H5Id dset(H5Dopen2(file, matrix.c_str(), H5P_DEFAULT), H5Dclose);
+        const auto dims = h5_shape(dset);
+        if (dims.size() != 2) throw std::runtime_error(matrix + " is not a 2D matrix");
+        m.n_cells = static_cast<int64_t>(dims[0]);
+        m.n_genes = static_cast<int64_t>(dims[1]);
+        m.storage = ExpressionMatrix::H5AD_DENSE;
+        return;
+    }
+
+    H5Id group(H5Gopen2(file, matrix.c_str(), H5P_DEFAULT), H5Gclose);
+    const std::string encoding = h5_string_attr(group, "encoding-type");
+    const auto shape = h5_int_list_attr(group, "shape");
+    if ((encoding != "csr_matrix" && encoding != "csc_matrix") || shape.size() != 2) {
+        throw std::runtime_error("Unsupported matrix encoding '" + encoding + "' of " + matrix);
+    }
+    m.n_cells = shape[0];
+    m.n_genes = shape[1];
+    if (m.n_cells > std::numeric_limits<int32_t>::max()) {
+        throw std::runtime_error("Too many cells for the expression index in " + matrix);
+    }
+
+    H5Id ptr_dset(H5Dopen2(group, "indptr", H5P_DEFAULT), H5Dclose);
+    const int64_t n_major = encoding == "csc_matrix" ? m.n_genes : m.n_cells;
+    std::vector<int64_t> ptr(n_major + 1);
+    h5_read_block(ptr_dset, H5T_NATIVE_INT64, 0, ptr.size(), 1, false, ptr.data());
+    if (encoding == "csc_matrix") {
+        m.indptr = std::move(ptr);
+        m.storage = ExpressionMatrix::H5AD_CSC;
+        return;
+    }
+
+    // CSR: count entries per gene, then place them, reading blocks of entries
+    H5Id indices(H5Dopen2(group, "indices", H5P_DEFAULT), H5Dclose);
+    H5Id data(H5Dopen2(group, "data", H5P_DEFAULT), H5Dclose);
+    const int64_t nnz = ptr.back();
+    const int64_t block = static_cast<int64_t>(H5_BLOCK_ROWS) << 4;
+    std::vector<int32_t> idx(std::min(nnz, block));
+    std::vector<float> vals(std::min(nnz, block));
+
+    m.indptr.assign(m.n_genes + 1, 0);
+    for (int64_t k0 = 0; k0 < nnz; k0 += block) {
+        const int64_t count = std::min(block, nnz - k0);
+        h5_read_block(indices, H5T_NATIVE_INT32, k0, count, 1, false, idx.data());
+        for (int64_t k = 0; k < count; ++k) {
+            if (idx[k] < 0 || idx[k] >= m.n_genes) throw std::runtime_error("Gene index out of range in " + matrix);
+            ++m.indptr[idx[k] + 1];
+        }
+    }
+    for (int64_t j = 0; j < m.n_genes; ++j) m.indptr[j + 1] += m.indptr[j];
+
+    std::vector<int64_t> next(m.indptr.begin(), m.indptr.end() - 1);
+    m.cells.resize(nnz);
+    m.values.resize(nnz);
+    int64_t cell = 0;
+    for (int64_t k0 = 0; k0 < nnz; k0 += block) {
+        const int64_t count = std::min(block, nnz - k0);
+        h5_read_block(indices, H5T_NATIVE_INT32, k0, count, 1, false, idx.data());
+        h5_read_block(data, H5T_NATIVE_FLOAT, k0, count, 1, false, vals.data());
+        for (int64_t k = 0; k < count; ++k) {
+            while (ptr[cell + 1] <= k0 + k) ++cell;
+            const int64_t pos = next[idx[k]]++;
+            m.cells[pos] = static_cast<int32_t>(cell);
+            m.values[pos] = vals[k];
+        }
+    }
+    m.storage = ExpressionMatrix::IN_MEMORY;
+}
+
+// Gene names of an .h5ad matrix: the index of var (raw/var for raw/X)
+static std::vector<std::string> h5ad_var_names(const std::string& filepath, const std::string& matrix) {
+    std::lock_guard<std::mutex> lock(h5_mutex);
+    H5Id file = h5_open_file(filepath);
+    const std::string var = matrix.rfind("raw/", 0) == 0 ? "raw/var" : "var";
+    if (!h5_exists(file, var)) throw std::runtime_error("h5ad file has no " + var + " group");
+    H5Id group(H5Gopen2(file, var.c_str(), H5P_DEFAULT), H5Gclose);
+    std::string index = h5_string_attr(group, "_index");
+    if (index.empty()) index = "_index";
+    if (!h5_exists(group, index)) throw std::runtime_error("h5ad file has no " + var + " index");
+    H5Id dset(H5Dopen2(group, index.c_str(), H5P_DEFAULT), H5Dclose);
+    return h5_read_string_dataset(dset);
+}
+#endif  // TRIDENT_WITH_HDF5
+
+// Result of a merged obsm + obs load before conversion to Python
+struct MergedLoad {
+    py::array_t<float> merged;
+    ParsedCSV obs;                        // numeric values freed, codes and cat_maps kept
+    std::vector<int64_t> obs_rows;        // keyed joins: obs row of every output row, -1 for none
+    std::vector<ColumnStats> col_stats;   // one per obs column
+    py::object join_stats;
+    py::object filter_stats;              // None without filters or sampling
+    py::object sample_rows;               // sampled obs row positions, None without sampling
+    py::object obs_positions;             // obs row position of every output row, None if all in order
+    size_t rows = 0;
+    size_t data_cols = 0;
+};
+
+// Typed load result. `data` is the merged column-major float32 table (XYZ,
+// then one column per label). For every categorical label it also holds
+// int32 codes (-1 for missing) and a category table: the names in code
+// order concatenated into one byte arena, name i being
+// arena[offsets[i]:offsets[i + 1]]. These are returned as NumPy arrays that
+// share memory with the result (buffer protocol, no copies, no dicts).
+struct TRIDENTLoadResult {
+    py::array_t<float> data;
+    std::vector<std::string> labels;
+    std::vector<bool> is_categorical;
+    py::object join_stats = py::none();
+    py::object filter_stats = py::none();
+    py::object sample_rows = py::none();
+    py::object obs_rows = py::none();
+    py::list stats;
+    std::vector<std::vector<int32_t>> codes;     // empty for numeric labels
+    std::vector<std::string> arenas;
+    std::vector<std::vector<int64_t>> offsets;
+
+    size_t index(const std::string& label) const {
+        auto it = std::find(labels.begin(), labels.end(), label);
+        if (it == labels.end()) {
+            throw py::key_error("Unknown label: " + label);
+        }
+        return static_cast<size_t>(it - labels.begin());
+    }
+
+    size_t categorical_index(const std::string& label) const {
+        const size_t j = index(label);
+        if (!is_categorical[j]) {
+            throw py::key_error("Label is not categorical: " + label);
+        }
+        return j;
+    }
+};
+
+class TRIDENTDataLoader {
+public:
+    // Returns (numpy.float32 array [rows, cols], list[dict] mappings, list[bool] is_categorical)
+    // The GIL is released while parsing and filling, so other Python threads
+    // (e.g. Blender's UI) keep running during large loads.
+    // column_major=true returns a Fortran-ordered array (contiguous columns).
+    // with_stats=true appends a list of per-column statistics dicts.
+    py::tuple load_csv(const std::string& filepath,
+                       const std::vector<std::string>& labels = {},
+                       bool column_major = false,
+                       bool with_stats = false) {
+        ParsedCSV parsed;
+        {
+            py::gil_scoped_release release;
+            parsed = parse_csv_file(filepath, labels);
+        }
+        return to_python(parsed, column_major, with_stats);
+    }
+
+private:
+    py::tuple to_python(const ParsedCSV& parsed, bool column_major, bool with_stats = false) {
+        const size_t out_rows = parsed.rows;
+        const size_t out_cols = parsed.col_indices.size();
+
+        // Allocate result array
+        auto result = alloc_table(out_rows, out_cols, column_major);
+        auto buf = result.request();
+        float* ptr = static_cast<float*>(buf.ptr);
+
+        // Fill array
+        std::vector<ColumnStats> stats;
+        {
+            py::gil_scoped_release release;
+            const size_t row_stride = column_major ? 1 : out_cols;
+            const size_t col_stride = column_major ? out_rows : 1;
+            fill_columns(parsed, ptr, row_stride, col_stride, 0);
+            if (with_stats) {
+                stats = compute_table_stats(ptr, out_rows, row_stride, col_stride, 0, out_cols);
+            }
+        }
+
+        auto [py_maps, py_is_cat] = maps_to_python(parsed);
+
+        std::cout << "[TRIDENT C++] Loaded CSV (rows=" << out_rows
+                  << ", cols=" << out_cols << ")\n";
+
+        // return (array, mappings, is_categorical[, stats])
+        if (with_stats) {
+            return py::make_tuple(result, py_maps, py_is_cat, stats_to_python(stats));
+        }
+        return py::make_tuple(result, py_maps, py_is_cat);
+    }
+
+public:
+    // Per-column statistics of a 2D float32 array (any memory layout)
+    py::list column_stats(py::array_t<float> data) {
+        auto buf = data.request();
+        if (buf.ndim != 2) {
+            throw std::runtime_error("Input must be a 2D array");
+        }
+        const size_t rows = buf.shape[0];
+        const size_t cols = buf.shape[1];
+        const size_t row_stride = buf.strides[0] / sizeof(float);
+        const size_t col_stride = buf.strides[1] / sizeof(float);
+        const float* ptr = static_cast<const float*>(buf.ptr);
+
+        std::vector<ColumnStats> stats;
+        {
+            py::gil_scoped_release release;
+            stats = compute_table_stats(ptr, rows, row_stride, col_stride, 0, cols);
+        }
+        return stats_to_python(stats);
+    }
+
+    // Sorted distinct non-NaN values of a 1D float32 array (sort + unique),
+    // or None if there are more than max_count of them. Used to derive a
+    // categorical mapping for a numeric column on demand.
+    py::object unique_values(py::array_t<float> values, size_t max_count = MAX_TRACKED_VALUES) {
+        auto buf = values.request();
+        if (buf.ndim != 1) {
+            throw std::runtime_error("Input must be a 1D array");
+        }
+        const size_t n = buf.shape[0];
+        const size_t stride = buf.strides[0] / sizeof(float);
+        const float* ptr = static_cast<const float*>(buf.ptr);
+
+        std::vector<float> uniq;
+        {
+            py::gil_scoped_release release;
+            uniq.reserve(n);
+            for (size_t i = 0; i < n; ++i) {
+                const float v = ptr[i * stride];
+                if (!std::isnan(v)) uniq.push_back(v);
+            }
+            std::sort(uniq.begin(), uniq.end());
+            uniq.erase(std::unique(uniq.begin(), uniq.end()), uniq.end());
+        }
+
+        if (uniq.size() > max_count) {
+            return py::none();
+        }
+        py::array_t<float> out(static_cast<py::ssize_t>(uniq.size()));
+        std::copy(uniq.begin(), uniq.end(), static_cast<float*>(out.request().ptr));
+        return std::move(out);
+    }
+
+    // Dictionary-encode a numeric column for categorical use with any number
+    // of distinct values. Returns (codes int32 [n], arena uint8, offsets
+    // int64 [k + 1], values float32 [k]) with names sorted by value.
+    py::tuple encode_values(py::array_t<float> values) {
+        auto buf = values.request();
+        if (buf.ndim != 1) {
+            throw std::runtime_error("Input must be a 1D array");
+        }
+        const size_t n = buf.shape[0];
+        const size_t stride = buf.strides[0] / sizeof(float);
+        const float* ptr = static_cast<const float*>(buf.ptr);
+
+        Dictionary dict;
+        {
+            py::gil_scoped_release release;
+            dict = encode_float_column(ptr, n, stride);
+        }
+        return py::make_tuple(vector_to_numpy(dict.codes), arena_to_numpy(dict.arena),
+                              vector_to_numpy(dict.offsets), vector_to_numpy(dict.values));
+    }
+
+    // Stable palette slot (0 .. n_slots - 1) of every name of a dictionary
+    py::array_t<int32_t> hash_slots(py::array_t<uint8_t, py::array::c_style | py::array::forcecast> arena,
+                                    py::array_t<int64_t, py::array::c_style | py::array::forcecast> offsets,
+                                    uint32_t n_slots) {
+        if (n_slots == 0) {
+            throw std::runtime_error("n_slots must be positive");
+        }
+        auto obuf = offsets.request();
+        const size_t n_names = obuf.shape[0] > 0 ? static_cast<size_t>(obuf.shape[0]) - 1 : 0;
+        const char* a = static_cast<const char*>(arena.request().ptr);
+        const int64_t* o = static_cast<const int64_t*>(obuf.ptr);
+
+        std::vector<int32_t> slots;
+        {
+            py::gil_scoped_release release;
+            slots = ::hash_slots(a, o, n_names, n_slots);
+        }
+        return vector_to_numpy(slots);
+    }
+
+    // Fast schema probe of a CSV file without loading it. Returns a dict with
+    // "names", "types" ('numeric' / 'categorical', from a sample of rows),
+    // "cardinalities" (approximate distinct counts), "rows" (estimated from
+    // the file size, exact if the sample reached the end of the file),
+    // "rows_exact", "sampled_rows" and "file_size".
+    py::dict probe(const std::string& filepath, size_t sample_rows = 1000,
+                   size_t sample_bytes = 4 << 20) {
+        ProbeResult probe;
+        {
+            py::gil_scoped_release release;
+            probe = probe_csv_file(filepath, sample_rows, sample_bytes);
+        }
+        return probe_to_python(probe);
+    }
+
+    // Byte offset past the first `rows` data rows of a plain CSV file, or -1
+    int64_t csv_rows_end(const std::string& filepath, size_t rows) {
+        py::gil_scoped_release release;
+        return ::csv_rows_end(filepath, rows);
+    }
+
+    // Rows appended to a plain CSV file from byte offset `start`: (float32
+    // [rows, cols], int64 byte offset past each row, {label: new category
+    // names}). categories holds the names of the categorical labels in
+    // code order; labels empty reads every column (obsm files).
+    py::tuple read_csv_range(const std::string& filepath, const std::vector<std::string>& labels,
+                             int64_t start, const py::dict& categories) {
+        std::unordered_map<std::string, std::vector<std::string>> names;
+        for (auto item : categories) {
+            names[py::str(item.first)] = item.second.cast<std::vector<std::string>>();
+        }
+        CsvRange range;
+        {
+            py::gil_scoped_release release;
+            range = ::read_csv_range(filepath, labels, start, names);
+        }
+        const size_t rows = range.ends.size();
+        py::array_t<float> values({rows, range.cols});
+        if (!range.values.empty()) {
+            std::memcpy(values.mutable_data(), range.values.data(), range.values.size() * sizeof(float));
+        }
+        py::dict added, codes;
+        for (size_t j = 0; j < range.cols; ++j) {
+            const py::str name(labels.empty() ? std::to_string(j) : labels[j]);
+            if (!range.added[j].empty()) added[name] = range.added[j];
+            if (categories.contains(name)) codes[name] = vector_to_numpy(range.codes[j]);
+        }
+        return py::make_tuple(values, vector_to_numpy(range.ends), added, codes);
+    }
+
+    // Schema of an .h5ad file in the format of probe(), plus "obsm":
+    // {key: (rows, cols)} for the 2D obsm arrays
+    py::dict h5ad_info(const std::string& filepath, size_t sample_rows = 1000) {
+        require_hdf5();
+#ifdef TRIDENT_WITH_HDF5
+        H5adInfo info;
+        {
+            py::gil_scoped_release release;
+            info = h5ad_probe(filepath, sample_rows);
+        }
+        py::dict d = probe_to_python(info.probe);
+        py::dict obsm;
+        for (const auto& [key, shape] : info.obsm) obsm[py::str(key)] = py::make_tuple(shape.first, shape.second);
+        d["obsm"] = obsm;
+        return d;
+#else
+        return py::dict();
+#endif
+    }
+
+    // First `cols` columns of obsm/<key> as float32 [n, min(cols, d)], for all
+    // rows or only the sorted row positions `rows`. Read in row blocks;
+    // blocks without selected rows are skipped.
+    py::array_t<float> read_h5ad_obsm(const std::string& filepath, const std::string& key,
+                                      size_t cols = 3, const py::object& rows = py::none()) {
+        require_hdf5();
+#ifdef TRIDENT_WITH_HDF5
+        std::vector<int64_t> selected;
+        const bool subset = !rows.is_none();
+        if (subset) {
+            auto arr = py::array_t<int64_t, py::array::c_style | py::array::forcecast>::ensure(rows);
+            if (!arr || arr.ndim() != 1) throw std::runtime_error("rows must be a 1D integer array");
+            selected.assign(arr.data(), arr.data() + arr.size());
+            for (size_t i = 0; i < selected.size(); ++i) {
+                if (selected[i] < 0 || (i && selected[i] <= selected[i - 1])) {
+                    throw std::runtime_error("rows must be sorted, unique and non-negative");
+                }
+            }
+        }
+
+        std::vector<float> out;
+        hsize_t n = 0, c = 0;
+        {
+            py::gil_scoped_release release;
+            std::lock_guard<std::mutex> lock(h5_mutex);
+            H5Id file = h5_open_file(filepath);
+            out = h5ad_read_obsm(file, key, cols, subset ? &selected : nullptr, n, c);
+        }
+        py::array_t<float> result({static_cast<py::ssize_t>(n), static_cast<py::ssize_t>(c)});
+        if (!out.empty()) std::memcpy(result.mutable_data(), out.data(), out.size() * sizeof(float));
+        return result;
+#else
+        return py::array_t<float>();
+#endif
+    }
+
+    // One obs column of an .h5ad file: (float32 values, None, None, None) for
+    // numeric columns, (None, int32 codes, uint8 arena, int64 offsets) for
+    // categoricals and strings (codes -1 for missing, names in code order)
+    py::tuple read_h5ad_obs(const std::string& filepath, const std::string& column) {
+        require_hdf5();
+#ifdef TRIDENT_WITH_HDF5
+        H5Column col;
+        std::string arena;
+        std::vector<int64_t> offsets;
+        {
+            py::gil_scoped_release release;
+            {
+                std::lock_guard<std::mutex> lock(h5_mutex);
+                H5Id file = h5_open_file(filepath);
+                col = h5ad_read_obs_column(file, column);
+            }
+            offsets.push_back(0);
+            for (const auto& name : col.names) {
+                arena += name;
+                offsets.push_back(static_cast<int64_t>(arena.size()));
+            }
+        }
+        if (!col.categorical) {
+            return py::make_tuple(vector_to_numpy(col.values), py::none(), py::none(), py::none());
+        }
+        return py::make_tuple(py::none(), vector_to_numpy(col.codes), arena_to_numpy(arena),
+                              vector_to_numpy(offsets));
+#else
+        return py::tuple();
+#endif
+    }
+
+    // (rows, cols, entries) from the header of a Matrix Market file
+    std::tuple<int64_t, int64_t, int64_t> mtx_shape(const std::string& filepath) {
+        py::gil_scoped_release release;
+        LineReader reader(filepath);
+        int64_t rows = 0, cols = 0, entries = 0;
+        read_mtx_header(reader, filepath, rows, cols, entries);
+        return std::make_tuple(rows, cols, entries);
+    }
+
+    // Expression matrix of a Matrix Market file, indexed by gene
+    std::unique_ptr<ExpressionMatrix> read_mtx(const std::string& filepath, bool genes_on_rows) {
+        auto m = std::make_unique<ExpressionMatrix>();
+        py::gil_scoped_release release;
+        ::read_mtx(filepath, genes_on_rows, *m);
+        return m;
+    }
+
+    // Expression matrix of the arrays of a compressed sparse matrix (CSR or
+    // CSC, as written by scipy.sparse.save_npz) with n_major compressed rows
+    // or columns of n_minor entries. If the compressed axis is the gene axis
+    // (genes_major) the arrays are copied, otherwise transposed.
+    std::unique_ptr<ExpressionMatrix> sparse_matrix(py::array indptr, py::array indices,
+                                                    py::array_t<float, py::array::c_style | py::array::forcecast> data,
+                                                    int64_t n_major, int64_t n_minor, bool genes_major) {
+        auto ptr = py::array_t<int64_t, py::array::c_style | py::array::forcecast>::ensure(indptr);
+        if (!ptr || ptr.ndim() != 1 || ptr.size() != n_major + 1) {
+            throw std::runtime_error("indptr must hold n_major + 1 offsets");
+        }
+        const int64_t nnz = ptr.data()[n_major];
+        if (nnz < 0 || indices.size() < nnz || data.size() < nnz) {
+            throw std::runtime_error("Sparse arrays are shorter than indptr says");
+        }
+        const int64_t n_cells = genes_major ? n_minor : n_major;
+        if (n_cells > std::numeric_limits<int32_t>::max()) {
+            throw std::runtime_error("Too many cells for the expression index");
+        }
+
+        auto m = std::make_unique<ExpressionMatrix>();
+        m->n_cells = n_cells;
+        m->n_genes = genes_major ? n_major : n_minor;
+        const bool narrow = indices.dtype().is(py::dtype::of<int32_t>());
+        py::array_t<int32_t, py::array::c_style> idx32;
+        py::array_t<int64_t, py::array::c_style | py::array::forcecast> idx64;
+        if (narrow) {
+            idx32 = py::array_t<int32_t, py::array::c_style>::ensure(indices);
+        } else {
+            idx64 = py::array_t<int64_t, py::array::c_style | py::array::forcecast>::ensure(indices);
+        }
+        if (narrow ? !idx32 : !idx64) throw std::runtime_error("indices must be an integer array");
+
+        py::gil_scoped_release release;
+        if (!genes_major) {
+            if (narrow) transpose_compressed(ptr.data(), n_major, idx32.data(), data.data(), n_minor, *m);
+            else transpose_compressed(ptr.data(), n_major, idx64.data(), data.data(), n_minor, *m);
+            return m;
+        }
+        m->indptr.assign(ptr.data(), ptr.data() + n_major + 1);
+        m->cells.resize(nnz);
+        for (int64_t k = 0; k < nnz; ++k) {
+            const int64_t c = narrow ? idx32.data()[k] : idx64.data()[k];
+            if (c < 0 || c >= n_cells) throw std::runtime_error("Sparse index out of range");
+            m->cells[k] = static_cast<int32_t>(c);
+        }
+        m->values.assign(data.data(), data.data() + nnz);
+        return m;
+    }
+
+    // Expression matrix of an .h5ad file (X, raw/X or layers/<name>)
+    std::unique_ptr<ExpressionMatrix> open_h5ad_matrix(const std::string& filepath, const std::string& matrix = "X") {
+        require_hdf5();
+        auto m = std::make_unique<ExpressionMatrix>();
+#ifdef TRIDENT_WITH_HDF5
+        py::gil_scoped_release release;
+        ::open_h5ad_matrix(filepath, matrix, *m);
+#endif
+        return m;
+    }
+
+    // Gene names (var index) of an .h5ad matrix
+    std::vector<std::string> h5ad_var_names(const std::string& filepath, const std::string& matrix = "X") {
+        require_hdf5();
+#ifdef TRIDENT_WITH_HDF5
+        py::gil_scoped_release release;
+        return ::h5ad_var_names(filepath, matrix);
+#else
+        return {};
+#endif
+    }
+
+    // Getter for shape
+    std::tuple<size_t, size_t> get_shape(py::array_t<float> array) {
+        auto buf = array.request();
+        return std::make_tuple(buf.shape[0], buf.shape[1]);
+    }
+
+    // Load obsm and obs in one go into a single preallocated column-major
+    // float32 buffer [rows, obsm_cols + len(labels)]: obs is parsed into
+    // typed columns, then obsm rows are converted straight into their column
+    // range of the output while reading, without intermediate per-file
+    // arrays or a merge copy. Rows are matched by position, or on key
+    // columns (inner/left) when key_obsm and key_obs are given.
+    // `filters` is a list of row predicates on obs columns (see
+    // predicates_from_python); rows failing them are dropped from both files
+    // while parsing. `sample` (see sampler_from_python) then keeps a
+    // reproducible, optionally stratified subsample of the rows.
+    // Returns a LoadResult: int32 codes and byte-arena category tables for
+    // categorical columns instead of Python dicts. With an empty
+    // filepath_data only the obs columns are loaded (for obsm inputs read
+    // elsewhere); obs_rows then holds the kept obs rows.
+    TRIDENTLoadResult load_table(const std::string& filepath_data,
+                                 const std::string& filepath_obs,
+                                 const std::vector<std::string>& labels,
+                                 const std::string& key_obsm = "",
+                                 const std::string& key_obs = "",
+                                 const std::string& how = "inner",
+                                 const py::object& filters = py::none(),
+                                 const py::object& sample = py::none()) {
+        MergedLoad loaded = merge_files(filepath_data, filepath_obs, labels, key_obsm, key_obs, how, true,
+                                        filters, sample);
+        ParsedCSV& obs = loaded.obs;
+        const size_t cols = obs.col_indices.size();
+
+        TRIDENTLoadResult result;
+        result.data = loaded.merged;
+        result.join_stats = loaded.join_stats;
+        result.filter_stats = loaded.filter_stats;
+        result.sample_rows = loaded.sample_rows;
+        result.obs_rows = loaded.obs_positions;
+        result.stats = stats_to_python(loaded.col_stats);
+        result.is_categorical = obs.is_categorical;
+        for (size_t j = 0; j < cols; ++j) {
+            result.labels.push_back(obs.headers[obs.col_indices[j]]);
+        }
+        result.codes.resize(cols);
+        result.arenas.resize(cols);
+        result.offsets.resize(cols);
+
+        {
+            py::gil_scoped_release release;
+            for (size_t j = 0; j < cols; ++j) {
+                if (!obs.is_categorical[j]) continue;
+
+                // Codes from the parse, in output row order
+                auto& codes = result.codes[j];
+                if (loaded.obs_rows.empty()) {
+                    codes = std::move(obs.columns[j].codes);
+                } else {
+                    const auto& parsed = obs.columns[j].codes;
+                    codes.resize(loaded.rows);
+                    for (size_t r = 0; r < loaded.rows; ++r) {
+                        const int64_t i = loaded.obs_rows[r];
+                        codes[r] = i < 0 ? -1 : parsed[i];
+                    }
+                    std::vector<int32_t>().swap(obs.columns[j].codes);
+                }
+
+                // Category table in code order
+                const auto& cat_map = obs.columns[j].cat_map;
+                std::vector<const std::string*> names(cat_map.size());
+                for (const auto& kv : cat_map) names[kv.second] = &kv.first;
+                auto& arena = result.arenas[j];
+                auto& offsets = result.offsets[j];
+                offsets.reserve(names.size() + 1);
+                offsets.push_back(0);
+                for (const std::string* name : names) {
+                    arena += *name;
+                    offsets.push_back(static_cast<int64_t>(arena.size()));
+                }
+            }
+        }
+        return result;
+    }
+
+private:
+    MergedLoad merge_files(const std::string& filepath_data,
+                           const std::string& filepath_obs,
+                           const std::vector<std::string>& labels,
+                           const std::string& key_obsm,
+                           const std::string& key_obs,
+                           const std::string& how,
+                           bool column_major,
+                           const py::object& filters,
+                           const py::object& sample) {
+        if (key_obsm.empty() != key_obs.empty()) {
+            throw std::runtime_error("Both obsm and obs key columns are needed for a key-based join");
+        }
+        if (how != "inner" && how != "left") {
+            throw std::runtime_error("Unknown join type: " + how + " (expected 'inner' or 'left')");
+        }
+        const bool keyed = !key_obsm.empty();
+        if (filepath_data.empty() && keyed) {
+            throw std::runtime_error("A key-based join needs an obsm file");
+        }
+
+        // obs is read first, into typed columns. obsm rows are then converted
+        // into the output as they are read, so neither file is held as text.
+        // With filters or sampling only the kept obs rows (by position, or by
+        // key for keyed joins) are read from obsm. obsm rows without an obs
+        // row cannot be kept, so a filtered left join drops them.
+        RowSelection obs_selection, data_selection;
+        obs_selection.predicates = predicates_from_python(filters);
+        auto sampler = sampler_from_python(sample);
+        obs_selection.sampler = sampler.get();
+        const bool filtered = !obs_selection.predicates.empty() || sampler;
+        if (filtered) {
+            if (keyed) data_selection.keep_keys = &obs_selection.kept_keys;
+            else data_selection.keep_positions = &obs_selection.kept;
+        }
+        auto check_data_rows = [&]() {
+            if (data_selection.rows_kept == 0) {
+                throw std::runtime_error(filtered && data_selection.rows_read > 0
+                                         ? "No rows pass the row filters in " + filepath_data
+                                         : "No data rows in CSV file");
+            }
+        };
+
+        ParsedCSV obs;
+        std::unique_ptr<CsvRows> data;
+        JoinStats stats;
+        std::vector<int64_t> obs_rows_map;  // keyed: obs row of every output row, -1 for none
+        std::vector<float> data_values;     // keyed: obsm values of the output rows, row-major
+        size_t data_cols = 0;
+        {
+            py::gil_scoped_release release;
+            obs = parse_csv_file(filepath_obs, labels, key_obs, &obs_selection);
+            if (!filepath_data.empty()) {
+                data = std::make_unique<CsvRows>(filepath_data, std::vector<std::string>{}, key_obsm, &data_selection);
+                data_cols = data->col_indices.size();
+            }
+
+            if (keyed) {
+                // The output rows are only known once every obsm key is matched
+                KeyIndex index(obs.rows, [&](size_t i) { return std::string_view(obs.keys[i]); }, stats);
+                std::vector<std::string> cells;
+                std::string key;
+                while (data->next(cells, key)) {
+                    const int64_t match = index.match(key);
+                    if (match < 0 && how == "inner") continue;
+                    obs_rows_map.push_back(match);
+                    for (size_t j = 0; j < data_cols; ++j) data_values.push_back(cell_value(data->cell(cells, j)));
+                }
+                index.finish();
+                check_data_rows();
+            }
+        }
+
+        const size_t out_rows = keyed ? obs_rows_map.size() : obs.rows;
+        const size_t merged_cols = data_cols + obs.col_indices.size();
+
+        MergedLoad loaded;
+        loaded.merged = alloc_table(out_rows, merged_cols, column_major);
+        loaded.rows = out_rows;
+        loaded.data_cols = data_cols;
+        float* ptr = static_cast<float*>(loaded.merged.request().ptr);
+        {
+            py::gil_scoped_release release;
+            const size_t row_stride = column_major ? 1 : merged_cols;
+            const size_t col_stride = column_major ? out_rows : 1;
+            fill_columns(obs, ptr, row_stride, col_stride, data_cols, keyed ? &obs_rows_map : nullptr);
+            // Only the codes and category maps of obs are needed from here on
+            for (auto& column : obs.columns) std::vector<float>().swap(column.values);
+
+            if (keyed) {
+                for (size_t r = 0; r < out_rows; ++r) {
+                    for (size_t j = 0; j < data_cols; ++j) {
+                        ptr[r * row_stride + j * col_stride] = data_values[r * data_cols + j];
+                    }
+                }
+                std::vector<float>().swap(data_values);
+            } else if (data) {
+                std::vector<std::string> cells;
+                std::string key;
+                size_t r = 0;
+                while (data->next(cells, key)) {
+                    if (r < out_rows) {
+                        for (size_t j = 0; j < data_cols; ++j) {
+                            ptr[r * row_stride + j * col_stride] = cell_value(data->cell(cells, j));
+                        }
+                    }
+                    ++r;
+                }
+                check_data_rows();
+                if (data_selection.rows_read != obs_selection.rows_read) {
+                    throw std::runtime_error("Incompatible row counts: obsm has " +
+                                             std::to_string(data_selection.rows_read) + " rows, obs has " +
+                                             std::to_string(obs_selection.rows_read));
+                }
+            }
+            data.reset();
+            loaded.col_stats = compute_table_stats(ptr, out_rows, row_stride, col_stride,
+                                                   data_cols, obs.col_indices.size());
+        }
+
+        loaded.join_stats = keyed
+            ? py::object(join_stats_to_python(stats, how, out_rows, data_selection.rows_kept))
+            : py::object(py::none());
+        loaded.filter_stats = py::none();
+        if (filtered) {
+            py::dict fs;
+            fs["rows_read"] = obs_selection.rows_read;
+            fs["rows_kept"] = obs_selection.rows_kept;
+            fs["filters"] = obs_selection.predicates.size();
+            fs["sampled"] = static_cast<bool>(sampler);
+            loaded.filter_stats = fs;
+        }
+        loaded.sample_rows = sampler ? py::object(vector_to_numpy(obs_selection.sampled)) : py::object(py::none());
+
+        // obs row position of every output row: the kept obs rows, taken
+        // through the key join
+        loaded.obs_positions = py::none();
+        if (keyed || filtered) {
+            std::vector<int64_t> kept_rows, positions;
+            {
+                py::gil_scoped_release release;
+                for (size_t i = 0; i < obs_selection.kept.size(); ++i) {
+                    if (obs_selection.kept[i]) kept_rows.push_back(static_cast<int64_t>(i));
+                }
+                if (keyed) {
+                    positions.reserve(out_rows);
+                    for (int64_t i : obs_rows_map) {
+                        positions.push_back(i < 0 ? -1 : filtered ? kept_rows[i] : i);
+                    }
+                } else {
+                    positions.swap(kept_rows);
+                }
+            }
+            loaded.obs_positions = vector_to_numpy(positions);
+        }
+        loaded.obs = std::move(obs);
+        loaded.obs_rows = std::move(obs_rows_map);
+
+        std::cout << "[TRIDENT C++] Loaded merged data (rows=" << out_rows
+                  << ", cols=" << merged_cols << ")\n";
+        return loaded;
+    }
+};
+
+PYBIND11_MODULE(_trident, m) {
+    m.doc() = "TRIDENT core - High performance data processing";
+#ifdef TRIDENT_WITH_HDF5
+    m.attr("HAS_HDF5") = true;
+#else
+    m.attr("HAS_HDF5") = false;
+#endif
+#ifdef TRIDENT_WITH_ZLIB
+    m.attr("HAS_ZLIB") = true;
+#else
+    m.attr("HAS_ZLIB") = false;
+#endif
+#ifdef TRIDENT_WITH_ZSTD
+    m.attr("HAS_ZSTD") = true;
+#else
+    m.attr("HAS_ZSTD") = false;
+#endif
+
+    py::class_<TRIDENTLoadResult>(m, "LoadResult")
+    .def_readonly("data", &TRIDENTLoadResult::data, "Merged column-major float32 table [rows, 3 + len(labels)]")
+    .def_readonly("labels", &TRIDENTLoadResult::labels)
+    .def_readonly("is_categorical", &TRIDENTLoadResult::is_categorical)
+    .def_readonly("join_stats", &TRIDENTLoadResult::join_stats, "Join statistics, None for positional merges")
+    .def_readonly("filter_stats", &TRIDENTLoadResult::filter_stats, "Rows read and kept by the row filters and sampling, None without either")
+    .def_readonly("sample_rows", &TRIDENTLoadResult::sample_rows,
+                  "int64 positions of the sampled obs rows (0-based data rows, file order), None without sampling")
+    .def_readonly("obs_rows", &TRIDENTLoadResult::obs_rows,
+                  "int64 obs row position (0-based data row) of every row of data, -1 where a left join found "
+                  "no obs row; None when the rows are all obs rows in file order")
+    .def_readonly("stats", &TRIDENTLoadResult::stats, "Per-label column statistics")
+    .def("codes", [](py::object self, const std::string& label) {
+            auto& r = self.cast<TRIDENTLoadResult&>();
+            auto& codes = r.codes[r.categorical_index(label)];
+            return py::array_t<int32_t>(static_cast<py::ssize_t>(codes.size()), codes.data(), self);
+         },
+         py::arg("label"),
+         "int32 category codes of a categorical label (-1 for missing), sharing memory with the result")
+    .def("categories", [](py::object self, const std::string& label) {
+            auto& r = self.cast<TRIDENTLoadResult&>();
+            const size_t j = r.categorical_index(label);
+            auto& arena = r.arenas[j];
+            auto& offsets = r.offsets[j];
+            py::array_t<uint8_t> py_arena(static_cast<py::ssize_t>(arena.size()),
+                                          reinterpret_cast<const uint8_t*>(arena.data()), self);
+            py::array_t<int64_t> py_offsets(static_cast<py::ssize_t>(offsets.size()), offsets.data(), self);
+            return py::make_tuple(py_arena, py_offsets);
+         },
+         py::arg("label"),
+         "Category table (uint8 name arena, int64 offsets) of a categorical label, in code order");
+
+    py::class_<ExpressionMatrix>(m, "ExpressionMatrix")
+    .def_readonly("n_cells", &ExpressionMatrix::n_cells)
+    .def_readonly("n_genes", &ExpressionMatrix::n_genes)
+    .def_property_readonly("nnz", &ExpressionMatrix::nnz, "Number of stored entries")
+    .def_property_readonly("nbytes", &ExpressionMatrix::nbytes, "Memory held by the gene index")
+    .def_property_readonly("storage", &ExpressionMatrix::storage_name,
+                           "'memory' (CSC index), or 'h5ad_csc' / 'h5ad_dense' (read per gene from the file)")
+    .def("column", &ExpressionMatrix::column_to_python,
+         py::arg("gene"),
+         py::arg("rows") = py::none(),
+         "Expression of one gene as float32, in every cell or only in the given cell positions "
+         "(NaN for positions of -1)");
+
+    py::class_<TRIDENTDataLoader>(m, "DataLoader")
+    .def(py::init<>())
+    .def("load_csv", &TRIDENTDataLoader::load_csv,
+         py::arg("filepath"),
+         py::arg("labels") = std::vector<std::string>(),
+         py::arg("column_major") = false,
+         py::arg("with_stats") = false,
          "Load CSV file and return numpy array, optionally filtering columns by labels")
-    .def("get_shape", &TRIDENTDataLoader::get_shape, "Get shape of numpy array")
-    .def("merge_data", &TRIDENTDataLoader::merge_data,
+    .def("column_stats", &TRIDENTDataLoader::column_stats,
          py::arg("data"),
-         py::arg("obs"),
-         "Merge two arrays horizontally (columns).");
+         "Per-column statistics (min, max, NaN count, distinct count, value counts, histogram) of a 2D array")
+    .def("unique_values", &TRIDENTDataLoader::unique_values,
+         py::arg("values"),
+         py::arg("max_count") = MAX_TRACKED_VALUES,
+         "Sorted distinct non-NaN values of a 1D array, or None if there are more than max_count")
+    .def("encode_values", &TRIDENTDataLoader::encode_values,
+         py::arg("values"),
+         "Dictionary-encode a 1D array: (int32 codes, name arena, int64 offsets, float32 values)")
+    .def("hash_slots", &TRIDENTDataLoader::hash_slots,
+         py::arg("arena"),
+         py::arg("offsets"),
+         py::arg("n_slots"),
+         "Stable palette slot of every dictionary name (hash of the name modulo n_slots)")
+    .def("probe", &TRIDENTDataLoader::probe,
+         py::arg("filepath"),
+         py::arg("sample_rows") = 1000,
+         py::arg("sample_bytes") = 4 << 20,
+         "Column names, inferred types, approximate cardinalities and estimated row count from a sample")
+    .def("csv_rows_end", &TRIDENTDataLoader::csv_rows_end,
+         py::arg("filepath"),
+         py::arg("rows"),
+         "Byte offset past the first rows data rows of a plain CSV file, or -1 if it has fewer")
+    .def("read_csv_range", &TRIDENTDataLoader::read_csv_range,
+         py::arg("filepath"),
+         py::arg("labels"),
+         py::arg("start"),
+         py::arg("categories"),
+         "Complete rows of a plain CSV file from a byte offset: "
+         "(float32 values, row end offsets, new category names, int32 codes of the categorical columns)")
+    .def("h5ad_info", &TRIDENTDataLoader::h5ad_info,
+         py::arg("filepath"),
+         py::arg("sample_rows") = 1000,
+         "obs schema (like probe) and obsm array shapes of an .h5ad file")
+    .def("read_h5ad_obsm", &TRIDENTDataLoader::read_h5ad_obsm,
+         py::arg("filepath"),
+         py::arg("key"),
+         py::arg("cols") = 3,
+         py::arg("rows") = py::none(),
+         "First columns of an .h5ad obsm array as float32, optionally only the given sorted rows")
+    .def("read_h5ad_obs", &TRIDENTDataLoader::read_h5ad_obs,
+         py::arg("filepath"),
+         py::arg("column"),
+         "One .h5ad obs column: (values, None, None, None) or (None, codes, arena, offsets) for categoricals")
+    .def("mtx_shape", &TRIDENTDataLoader::mtx_shape,
+         py::arg("filepath"),
+         "(rows, cols, entries) from the header of a Matrix Market file")
+    .def("read_mtx", &TRIDENTDataLoader::read_mtx,
+         py::arg("filepath"),
+         py::arg("genes_on_rows"),
+         "ExpressionMatrix of a Matrix Market file (plain, gzip or zstd)")
+    .def("sparse_matrix", &TRIDENTDataLoader::sparse_matrix,
+         py::arg("indptr"),
+         py::arg("indices"),
+         py::arg("data"),
+         py::arg("n_major"),
+         py::arg("n_minor"),
+         py::arg("genes_major"),
+         "ExpressionMatrix of CSR/CSC arrays")
+    .def("open_h5ad_matrix", &TRIDENTDataLoader::open_h5ad_matrix,
+         py::arg("filepath"),
+         py::arg("matrix") = "X",
+         "ExpressionMatrix of an .h5ad matrix (X, raw/X or layers/<name>)")
+    .def("h5ad_var_names", &TRIDENTDataLoader::h5ad_var_names,
+         py::arg("filepath"),
+         py::arg("matrix") = "X",
+         "Gene names of an .h5ad matrix")
+    .def("get_shape", &TRIDENTDataLoader::get_shape, "Get shape of numpy array")
+    .def("load_table", &TRIDENTDataLoader::load_table,
+         py::arg("filepath_data"),
+         py::arg("filepath_obs"),
+         py::arg("labels"),
+         py::arg("key_obsm") = "",
+         py::arg("key_obs") = "",
+         py::arg("how") = "inner",
+         py::arg("filters") = py::none(),
+         py::arg("sample") = py::none(),
+         "Load obsm + selected obs columns (positional or key-based) into a typed LoadResult, "
+         "keeping only rows that pass the optional obs row filters and sampling "
+         "(only the obs columns if filepath_data is empty).");
 }
\ No newline at end of file
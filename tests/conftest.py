@@ -0,0 +1,34 @@
+"""
+Tests of the C++ loader and the live client, without Blender. The loader
+tests need the compiled module in trident_extension/bin (see
+cpp/CMakeLists.txt) and are skipped without it.
+"""
+
+import glob
+import importlib.util
+import os
+
+import pytest
+
+BIN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "trident_extension", "bin")
+
+def _load_module():
+    for path in glob.glob(os.path.join(BIN_DIR, "_trident*")):
+        if path.endswith((".so", ".pyd")):
+            spec = importlib.util.spec_from_file_location("_trident", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            return module
+    return None
+
+_trident = _load_module()
+
+@pytest.fixture(scope="session")
+def trident():
+    if _trident is None:
+        pytest.skip("C++ module not built (trident_extension/bin/_trident*)")
+    return _trident
+
+@pytest.fixture
+def loader(trident):
+    return trident.DataLoader()
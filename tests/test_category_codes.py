@@ -0,0 +1,50 @@
+import numpy as np
+
+def write_inputs(tmp_path):
+    obsm = tmp_path / "obsm.csv"
+    obs = tmp_path / "obs.csv"
+    obsm.write_text("id,x,y,z\nc3,3,0,0\nc0,0,0,0\nc9,9,0,0\nc1,1,0,0\n")
+    obs.write_text("id,cell_type\nc0,T\nc1,B\nc2,\nc3,B\n")
+    return str(obsm), str(obs)
+
+def test_codes_follow_the_joined_rows(loader, tmp_path):
+    obsm, obs = write_inputs(tmp_path)
+    result = loader.load_table(obsm, obs, ["cell_type"], "id", "id", "left")
+    arena, offsets = result.categories("cell_type")
+    names = [bytes(arena[offsets[i]:offsets[i + 1]]).decode() for i in range(len(offsets) - 1)]
+    # Categories in order of appearance in obs, missing cells last
+    assert names == ["T", "B", "nan"]
+    codes = result.codes("cell_type")
+    assert codes.dtype == np.int32
+    assert codes.tolist() == [1, 0, -1, 1]
+    assert np.array_equal(result.data[:, 3], np.where(codes < 0, np.nan, codes), equal_nan=True)
+
+def test_appended_rows_come_with_codes(loader, tmp_path):
+    obs = tmp_path / "obs.csv"
+    obs.write_text("cell_type,n\nT,1\nNK,2\n")
+    start = loader.csv_rows_end(str(obs), 0)
+    values, ends, added, codes = loader.read_csv_range(str(obs), ["cell_type", "n"], start,
+                                                       {"cell_type": ["B", "T"]})
+    assert added == {"cell_type": ["NK"]}
+    assert codes["cell_type"].tolist() == [1, 2]
+    assert "n" not in codes
+    assert values[:, 1].tolist() == [1, 2]
+
+def test_late_text_cell_turns_numeric_column_categorical(loader, tmp_path):
+    # Past the text prefix of numeric columns (TEXT_PREFIX_ROWS), so the
+    # earlier cells are read again; every other row is filtered out
+    n = 5000
+    obsm = tmp_path / "obsm.csv"
+    obs = tmp_path / "obs.csv"
+    obsm.write_text("x,y,z\n" + "0,0,0\n" * (n + 2))
+    obs.write_text("batch,keep\n" + "".join(f"{i % 3}.0,{i % 2}\n" for i in range(n))
+                   + ",1\nlate,1\n")
+    result = loader.load_table(str(obsm), str(obs), ["batch"],
+                               filters=[{"column": "keep", "op": "==", "value": "1"}])
+    arena, offsets = result.categories("batch")
+    names = [bytes(arena[offsets[i]:offsets[i + 1]]).decode() for i in range(len(offsets) - 1)]
+    # Kept rows 1, 3, 5, ...: the cell text as names, in order of appearance
+    assert names == ["1.0", "0.0", "2.0", "late", "nan"]
+    codes = result.codes("batch")
+    assert codes[:4].tolist() == [0, 1, 2, 0]
+    assert codes[-2:].tolist() == [4, 3]
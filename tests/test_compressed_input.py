@@ -0,0 +1,77 @@
+import gzip
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+# LineReader::CHUNK_BYTES: decompressed data is handed over in chunks of this size
+CHUNK_BYTES = 4 << 20
+
+HEADER = "x,y,z\n"
+ROW = "1.5,2.5,3.5\n"
+
+def csv_text(size):
+    """CSV of exactly size bytes: constant rows, the last one padded"""
+    n_rows = (size - len(HEADER)) // len(ROW)
+    pad = size - len(HEADER) - n_rows * len(ROW)
+    text = HEADER + ROW * (n_rows - 1) + "1.5,2.5,3.5" + "0" * pad + "\n"
+    assert len(text) == size
+    return text, n_rows
+
+@pytest.fixture
+def gzip_loader(trident, loader):
+    if not trident.HAS_ZLIB:
+        pytest.skip("C++ module built without zlib")
+    return loader
+
+@pytest.fixture
+def zstd_loader(trident, loader):
+    if not trident.HAS_ZSTD:
+        pytest.skip("C++ module built without zstd")
+    return loader
+
+def write_zstd(path, data):
+    if shutil.which("zstd") is None:
+        pytest.skip("zstd command not available")
+    plain = path.with_suffix("")
+    plain.write_bytes(data)
+    subprocess.run(["zstd", "-qf", str(plain), "-o", str(path)], check=True)
+
+@pytest.mark.parametrize("size", [CHUNK_BYTES, CHUNK_BYTES + len(ROW), CHUNK_BYTES - len(ROW)])
+def test_gzip_ending_on_chunk_boundary(gzip_loader, tmp_path, size):
+    text, n_rows = csv_text(size)
+    path = tmp_path / "data.csv.gz"
+    path.write_bytes(gzip.compress(text.encode()))
+    array = gzip_loader.load_csv(str(path))[0]
+    assert array.shape == (n_rows, 3)
+    assert np.allclose(array[0], [1.5, 2.5, 3.5])
+
+@pytest.mark.parametrize("size", [CHUNK_BYTES, CHUNK_BYTES + len(ROW)])
+def test_zstd_ending_on_chunk_boundary(zstd_loader, tmp_path, size):
+    text, n_rows = csv_text(size)
+    path = tmp_path / "data.csv.zst"
+    write_zstd(path, text.encode())
+    assert zstd_loader.load_csv(str(path))[0].shape == (n_rows, 3)
+
+def test_gzip_members_split_on_chunk_boundary(gzip_loader, tmp_path):
+    text, n_rows = csv_text(2 * CHUNK_BYTES)
+    data = text.encode()
+    path = tmp_path / "data.csv.gz"
+    path.write_bytes(gzip.compress(data[:CHUNK_BYTES]) + gzip.compress(data[CHUNK_BYTES:]))
+    assert gzip_loader.load_csv(str(path))[0].shape == (n_rows, 3)
+
+def test_truncated_gzip_is_an_error(gzip_loader, tmp_path):
+    text, _ = csv_text(CHUNK_BYTES)
+    path = tmp_path / "data.csv.gz"
+    path.write_bytes(gzip.compress(text.encode())[:-64])
+    with pytest.raises(Exception, match="truncated gzip"):
+        gzip_loader.load_csv(str(path))
+
+def test_truncated_zstd_is_an_error(zstd_loader, tmp_path):
+    text, _ = csv_text(CHUNK_BYTES)
+    path = tmp_path / "data.csv.zst"
+    write_zstd(path, text.encode())
+    path.write_bytes(path.read_bytes()[:-64])
+    with pytest.raises(Exception, match="truncated zstd"):
+        zstd_loader.load_csv(str(path))
@@ -0,0 +1,92 @@
+"""
+Loopback round trip of live_client: a server thread in the test process
+receives a push over the socket and reads the arrays back from the shared
+memory block, as the bridge in Blender does.
+"""
+
+import importlib.util
+import os
+import socket
+import tempfile
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+CLIENT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "trident_extension", "live_client.py")
+
+def _load_client():
+    spec = importlib.util.spec_from_file_location("live_client", CLIENT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+live_client = _load_client()
+
+@pytest.fixture
+def bridge():
+    """Listening socket and session token, as live_bridge.start sets them up"""
+    address = os.path.join(tempfile.gettempdir(), f"trident_test_{os.getpid()}.sock") \
+        if hasattr(socket, "AF_UNIX") else f"127.0.0.1:{live_client.DEFAULT_PORT + 1}"
+    server = live_client.listen(address)
+    token = live_client.write_token(address)
+    yield server, address, token
+    server.close()
+    for path in (address, live_client.token_path(address)):
+        if not live_client.tcp_address(path) and os.path.exists(path):
+            os.remove(path)
+
+def _serve(server, token, received):
+    conn, _ = server.accept()
+    with conn:
+        header = live_client._receive(conn)
+        if not live_client.valid_token(header, token):
+            conn.sendall(live_client.frame({"ok": False, "error": "Missing or wrong session token"}))
+            return
+        # Same process as the creator: open the block as is, attach() would
+        # drop the creator's registration with the resource tracker
+        shm = shared_memory.SharedMemory(name=header["shm"])
+        try:
+            coords, columns = live_client.unpack(shm, header)
+            received["coords"] = coords.copy()
+            received["columns"] = {label: (v[0].copy(), v[1]) if isinstance(v, tuple) else v.copy()
+                                   for label, v in columns.items()}
+        finally:
+            shm.close()
+        conn.sendall(live_client.frame({"ok": True, "points": int(header["n"])}))
+
+def test_push_round_trip(bridge):
+    server, address, token = bridge
+    received = {}
+    thread = threading.Thread(target=_serve, args=(server, token, received), daemon=True)
+    thread.start()
+    rng = np.random.default_rng(0)
+    coords = rng.normal(size=(1000, 2))
+    obs = {"cluster": np.array(["b", "a", "c", "a"] * 250), "score": rng.random(1000),
+           "batch": (np.tile([0, 1, -1, 1], 250), ["x", "y"])}
+    reply = live_client.push(coords, obs, address=address, timeout=10.0)
+    thread.join(10.0)
+
+    assert reply == {"ok": True, "points": 1000}
+    assert np.array_equal(received["coords"], coords.astype(np.float32))
+    codes, names = received["columns"]["cluster"]
+    assert names == ["a", "b", "c"] and [names[c] for c in codes[:4]] == ["b", "a", "c", "a"]
+    assert np.array_equal(received["columns"]["score"], obs["score"].astype(np.float32))
+    assert np.array_equal(received["columns"]["batch"][0], obs["batch"][0])
+
+def test_request_without_token_is_refused(bridge):
+    server, address, token = bridge
+    os.remove(live_client.token_path(address))
+    thread = threading.Thread(target=_serve, args=(server, token, {}), daemon=True)
+    thread.start()
+    with pytest.raises(RuntimeError, match="session token"):
+        live_client.ping(address=address, timeout=10.0)
+    thread.join(10.0)
+
+def test_token_file_is_owner_only(bridge):
+    _, address, token = bridge
+    assert live_client.read_token(address) == token
+    if os.name == "posix":
+        assert os.stat(live_client.token_path(address)).st_mode & 0o077 == 0
@@ -0,0 +1,57 @@
+import numpy as np
+
+def write_inputs(tmp_path):
+    obsm = tmp_path / "obsm.csv"
+    obs = tmp_path / "obs.csv"
+    # obsm in a different order than obs, with one cell obs does not have
+    obsm.write_text("id,x,y,z\nc4,4,0,0\nc1,1,0,0\nc9,9,0,0\nc0,0,0,0\n")
+    obs.write_text("id,group\n" + "".join(f"c{i},{'ab'[i % 2]}\n" for i in range(6)))
+    return str(obsm), str(obs)
+
+def test_positional_load_keeps_obs_order(loader, tmp_path):
+    obs = tmp_path / "obs.csv"
+    obsm = tmp_path / "obsm.csv"
+    obs.write_text("group\na\nb\na\n")
+    obsm.write_text("x,y,z\n0,0,0\n1,0,0\n2,0,0\n")
+    assert loader.load_table(str(obsm), str(obs), ["group"]).obs_rows is None
+    filtered = loader.load_table(str(obsm), str(obs), ["group"],
+                                 filters=[{"column": "group", "op": "==", "value": "a"}])
+    assert filtered.obs_rows.tolist() == [0, 2]
+
+def test_key_join_maps_points_to_obs_rows(loader, tmp_path):
+    obsm, obs = write_inputs(tmp_path)
+    inner = loader.load_table(obsm, obs, ["group"], "id", "id")
+    assert inner.obs_rows.tolist() == [4, 1, 0]
+    left = loader.load_table(obsm, obs, ["group"], "id", "id", "left")
+    assert left.obs_rows.tolist() == [4, 1, -1, 0]
+
+def test_key_join_with_filters_and_sampling(loader, tmp_path):
+    obsm, obs = write_inputs(tmp_path)
+    filtered = loader.load_table(obsm, obs, ["group"], "id", "id",
+                                 filters=[{"column": "group", "op": "==", "value": "b"}])
+    assert filtered.obs_rows.tolist() == [1]
+    sampled = loader.load_table(obsm, obs, ["group"], "id", "id", sample={"max_points": 3, "seed": 5})
+    # Every point's obs row is one of the sampled rows, in obsm order
+    assert set(sampled.obs_rows.tolist()) <= set(sampled.sample_rows.tolist())
+    assert np.array_equal(sampled.data[:, 0], sampled.obs_rows)
+
+def test_gene_column_after_left_join(loader, tmp_path):
+    obsm, obs = write_inputs(tmp_path)
+    mtx = tmp_path / "matrix.mtx"
+    # 2 genes x 6 cells; gene 1 is 10 * cell + 1 (c0 left out as 0, the sparse default)
+    mtx.write_text("%%MatrixMarket matrix coordinate real general\n2 6 5\n"
+                   + "".join(f"2 {i + 1} {10 * i + 1}\n" for i in range(1, 6)))
+    left = loader.load_table(obsm, obs, ["group"], "id", "id", "left")
+    column = loader.read_mtx(str(mtx), True).column(1, left.obs_rows)
+    assert np.isnan(column[2])
+    assert column[[0, 1, 3]].tolist() == [41, 11, 0]
+    # The color range skips the point without obs row
+    assert (np.nanmin(column), np.nanmax(column)) == (0, 41)
+
+def test_obs_only_load_applies_filters(loader, tmp_path):
+    _, obs = write_inputs(tmp_path)
+    result = loader.load_table("", obs, ["group"], filters=[{"column": "group", "op": "==", "value": "b"}])
+    assert result.data.shape == (3, 1)
+    assert result.obs_rows.tolist() == [1, 3, 5]
+    assert result.codes("group").tolist() == [0, 0, 0]
+    assert result.filter_stats["rows_read"] == 6
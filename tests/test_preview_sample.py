@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+# Category sizes of the obs table: two large categories and three rare ones
+SIZES = {"T": 6000, "B": 3000, "NK": 12, "DC": 5, "pDC": 1}
+
+@pytest.fixture
+def inputs(tmp_path):
+    rng = np.random.default_rng(7)
+    cells = rng.permutation(np.repeat(list(SIZES), list(SIZES.values())))
+    obsm = tmp_path / "obsm.csv"
+    obs = tmp_path / "obs.csv"
+    # x is the row position, so the loaded points can be checked against sample_rows
+    obsm.write_text("x,y,z\n" + "".join(f"{i},0,0\n" for i in range(len(cells))))
+    obs.write_text("cell_type\n" + "".join(f"{c}\n" for c in cells))
+    return str(obsm), str(obs), cells
+
+def load(loader, inputs, **sample):
+    obsm, obs, _ = inputs
+    sample = {"max_points": 500, "stratify": "cell_type", "min_per_stratum": 20, "seed": 3, **sample}
+    return loader.load_table(obsm, obs, ["cell_type"], sample=sample)
+
+def test_every_category_keeps_its_minimum(loader, inputs):
+    result = load(loader, inputs)
+    rows = np.asarray(result.sample_rows)
+    counts = dict(zip(*np.unique(inputs[2][rows], return_counts=True)))
+    for name, size in SIZES.items():
+        assert counts.get(name, 0) >= min(size, 20)
+    assert len(rows) == 500
+    # The rest of the budget follows the category sizes
+    assert counts["T"] > counts["B"] > 20
+    assert np.array_equal(np.asarray(result.data)[:, 0], rows)
+
+def test_same_seed_same_sample(loader, inputs):
+    first = np.asarray(load(loader, inputs).sample_rows)
+    again = np.asarray(load(loader, inputs).sample_rows)
+    other = np.asarray(load(loader, inputs, seed=4).sample_rows)
+    assert np.array_equal(first, again)
+    assert np.all(np.diff(first) > 0)
+    assert not np.array_equal(first, other)
+
+def test_minimums_beyond_the_budget(loader, inputs):
+    # Reserves are kept even when they exceed max_points
+    rows = np.asarray(load(loader, inputs, max_points=30).sample_rows)
+    assert len(rows) == 20 + 20 + 12 + 5 + 1
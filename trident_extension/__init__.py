@@ -15,18 +15,36 @@ Core workflow:
 3. Python creates 3D point cloud in Blender
 4. Geometry nodes instance spheres on points
 5. Materials colorize by selected attribute
+
+The same workflow is available without UI context through the api module
+(load, plot, color_by, legend) for batch jobs and notebooks.
 """
 
 from . import properties
+from . import data_loader
+from . import api
+from . import hot_reload
+from . import live_bridge
+from . import timeseries
+from . import render_bake
 from . import operators
 from . import panel
 
 def register():
     properties.register_properties()
+    data_loader.register_handlers()
+    hot_reload.register_timers()
+    timeseries.register_handlers()
+    render_bake.register_handlers()
     operators.register_operators()
     panel.register_panel()
 
 def unregister():
+    live_bridge.stop()
     panel.unregister_panel()
     operators.unregister_operators()
+    render_bake.unregister_handlers()
+    timeseries.unregister_handlers()
+    hot_reload.unregister_timers()
+    data_loader.unregister_handlers()
     properties.unregister_properties()
@@ -0,0 +1,951 @@
+"""
+TRIDENT scripting API - drive TRIDENT from scripts, batch jobs and notebooks
+
+Every function works on an explicit scene (defaulting to the current one)
+and needs no UI context, so it runs in background mode as well:
+
+    from bl_ext.user_default.trident import api
+
+    api.load("obsm.csv", "obs.csv", ["leiden", "n_genes"])
+    api.plot()
+    api.color_by("leiden", "Viridis")
+    api.legend("square")
+
+    api.attach_expression("matrix.mtx.gz")
+    api.color_by_gene("CD3E")
+
+    api.set_points(adata.obsm["X_umap"], {"n_genes": adata.obs["n_genes"]})
+    api.load_embedding("cells.h5ad", obsm_key="X_tsne")
+    api.morph(["Primary", "X_tsne"], frames=48)
+    api.play_series("timecourse/*.npy", frames_per_step=4)
+    api.stop_series()
+    api.bake_for_render()
+    api.camera_path("cluster_tour", clusters=4)
+    api.render_frames("renders/", "tour")
+
+The operators in operators.py are thin wrappers around these functions.
+Errors are raised as exceptions instead of being reported.
+"""
+
+import os
+import re
+import bpy
+import numpy as np
+
+from . import data_loader
+from . import array_loader
+from . import column_cache
+from . import embeddings
+from . import expression
+from . import geometry_nodes
+from . import morph as morph_points
+from . import scene_environment
+from . import timeseries
+from . import render_bake
+from . import camera_paths
+from . import render_farm
+
+def _scene(scene):
+    return bpy.context.scene if scene is None else scene
+
+def _scene_override(scene):
+    """Context override pointing bpy.ops at an explicit scene"""
+    context = bpy.context
+    view_layer = context.view_layer if context.scene == scene else scene.view_layers[0]
+    return context.temp_override(scene=scene, view_layer=view_layer, collection=scene.collection)
+
+def _require_loader():
+    cpp_loader = data_loader.get_cpp_loader()
+    if cpp_loader is None:
+        raise RuntimeError("C++ module not available")
+    return cpp_loader
+
+def _check_file(filepath, name):
+    if not filepath or not os.path.exists(filepath):
+        raise FileNotFoundError(f"Invalid {name} file path: {filepath}")
+
+def probe(filepath):
+    """
+    Schema of an obs file without loading it: a dict with "names", "types"
+    ('numeric' / 'categorical'), approximate "cardinalities", estimated
+    "rows" and "rows_exact". Reads only the header and a bounded sample.
+    """
+    cpp_loader = _require_loader()
+    _check_file(filepath, "obs")
+    if array_loader.is_array_file(filepath):
+        return array_loader.probe_arrays(filepath)
+    return cpp_loader.probe(filepath)
+
+def read_headers(filepath_obs):
+    """Return the column names of an obs file"""
+    return probe(filepath_obs)["names"]
+
+def _set_label_collections(scene, all_labels, selected_labels, schema=None):
+    trident = scene.trident
+    trident.all_labels.clear()
+    trident.labels.clear()
+    trident.excluded_labels.clear()
+    for name in all_labels:
+        item = trident.all_labels.add()
+        item.name = name
+        if schema and name in schema:
+            item.kind, item.cardinality = schema[name]
+        if name in selected_labels:
+            trident.labels.add().name = name
+        else:
+            trident.excluded_labels.add().name = name
+
+def load_headers(filepath_obs, scene=None):
+    """Read the obs header into the scene label lists, all labels preselected"""
+    scene = _scene(scene)
+    info = probe(filepath_obs)
+    headers = info["names"]
+    scene.trident.filepath_obs = filepath_obs
+    scene.trident.obs_rows_estimate = info["rows"]
+    scene.trident.obs_rows_exact = info["rows_exact"]
+    schema = dict(zip(headers, zip(info["types"], info["cardinalities"])))
+    _set_label_collections(scene, headers, headers, schema)
+    return headers
+
+def parse_inputs(filepath_data, filepath_obs, labels, progress=None,
+                 key_obsm="", key_obs="", how="inner", filters=None, sample=None, obsm_key=""):
+    """
+    Parse the obsm and obs files with the C++ loader straight into one
+    merged column-major float32 array [n_points, 3 + n_labels] (first 3
+    cols are XYZ).
+    Rows are merged by position, or matched on index columns when key_obsm
+    and key_obs are given (how is 'inner' or 'left').
+    filters is an optional list of obs row predicates (see
+    parse_filter_expression); rows failing them are skipped in both files
+    while parsing, so only the selected rows are stored. sample (see
+    sample_options) then keeps a reproducible, optionally stratified
+    subsample of at most sample["max_points"] rows.
+    Either input may be a .npy/.npz array file instead (see array_loader;
+    obsm_key picks the array of an obsm .npz); such inputs are memory-mapped
+    and merged by position.
+    Returns the loader's LoadResult: .data (the merged array), .labels,
+    .is_categorical, .stats, .join_stats (None for positional merges),
+    .filter_stats (None without filters or sampling), .sample_rows (the
+    sampled obs row positions, None without sampling), .obs_rows (the obs
+    row position of every point, -1 without one, None when the points are
+    all obs rows in order), and
+    per categorical label .codes(label) (int32) and .categories(label)
+    (uint8 name arena, int64 offsets).
+    The C++ loader releases the GIL, so this can run on a worker thread;
+    progress is an optional callable receiving a stage description.
+    """
+    cpp_loader = _require_loader()
+    _check_file(filepath_data, "obsm")
+    _check_file(filepath_obs, "obs")
+
+    if array_loader.is_array_file(filepath_data) or array_loader.is_array_file(filepath_obs):
+        if key_obsm or key_obs:
+            raise ValueError("Key-based joins need CSV inputs; array files are merged by position")
+        if progress:
+            progress("Reading obsm + obs arrays")
+        return array_loader.load_arrays(filepath_data, filepath_obs, labels, obsm_key, filters, sample)
+
+    if progress:
+        progress("Parsing obsm + obs")
+    # Column-major: each label is one contiguous block for per-label reads
+    result = cpp_loader.load_table(filepath_data, filepath_obs, labels, key_obsm, key_obs, how,
+                                   filters or None, sample)
+
+    if result.join_stats is not None and result.join_stats["rows"] == 0:
+        raise RuntimeError("No obsm rows matched an obs row on the key columns")
+
+    return result
+
+def result_codes(result):
+    """int32 codes of the categorical labels of a LoadResult: {label: codes}"""
+    return {label: result.codes(label)
+            for label, is_cat in zip(result.labels, result.is_categorical) if is_cat}
+
+def result_mappings(result):
+    """
+    Category mappings {label: {name: code}} of a LoadResult for the
+    cat_map_json store, and the names {label: [name, ...]} of vocabularies
+    too large for it (more than MAX_OVERRIDE_CATEGORIES categories).
+    """
+    cat_map, large = {}, {}
+    for label, is_cat in zip(result.labels, result.is_categorical):
+        cat_map[label] = None
+        if not is_cat:
+            continue
+        names = data_loader.table_names(*result.categories(label))
+        if len(names) > data_loader.MAX_OVERRIDE_CATEGORIES:
+            large[label] = names
+        else:
+            cat_map[label] = {name: i for i, name in enumerate(names)}
+    return cat_map, large
+
+def describe_join(join_stats):
+    """One-line summary of join statistics"""
+    if not join_stats:
+        return ""
+    return (f"{join_stats['how'].title()} join: {join_stats['matched']} matched, "
+            f"{join_stats['unmatched_obsm']} obsm / {join_stats['unmatched_obs']} obs rows unmatched")
+
+def _filter_value(text):
+    """A filter value without surrounding quotes"""
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"":
+        return text[1:-1]
+    return text
+
+def _filter_number(text, clause):
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"Expected a number in filter '{clause}', got '{text}'") from None
+
+def parse_filter_expression(text):
+    """
+    Parse a row filter expression into loader predicates. Clauses are
+    separated by ';' and must all hold:
+
+        tissue == liver; sample in {A, B}; 200 <= n_genes <= 5000
+
+    Supported are 'column == value', 'column in {a, b, ...}' and inclusive
+    numeric ranges ('lo <= column <= hi', 'column >= lo', 'column <= hi').
+    """
+    filters = []
+    for clause in text.split(";"):
+        clause = clause.strip()
+        if not clause:
+            continue
+        if "==" in clause:
+            column, value = clause.split("==", 1)
+            filters.append({"column": _filter_value(column), "op": "==", "value": _filter_value(value)})
+            continue
+        match = re.match(r"^(?P<column>.+?)\s+in\s*[{\[(](?P<values>.*)[}\])]$", clause)
+        if match:
+            values = [_filter_value(v) for v in match.group("values").split(",") if v.strip()]
+            filters.append({"column": _filter_value(match.group("column")), "op": "in", "values": values})
+            continue
+        if ">=" in clause and "<" not in clause:
+            column, lo = clause.split(">=", 1)
+            filters.append({"column": _filter_value(column), "op": "range",
+                            "min": _filter_number(lo.strip(), clause), "max": None})
+            continue
+        parts = clause.split("<=")
+        if len(parts) not in (2, 3) or any(c in part for part in parts for c in "<>="):
+            raise ValueError(f"Unsupported filter clause: '{clause}'")
+        lo, column, hi = parts if len(parts) == 3 else (None, parts[0], parts[1])
+        filters.append({"column": _filter_value(column), "op": "range",
+                        "min": _filter_number(lo.strip(), clause) if lo is not None else None,
+                        "max": _filter_number(hi.strip(), clause)})
+    return filters
+
+def describe_filters(filter_stats):
+    """One-line summary of the row filter and sampling statistics of a LoadResult"""
+    if not filter_stats:
+        return ""
+    what = "Preview sample" if filter_stats["sampled"] else "Row filters"
+    return f"{what}: {filter_stats['rows_kept']:,} of {filter_stats['rows_read']:,} rows kept"
+
+def sample_options(scene):
+    """
+    Preview sampling settings of the scene for the loader, or None when
+    preview is off. The fraction applies to the probed obs row count and is
+    capped by preview_max_points.
+    """
+    trident = scene.trident
+    if not trident.preview_enabled:
+        return None
+
+    rows = trident.obs_rows_estimate
+    if not rows and trident.filepath_obs:
+        rows = probe(trident.filepath_obs)["rows"]
+    max_points = int(np.ceil(rows * trident.preview_fraction)) if rows else 0
+    if trident.preview_max_points:
+        max_points = min(max_points, trident.preview_max_points) if max_points else trident.preview_max_points
+    if not max_points:
+        return None
+
+    return {
+        "max_points": max_points,
+        "stratify": trident.preview_stratify.strip(),
+        "min_per_stratum": trident.preview_min_per_category if trident.preview_stratify.strip() else 0,
+        "seed": trident.preview_seed,
+    }
+
+def join_options(scene):
+    """Key-based join, row filter and preview settings of the scene as parse_inputs keyword arguments"""
+    trident = scene.trident
+    return {
+        "key_obsm": trident.join_key_obsm.strip(),
+        "key_obs": trident.join_key_obs.strip(),
+        "how": trident.join_how.lower(),
+        "filters": parse_filter_expression(trident.row_filter),
+        "sample": sample_options(scene),
+        "obsm_key": trident.obsm_key.strip(),
+    }
+
+def plot_labels(labels, scene=None):
+    """
+    Labels to parse for a plot: all of them, or with lazy_labels only the
+    color label (color_label if it is one of them, else the first). The
+    others are loaded on demand, see column_cache.
+    """
+    scene = _scene(scene)
+    labels = list(labels)
+    if not scene.trident.lazy_labels or not labels:
+        return labels
+    color_label = scene.trident.color_label
+    return [color_label if color_label in labels else labels[0]]
+
+def store_data(scene, result, inputs=None):
+    """
+    Store a LoadResult (data, codes, mappings, column statistics, labels) on
+    the scene. inputs is the (filepath_data, filepath_obs, parse_inputs
+    options) it was parsed with, needed to load labels left out later.
+    """
+    labels = list(result.labels)
+    cat_map, _large = result_mappings(result)
+    scene.trident.join_summary = describe_join(result.join_stats)
+    scene.trident.filter_summary = describe_filters(result.filter_stats)
+    data_loader.set_cat_map(cat_map, scene)
+    data_loader.set_column_stats(dict(zip(labels, result.stats)), scene)
+    data_loader.set_obs_map(labels, result.is_categorical, scene)
+    data_loader.set_data_cache(result.data, scene)
+    data_loader.set_sample_rows(result.sample_rows, scene)
+    data_loader.set_obs_rows(result.obs_rows, scene)
+    data_loader.set_category_tables(
+        {label: (codes,) + tuple(result.categories(label)) for label, codes in result_codes(result).items()},
+        scene)
+    data_loader.set_loaded_labels(labels, scene)
+    data_loader.set_label_cache(labels, scene)
+    if inputs is not None:
+        column_cache.record_source(scene, *inputs)
+    else:
+        scene.trident.lazy_source_json = ""
+
+def load(filepath_data, filepath_obs, labels=None, scene=None):
+    """
+    Load obsm coordinates and the selected obs labels into the scene.
+    All obs columns are loaded when labels is None. Rows are matched on the
+    scene's join_key_obsm/join_key_obs columns if set and only rows passing
+    the scene's row_filter are loaded, subsampled when preview is enabled
+    (see sample_rows). With the scene's lazy_labels set only the color label
+    is parsed (see plot_labels). Returns the merged array.
+    """
+    scene = _scene(scene)
+    if labels is None:
+        labels = load_headers(filepath_obs, scene)
+    else:
+        labels = list(labels)
+        current = [item.name for item in scene.trident.labels if item.name]
+        if current != labels:
+            all_labels = [item.name for item in scene.trident.all_labels] or labels
+            _set_label_collections(scene, all_labels, labels)
+
+    if not labels:
+        raise ValueError("No labels selected for analysis")
+
+    options = join_options(scene)
+    result = parse_inputs(filepath_data, filepath_obs, plot_labels(labels, scene), **options)
+
+    scene.trident.filepath_data = filepath_data
+    scene.trident.filepath_obs = filepath_obs
+    store_data(scene, result, (filepath_data, filepath_obs, options))
+    return result.data
+
+def sample_rows(scene=None):
+    """
+    0-based obs row positions of the loaded points if they are a preview
+    sample, else None. Plotting again with the same preview settings and
+    seed reproduces the sample; turning preview off loads every row.
+    """
+    return data_loader.get_sample_rows(_scene(scene))
+
+def load_sidecar(filepath, scene=None):
+    """Attach a binary sidecar written by export_sidecar, memory-mapped. Returns the array"""
+    scene = _scene(scene)
+    merged_array, meta = data_loader.read_sidecar(filepath)
+    labels = meta["labels"]
+
+    _set_label_collections(scene, labels, labels)
+    data_loader.set_cat_map(meta["cat_map"], scene)
+    # Sidecars written before column statistics existed get them computed here
+    data_loader.set_column_stats(meta.get("stats") or data_loader.compute_column_stats(merged_array, labels), scene)
+    data_loader.set_obs_map(labels, [meta["obs_map"][n] for n in labels], scene)
+    data_loader.set_data_cache(merged_array, scene, sidecar=filepath)
+    data_loader.set_loaded_labels(labels, scene)
+    data_loader.set_label_cache(labels, scene)
+    scene.trident.lazy_source_json = ""
+    return merged_array
+
+def export_sidecar(filepath, scene=None):
+    """Parse the scene's input files and write them to a binary sidecar. Returns the .npy path"""
+    scene = _scene(scene)
+    labels = [item.name for item in scene.trident.labels if item.name]
+    if not labels:
+        raise ValueError("No labels selected for analysis")
+
+    # Sidecars feed full-resolution renders, so the preview setting is ignored
+    options = join_options(scene)
+    options["sample"] = None
+    result = parse_inputs(scene.trident.filepath_data, scene.trident.filepath_obs, labels, **options)
+    cat_map, large = result_mappings(result)
+    return data_loader.write_sidecar(filepath, result.data, labels, cat_map, result.is_categorical,
+                                     dict(zip(labels, result.stats)), large)
+
+def _create_instance_object(scene):
+    """Low-poly smooth sphere instanced on every point"""
+    import bmesh
+
+    mesh = bpy.data.meshes.new("TRIDENT_Instance")
+    bm = bmesh.new()
+    bmesh.ops.create_icosphere(bm, subdivisions=1, radius=0.05)
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.shade_smooth()
+
+    inst_obj = bpy.data.objects.new("TRIDENT_Instance", mesh)
+    scene.collection.objects.link(inst_obj)
+    return inst_obj
+
+def write_label_attribute(mesh, name, values):
+    """Write a label column (codes or numbers) as the INT point attribute name of a mesh"""
+    if np.issubdtype(values.dtype, np.number):
+        vals = np.asarray(values, dtype=np.int32)
+    else:
+        as_str = values.astype(str)
+        uniques, inverse = np.unique(as_str, return_inverse=True)
+        vals = inverse.astype(np.int32)
+
+    attr = mesh.attributes.get(name)
+    if attr is not None and (attr.data_type != 'INT' or attr.domain != 'POINT'):
+        mesh.attributes.remove(attr)
+        attr = None
+    if attr is None:
+        attr = mesh.attributes.new(name=name, type='INT', domain='POINT')
+
+    vals_view = np.asarray(vals[:len(mesh.vertices)], dtype=np.int32)
+    attr.data.foreach_set("value", vals_view)
+
+def build_points_mesh(data, labels, codes=None):
+    """
+    Build the (unlinked) TRIDENT_Points mesh from a data array step by step.
+    codes optionally maps categorical labels to their int32 codes, which are
+    written as they are instead of being converted from the float columns.
+    Generator yielding (stage, fraction, mesh) after each unit of work, so
+    callers can spread the build over timer ticks; a cancelled build is
+    discarded with bpy.data.meshes.remove(mesh).
+    """
+    # Coords, moved so that the geometry median sits at the object origin
+    coords = np.ascontiguousarray(data[:, :3], dtype=np.float32)
+    coords -= coords.mean(axis=0, dtype=np.float64).astype(np.float32)
+    n_points = coords.shape[0]
+
+    # Create mesh from coords and embed label_id attribute
+    mesh = bpy.data.meshes.new("TRIDENT_Points_Mesh")
+    mesh.vertices.add(n_points)
+    mesh.vertices.foreach_set("co", coords.ravel())
+    del coords
+
+    n_extra = max(0, data.shape[1] - 3)
+    names = list(labels or [])
+    use_count = min(len(names), n_extra)
+    if n_extra and names and len(names) != n_extra:
+        print(f"[TRIDENT] Warning: Label names ({len(names)}) != extra columns ({n_extra}); using first {use_count}.")
+
+    n_steps = use_count + 1
+    yield "Building point mesh", 1 / n_steps, mesh
+
+    for j in range(use_count):
+        name = names[j]
+        write_label_attribute(mesh, name, codes[name] if codes and name in codes else data[:, 3 + j])
+        yield f"Writing attribute '{name}'", (j + 2) / n_steps, mesh
+
+    mesh.update()
+
+def update_points_mesh(mesh, data, labels, codes=None, stale=()):
+    """
+    Rewrite a built points mesh in place from a data array (centered like
+    build_points_mesh), resizing it if the point count changed. Point
+    attributes named in stale are removed.
+    """
+    coords = np.ascontiguousarray(data[:, :3], dtype=np.float32)
+    coords -= coords.mean(axis=0, dtype=np.float64).astype(np.float32)
+    if len(mesh.vertices) != coords.shape[0]:
+        mesh.clear_geometry()
+        mesh.vertices.add(coords.shape[0])
+    mesh.vertices.foreach_set("co", coords.ravel())
+
+    for name in stale:
+        attr = mesh.attributes.get(name)
+        if attr is not None:
+            mesh.attributes.remove(attr)
+    for j, name in enumerate(labels):
+        write_label_attribute(mesh, name, codes[name] if codes and name in codes else data[:, 3 + j])
+    mesh.update()
+
+def finish_plot(scene, mesh):
+    """
+    Replace the scene contents with a built points mesh, then set up
+    instancing, geometry nodes and the environment. Returns TRIDENT_Points.
+    """
+    trident_label_cache = data_loader.get_loaded_labels(scene)
+    embeddings.clear(scene)
+
+    # Clear scene
+    for o in list(scene.objects):
+        bpy.data.objects.remove(o, do_unlink=True)
+
+    # Create the instanced object and store reference
+    inst_obj = scene.trident.instance_obj
+    if inst_obj is None or not inst_obj.name in bpy.data.objects:
+        inst_obj = _create_instance_object(scene)
+        scene.trident.instance_obj = inst_obj
+
+    inst_obj.hide_viewport = True
+    inst_obj.hide_render = True
+
+    points_obj = bpy.data.objects.new("TRIDENT_Points", mesh)
+    scene.collection.objects.link(points_obj)
+
+    # Store reference
+    scene.trident.points_obj = points_obj
+
+    # Geometry Nodes setup (Object Info → Instance on Points → Realize → Output)
+    first_stats = data_loader.get_column_stats(trident_label_cache[0], scene) if trident_label_cache else None
+    max_color = first_stats["max"] if first_stats and first_stats["max"] is not None else 10
+    geometry_nodes.setup_geometry_nodes(points_obj, inst_obj, scene, max_color)
+    with _scene_override(scene):
+        scene_environment.setup_scene_environment(bpy.context)
+
+    # Store initial color label for legend use
+    if trident_label_cache:
+        scene.trident.current_color_label = trident_label_cache[0]
+
+    print(f"[TRIDENT] Created point cloud with {len(mesh.vertices)} points (instanced & realized).")
+    return points_obj
+
+def plot(scene=None):
+    """
+    Build the TRIDENT point cloud from the loaded data, replacing the scene
+    contents. Returns the TRIDENT_Points object.
+    """
+    scene = _scene(scene)
+    trident_data_cache = data_loader.get_data_cache(scene)
+
+    if trident_data_cache is None:
+        raise RuntimeError("No data loaded. Please load data first.")
+
+    if trident_data_cache.size == 0:
+        raise RuntimeError("No points to plot.")
+
+    labels = data_loader.get_loaded_labels(scene) or []
+    codes = {}
+    for label in labels:
+        label_codes = data_loader.get_codes(label, scene)
+        if label_codes is not None:
+            codes[label] = label_codes
+
+    mesh = None
+    for _stage, _fraction, mesh in build_points_mesh(trident_data_cache, labels, codes):
+        pass
+    return finish_plot(scene, mesh)
+
+def set_points(coords, obs=None, scene=None):
+    """
+    Use in-memory arrays as the scene's data: coords [n, 2 or 3] and obs
+    {label: values}, where values are numbers or a (codes, category names)
+    pair (code -1 for missing). A plotted TRIDENT_Points is updated in
+    place and keeps its coloring; otherwise the data is plotted. Returns
+    the merged array.
+    """
+    scene = _scene(scene)
+    trident = scene.trident
+    coords = np.asarray(coords)
+    if coords.ndim != 2 or coords.shape[1] < 2:
+        raise ValueError(f"coords must be an [n, 2+] array, got shape {coords.shape}")
+    n = coords.shape[0]
+    obs = obs or {}
+    labels = list(obs)
+
+    data = np.empty((n, 3 + len(labels)), dtype=np.float32, order='F')
+    dims = min(coords.shape[1], 3)
+    data[:, :dims] = coords[:, :dims]
+    data[:, dims:3] = 0.0  # 2D embeddings lie in the z = 0 plane
+
+    tables, is_categorical = {}, []
+    for j, label in enumerate(labels):
+        values = obs[label]
+        if isinstance(values, tuple):
+            codes, names = np.array(values[0], dtype=np.int32), list(values[1])
+            if (codes < 0).any():
+                if array_loader.MISSING_CATEGORY not in names:
+                    names.append(array_loader.MISSING_CATEGORY)
+                codes = np.where(codes < 0, names.index(array_loader.MISSING_CATEGORY), codes).astype(np.int32)
+            values = codes
+            tables[label] = (np.ascontiguousarray(codes),) + data_loader.names_to_table(names)
+        if len(values) != n:
+            raise ValueError(f"obs column '{label}' has {len(values)} values for {n} points")
+        data[:, 3 + j] = values
+        is_categorical.append(label in tables)
+
+    stats = data_loader.compute_column_stats(data, labels)
+    result = array_loader.ArrayLoadResult(data, labels, is_categorical, [stats.get(label) for label in labels], tables)
+
+    previous = data_loader.get_loaded_labels(scene) or []
+    _set_label_collections(scene, labels, labels)
+    store_data(scene, result)
+
+    points_obj = trident.points_obj
+    if not points_obj or points_obj.name not in bpy.data.objects:
+        plot(scene)
+        return data
+
+    # Extra embeddings were rows of the previous points
+    embeddings.clear(scene)
+    codes = {label: table[0] for label, table in tables.items()}
+    update_points_mesh(points_obj.data, data, labels, codes, [l for l in previous if l not in labels])
+
+    # Keep the coloring if its label is still there
+    gene, label = trident.current_color_gene, trident.current_color_label
+    try:
+        if gene:
+            color_by_gene(gene, scene=scene)
+        elif labels:
+            color_by(label if label in labels else labels[0], scene=scene)
+    except Exception as e:
+        print(f"[TRIDENT] Could not restore the coloring by {gene or label}: {e}")
+    print(f"[TRIDENT] Updated TRIDENT_Points in place ({n} points, {len(labels)} labels)")
+    return data
+
+def add_embedding(name, coords, scene=None):
+    """
+    Show another embedding of the plotted points: coords [n_points, 2 or 3]
+    in point order. It shares the obs columns of TRIDENT_Points (see
+    embeddings). Returns its object.
+    """
+    return embeddings.add(name, coords, _scene(scene))
+
+def load_embedding(filepath, name="", obsm_key="", scene=None):
+    """
+    Read another embedding of the plotted cells from an obsm file (CSV,
+    NumPy array or .h5ad, obsm_key picking the array) for the same rows as
+    the plot: the join, row filters and preview sample of the plot are
+    applied again. Returns its object.
+    """
+    scene = _scene(scene)
+    source = column_cache.recorded_source(scene)
+    if source is None:
+        raise RuntimeError("The input files of the plotted points are unknown; use add_embedding with coordinates")
+    options = dict(source["options"])
+    if obsm_key:
+        options["obsm_key"] = obsm_key
+    # One plotted label keeps the row selection; only the coordinates are used
+    labels = (data_loader.get_loaded_labels(scene) or [])[:1]
+    result = parse_inputs(filepath, source["filepath_obs"], labels, **options)
+
+    name = name or obsm_key or os.path.basename(filepath).split(".")[0]
+    obj = embeddings.add(name, result.data[:, :3], scene)
+    item = next(it for it in scene.trident.embeddings if it.name == name)
+    item.filepath = filepath
+    item.obsm_key = obsm_key
+    return obj
+
+def remove_embedding(name, scene=None):
+    """Remove an embedding added by add_embedding or load_embedding"""
+    embeddings.remove(name, _scene(scene))
+
+def morph(targets=None, frame_start=None, frames=60, hold=24, scene=None):
+    """
+    Animate TRIDENT_Points through embeddings (names, default all of them
+    in order; see embeddings.names), holding each for hold frames and
+    moving to the next in frames frames. Interpolation runs in geometry
+    nodes from one keyframed factor. Returns the last keyframed frame.
+    """
+    return morph_points.create(_scene(scene), targets, frame_start, frames, hold)
+
+def remove_morph(scene=None):
+    """Remove the morph animation of TRIDENT_Points"""
+    morph_points.remove(_scene(scene))
+
+def play_series(path, key="", frame_start=1, frames_per_step=1, scene=None):
+    """
+    Play a time series of embeddings from disk on TRIDENT_Points: a
+    [T, N, 3] .npy/.npz array (key picks the .npz array) or a directory or
+    glob of per-timepoint coordinate files. Frame frame_start shows the
+    first timepoint; the points blend between timepoints over
+    frames_per_step frames. Returns the number of timepoints.
+    """
+    scene = _scene(scene)
+    trident = scene.trident
+    trident.series_path = path
+    trident.series_key = key
+    trident.series_frame_start = frame_start
+    trident.series_frames_per_step = frames_per_step
+    steps = timeseries.start(scene)
+    trident.series_enabled = True
+    return steps
+
+def stop_series(scene=None):
+    """Stop the time series playback and show the plotted positions again"""
+    _scene(scene).trident.series_enabled = False
+
+def bake_for_render(scene=None):
+    """
+    Evaluate TRIDENT_Points once and render from the result, so animation
+    frames skip the instancing nodes. The bake is dropped automatically
+    when the data, color label or point size changes. Returns the number
+    of baked vertices.
+    """
+    return render_bake.bake(_scene(scene))
+
+def clear_render_bake(scene=None):
+    """Render TRIDENT_Points from its modifiers again"""
+    render_bake.clear(_scene(scene))
+
+def camera_path(preset="turntable", frame_start=None, scene=None, **options):
+    """
+    Animate the scene camera along a preset of camera_paths.PRESETS
+    ("turntable", "cluster_tour", "zoom_in", ...); options override the
+    preset's frames, turns, clusters, hold, zoom, label or category.
+    Returns the last keyframed frame.
+    """
+    return camera_paths.create(_scene(scene), preset, frame_start, **options)
+
+def remove_camera_path(scene=None):
+    """Remove the camera rig and put the camera back at its overview position"""
+    camera_paths.remove(_scene(scene))
+
+def render_frames(output_dir, name="trident", frame_start=None, frame_end=None, scene=None):
+    """
+    Render the scene's frames to <output_dir>/<name>_<frame>.png, skipping
+    frames already there, so an interrupted render continues where it
+    stopped. Returns the number of frames rendered now.
+    """
+    scene = _scene(scene)
+    job = {"name": name,
+           "frame_start": scene.frame_start if frame_start is None else frame_start,
+           "frame_end": scene.frame_end if frame_end is None else frame_end}
+    output_dir = bpy.path.abspath(output_dir)
+    skipped = len(render_farm.job_frames(job)) - len(render_farm.missing_frames(output_dir, job))
+    if skipped:
+        print(f"[TRIDENT] Skipping {skipped} frames already in {output_dir}")
+    with _scene_override(scene):
+        return render_farm.render_missing_frames(scene, output_dir, job)
+
+def _find_geometry_nodes_modifier(points_obj):
+    for mod in points_obj.modifiers:
+        if mod.type == 'NODES' and mod.name in ["TRIDENT_GeoNodes", "InstancePoints"]:
+            return mod
+    return None
+
+# Point attribute holding the hashed palette slot of high-cardinality labels
+PALETTE_SLOT_ATTRIBUTE = "TRIDENT_Palette_Slot"
+
+def _write_palette_slots(points_obj, label, scene):
+    """Write the palette slot of every point's category as an INT attribute. Returns its name"""
+    dictionary = data_loader.get_category_dictionary(label, scene)
+    codes = dictionary.codes
+    if len(dictionary):
+        point_slots = dictionary.palette_slots()[np.maximum(codes, 0)]
+        point_slots[codes < 0] = 0
+    else:
+        point_slots = np.zeros(codes.shape[0], dtype=np.int32)
+
+    mesh = points_obj.data
+    attr = mesh.attributes.get(PALETTE_SLOT_ATTRIBUTE)
+    if attr is None:
+        attr = mesh.attributes.new(name=PALETTE_SLOT_ATTRIBUTE, type='INT', domain='POINT')
+    attr.data.foreach_set("value", np.ascontiguousarray(point_slots, dtype=np.int32))
+    mesh.update()
+    print(f"[TRIDENT] Hashed {len(dictionary)} categories of {label} into {data_loader.PALETTE_SLOTS} palette slots")
+    return PALETTE_SLOT_ATTRIBUTE
+
+def _find_color_nodes(points_obj):
+    """Named Attribute and Map Range nodes of the points' geometry nodes (Map Range may be None)"""
+    gn_mod = _find_geometry_nodes_modifier(points_obj)
+    if not gn_mod or not gn_mod.node_group:
+        raise RuntimeError("Geometry nodes modifier not found")
+
+    tree = gn_mod.node_group
+    attr_node = None
+
+    for node in tree.nodes:
+        if hasattr(node, 'bl_idname') and node.bl_idname == 'GeometryNodeInputNamedAttribute':
+            attr_node = node
+            break
+        elif hasattr(node, 'inputs') and len(node.inputs) > 0:
+            if hasattr(node.inputs[0], 'name') and 'Name' in node.inputs[0].name:
+                attr_node = node
+                break
+
+    if not attr_node:
+        raise RuntimeError("Named attribute node not found in geometry nodes")
+
+    map_range_node = None
+    for node in tree.nodes:
+        if hasattr(node, 'bl_idname') and node.bl_idname == 'ShaderNodeMapRange':
+            map_range_node = node
+            break
+    return attr_node, map_range_node
+
+def color_by(label=None, palette=None, scene=None):
+    """
+    Color the points by an obs label with a palette. Defaults to the scene's
+    color_label/color_palette settings. Returns the max color value used.
+    """
+    scene = _scene(scene)
+    trident = scene.trident
+    color_label = label if label is not None else trident.color_label
+    palette = palette if palette is not None else trident.color_palette
+
+    if not color_label or color_label == 'NONE':
+        raise ValueError("No color label selected")
+
+    trident_data_cache = data_loader.get_data_cache(scene)
+    trident_label_cache = data_loader.get_label_cache(scene)
+
+    if trident_data_cache is None or trident_label_cache is None:
+        raise RuntimeError("No data loaded. Plot data first.")
+
+    if color_label not in trident_label_cache:
+        raise ValueError(f"Label '{color_label}' not found in {trident_label_cache}")
+
+    # Labels left out of a lazy plot are loaded on first use
+    column_cache.ensure_label(color_label, scene)
+
+    trident.current_color_label = color_label
+    trident.current_color_gene = ""
+
+    # Max color from the load-time statistics (NaN values are not counted)
+    stats = data_loader.get_column_stats(color_label, scene)
+
+    if stats and stats["max"] is not None:
+        max_color = float(stats["max"])
+    else:
+        max_color = 1.0
+        print(f"[TRIDENT] Warning: No valid data found for {color_label}")
+
+    # Find the TRIDENT points object
+    points_obj = trident.points_obj
+    if not points_obj or points_obj.name not in bpy.data.objects:
+        raise RuntimeError("TRIDENT_Points object not found. Plot data first.")
+
+    data_type = data_loader.get_data_type(scene)
+
+    # High-cardinality categories are colored by hashed palette slot, so each
+    # category keeps its color whatever other categories are present
+    hashed = data_type == True and data_loader.is_high_cardinality(color_label, scene)
+
+    # Use stored reference
+    inst_obj = trident.instance_obj
+    if inst_obj and inst_obj.name in bpy.data.objects:
+        max_label = data_loader.PALETTE_SLOTS if hashed else max_color
+        geometry_nodes.setup_instance_material(inst_obj, scene, max_label=max_label, palette_name=palette, points_obj=points_obj)
+    else:
+        print("[TRIDENT] Warning: Instance object not found")
+
+    # Update the named attribute node (obs labels are INT attributes)
+    attr_node, map_range_node = _find_color_nodes(points_obj)
+    attr_node.data_type = 'INT'
+    attr_node.inputs[0].default_value = _write_palette_slots(points_obj, color_label, scene) if hashed else color_label
+
+    # Change the max of the Map Range node
+    if map_range_node:
+        map_range_node.inputs['From Min'].default_value = 0.0
+        if hashed:
+            map_range_node.inputs['From Max'].default_value = data_loader.PALETTE_SLOTS - 1
+        elif max_color < 32:
+            map_range_node.inputs['From Max'].default_value = max_color
+        else:
+            if data_type == True:
+                map_range_node.inputs['From Max'].default_value = 32
+            else:
+                map_range_node.inputs['From Max'].default_value = max_color
+    else:
+        print("[TRIDENT] Warning: Map Range node not found in geometry nodes")
+
+    print(f"[TRIDENT] Updated colors: {color_label} with {palette} palette (max: {max_color})")
+    return max_color
+
+def attach_expression(filepath, genes_path="", matrix="X", scene=None):
+    """
+    Attach a cells x genes expression matrix (.mtx, sparse .npz or .h5ad) to
+    the scene for color_by_gene and index it by gene. genes_path names the
+    gene names file of .mtx/.npz matrices (found next to 10x matrices when
+    empty), matrix the .h5ad matrix (X, raw/X or layers/<name>). Its cells
+    are the obs rows. Returns a one-line description of the matrix.
+    """
+    scene = _scene(scene)
+    return expression.attach(filepath, genes_path, matrix, scene).describe()
+
+# Point attribute holding the expression of the gene colored by
+EXPRESSION_ATTRIBUTE = "TRIDENT_Expression"
+
+def color_by_gene(gene, palette=None, scene=None):
+    """
+    Color the points by the expression of a gene of the attached matrix
+    (continuous palette from the gene's min to max over the plotted points).
+    Returns the max expression.
+    """
+    scene = _scene(scene)
+    trident = scene.trident
+    palette = palette if palette is not None else trident.color_palette
+
+    points_obj = trident.points_obj
+    if not points_obj or points_obj.name not in bpy.data.objects:
+        raise RuntimeError("TRIDENT_Points object not found. Plot data first.")
+
+    column = expression.gene_column(gene, scene)
+    mesh = points_obj.data
+    if len(column) != len(mesh.vertices):
+        raise RuntimeError(f"Gene column has {len(column)} values for {len(mesh.vertices)} points")
+
+    attr = mesh.attributes.get(EXPRESSION_ATTRIBUTE)
+    if attr is None:
+        attr = mesh.attributes.new(name=EXPRESSION_ATTRIBUTE, type='FLOAT', domain='POINT')
+    attr.data.foreach_set("value", column)
+    mesh.update()
+
+    low, high = expression.value_range(column)
+    trident.current_color_label = gene
+    trident.current_color_gene = gene
+
+    inst_obj = trident.instance_obj
+    if inst_obj and inst_obj.name in bpy.data.objects:
+        geometry_nodes.setup_instance_material(inst_obj, scene, max_label=high, palette_name=palette, points_obj=points_obj)
+    else:
+        print("[TRIDENT] Warning: Instance object not found")
+
+    attr_node, map_range_node = _find_color_nodes(points_obj)
+    attr_node.data_type = 'FLOAT'
+    attr_node.inputs[0].default_value = EXPRESSION_ATTRIBUTE
+    if map_range_node:
+        map_range_node.inputs['From Min'].default_value = low
+        map_range_node.inputs['From Max'].default_value = high if high > low else low + 1.0
+    else:
+        print("[TRIDENT] Warning: Map Range node not found in geometry nodes")
+
+    print(f"[TRIDENT] Updated colors: gene {gene} with {palette} palette (range: {low:g} - {high:g})")
+    return high
+
+def legend(format="square", scene=None):
+    """Create the legend overlay scene, format is 'square' (1080x1080) or 'rectangle' (1920x1080)"""
+    from . import legend_setup
+
+    scene = _scene(scene)
+    with _scene_override(scene):
+        if format == "square":
+            legend_setup.create_square_legend(bpy.context)
+        elif format == "rectangle":
+            legend_setup.create_rectangle_legend(bpy.context)
+        else:
+            raise ValueError(f"Unknown legend format: {format}")
+
+def set_transparent_environment(enabled=True, scene=None):
+    """Toggle the transparent render environment of the scene"""
+    scene = _scene(scene)
+    with _scene_override(scene):
+        if enabled:
+            scene_environment.set_transparent_environment()
+        else:
+            scene_environment.disable_transparent_environment()
+    scene.trident.environment_transparent = enabled
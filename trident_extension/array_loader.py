@@ -0,0 +1,394 @@
+"""
+TRIDENT array inputs - obsm and obs from NumPy .npy / .npz and AnnData .h5ad files
+
+The obsm input can be a 2D float array (.npy, or one array of a .npz or of
+an .h5ad's obsm, chosen by scene.trident.obsm_key). The obs input can be a
+.npz of 1D columns, a structured .npy or an .h5ad's obs dataframe. NumPy
+arrays are memory-mapped (uncompressed .npz members too); .h5ad datasets are
+read by the C++ module through HDF5, only the requested ones, in row
+blocks. Nothing goes through text. Either input can still be a CSV file.
+
+load_arrays returns an ArrayLoadResult, which has the interface of the C++
+loader's LoadResult, so the plotting path treats both alike.
+"""
+
+import os
+import struct
+import zipfile
+import numpy as np
+
+from . import data_loader
+
+ARRAY_EXTENSIONS = (".npy", ".npz", ".h5ad")
+
+# Preferred obsm arrays when no key is given
+DEFAULT_OBSM_KEYS = ("X_umap", "X_tsne", "X_draw_graph_fa", "X_pca")
+
+# Empty strings are missing values; CSV parsing gives them this category
+MISSING_CATEGORY = "nan"
+
+def is_array_file(filepath):
+    return bool(filepath) and filepath.lower().endswith(ARRAY_EXTENSIONS)
+
+def is_h5ad(filepath):
+    return bool(filepath) and filepath.lower().endswith(".h5ad")
+
+def _default_obsm_key(names):
+    for key in DEFAULT_OBSM_KEYS:
+        if key in names:
+            return key
+    return names[0]
+
+def obsm_keys(filepath):
+    """Names of the arrays an obsm key can pick in a .npz or .h5ad file"""
+    if is_h5ad(filepath):
+        return list(data_loader.cpp_loader.h5ad_info(filepath, 0)["obsm"])
+    if filepath.lower().endswith(".npz"):
+        return npz_names(filepath)
+    return []
+
+def npz_names(filepath):
+    """Names of the arrays in a .npz"""
+    with zipfile.ZipFile(filepath) as zf:
+        return [n[:-4] for n in zf.namelist() if n.endswith(".npy")]
+
+def npz_member(filepath, name):
+    """One array of a .npz, memory-mapped if it is stored uncompressed"""
+    with zipfile.ZipFile(filepath) as zf:
+        try:
+            info = zf.getinfo(name + ".npy")
+        except KeyError:
+            raise KeyError(f"No array '{name}' in {filepath} "
+                           f"(has {', '.join(npz_names(filepath))})") from None
+        if info.compress_type != zipfile.ZIP_STORED:
+            # np.savez_compressed output has to be inflated into memory
+            with zf.open(info) as f:
+                return np.lib.format.read_array(f, allow_pickle=False)
+
+    with open(filepath, 'rb') as f:
+        # The member data follows its local file header
+        f.seek(info.header_offset)
+        name_len, extra_len = struct.unpack("<HH", f.read(30)[26:30])
+        f.seek(info.header_offset + 30 + name_len + extra_len)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if dtype.hasobject:
+        raise ValueError(f"Object array '{name}' in {filepath} is not supported")
+    return np.memmap(filepath, dtype=dtype, mode='r', offset=offset, shape=shape,
+                     order='F' if fortran else 'C')
+
+def _load_npy(filepath):
+    return np.load(filepath, mmap_mode='r', allow_pickle=False)
+
+def read_obsm(filepath, key=""):
+    """
+    Embedding coordinates [n, d] (d >= 2) of a .npy, or of the array `key` of
+    a .npz (X_umap or its first array if key is empty). Memory-mapped, not copied.
+    """
+    if filepath.lower().endswith(".npz"):
+        names = npz_names(filepath)
+        if not names:
+            raise ValueError(f"No arrays in {filepath}")
+        array = npz_member(filepath, key or _default_obsm_key(names))
+    else:
+        array = _load_npy(filepath)
+
+    if array.ndim != 2 or array.shape[1] < 2 or array.dtype.kind not in "iuf":
+        raise ValueError(f"obsm array must be numeric with shape (n, 2+), got {array.dtype} {array.shape}")
+    return array
+
+def obs_columns(filepath):
+    """Column names of an obs array file: .npz member names or structured .npy fields"""
+    if filepath.lower().endswith(".npz"):
+        return npz_names(filepath)
+    names = _load_npy(filepath).dtype.names
+    if not names:
+        raise ValueError(f"obs .npy files must hold a structured array: {filepath}")
+    return list(names)
+
+def read_obs_column(filepath, name):
+    """One 1D obs column of an array file, memory-mapped where possible"""
+    if filepath.lower().endswith(".npz"):
+        column = npz_member(filepath, name)
+    else:
+        array = _load_npy(filepath)
+        if name not in (array.dtype.names or ()):
+            raise KeyError(f"No column '{name}' in {filepath}")
+        column = array[name]
+    if column.ndim != 1:
+        raise ValueError(f"obs column '{name}' must be 1D, got shape {column.shape}")
+    return column
+
+def _is_text(column):
+    return column.dtype.kind in "US"
+
+def probe_arrays(filepath, sample_rows=1000):
+    """Schema of an obs array file, in the format of the C++ loader's probe"""
+    if is_h5ad(filepath):
+        return data_loader.cpp_loader.h5ad_info(filepath, sample_rows)
+    names = obs_columns(filepath)
+    types, cardinalities = [], []
+    rows = 0
+    for name in names:
+        column = read_obs_column(filepath, name)
+        rows = max(rows, len(column))
+        types.append("categorical" if _is_text(column) else "numeric")
+        # Distinct values of the first rows, like the CSV probe's sample
+        cardinalities.append(len(np.unique(np.asarray(column[:sample_rows]))))
+    return {
+        "names": names,
+        "types": types,
+        "cardinalities": cardinalities,
+        "rows": rows,
+        "rows_exact": True,
+        "sampled_rows": min(rows, sample_rows),
+        "file_size": os.path.getsize(filepath),
+        "compression": "plain",
+    }
+
+def _encode_column(column):
+    """(float32 values, int32 codes or None, category names or None) of an obs column"""
+    if not _is_text(column):
+        return np.asarray(column, dtype=np.float32), None, None
+
+    names, codes = np.unique(np.asarray(column), return_inverse=True)
+    names = [n.decode('utf-8') if isinstance(n, bytes) else str(n) for n in names]
+    if names and names[0] == "":
+        names[0] = MISSING_CATEGORY
+    codes = codes.astype(np.int32)
+    return codes.astype(np.float32), codes, names
+
+def _h5ad_column(filepath, name):
+    """One .h5ad obs column as (values, codes, names)"""
+    values, codes, arena, offsets = data_loader.cpp_loader.read_h5ad_obs(filepath, name)
+    if values is not None:
+        return values, None, None
+    names = data_loader.table_names(arena, offsets)
+    if (codes < 0).any():
+        # Missing values (code -1) get the category CSV parsing gives them
+        if MISSING_CATEGORY not in names:
+            names.append(MISSING_CATEGORY)
+        codes = np.where(codes < 0, names.index(MISSING_CATEGORY), codes).astype(np.int32)
+    return codes.astype(np.float32), codes, names
+
+def obsm_reader(filepath, key):
+    """
+    (row count, reader) of an obsm input (.npy, .npz, .h5ad or CSV); reader(rows)
+    returns the first 3 columns of those rows (all rows if rows is None).
+    """
+    if is_h5ad(filepath):
+        shapes = data_loader.cpp_loader.h5ad_info(filepath, 0)["obsm"]
+        if not shapes:
+            raise ValueError(f"No obsm arrays in {filepath}")
+        key = key or _default_obsm_key(list(shapes))
+        if key not in shapes:
+            raise KeyError(f"No obsm array '{key}' in {filepath} (has {', '.join(shapes)})")
+        if shapes[key][1] < 2:
+            raise ValueError(f"obsm array '{key}' must have at least 2 columns")
+        return shapes[key][0], lambda rows: data_loader.cpp_loader.read_h5ad_obsm(filepath, key, 3, rows)
+
+    if is_array_file(filepath):
+        obsm = read_obsm(filepath, key)
+    else:
+        obsm = data_loader.cpp_loader.load_csv(filepath, [], True)[0]
+    return len(obsm), lambda rows: obsm[:, :3] if rows is None else obsm[rows, :3]
+
+class ArrayLoadResult:
+    """Load result of array inputs, with the interface of the C++ LoadResult"""
+
+    def __init__(self, data, labels, is_categorical, stats, tables, filter_stats=None, sample_rows=None):
+        self.data = data
+        self.labels = labels
+        self.is_categorical = is_categorical
+        self.stats = stats
+        self.join_stats = None
+        self.filter_stats = filter_stats
+        self.sample_rows = sample_rows
+        # Array inputs are merged by position: the kept rows are the obs rows
+        self.obs_rows = sample_rows
+        self._tables = tables
+
+    def codes(self, label):
+        if label not in self._tables:
+            raise KeyError(f"Unknown categorical label: {label}")
+        return self._tables[label][0]
+
+    def categories(self, label):
+        if label not in self._tables:
+            raise KeyError(f"Unknown categorical label: {label}")
+        return self._tables[label][1:]
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+def _bounds(f):
+    lo = -np.inf if f.get("min") is None else f["min"]
+    hi = np.inf if f.get("max") is None else f["max"]
+    return lo, hi
+
+def _wanted(f):
+    return [f["value"]] if f.get("op", "==") == "==" else list(f["values"])
+
+def _name_matches(f, name):
+    """Whether a category name passes a filter, compared like CSV cells"""
+    number = _number(name)
+    if f.get("op") == "range":
+        lo, hi = _bounds(f)
+        return number is not None and lo <= number <= hi
+    wanted = _wanted(f)
+    if name in map(str, wanted):
+        return True
+    numbers = {np.float32(w) for w in map(_number, wanted) if w is not None}
+    return number is not None and np.float32(number) in numbers
+
+def _predicate(f, values, codes, names):
+    """Rows of one column passing a filter (see api.parse_filter_expression)"""
+    if names is not None:
+        # Decide per category, then look the codes up (-1, missing, fails)
+        passes = np.array([_name_matches(f, name) for name in names] + [False])
+        return passes[codes]
+    if f.get("op") == "range":
+        lo, hi = _bounds(f)
+        return (values >= lo) & (values <= hi)
+    numbers = [w for w in map(_number, _wanted(f)) if w is not None]
+    return np.isin(values, np.array(numbers, dtype=np.float32))
+
+def _stratum_quotas(sizes, max_points, minimum):
+    """Rows per stratum: the minimum first, the rest of max_points proportionally"""
+    quotas = np.minimum(sizes, minimum)
+    budget = min(max_points, int(sizes.sum())) - int(quotas.sum())
+    if budget <= 0:
+        return quotas
+    share = budget * sizes / sizes.sum()
+    extra = np.minimum(sizes - quotas, np.floor(share).astype(np.int64))
+    quotas += extra
+    left = budget - int(extra.sum())
+    # Largest remainders first; rows left by full strata go to the others
+    order = np.argsort(-(share - np.floor(share)), kind='stable')
+    while left > 0:
+        open_strata = order[quotas[order] < sizes[order]]
+        if not len(open_strata):
+            break
+        take = open_strata[:left]
+        quotas[take] += 1
+        left -= len(take)
+    return quotas
+
+def select_rows(n, columns, filters=None, sample=None):
+    """
+    Sorted positions of the rows passing the filters, subsampled as the C++
+    loader does it (see api.sample_options). None when all rows are kept.
+    """
+    if not filters and not sample:
+        return None
+
+    mask = np.ones(n, dtype=bool)
+    for f in filters or []:
+        if f["column"] not in columns:
+            raise RuntimeError(f"Filter column not found: {f['column']}")
+        mask &= _predicate(f, *columns[f["column"]])
+    rows = np.flatnonzero(mask)
+    if not len(rows):
+        raise RuntimeError("No rows pass the row filters")
+    if not sample:
+        return rows
+
+    rng = np.random.default_rng(sample.get("seed", 0))
+    stratify = sample.get("stratify")
+    if stratify:
+        if stratify not in columns:
+            raise RuntimeError(f"Stratification column not found: {stratify}")
+        values, codes, names = columns[stratify]
+        strata = np.unique(codes[rows] if names is not None else values[rows], return_inverse=True)[1]
+    else:
+        strata = np.zeros(len(rows), dtype=np.int64)
+
+    order = np.argsort(strata, kind='stable')
+    sizes = np.bincount(strata)
+    quotas = _stratum_quotas(sizes, sample["max_points"], sample.get("min_per_stratum", 0) if stratify else 0)
+    picked = []
+    for members, quota in zip(np.split(rows[order], np.cumsum(sizes)[:-1]), quotas):
+        picked.append(rng.choice(members, int(quota), replace=False))
+    return np.sort(np.concatenate(picked))
+
+def _load_csv_obs(filepath_obs, labels, n, filters, sample):
+    """
+    Labels of a CSV obs through the C++ loader, which applies the filters and
+    sampling while parsing. Returns (kept rows or None, LoadResult).
+    """
+    obs = data_loader.cpp_loader.load_table("", filepath_obs, labels, filters=filters or None, sample=sample)
+    n_obs = obs.filter_stats["rows_read"] if obs.filter_stats is not None else len(obs.data)
+    if n != n_obs:
+        raise RuntimeError(f"Incompatible row counts: obsm has {n} rows, obs has {n_obs}")
+    return obs.obs_rows, obs
+
+def load_arrays(filepath_data, filepath_obs, labels, obsm_key="", filters=None, sample=None):
+    """
+    Load obsm and obs (array files or CSV) into an ArrayLoadResult with a
+    merged column-major float32 array [n_points, 3 + n_labels]. Rows are
+    merged by position. Filter and stratification columns may be obs
+    columns that are not plotted.
+    """
+    labels = list(labels)
+    n, read_obsm_rows = obsm_reader(filepath_data, obsm_key)
+
+    csv_obs = not is_array_file(filepath_obs)
+    if csv_obs:
+        rows, obs = _load_csv_obs(filepath_obs, labels, n, filters, sample)
+        filter_stats = obs.filter_stats
+    else:
+        extra = [f["column"] for f in filters or []]
+        if sample and sample.get("stratify"):
+            extra.append(sample["stratify"])
+        needed = labels + [c for c in dict.fromkeys(extra) if c not in labels]
+        if is_h5ad(filepath_obs):
+            columns = {name: _h5ad_column(filepath_obs, name) for name in needed}
+        else:
+            columns = {name: _encode_column(read_obs_column(filepath_obs, name)) for name in needed}
+        n_obs = len(next(iter(columns.values()))[0]) if columns else n
+        if n != n_obs:
+            raise RuntimeError(f"Incompatible row counts: obsm has {n} rows, obs has {n_obs}")
+        rows = select_rows(n, columns, filters, sample)
+        filter_stats = None
+        if rows is not None:
+            filter_stats = {"rows_read": n, "rows_kept": len(rows),
+                            "filters": len(filters or []), "sampled": bool(sample)}
+    take = (lambda a: a) if rows is None else (lambda a: a[rows])
+    out_rows = n if rows is None else len(rows)
+
+    # Only the kept rows of obsm are read
+    coords = read_obsm_rows(rows)
+    data = np.empty((out_rows, 3 + len(labels)), dtype=np.float32, order='F')
+    dims = coords.shape[1]
+    data[:, :dims] = coords
+    data[:, dims:3] = 0.0  # 2D embeddings lie in the z = 0 plane
+
+    if csv_obs:
+        # Already the kept rows, with codes straight from the parser
+        data[:, 3:] = obs.data
+        is_categorical = [bool(c) for c in obs.is_categorical]
+        tables = {label: (obs.codes(label),) + tuple(obs.categories(label))
+                  for label, categorical in zip(labels, is_categorical) if categorical}
+        stats = list(obs.stats)
+    else:
+        tables = {}
+        is_categorical = []
+        for j, label in enumerate(labels):
+            values, codes, names = columns[label]
+            data[:, 3 + j] = take(values)
+            is_categorical.append(names is not None)
+            if names is not None:
+                tables[label] = (np.ascontiguousarray(take(codes)),) + data_loader.names_to_table(names)
+        label_stats = data_loader.compute_column_stats(data, labels)
+        stats = [label_stats.get(label) for label in labels]
+
+    print(f"[TRIDENT] Loaded array inputs (rows={out_rows}, cols={data.shape[1]})")
+    return ArrayLoadResult(data, labels, is_categorical, stats, tables, filter_stats, rows)
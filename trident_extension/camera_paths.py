@@ -0,0 +1,308 @@
+"""
+TRIDENT camera paths - keyframed camera rigs for turntables and flythroughs
+
+A rig is the scene camera parented to a pivot empty and tracking a target
+empty. Paths only keyframe those few transforms, so they stay lightweight
+whatever the number of points:
+
+- TURNTABLE: the pivot sits at the plot center and turns around Z.
+- FLY: the camera and target move from the overview to the centroids of
+  the largest categories of a label and back. The centroids and spreads
+  are computed from the plotted coordinates with one bincount per axis.
+- ZOOM: the camera pushes in toward the plot center or a category.
+
+PRESETS is the library of ready-made paths; every option of a preset can
+be overridden when creating it.
+"""
+
+import math
+import numpy as np
+import bpy
+
+from . import data_loader
+from . import embeddings
+
+PIVOT = "TRIDENT_CameraPivot"
+
+TARGET = "TRIDENT_CameraTarget"
+
+CONSTRAINT = "TRIDENT_Track"
+
+# Camera of a new rig, where scene_environment places it
+DEFAULT_LOCATION = (-31.3817, 32.3135, 9.39782)
+
+# A category is framed at this many times its RMS radius from the camera
+CLUSTER_FRAMING = 4.0
+
+# Closest the camera gets to a target, in plot units
+MIN_DISTANCE = 3.0
+
+PRESETS = {
+    "turntable": {"kind": 'TURNTABLE', "frames": 240, "turns": 1.0,
+                  "description": "One full orbit around the plot"},
+    "turntable_short": {"kind": 'TURNTABLE', "frames": 120, "turns": 0.25,
+                        "description": "A quarter orbit, e.g. for a looping teaser"},
+    "cluster_tour": {"kind": 'FLY', "clusters": 6, "frames": 72, "hold": 24,
+                     "description": "Fly from the overview to the largest categories and back"},
+    "zoom_in": {"kind": 'ZOOM', "frames": 120, "hold": 24, "zoom": 0.35,
+                "description": "Push in toward the plot center"},
+    "zoom_cluster": {"kind": 'ZOOM', "frames": 120, "hold": 24, "zoom": 0.0,
+                     "description": "Push in to the largest category"},
+}
+
+def category_centroids(coords, codes, n_categories):
+    """
+    Centroids [n, 3], RMS radii [n] and point counts [n] of the categories
+    of coords [m, 3]; codes are category ids per point (-1 for missing).
+    """
+    valid = codes >= 0
+    codes = codes[valid]
+    coords = np.asarray(coords, dtype=np.float64)[valid]
+    counts = np.bincount(codes, minlength=n_categories)
+    sums = np.stack([np.bincount(codes, weights=coords[:, d], minlength=n_categories)
+                     for d in range(3)], axis=1)
+    squares = np.bincount(codes, weights=np.einsum('ij,ij->i', coords, coords), minlength=n_categories)
+    safe = np.maximum(counts, 1)
+    centroids = sums / safe[:, None]
+    variance = squares / safe - np.einsum('ij,ij->i', centroids, centroids)
+    return centroids, np.sqrt(np.maximum(variance, 0.0)), counts
+
+def _points(scene):
+    points_obj = scene.trident.points_obj
+    if not points_obj or points_obj.name not in bpy.data.objects:
+        raise RuntimeError("TRIDENT_Points object not found. Plot data first.")
+    return points_obj
+
+def _plot_transform(points_obj):
+    """(4x4 matrix, scale) taking mesh coordinates to the rendered plot"""
+    mesh = points_obj.data
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+    scale = embeddings.plot_scale(np.ptp(co, axis=0)) if len(co) else 1.0
+    return np.array(points_obj.matrix_world, dtype=np.float64), scale, co
+
+def _to_world(matrix, scale, coords):
+    coords = np.asarray(coords, dtype=np.float64) * scale
+    return coords @ matrix[:3, :3].T + matrix[:3, 3]
+
+def _is_categorical(label, scene):
+    trident = scene.trident
+    if label == (trident.current_color_label or trident.color_label) and not trident.current_color_gene:
+        return data_loader.get_data_type(scene)
+    return bool(data_loader.get_obs_map(scene).get(label))
+
+def label_centroids(scene, label=""):
+    """
+    (names, world centroids [n, 3], world radii [n], counts [n]) of the
+    categories of label (default: the color label), largest first.
+    """
+    trident = scene.trident
+    label = label or trident.current_color_label or trident.color_label
+    if not label or label == 'NONE':
+        raise ValueError("No color label; pick a categorical label to fly between its categories")
+    if not _is_categorical(label, scene):
+        raise ValueError(f"Label {label} is continuous; cluster paths need a categorical label")
+    dictionary = data_loader.get_category_dictionary(label, scene)
+    if dictionary is None:
+        raise ValueError(f"Label {label} is not loaded")
+
+    points_obj = _points(scene)
+    matrix, scale, co = _plot_transform(points_obj)
+    if len(co) != len(dictionary.codes):
+        raise RuntimeError(f"{len(co):,} points are plotted but label {label} has {len(dictionary.codes):,} rows")
+    centroids, radii, counts = category_centroids(co, dictionary.codes, len(dictionary))
+    order = np.argsort(-counts, kind='stable')
+    order = order[counts[order] > 0]
+    names = [dictionary.name(i) for i in order]
+    return names, _to_world(matrix, scale, centroids[order]), radii[order] * scale, counts[order]
+
+def _tour_order(start, centroids):
+    """Visit order of centroids, always flying to the nearest one not visited yet"""
+    remaining = list(range(len(centroids)))
+    order, position = [], np.asarray(start, dtype=np.float64)
+    while remaining:
+        distances = np.linalg.norm(centroids[remaining] - position, axis=1)
+        nearest = remaining.pop(int(np.argmin(distances)))
+        order.append(nearest)
+        position = centroids[nearest]
+    return order
+
+def _clear_fcurves(obj, prefixes):
+    action = obj.animation_data.action if obj.animation_data else None
+    if action is None:
+        return
+    for fcurve in [fc for fc in action.fcurves if fc.data_path.startswith(prefixes)]:
+        action.fcurves.remove(fcurve)
+
+def _empty(name, scene):
+    obj = bpy.data.objects.get(name)
+    if obj is None:
+        obj = bpy.data.objects.new(name, None)
+        obj.empty_display_type = 'PLAIN_AXES'
+        obj.hide_render = True
+    if obj.name not in scene.collection.objects:
+        scene.collection.objects.link(obj)
+    return obj
+
+def _camera(scene):
+    camera = scene.camera
+    if camera is None:
+        camera = bpy.data.objects.new("Camera", bpy.data.cameras.new("Camera"))
+        scene.collection.objects.link(camera)
+        camera.location = DEFAULT_LOCATION
+        scene.camera = camera
+    return camera
+
+def _home(scene, camera):
+    """Camera position of the overview: where it was before the first path"""
+    pivot = bpy.data.objects.get(PIVOT)
+    if pivot is not None and "trident_home" in pivot:
+        return np.array(pivot["trident_home"], dtype=np.float64)
+    # matrix_world of a camera created just now is only set by the next depsgraph update
+    if camera.parent is None:
+        return np.array(camera.location, dtype=np.float64)
+    return np.array(camera.matrix_world.translation, dtype=np.float64)
+
+def _rig(scene):
+    """(camera, pivot, target, home) of a fresh rig without keyframes"""
+    camera = _camera(scene)
+    home = _home(scene, camera)
+    remove(scene)
+    pivot = _empty(PIVOT, scene)
+    target = _empty(TARGET, scene)
+    pivot["trident_home"] = [float(v) for v in home]
+    pivot.location = (0.0, 0.0, 0.0)
+    pivot.rotation_euler = (0.0, 0.0, 0.0)
+    camera.parent = pivot
+    camera.matrix_parent_inverse.identity()
+    constraint = camera.constraints.new(type='TRACK_TO')
+    constraint.name = CONSTRAINT
+    constraint.target = target
+    constraint.track_axis = 'TRACK_NEGATIVE_Z'
+    constraint.up_axis = 'UP_Y'
+    return camera, pivot, target, home
+
+def _key(frame, *items):
+    """Keyframe (object, location) pairs at frame"""
+    for obj, location in items:
+        obj.location = tuple(float(v) for v in location)
+        obj.keyframe_insert(data_path="location", frame=frame)
+
+def _current(obj):
+    return np.array(obj.location, dtype=np.float64)
+
+def _framing(center, home, radius, zoom=None):
+    """Camera position looking at center from the direction of home"""
+    offset = np.asarray(home, dtype=np.float64) - center
+    distance = float(np.linalg.norm(offset))
+    direction = offset / distance if distance > 0 else np.array([0.0, -1.0, 0.0])
+    if zoom:
+        distance *= zoom
+    else:
+        distance = radius * CLUSTER_FRAMING
+    return center + direction * max(distance, MIN_DISTANCE)
+
+def create(scene, preset="turntable", frame_start=None, **options):
+    """
+    Keyframe the camera rig along a preset of PRESETS, with options
+    overriding the preset's (frames, turns, clusters, hold, zoom, label,
+    category). Returns the last keyframed frame.
+    """
+    if preset not in PRESETS:
+        raise KeyError(f"Unknown camera path '{preset}' (available: {', '.join(PRESETS)})")
+    settings = dict(PRESETS[preset], **{k: v for k, v in options.items() if v is not None})
+    kind = settings["kind"]
+    frames = int(settings["frames"])
+    hold = int(settings.get("hold", 0))
+    if frames < 1 or hold < 0:
+        raise ValueError("Paths need at least one frame per move and holds cannot be negative")
+    frame_start = scene.frame_start if frame_start is None else int(frame_start)
+
+    points_obj = _points(scene)
+    center = np.array(points_obj.matrix_world.translation, dtype=np.float64)
+    if kind == 'FLY' or (kind == 'ZOOM' and (settings.get("category") or not settings.get("zoom"))):
+        names, centroids, radii, _counts = label_centroids(scene, settings.get("label", ""))
+        if not names:
+            raise ValueError("The label has no categories with points")
+    camera, pivot, target, home = _rig(scene)
+
+    frame = frame_start
+    if kind == 'TURNTABLE':
+        pivot.location = tuple(center)
+        camera.location = tuple(home - center)
+        target.location = tuple(center)
+        pivot.rotation_euler = (0.0, 0.0, 0.0)
+        pivot.keyframe_insert(data_path="rotation_euler", index=2, frame=frame)
+        frame += frames
+        pivot.rotation_euler = (0.0, 0.0, 2 * math.pi * float(settings.get("turns", 1.0)))
+        pivot.keyframe_insert(data_path="rotation_euler", index=2, frame=frame)
+        # Constant speed, so looping turntables do not ease in and out
+        for fcurve in pivot.animation_data.action.fcurves:
+            for point in fcurve.keyframe_points:
+                point.interpolation = 'LINEAR'
+        description = f"{settings.get('turns', 1.0):g} turns"
+
+    elif kind == 'FLY':
+        count = min(int(settings.get("clusters", 6)), len(names))
+        visits = _tour_order(home, centroids[:count])
+        _key(frame, (camera, home), (target, center))
+        stops = [(_framing(centroids[i], home, radii[i]), centroids[i]) for i in visits]
+        for location, look_at in stops + [(home, center)]:
+            if hold:
+                frame += hold
+                _key(frame, (camera, _current(camera)), (target, _current(target)))
+            frame += frames
+            _key(frame, (camera, location), (target, look_at))
+        description = "tour of " + ", ".join(names[i] for i in visits)
+
+    elif kind == 'ZOOM':
+        category = settings.get("category")
+        if category:
+            if category not in names:
+                raise KeyError(f"No category '{category}' in label {settings.get('label') or 'the color label'}")
+            index = names.index(category)
+            look_at, location = centroids[index], _framing(centroids[index], home, radii[index])
+        elif settings.get("zoom"):
+            look_at, location = center, _framing(center, home, 0.0, float(settings["zoom"]))
+        else:
+            look_at, location = centroids[0], _framing(centroids[0], home, radii[0])
+        _key(frame, (camera, home), (target, center))
+        if hold:
+            frame += hold
+            _key(frame, (camera, home), (target, center))
+        frame += frames
+        _key(frame, (camera, location), (target, look_at))
+        if hold:
+            frame += hold
+            _key(frame, (camera, location), (target, look_at))
+        description = f"zoom to {category or (names[0] if not settings.get('zoom') else 'the center')}"
+
+    else:
+        raise ValueError(f"Unknown camera path kind '{kind}'")
+
+    if scene.frame_end < frame:
+        scene.frame_end = frame
+    scene.trident.camera_path_summary = f"{preset}: frames {frame_start}-{frame}, {description}"
+    print(f"[TRIDENT] Camera path {scene.trident.camera_path_summary}")
+    return frame
+
+def remove(scene):
+    """Remove the camera rig; the camera goes back to its overview position"""
+    scene.trident.camera_path_summary = ""
+    pivot = bpy.data.objects.get(PIVOT)
+    camera = scene.camera
+    if camera is not None and pivot is not None and camera.parent == pivot:
+        home = pivot.get("trident_home")
+        _clear_fcurves(camera, ("location",))
+        camera.parent = None
+        if home is not None:
+            camera.location = tuple(home)
+    if camera is not None:
+        constraint = camera.constraints.get(CONSTRAINT)
+        if constraint is not None:
+            camera.constraints.remove(constraint)
+    for name in (PIVOT, TARGET):
+        obj = bpy.data.objects.get(name)
+        if obj is not None:
+            bpy.data.objects.remove(obj, do_unlink=True)
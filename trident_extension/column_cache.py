@@ -0,0 +1,173 @@
+"""
+TRIDENT column cache - load labels left out of a lazy plot on demand
+
+With lazy labels on, Plot Data parses only the coordinates and the color
+label, so the time to the first plot does not depend on how many obs
+columns are included. The other labels are loaded the first time they are
+colored by: one pass over the input files, with the join, row filters and
+preview sample of the plot, parses a batch of them and writes every column
+to an on-disk columnar cache. Columns are memory-mapped from there, so
+later selections (also after reopening the .blend) cost no parsing.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import bpy
+
+from . import data_loader
+
+# Labels parsed per pass over the inputs
+BATCH_LABELS = 32
+
+# Input sets kept in the cache; the least recently used are removed
+CACHE_ENTRIES = 8
+
+MANIFEST = "columns.json"
+
+def cache_root():
+    return os.path.join(tempfile.gettempdir(), "trident_column_cache")
+
+def _file_state(filepath):
+    stat = os.stat(filepath)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def record_source(scene, filepath_data, filepath_obs, options):
+    """
+    Remember the input files and parse_inputs options of the scene's data,
+    so that labels left out of the plot can be loaded for the same rows.
+    """
+    source = {
+        "filepath_data": os.path.abspath(filepath_data),
+        "filepath_obs": os.path.abspath(filepath_obs),
+        "options": options,
+        "files": [_file_state(filepath_data), _file_state(filepath_obs)],
+    }
+    scene.trident.lazy_source_json = json.dumps(source, sort_keys=True)
+
+def recorded_source(scene):
+    """Input files and load options recorded by record_source, or None"""
+    text = scene.trident.lazy_source_json
+    return json.loads(text) if text else None
+
+def _source(scene, label):
+    source = recorded_source(scene)
+    if source is None:
+        raise RuntimeError(f"Label '{label}' is not loaded and the input files of the data are unknown; plot again")
+    for filepath, state in zip((source["filepath_data"], source["filepath_obs"]), source["files"]):
+        if not os.path.exists(filepath) or _file_state(filepath) != state:
+            raise RuntimeError(f"{filepath} changed since the data was plotted; plot again to load '{label}'")
+    return source
+
+def _cache_dir(source):
+    key = hashlib.sha1(json.dumps(source, sort_keys=True).encode('utf-8')).hexdigest()[:20]
+    return os.path.join(cache_root(), key)
+
+def _read_manifest(directory):
+    """{label: {"file", "codes", "names", "stats"}} of the cached columns"""
+    try:
+        with open(os.path.join(directory, MANIFEST), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+def _prune(keep):
+    root = cache_root()
+    entries = [os.path.join(root, name) for name in os.listdir(root)]
+    entries = sorted((e for e in entries if os.path.isdir(e) and e != keep), key=os.path.getmtime, reverse=True)
+    for entry in entries[CACHE_ENTRIES - 1:]:
+        shutil.rmtree(entry, ignore_errors=True)
+
+def _fill(label, scene, source, directory, manifest):
+    """Parse label and a batch of other pending labels into the cache. Returns the new manifest"""
+    from . import api
+
+    loaded = set(data_loader.get_loaded_labels(scene) or [])
+    pending = [label] + [l for l in (data_loader.get_label_cache(scene) or [])
+                         if l != label and l not in manifest and l not in loaded]
+    pending = pending[:BATCH_LABELS]
+
+    result = api.parse_inputs(source["filepath_data"], source["filepath_obs"], pending, **source["options"])
+    coords = data_loader.get_coords(scene)
+    if coords is None or result.data.shape[0] != coords.shape[0] or \
+            not np.array_equal(result.data[:, 0], coords[:, 0], equal_nan=True):
+        raise RuntimeError("The input files no longer give the plotted rows; plot again")
+
+    os.makedirs(directory, exist_ok=True)
+    for j, (name, is_cat) in enumerate(zip(result.labels, result.is_categorical)):
+        filename = f"c{len(manifest):04d}.npy"
+        np.save(os.path.join(directory, filename), np.ascontiguousarray(result.data[:, 3 + j]))
+        codes_file = None
+        if is_cat:
+            codes_file = f"c{len(manifest):04d}_codes.npy"
+            np.save(os.path.join(directory, codes_file), result.codes(name))
+        manifest[name] = {
+            "file": filename,
+            "codes": codes_file,
+            "names": data_loader.table_names(*result.categories(name)) if is_cat else None,
+            "stats": result.stats[j],
+        }
+    _write_manifest(directory, manifest)
+    _prune(directory)
+    print(f"[TRIDENT] Cached {len(result.labels)} label columns in {directory}")
+    return manifest
+
+def _write_attribute(label, column, scene):
+    """Write a label's INT point attribute to the plotted point cloud, if it has none yet"""
+    from . import api
+
+    points_obj = scene.trident.points_obj
+    if not points_obj or points_obj.name not in bpy.data.objects:
+        return
+    mesh = points_obj.data
+    attr = mesh.attributes.get(label)
+    if attr is not None and attr.data_type == 'INT' and attr.domain == 'POINT':
+        return
+    codes = data_loader.get_codes(label, scene)
+    api.write_label_attribute(mesh, label, codes if codes is not None else column)
+    mesh.update()
+
+def ensure_label(label, scene=None):
+    """
+    Make a label's column available: labels left out of a lazy plot are
+    loaded from the column cache, filling it first if needed, and written as
+    point attributes of the plotted point cloud. Returns True if the label
+    had to be loaded.
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    if data_loader.get_column(label, scene) is not None:
+        return False
+    if data_loader.get_data_cache(scene) is None:
+        raise RuntimeError("No data loaded. Plot data first.")
+
+    source = _source(scene, label)
+    directory = _cache_dir(source)
+    manifest = _read_manifest(directory)
+    if label not in manifest:
+        manifest = _fill(label, scene, source, directory, manifest)
+    else:
+        os.utime(directory)
+
+    entry = manifest[label]
+    column = np.load(os.path.join(directory, entry["file"]), mmap_mode='r')
+    if column.shape[0] != scene.trident.data_shape[0]:
+        raise RuntimeError(f"Cached column of '{label}' has {column.shape[0]} rows for {scene.trident.data_shape[0]} points")
+
+    # Caches written before codes were stored get them from the float ids
+    codes = entry.get("codes")
+    if codes:
+        codes = np.load(os.path.join(directory, codes), mmap_mode='r')
+    data_loader.set_lazy_column(label, column, entry["names"], entry["stats"], scene, codes)
+    _write_attribute(label, column, scene)
+    print(f"[TRIDENT] Loaded label {label} from the column cache")
+    return True
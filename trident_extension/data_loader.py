@@ -1,4 +1,6 @@
+import os
 import json
+import uuid
 import numpy as np
 import bpy
 
@@ -20,9 +22,39 @@ except Exception as e:
     print("[TRIDENT] ERROR: Could not import C++ module:", e)
     print("[TRIDENT] The addon will not work without the compiled C++ module.")
 
-# Add in-memory cache
-_cached_data = None
-_cached_data_hash = None
+# In-memory data cache: {scene.trident.data_token: array}
+# The arrays are shared zero-copy with everything that reads the cache; they
+# are persisted as a binary sidecar next to the .blend on save (see _save_pre)
+_data_store = {}
+
+# Dictionary-encoded categorical columns: {(data_token, label): CategoryDictionary}
+# Derived from the data on demand, so they are not persisted
+_dictionary_store = {}
+
+# Codes and category tables of categorical labels:
+# {data_token: {label: (int32 codes, uint8 arena, int64 offsets)}}
+_category_store = {}
+
+# Sampled obs rows of preview plots: {data_token: int64 row positions}
+# Not persisted; the preview settings and seed reproduce the same sample
+_sample_store = {}
+
+# obs row of every point after a key join, row filter or preview sample:
+# {data_token: int64 row positions, -1 for points without obs row}
+_obs_rows_store = {}
+
+# Label columns loaded after the plot (see column_cache):
+# {data_token: {label: float32 column}}; memory-mapped from the column cache
+_lazy_store = {}
+
+# Parsed column statistics: {scene.trident.data_token: {label: stats}}
+# Persisted as JSON in scene.trident.stats_json, parsed once per data token
+_stats_store = {}
+
+# Running Plot Data jobs: {scene name: {"progress", "stage", "cancel"}}
+# Runtime state only: never saved, so a save or crash mid-plot cannot
+# leave a scene marked as plotting
+_plot_jobs = {}
 
 def get_cpp_loader():
     """Get the C++ DataLoader instance for CSV operations"""
@@ -33,74 +65,174 @@ def get_trident_module():
     return trident_module
 
 def get_data_cache(scene=None):
-    """Get data from scene storage with caching"""
-    global _cached_data, _cached_data_hash
-    
+    """
+    Get the merged data array of a scene. Served from memory; after a file
+    reload it is memory-mapped from the binary sidecar.
+    """
     try:
         if scene is None:
             scene = bpy.context.scene
 
-        if not scene.trident.data_loaded or not scene.trident.data_serialized:
-            _cached_data = None
-            _cached_data_hash = None
+        trident = scene.trident
+        if not trident.data_loaded:
             return None
-        
-        # Create a simple hash of the serialized data
-        current_hash = hash(scene.trident.data_serialized)
-        
-        # Return cached data if it hasn't changed
-        if _cached_data is not None and _cached_data_hash == current_hash:
-            return _cached_data
-        
-        # Reconstruct numpy array from serialized data
-        shape = tuple(scene.trident.data_shape)
-        if shape == (0, 0):
+
+        array = _data_store.get(trident.data_token)
+        if array is not None:
+            return array
+
+        if trident.data_sidecar:
+            # Memory-map the binary sidecar, nothing is copied
+            array, _meta = read_sidecar(bpy.path.abspath(trident.data_sidecar))
+        elif trident.data_serialized:
+            # Files saved by older versions stored the array as JSON
+            shape = tuple(trident.data_shape)
+            if shape == (0, 0):
+                return None
+            flat_data = json.loads(trident.data_serialized)
+            array = np.array(flat_data, dtype=np.float32).reshape(shape)
+        else:
             return None
-            
-        # Deserialize the array data (only when needed)
-        flat_data = json.loads(scene.trident.data_serialized)
-        array = np.array(flat_data, dtype=np.float32).reshape(shape)
-        
-        # Cache the result
-        _cached_data = array
-        _cached_data_hash = current_hash
-        
+
+        if not trident.data_token:
+            trident.data_token = uuid.uuid4().hex
+        _data_store[trident.data_token] = array
         return array
         
     except Exception as e:
         print(f"[TRIDENT] Error loading data cache: {e}")
-        _cached_data = None
-        _cached_data_hash = None
         return None
 
-def set_data_cache(data, scene=None):
-    """Store data in scene storage"""
-    global _cached_data, _cached_data_hash
-    
+def set_data_cache(data, scene=None, sidecar=""):
+    """
+    Store data for a scene. The array is kept by reference (no copy); if it
+    comes from a binary sidecar, the sidecar path is recorded as its storage.
+    """
     try:
         if scene is None:
             scene = bpy.context.scene
+
+        trident = scene.trident
+        _data_store.pop(trident.data_token, None)
+        _sample_store.pop(trident.data_token, None)
+        _obs_rows_store.pop(trident.data_token, None)
+        _lazy_store.pop(trident.data_token, None)
+        trident.data_serialized = ""
+
         if data is None:
-            scene.trident.data_loaded = False
-            scene.trident.data_serialized = ""
-            scene.trident.data_shape = (0, 0)
-            _cached_data = None
-            _cached_data_hash = None
+            trident.data_loaded = False
+            trident.data_sidecar = ""
+            trident.data_token = ""
+            trident.data_shape = (0, 0)
         else:
-            scene.trident.data_loaded = True
-            scene.trident.data_shape = data.shape
-            # Serialize numpy array to JSON
-            serialized = json.dumps(data.flatten().tolist())
-            scene.trident.data_serialized = serialized
-            
-            # Update cache
-            _cached_data = data
-            _cached_data_hash = hash(serialized)
+            trident.data_loaded = True
+            trident.data_shape = data.shape
+            trident.data_sidecar = sidecar
+            trident.data_token = uuid.uuid4().hex
+            _data_store[trident.data_token] = data
             
         print(f"[TRIDENT] Stored data cache: {data.shape if data is not None else 'None'}")
     except Exception as e:
         print(f"[TRIDENT] Error storing data cache: {e}")
 
+def get_column(label, scene=None):
+    """
+    One label's column from the data cache, or None if the label is not loaded.
+    The cache is column-major, so this is a contiguous zero-copy view.
+    Labels loaded after a lazy plot come from the column cache.
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    data = get_data_cache(scene)
+    if data is None:
+        return None
+    labels = get_loaded_labels(scene) or []
+    if label in labels:
+        return data[:, 3 + labels.index(label)]
+    return _lazy_store.get(scene.trident.data_token, {}).get(label)
+
+def get_lazy_columns(scene=None):
+    """Label columns loaded after the plot: {label: column}"""
+    if scene is None:
+        scene = bpy.context.scene
+    return dict(_lazy_store.get(scene.trident.data_token, {}))
+
+def set_lazy_column(label, column, names=None, stats=None, scene=None, codes=None):
+    """
+    Add a label column loaded after the plot (see column_cache) to the
+    scene's data. names are its categories in code order (None for numeric
+    labels), codes their int32 codes from the loader and stats its
+    load-time statistics; all are stored like those of the labels loaded
+    with the data.
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    trident = scene.trident
+    _lazy_store.setdefault(trident.data_token, {})[label] = column
+
+    obs_map = get_obs_map(scene)
+    obs_map[label] = names is not None
+    trident.obs_map_json = json.dumps(obs_map)
+
+    cat_map = get_cat_map(scene=scene)
+    small = names is not None and len(names) <= MAX_OVERRIDE_CATEGORIES
+    cat_map[label] = {name: i for i, name in enumerate(names)} if small else None
+    set_cat_map(cat_map, scene)
+
+    if names is not None:
+        if codes is None:
+            codes = _codes_from_ids(column, len(names))
+        _category_store.setdefault(trident.data_token, {})[label] = (codes,) + names_to_table(names)
+    if stats is not None:
+        all_stats = dict(get_column_stats(scene=scene) or {})
+        all_stats[label] = stats
+        set_column_stats(all_stats, scene)
+
+def get_coords(scene=None):
+    """XYZ coordinates from the data cache as a [n, 3] view, or None"""
+    data = get_data_cache(scene)
+    if data is None:
+        return None
+    return data[:, :3]
+
+def sidecar_paths(filepath):
+    """Return the (.npy, .json) pair for a sidecar path with or without extension"""
+    base = os.path.splitext(filepath)[0]
+    return base + ".npy", base + ".json"
+
+def write_sidecar(filepath, data, labels, cat_map, obs_cat, stats=None, categories=None):
+    """
+    Write merged data to a binary sidecar that other processes can memory-map.
+    The array goes to <base>.npy, labels, mappings and column statistics to
+    <base>.json, along with the category names of vocabularies too large for
+    cat_map ({label: [name, ...]} in code order). Returns the .npy path.
+    """
+    npy_path, meta_path = sidecar_paths(filepath)
+    # np.save keeps the memory layout (column-major stays column-major)
+    np.save(npy_path, np.asarray(data, dtype=np.float32))
+
+    meta = {
+        "labels": list(labels),
+        "cat_map": cat_map,
+        "obs_map": dict(zip(labels, obs_cat)),
+        "shape": list(data.shape),
+        "stats": stats or {},
+        "categories": categories or {},
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+
+    print(f"[TRIDENT] Wrote sidecar: {npy_path} {data.shape}")
+    return npy_path
+
+def read_sidecar(filepath):
+    """Open a binary sidecar read-only and memory-mapped. Returns (array, meta)"""
+    npy_path, meta_path = sidecar_paths(filepath)
+    array = np.load(npy_path, mmap_mode='r')
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    return array, meta
+
 def get_label_cache(scene=None):
     """Get labels from scene storage"""
     try:
@@ -113,6 +245,26 @@ def get_label_cache(scene=None):
         print(f"[TRIDENT] Error loading label cache: {e}")
         return None
 
+def get_loaded_labels(scene=None):
+    """
+    Labels whose columns are in the data array, in column order: the
+    included labels of a full plot, only the color label of a lazy one.
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    names = [item.name for item in scene.trident.column_labels if item.name]
+    # Files saved before column_labels existed hold all included labels
+    return names or get_label_cache(scene)
+
+def set_loaded_labels(labels, scene=None):
+    """Record the labels of the data array columns, in column order"""
+    if scene is None:
+        scene = bpy.context.scene
+    column_labels = scene.trident.column_labels
+    column_labels.clear()
+    for name in labels:
+        column_labels.add().name = name
+
 def set_label_cache(labels, scene=None):
     """Labels are already stored in scene.trident.labels, just mark as loaded"""
     try:
@@ -161,7 +313,8 @@ def get_cat_map(label=None, scene=None):
             return {}
     else:
         try:
-            scene = bpy.context.scene
+            if scene is None:
+                scene = bpy.context.scene
             if not scene.trident.cat_map_json:
                 return "None"
             full_map = json.loads(scene.trident.cat_map_json)
@@ -170,16 +323,450 @@ def get_cat_map(label=None, scene=None):
             print(f"[TRIDENT] Error loading cat map for label {label}: {e}")
             return "None"
 
+# Numeric columns with more distinct values than this get no JSON category
+# mapping; they are handled through a CategoryDictionary instead
+MAX_OVERRIDE_CATEGORIES = 1000
+
+# Categorical labels with more categories than this are colored by hashed
+# palette slots (see CategoryDictionary.palette_slots)
+HIGH_CARDINALITY = MAX_OVERRIDE_CATEGORIES
+PALETTE_SLOTS = 32
+
+# Category ids above this are not exact in the float32 data table
+MAX_FLOAT_CODES = 1 << 24
+
+class CategoryDictionary:
+    """
+    Dictionary-encoded categorical column that scales to 100k+ categories.
+
+    Names are sorted and concatenated into one UTF-8 byte arena; name i is
+    arena[offsets[i]:offsets[i + 1]]. codes holds one int32 per point (-1 for
+    missing) and values[i] is the data value (category id or number) of
+    name i. Memory per million points: 4 MB of codes, plus about
+    (mean name length + 12) bytes per distinct category for the table.
+    """
+
+    def __init__(self, codes, arena, offsets, values):
+        self.codes = codes
+        self.arena = arena
+        self.offsets = offsets
+        self.values = values
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.arena.nbytes + self.offsets.nbytes + self.values.nbytes
+
+    def name(self, i):
+        return self.arena[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def counts(self):
+        """Number of points per category"""
+        return np.bincount(self.codes[self.codes >= 0], minlength=len(self))
+
+    def top_k(self, k):
+        """Codes of the k most frequent categories (most frequent first) and all counts"""
+        counts = self.counts()
+        order = np.argsort(-counts, kind='stable')[:k]
+        return order, counts
+
+    def palette_slots(self, n_slots=PALETTE_SLOTS):
+        """Palette slot of every category, from a hash of its name (stable across loads)"""
+        return cpp_loader.hash_slots(self.arena, self.offsets, n_slots)
+
+def table_names(arena, offsets):
+    """Category names of a (uint8 arena, int64 offsets) table, in code order"""
+    data = arena.tobytes()
+    return [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+def names_to_table(names):
+    """(uint8 arena, int64 offsets) table of a list of category names"""
+    encoded = [n.encode('utf-8') for n in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    arena = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return arena, offsets
+
+def _dictionary_from_names(names, codes):
+    """CategoryDictionary of a string column from its names in code order and its codes"""
+    order = sorted(range(len(names)), key=names.__getitem__)
+    arena, offsets = names_to_table([names[i] for i in order])
+
+    # code -> sorted code lookup table
+    remap = np.empty(len(names), dtype=np.int32)
+    remap[order] = np.arange(len(names), dtype=np.int32)
+    sorted_codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], -1).astype(np.int32)
+    return CategoryDictionary(sorted_codes, arena, offsets, np.array(order, dtype=np.float32))
+
+def set_category_tables(tables, scene=None):
+    """
+    Store the int32 codes and category tables of the categorical labels of
+    the scene's current data: {label: (codes, arena, offsets)}. They live
+    next to the data array for its lifetime and cost 4 bytes per point and
+    categorical label, plus the tables. The data array still holds the
+    codes as float ids, for sidecars, column statistics and legends.
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    _category_store[scene.trident.data_token] = dict(tables)
+
+def _sidecar_categories(scene):
+    """Category names of large vocabularies from the scene's sidecar metadata"""
+    sidecar = scene.trident.data_sidecar
+    if not sidecar:
+        return {}
+    try:
+        _npy_path, meta_path = sidecar_paths(bpy.path.abspath(sidecar))
+        with open(meta_path, 'r') as f:
+            return json.load(f).get("categories", {})
+    except (OSError, ValueError) as e:
+        print(f"[TRIDENT] Error reading sidecar categories: {e}")
+        return {}
+
+def _codes_from_ids(column, n_categories):
+    """
+    int32 codes (-1 for missing) from a float id column, for data that only
+    kept the ids (a reopened .blend, a sidecar). Loads get their codes from
+    the loader instead.
+    """
+    if n_categories > MAX_FLOAT_CODES:
+        raise RuntimeError(f"{n_categories:,} categories have no exact float32 ids; plot the data again")
+    valid = ~np.isnan(column)
+    codes = np.full(column.shape[0], -1, dtype=np.int32)
+    codes[valid] = column[valid].astype(np.int32)
+    return codes
+
+def _category_entry(label, scene):
+    """(codes, arena, offsets) of a categorical label, or None for numeric labels"""
+    if not get_obs_map(scene).get(label):
+        return None
+
+    tables = _category_store.setdefault(scene.trident.data_token, {})
+    entry = tables.get(label)
+    if entry is not None:
+        return entry
+
+    # Not loaded in this session: names from the stored mapping (or the
+    # sidecar for large vocabularies), codes from the data column
+    column = get_column(label, scene)
+    if column is None:
+        return None
+    mapping = get_cat_map(label, scene)
+    if isinstance(mapping, dict):
+        names = [None] * len(mapping)
+        for name, idx in mapping.items():
+            names[idx] = name
+    else:
+        names = _sidecar_categories(scene).get(label)
+        if names is None:
+            return None
+
+    entry = (_codes_from_ids(column, len(names)),) + names_to_table(names)
+    tables[label] = entry
+    return entry
+
+def get_codes(label, scene=None):
+    """int32 category codes of a categorical label (-1 for missing), or None"""
+    if scene is None:
+        scene = bpy.context.scene
+    entry = _category_entry(label, scene)
+    return entry[0] if entry is not None else None
+
+def get_category_table(label, scene=None):
+    """(uint8 arena, int64 offsets) category table of a categorical label in code order, or None"""
+    if scene is None:
+        scene = bpy.context.scene
+    entry = _category_entry(label, scene)
+    return entry[1:] if entry is not None else None
+
+def large_vocabularies(labels, scene=None):
+    """Category names {label: [name, ...]} of categorical labels kept out of cat_map"""
+    if scene is None:
+        scene = bpy.context.scene
+    cat_map = get_cat_map(scene=scene)
+    out = {}
+    for label in labels:
+        if isinstance(cat_map.get(label), dict):
+            continue
+        table = get_category_table(label, scene)
+        if table is not None:
+            out[label] = table_names(*table)
+    return out
+
+def get_category_dictionary(label, scene=None):
+    """
+    CategoryDictionary of a label, built on first use: from the category
+    table for string columns, in C++ (sort + unique + encode) for numeric
+    columns. Returns None if the label is not loaded.
+    """
+    if scene is None:
+        scene = bpy.context.scene
+
+    key = (scene.trident.data_token, label)
+    dictionary = _dictionary_store.get(key)
+    if dictionary is not None:
+        return dictionary
+
+    column = get_column(label, scene)
+    if column is None or cpp_loader is None:
+        return None
+
+    entry = _category_entry(label, scene)
+    if entry is not None:
+        codes, arena, offsets = entry
+        dictionary = _dictionary_from_names(table_names(arena, offsets), codes)
+    else:
+        dictionary = CategoryDictionary(*cpp_loader.encode_values(np.asarray(column, dtype=np.float32)))
+
+    _dictionary_store[key] = dictionary
+    print(f"[TRIDENT] Dictionary-encoded {label}: {len(dictionary)} categories, "
+          f"{dictionary.nbytes / 1e6:.1f} MB")
+    return dictionary
+
+def category_count(label, scene=None):
+    """Number of categories of a label when treated as categorical"""
+    if scene is None:
+        scene = bpy.context.scene
+    table = get_category_table(label, scene)
+    if table is not None:
+        return len(table[1]) - 1
+    stats = get_column_stats(label, scene)
+    return stats["distinct"] if stats else 0
+
+def is_high_cardinality(label, scene=None):
+    """True if a label has more categories than fit a palette-per-category coloring"""
+    return category_count(label, scene) > HIGH_CARDINALITY
+
+def _format_category(value):
+    """Category name of a numeric value: integers without decimals, floats shortest"""
+    if float(value).is_integer():
+        return str(int(value))
+    return np.format_float_positional(np.float32(value), trim='-')
+
+def ensure_category_map(label, scene=None):
+    """
+    Category mapping of a label. Numeric columns are loaded without one; it
+    is derived here on first use, from the sorted distinct values of the
+    column ({value_str: value}), and stored with the other mappings.
+    Columns with more than MAX_OVERRIDE_CATEGORIES values are
+    dictionary-encoded instead and None is returned.
+    """
+    if scene is None:
+        scene = bpy.context.scene
+
+    cat_map = get_cat_map(scene=scene)
+    if cat_map.get(label) is not None or get_obs_map(scene).get(label):
+        # String columns come with their mapping (None for large vocabularies)
+        return cat_map.get(label)
+
+    # The load-time statistics already hold the sorted distinct values of
+    # columns with few of them; otherwise sort + unique the column in C++
+    stats = get_column_stats(label, scene)
+    if stats and stats["values"] is not None:
+        values = stats["values"]
+    elif stats and stats["distinct"] > MAX_OVERRIDE_CATEGORIES:
+        values = None
+    else:
+        column = get_column(label, scene)
+        if column is None or cpp_loader is None:
+            return None
+        values = cpp_loader.unique_values(np.asarray(column, dtype=np.float32), MAX_OVERRIDE_CATEGORIES)
+
+    if values is None or len(values) > MAX_OVERRIDE_CATEGORIES:
+        # Too many values for a JSON mapping: dictionary-encode instead
+        get_category_dictionary(label, scene)
+        return None
+
+    mapping = {_format_category(v): int(v) if float(v).is_integer() else float(v) for v in values}
+    print(f"[TRIDENT] Derived category mapping for {label} ({len(mapping)} values)")
+
+    cat_map[label] = mapping
+    set_cat_map(cat_map, scene)
+    return mapping
+
 def set_cat_map(cat_map, scene=None):
     """Store categories for a specific label in original cat_map"""
     try:
         if scene is None:
             scene = bpy.context.scene
         scene.trident.cat_map_json = json.dumps(cat_map)
-        print(f"[TRIDENT] Stored cat map: {cat_map}")
+        sizes = {label: len(m) for label, m in cat_map.items() if isinstance(m, dict)}
+        print(f"[TRIDENT] Stored cat map: {sizes}")
     except Exception as e:
         print(f"[TRIDENT] Error storing cat map: {e}")
 
+def get_column_stats(label=None, scene=None):
+    """
+    Load-time statistics of a label (min, max, count, nan_count, distinct,
+    values/counts, histogram), or all of them by label if label is None.
+    Returns None (or {}) if no statistics are stored.
+    """
+    try:
+        if scene is None:
+            scene = bpy.context.scene
+        trident = scene.trident
+        stats = _stats_store.get(trident.data_token)
+        if stats is None:
+            stats = json.loads(trident.stats_json) if trident.stats_json else {}
+            _stats_store[trident.data_token] = stats
+        return stats if label is None else stats.get(label)
+    except Exception as e:
+        print(f"[TRIDENT] Error loading column stats: {e}")
+        return {} if label is None else None
+
+def get_sample_rows(scene=None):
+    """Positions of the obs rows in the cached data if it is a preview sample, else None"""
+    if scene is None:
+        scene = bpy.context.scene
+    return _sample_store.get(scene.trident.data_token)
+
+def set_sample_rows(rows, scene=None):
+    """Store the sampled obs row positions of the cached data (None for all rows)"""
+    if scene is None:
+        scene = bpy.context.scene
+    token = scene.trident.data_token
+    if rows is None:
+        _sample_store.pop(token, None)
+    else:
+        _sample_store[token] = rows
+
+def get_obs_rows(scene=None):
+    """obs row positions of the cached data's points (-1 for none), or None if they are all rows in order"""
+    if scene is None:
+        scene = bpy.context.scene
+    return _obs_rows_store.get(scene.trident.data_token)
+
+def set_obs_rows(rows, scene=None):
+    """Store the obs row positions of the cached data's points (None for all rows in order)"""
+    if scene is None:
+        scene = bpy.context.scene
+    token = scene.trident.data_token
+    if rows is None:
+        _obs_rows_store.pop(token, None)
+    else:
+        _obs_rows_store[token] = np.asarray(rows, dtype=np.int64)
+
+def known_obs_rows(scene=None):
+    """
+    get_obs_rows for mapping an input in obs order (an expression matrix, a
+    time series) to the plotted points. Raises when the points came from a
+    key join or row filter whose obs rows are not known in this session.
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    rows = get_obs_rows(scene)
+    if rows is None and (scene.trident.join_summary or scene.trident.filter_summary):
+        raise ValueError("The obs rows of the plotted points are not known in this session; plot again")
+    return rows
+
+def match_obs_rows(rows, n_points, n_cells, source):
+    """
+    Rows of an input in obs order with n_cells rows for n_points plotted
+    points with obs rows `rows` (see known_obs_rows): None when the points
+    are all its rows in order, else rows. source names the input in errors.
+    """
+    if rows is None:
+        if n_points != n_cells:
+            raise ValueError(f"{source} has {n_cells:,} cells but {n_points:,} points are plotted")
+        return None
+    if len(rows) and rows.max() >= n_cells:
+        raise ValueError(f"{source} has {n_cells:,} cells, fewer than the obs rows of the plotted points")
+    return rows
+
+def read_obs_rows(read, rows):
+    """
+    read(positions) for match_obs_rows rows, where read takes sorted,
+    unique positions (None for all rows). Points without obs row get NaN.
+    """
+    if rows is None:
+        return read(None)
+    valid = rows >= 0
+    wanted = rows[valid]
+    if len(wanted) > 1 and not np.all(wanted[1:] > wanted[:-1]):
+        # Key joins give the rows in obsm order
+        unique, inverse = np.unique(wanted, return_inverse=True)
+        values = read(unique)[inverse]
+    else:
+        values = read(wanted)
+    if valid.all():
+        return values
+    out = np.full((len(rows),) + values.shape[1:], np.nan, dtype=values.dtype)
+    out[valid] = values
+    return out
+
+def set_column_stats(stats, scene=None):
+    """Store per-label column statistics {label: stats} in scene storage"""
+    try:
+        if scene is None:
+            scene = bpy.context.scene
+        trident = scene.trident
+        trident.stats_json = json.dumps(stats or {})
+        _stats_store.pop(trident.data_token, None)
+        print(f"[TRIDENT] Stored column stats for {len(stats or {})} labels")
+    except Exception as e:
+        print(f"[TRIDENT] Error storing column stats: {e}")
+
+def compute_column_stats(data, labels):
+    """Column statistics {label: stats} of the label columns of a merged array"""
+    if cpp_loader is None or data is None or not labels:
+        return {}
+    columns = np.asarray(data[:, 3:3 + len(labels)], dtype=np.float32)
+    return dict(zip(labels, cpp_loader.column_stats(columns)))
+
+# Value counts are kept for columns with at most this many distinct values
+# (MAX_TRACKED_VALUES of the C++ module)
+MAX_TRACKED_VALUES = 1000
+
+def merge_column_stats(old, new):
+    """
+    Statistics of a column from those of its first rows (old) and of the
+    rows after them (new), without reading the column. Exact except that
+    the distinct count is a lower bound once either part has too many values
+    to count, and histogram bins are moved by their centers when the range grows.
+    """
+    if not old:
+        return new
+    lows = [s["min"] for s in (old, new) if s["count"]]
+    highs = [s["max"] for s in (old, new) if s["count"]]
+    merged = {
+        "min": min(lows) if lows else None,
+        "max": max(highs) if highs else None,
+        "count": old["count"] + new["count"],
+        "nan_count": old["nan_count"] + new["nan_count"],
+        "values": None,
+        "counts": None,
+        "histogram": [],
+    }
+
+    if old["values"] is not None and new["values"] is not None:
+        counts = dict(zip(old["values"], old["counts"]))
+        for value, count in zip(new["values"], new["counts"]):
+            counts[value] = counts.get(value, 0) + count
+        merged["distinct"] = len(counts)
+        if len(counts) <= MAX_TRACKED_VALUES:
+            merged["values"] = sorted(counts)
+            merged["counts"] = [counts[v] for v in merged["values"]]
+    else:
+        merged["distinct"] = max(old["distinct"], new["distinct"])
+
+    if merged["count"]:
+        low, high = merged["min"], merged["max"]
+        n_bins = len(old["histogram"] or new["histogram"])
+        histogram = np.zeros(n_bins, dtype=np.int64)
+        for s in (old, new):
+            if not s["count"]:
+                continue
+            if (s["min"], s["max"]) == (low, high):
+                histogram += np.asarray(s["histogram"], dtype=np.int64)
+                continue
+            centers = s["min"] + (np.arange(n_bins) + 0.5) * ((s["max"] - s["min"]) / n_bins)
+            bins = ((centers - low) / (high - low) * n_bins).astype(np.int64)
+            np.add.at(histogram, np.clip(bins, 0, n_bins - 1), np.asarray(s["histogram"], dtype=np.int64))
+        merged["histogram"] = histogram.tolist()
+    return merged
+
 def get_data_type(scene=None):
     """
     Return True if the selected color label is categorical, False if continuous.
@@ -198,6 +785,10 @@ def get_data_type(scene=None):
         trident = scene.trident
         color_label = trident.current_color_label or trident.color_label or ''
 
+        # Gene expression is always continuous
+        if trident.current_color_gene:
+            return False
+
         if treatment == 'AUTO':
             if not color_label or color_label == 'NONE':
                 return False
@@ -208,4 +799,65 @@ def get_data_type(scene=None):
         
     except Exception as e:
         print(f"[TRIDENT] Error in get_data_type: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def get_plot_job(scene=None):
+    """State of the scene's running Plot Data job, or None"""
+    if scene is None:
+        scene = bpy.context.scene
+    return _plot_jobs.get(scene.name)
+
+def start_plot_job(scene):
+    _plot_jobs[scene.name] = {"progress": 0.0, "stage": "", "cancel": False}
+    return _plot_jobs[scene.name]
+
+def end_plot_job(scene):
+    _plot_jobs.pop(scene.name, None)
+
+@bpy.app.handlers.persistent
+def _load_post(*args):
+    # Modal plots do not survive loading a file
+    _plot_jobs.clear()
+
+@bpy.app.handlers.persistent
+def _save_pre(filepath="", *args):
+    """Write each scene's data to a binary sidecar next to the .blend being saved"""
+    if not filepath:
+        return
+
+    blend_dir = os.path.dirname(filepath)
+    blend_stem = os.path.splitext(os.path.basename(filepath))[0]
+
+    for scene in bpy.data.scenes:
+        trident = scene.trident
+        if not trident.data_loaded:
+            continue
+
+        target = os.path.join(blend_dir, f"{blend_stem}_{bpy.path.clean_name(scene.name)}_trident.npy")
+        current = bpy.path.abspath(trident.data_sidecar) if trident.data_sidecar else ""
+        if current and os.path.normpath(current) == os.path.normpath(target):
+            continue
+
+        data = get_data_cache(scene)
+        if data is None:
+            continue
+
+        try:
+            labels = get_loaded_labels(scene) or []
+            obs_map = get_obs_map(scene)
+            write_sidecar(target, data, labels, get_cat_map(scene=scene), [obs_map.get(l, False) for l in labels],
+                          get_column_stats(scene=scene), large_vocabularies(labels, scene))
+            trident.data_sidecar = bpy.path.relpath(target, start=blend_dir)
+            trident.data_serialized = ""
+        except Exception as e:
+            print(f"[TRIDENT] Error writing data sidecar for scene {scene.name}: {e}")
+
+def register_handlers():
+    bpy.app.handlers.save_pre.append(_save_pre)
+    bpy.app.handlers.load_post.append(_load_post)
+
+def unregister_handlers():
+    if _save_pre in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.remove(_save_pre)
+    if _load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_load_post)
@@ -0,0 +1,225 @@
+"""
+TRIDENT embeddings - several embeddings of the same points in one scene
+
+Extra embeddings (e.g. t-SNE and PCA next to the plotted UMAP) share the
+obs columns of TRIDENT_Points instead of loading and storing them again:
+every embedding object links the TRIDENT_Points mesh, whose label
+attributes exist once, and the embedding's coordinates are one extra
+FLOAT_VECTOR point attribute of that mesh (12 bytes per point). A small
+node group moves the points to those coordinates before the shared
+InstancePoints node group instances and colors them, so coloring, point
+size and palette changes apply to every embedding at once.
+
+Embeddings are laid out side by side or toggled, with only the active one
+visible.
+"""
+
+import re
+import numpy as np
+import bpy
+
+# Name of the embedding plotted as TRIDENT_Points
+PRIMARY = "Primary"
+
+# Node group moving the points to an embedding attribute
+NODE_GROUP = "TRIDENT_Embedding"
+
+MODIFIER = "TRIDENT_Embedding"
+
+# Gap between side-by-side embeddings, relative to their width
+LAYOUT_GAP = 0.15
+
+# Plot size the InstancePoints node group scales the shortest extent to
+PLOT_SIZE = 20.0
+
+def attribute_name(name):
+    """Point attribute holding the coordinates of an embedding"""
+    return "TRIDENT_Embedding_" + re.sub(r"[^0-9A-Za-z_.-]", "_", name)[:40]
+
+def object_name(name):
+    return "TRIDENT_Embedding_" + name
+
+def _points(scene):
+    points_obj = scene.trident.points_obj
+    if not points_obj or points_obj.name not in bpy.data.objects:
+        raise RuntimeError("TRIDENT_Points object not found. Plot data first.")
+    return points_obj
+
+def names(scene):
+    """Embeddings of the scene, the primary (TRIDENT_Points) first"""
+    return [PRIMARY] + [item.name for item in scene.trident.embeddings]
+
+def embedding_object(name, scene):
+    """Object showing an embedding, or None"""
+    if name == PRIMARY:
+        points_obj = scene.trident.points_obj
+        return points_obj if points_obj and points_obj.name in bpy.data.objects else None
+    return bpy.data.objects.get(object_name(name))
+
+def _node_group():
+    """Node group setting the point positions from the attribute named by its Embedding input"""
+    tree = bpy.data.node_groups.get(NODE_GROUP)
+    if tree is not None:
+        return tree
+    tree = bpy.data.node_groups.new(name=NODE_GROUP, type='GeometryNodeTree')
+    tree.interface.new_socket(name="Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+    tree.interface.new_socket(name="Embedding", in_out='INPUT', socket_type='NodeSocketString')
+    tree.interface.new_socket(name="Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+
+    nodes, links = tree.nodes, tree.links
+    n_in   = nodes.new(type='NodeGroupInput');                  n_in.location   = (-600,    0)
+    n_attr = nodes.new(type='GeometryNodeInputNamedAttribute'); n_attr.location = (-400, -200)
+    n_set  = nodes.new(type='GeometryNodeSetPosition');         n_set.location  = (-100,    0)
+    n_out  = nodes.new(type='NodeGroupOutput');                 n_out.location  = ( 200,    0)
+    n_attr.data_type = 'FLOAT_VECTOR'
+
+    links.new(n_in.outputs["Geometry"], n_set.inputs["Geometry"])
+    links.new(n_in.outputs["Embedding"], n_attr.inputs["Name"])
+    links.new(n_attr.outputs["Attribute"], n_set.inputs["Position"])
+    links.new(n_attr.outputs["Exists"], n_set.inputs["Selection"])
+    links.new(n_set.outputs["Geometry"], n_out.inputs["Geometry"])
+    return tree
+
+def _input_identifier(tree, name):
+    for item in tree.interface.items_tree:
+        if getattr(item, "in_out", None) == 'INPUT' and item.name == name:
+            return item.identifier
+    raise KeyError(f"Node group {tree.name} has no input '{name}'")
+
+def add(name, coords, scene):
+    """
+    Add (or replace) embedding name with coords [n_points, 2 or 3] in the
+    order of the plotted points. Returns its object.
+    """
+    points_obj = _points(scene)
+    mesh = points_obj.data
+    coords = np.asarray(coords, dtype=np.float32)
+    if coords.ndim != 2 or coords.shape[1] < 2:
+        raise ValueError(f"Embedding coordinates must be an [n, 2+] array, got shape {coords.shape}")
+    if coords.shape[0] != len(mesh.vertices):
+        raise ValueError(f"Embedding '{name}' has {coords.shape[0]:,} rows for {len(mesh.vertices):,} points")
+    if not name or name == PRIMARY:
+        raise ValueError(f"Invalid embedding name '{name}'")
+
+    # Centered like build_points_mesh
+    positions = np.zeros((coords.shape[0], 3), dtype=np.float32)
+    dims = min(coords.shape[1], 3)
+    positions[:, :dims] = coords[:, :dims]
+    positions -= positions.mean(axis=0, dtype=np.float64).astype(np.float32)
+
+    attr_name = attribute_name(name)
+    attr = mesh.attributes.get(attr_name)
+    if attr is not None and (attr.data_type != 'FLOAT_VECTOR' or attr.domain != 'POINT'):
+        mesh.attributes.remove(attr)
+        attr = None
+    if attr is None:
+        attr = mesh.attributes.new(name=attr_name, type='FLOAT_VECTOR', domain='POINT')
+    attr.data.foreach_set("vector", positions.ravel())
+    mesh.update()
+
+    obj = bpy.data.objects.get(object_name(name))
+    if obj is None:
+        obj = bpy.data.objects.new(object_name(name), mesh)
+        scene.collection.objects.link(obj)
+        tree = _node_group()
+        mod = obj.modifiers.new(name=MODIFIER, type='NODES')
+        mod.node_group = tree
+        mod[_input_identifier(tree, "Embedding")] = attr_name
+        instance_mod = points_obj.modifiers.get("InstancePoints")
+        if instance_mod is not None:
+            shared = obj.modifiers.new(name="InstancePoints", type='NODES')
+            shared.node_group = instance_mod.node_group
+
+    items = scene.trident.embeddings
+    item = next((it for it in items if it.name == name), None) or items.add()
+    item.name = name
+    item.extent = tuple(float(v) for v in np.ptp(positions, axis=0))
+    layout(scene)
+    print(f"[TRIDENT] Added embedding {name} ({coords.shape[0]} points, {positions.nbytes / 1e6:.1f} MB)")
+    return obj
+
+def remove(name, scene):
+    """Remove an extra embedding, its object and its coordinate attribute"""
+    items = scene.trident.embeddings
+    index = next((i for i, it in enumerate(items) if it.name == name), -1)
+    if index < 0:
+        raise KeyError(f"No embedding named '{name}'")
+    from . import morph
+    settings = morph.get_settings(scene)
+    if settings and name in settings["targets"]:
+        morph.remove(scene)
+    obj = bpy.data.objects.get(object_name(name))
+    if obj is not None:
+        bpy.data.objects.remove(obj, do_unlink=True)
+    points_obj = scene.trident.points_obj
+    if points_obj and points_obj.name in bpy.data.objects:
+        attr = points_obj.data.attributes.get(attribute_name(name))
+        if attr is not None:
+            points_obj.data.attributes.remove(attr)
+    items.remove(index)
+    if scene.trident.active_embedding == name:
+        scene.trident.active_embedding = PRIMARY
+    layout(scene)
+
+def clear(scene):
+    """Forget the extra embeddings, e.g. when the plotted points change"""
+    if not len(scene.trident.embeddings):
+        return
+    from . import morph
+    morph.remove(scene)
+    points_obj = scene.trident.points_obj
+    mesh = points_obj.data if points_obj and points_obj.name in bpy.data.objects else None
+    for name in names(scene)[1:]:
+        obj = bpy.data.objects.get(object_name(name))
+        if obj is not None:
+            bpy.data.objects.remove(obj, do_unlink=True)
+        attr = mesh.attributes.get(attribute_name(name)) if mesh is not None else None
+        if attr is not None:
+            mesh.attributes.remove(attr)
+    scene.trident.embeddings.clear()
+    scene.trident.active_embedding = PRIMARY
+    print("[TRIDENT] Removed the extra embeddings of the previous points")
+
+def plot_scale(extent):
+    """Uniform scale the InstancePoints node group applies to coordinates of this extent"""
+    extent = np.asarray(extent, dtype=np.float64)
+    # Vector division by zero gives 0 in geometry nodes
+    scales = np.where(extent > 0, PLOT_SIZE / np.where(extent > 0, extent, 1.0), 0.0)
+    return float(scales.max())
+
+def _plot_width(extent):
+    """X size of an embedding after the InstancePoints plot scaling"""
+    return float(extent[0]) * plot_scale(extent)
+
+def _primary_extent(points_obj):
+    """Extent of the TRIDENT_Points coordinates (the mesh positions)"""
+    mesh = points_obj.data
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+    return tuple(float(v) for v in np.ptp(co, axis=0)) if len(co) else (0.0, 0.0, 0.0)
+
+def layout(scene):
+    """Place the embedding objects side by side or show only the active one"""
+    trident = scene.trident
+    objects = [(name, embedding_object(name, scene)) for name in names(scene)]
+    objects = [(name, obj) for name, obj in objects if obj is not None]
+    if not objects:
+        return
+
+    if trident.embedding_layout == 'TOGGLE':
+        active = trident.active_embedding if trident.active_embedding in dict(objects) else PRIMARY
+        for name, obj in objects:
+            obj.hide_viewport = obj.hide_render = name != active
+            obj.location.x = 0.0
+        return
+
+    extents = {item.name: tuple(item.extent) for item in trident.embeddings}
+    widths = [_plot_width(_primary_extent(obj) if name == PRIMARY else extents[name]) for name, obj in objects]
+    # One row centered on the origin, where the camera looks
+    total = sum(widths) + LAYOUT_GAP * sum(widths[:-1])
+    x = -total / 2
+    for (name, obj), width in zip(objects, widths):
+        obj.hide_viewport = obj.hide_render = False
+        obj.location.x = x + width / 2
+        x += width * (1 + LAYOUT_GAP)
@@ -0,0 +1,254 @@
+"""
+TRIDENT gene expression - color points by one gene of an expression matrix
+
+An expression matrix (cells x genes) is attached to a scene from a Matrix
+Market file (.mtx, optionally gzip/zstd compressed, e.g. a 10x Genomics
+matrix.mtx.gz with its features.tsv.gz), sparse CSR/CSC arrays in a .npz
+(scipy.sparse.save_npz) or an .h5ad file (X, raw/X or a layer). The C++
+module indexes the matrix by gene once; picking a gene then only extracts
+that gene's non-zeros for the plotted points. Recently used gene columns are
+kept in an LRU cache, so switching back and forth between genes is free.
+"""
+
+import os
+import gzip
+from collections import OrderedDict
+import numpy as np
+import bpy
+
+from . import data_loader
+from . import array_loader
+
+EXPRESSION_EXTENSIONS = (".mtx", ".mtx.gz", ".mtx.zst", ".npz", ".h5ad")
+
+# Gene name files looked up next to a matrix when no genes file is given
+GENE_FILES = ("features.tsv.gz", "features.tsv", "genes.tsv.gz", "genes.tsv")
+
+# Memory for cached gene columns (about 30 genes of 2M points)
+COLUMN_CACHE_BYTES = 256 << 20
+
+# Gene picker results per search
+SEARCH_LIMIT = 100
+
+# Indexed matrices: {(matrix path, genes path, matrix key): ExpressionIndex}
+_matrix_store = {}
+
+# Gene columns of the plotted points, least recently used first:
+# {(store key, gene, data token): float32 column}
+_column_cache = OrderedDict()
+
+class ExpressionIndex:
+    """ExpressionMatrix of the C++ module with its gene names"""
+
+    def __init__(self, matrix, names):
+        self.matrix = matrix
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self.lower = [name.lower() for name in names]
+
+    def describe(self):
+        m = self.matrix
+        where = f"{m.nbytes / 1e6:,.0f} MB index" if m.storage == "memory" else "read per gene from file"
+        return f"{m.n_genes:,} genes x {m.n_cells:,} cells, {m.nnz:,} entries ({where})"
+
+def is_expression_file(filepath):
+    return bool(filepath) and filepath.lower().endswith(EXPRESSION_EXTENSIONS)
+
+def _unique_names(names):
+    """Gene names made unique like anndata does: repeats get "-1", "-2", ..."""
+    seen = {}
+    out = []
+    taken = set(names)
+    for name in names:
+        if name not in seen:
+            seen[name] = 0
+            out.append(name)
+            continue
+        while True:
+            seen[name] += 1
+            candidate = f"{name}-{seen[name]}"
+            if candidate not in taken:
+                break
+        taken.add(candidate)
+        out.append(candidate)
+    return out
+
+def read_gene_file(filepath):
+    """
+    Gene names from a text file, one gene per line (optionally gzip
+    compressed). For tab-separated 10x features/genes files the symbol
+    column (the second) is used.
+    """
+    opener = gzip.open if filepath.lower().endswith(".gz") else open
+    names = []
+    with opener(filepath, 'rt', encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip("\r\n").split("\t")
+            names.append(parts[1] if len(parts) > 1 else parts[0])
+    return _unique_names(names)
+
+def find_gene_file(filepath):
+    """10x Genomics gene name file next to a matrix, or "" """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    for name in GENE_FILES:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            return path
+    return ""
+
+def _names_for(filepath, genes_path):
+    genes_path = genes_path or find_gene_file(filepath)
+    if not genes_path:
+        raise FileNotFoundError(f"No gene names for {os.path.basename(filepath)}: "
+                                f"set a genes file (one name per line, or {GENE_FILES[0]})")
+    return read_gene_file(genes_path)
+
+def _genes_on_rows(n_names, rows, cols, filepath, square_rows):
+    """Whether the genes of a rows x cols matrix are its rows, from the gene count"""
+    if n_names not in (rows, cols):
+        raise ValueError(f"{n_names:,} gene names fit neither axis of the {rows:,} x {cols:,} matrix {filepath}")
+    return square_rows if rows == cols else n_names == rows
+
+def open_matrix(filepath, genes_path="", matrix="X"):
+    """
+    Index an expression matrix by gene. Matrix Market files are laid out
+    genes x cells (10x) or cells x genes, told apart by the number of gene
+    names; .npz and .h5ad matrices are cells x genes. matrix picks the
+    .h5ad matrix (X, raw/X or layers/<name>). Returns an ExpressionIndex.
+    """
+    cpp_loader = data_loader.get_cpp_loader()
+    if cpp_loader is None:
+        raise RuntimeError("C++ module not available")
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"Invalid expression matrix path: {filepath}")
+
+    lower = filepath.lower()
+    if lower.endswith(".h5ad"):
+        names = _unique_names(cpp_loader.h5ad_var_names(filepath, matrix or "X"))
+        expression = cpp_loader.open_h5ad_matrix(filepath, matrix or "X")
+    elif lower.endswith(".npz"):
+        names = _names_for(filepath, genes_path)
+        members = array_loader.npz_names(filepath)
+        if "indptr" not in members or "format" not in members:
+            raise ValueError(f"{filepath} is not a sparse matrix saved by scipy.sparse.save_npz")
+        fmt = array_loader.npz_member(filepath, "format").item()
+        fmt = fmt.decode() if isinstance(fmt, bytes) else str(fmt)
+        if fmt not in ("csr", "csc"):
+            raise ValueError(f"Unsupported sparse format '{fmt}' (expected csr or csc): {filepath}")
+        rows, cols = (int(v) for v in array_loader.npz_member(filepath, "shape"))
+        genes_on_rows = _genes_on_rows(len(names), rows, cols, filepath, False)
+        n_major, n_minor = (rows, cols) if fmt == "csr" else (cols, rows)
+        expression = cpp_loader.sparse_matrix(array_loader.npz_member(filepath, "indptr"),
+                                              array_loader.npz_member(filepath, "indices"),
+                                              array_loader.npz_member(filepath, "data"),
+                                              n_major, n_minor, (fmt == "csr") == genes_on_rows)
+    elif lower.endswith((".mtx", ".mtx.gz", ".mtx.zst")):
+        names = _names_for(filepath, genes_path)
+        rows, cols, _entries = cpp_loader.mtx_shape(filepath)
+        expression = cpp_loader.read_mtx(filepath, _genes_on_rows(len(names), rows, cols, filepath, True))
+    else:
+        raise ValueError(f"Unsupported expression matrix file: {filepath}")
+
+    if len(names) != expression.n_genes:
+        raise ValueError(f"{len(names):,} gene names for {expression.n_genes:,} matrix genes")
+    index = ExpressionIndex(expression, names)
+    print(f"[TRIDENT] Indexed expression matrix {os.path.basename(filepath)}: {index.describe()}")
+    return index
+
+def _store_key(scene):
+    trident = scene.trident
+    if not trident.expression_path:
+        return None
+    genes = bpy.path.abspath(trident.expression_genes_path) if trident.expression_genes_path else ""
+    return (bpy.path.abspath(trident.expression_path), genes, trident.expression_matrix.strip() or "X")
+
+def attach(filepath, genes_path="", matrix="X", scene=None):
+    """Index an expression matrix and attach it to a scene. Returns its ExpressionIndex"""
+    if scene is None:
+        scene = bpy.context.scene
+    index = open_matrix(bpy.path.abspath(filepath), bpy.path.abspath(genes_path) if genes_path else "", matrix)
+
+    trident = scene.trident
+    old_key = _store_key(scene)
+    trident.expression_path = filepath
+    trident.expression_genes_path = genes_path
+    trident.expression_matrix = matrix
+    trident.expression_summary = index.describe()
+    key = _store_key(scene)
+    if old_key is not None and old_key != key:
+        release(old_key)
+    release(key)
+    _matrix_store[key] = index
+    return index
+
+def release(key):
+    """Drop an indexed matrix and its cached gene columns"""
+    _matrix_store.pop(key, None)
+    for cached in [k for k in _column_cache if k[0] == key]:
+        del _column_cache[cached]
+
+def get_index(scene=None, load=True):
+    """
+    ExpressionIndex of the scene's attached matrix, or None. After a file
+    reload the matrix is indexed again on first use (unless load is False).
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    key = _store_key(scene)
+    if key is None:
+        return None
+    index = _matrix_store.get(key)
+    if index is None and load:
+        index = open_matrix(*key)
+        _matrix_store[key] = index
+    return index
+
+def search_genes(text, scene=None, limit=SEARCH_LIMIT):
+    """Gene names containing text (case-insensitive), names starting with it first"""
+    index = get_index(scene)
+    if index is None:
+        return []
+    text = text.strip().lower()
+    if not text:
+        return index.names[:limit]
+    starts, contains = [], []
+    for name, lower in zip(index.names, index.lower):
+        if lower.startswith(text):
+            starts.append(name)
+            if len(starts) >= limit:
+                break
+        elif text in lower and len(contains) < limit:
+            contains.append(name)
+    return (starts + contains)[:limit]
+
+def value_range(column):
+    """(min, max) of a gene column, ignoring points without expression (NaN); (0, 1) if there are none"""
+    if not len(column) or np.isnan(column).all():
+        return 0.0, 1.0
+    return float(np.nanmin(column)), float(np.nanmax(column))
+
+def gene_column(gene, scene=None):
+    """Expression of a gene in every plotted point (float32), through the LRU cache"""
+    if scene is None:
+        scene = bpy.context.scene
+    index = get_index(scene)
+    if index is None:
+        raise RuntimeError("No expression matrix attached")
+    if gene not in index.index:
+        raise KeyError(f"Gene '{gene}' not found in the expression matrix")
+
+    key = (_store_key(scene), gene, scene.trident.data_token)
+    column = _column_cache.get(key)
+    if column is not None:
+        _column_cache.move_to_end(key)
+        return column
+
+    rows = data_loader.match_obs_rows(data_loader.known_obs_rows(scene), scene.trident.data_shape[0],
+                                      index.matrix.n_cells, "The expression matrix")
+    column = index.matrix.column(index.index[gene], rows)
+    _column_cache[key] = column
+    used = sum(c.nbytes for c in _column_cache.values())
+    while used > COLUMN_CACHE_BYTES and len(_column_cache) > 1:
+        _key, evicted = _column_cache.popitem(last=False)
+        used -= evicted.nbytes
+    return column
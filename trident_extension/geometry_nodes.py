@@ -1,7 +1,7 @@
 import bpy
 import json
 from pathlib import Path
-from .data_loader import get_obs_map, get_data_type
+from .data_loader import get_obs_map, get_data_type, get_loaded_labels
 
 def load_palettes():
     """Load color palettes from JSON file"""
@@ -254,13 +254,13 @@ def setup_instance_material(inst_obj, scene, max_label=10, palette_name='Viridis
     
     return mat
 
-def setup_geometry_nodes(points_obj, inst_obj, context, max_color=10):
+def setup_geometry_nodes(points_obj, inst_obj, scene, max_color=10):
     """Set up geometry nodes for point cloud visualization"""
     
-    palette = getattr(context.scene, 'trident_color_palette', 'Viridis')
+    palette = getattr(scene, 'trident_color_palette', 'Viridis')
     if not palette:
         palette = 'Viridis'
-    setup_instance_material(inst_obj, context.scene, max_label=max_color, palette_name=palette, points_obj=points_obj)
+    setup_instance_material(inst_obj, scene, max_label=max_color, palette_name=palette, points_obj=points_obj)
 
     mod = points_obj.modifiers.new(name="InstancePoints", type='NODES')
     if not mod.node_group:
@@ -326,7 +326,7 @@ def setup_geometry_nodes(points_obj, inst_obj, context, max_color=10):
     # Configure Vector Math nodes for point scaling
     n_vm_sp.operation = 'SUBTRACT'
     n_abs_p.operation = 'ABSOLUTE'
-    n_val.outputs[0].default_value = context.scene.trident.point_size
+    n_val.outputs[0].default_value = scene.trident.point_size
     n_vm_dp1.operation = 'DIVIDE'
     n_vm_dp1.inputs[1].default_value = (0.2, 0.2, 0.2)
     n_vm_dp2.operation = 'DIVIDE'
@@ -347,7 +347,8 @@ def setup_geometry_nodes(points_obj, inst_obj, context, max_color=10):
     n_max2.operation = 'MAXIMUM'
 
     # Configure Named Attribute node
-    n_attr.inputs[0].default_value = context.scene.trident.labels[0].name if context.scene.trident.labels else "label"
+    loaded_labels = get_loaded_labels(scene)
+    n_attr.inputs[0].default_value = loaded_labels[0] if loaded_labels else "label"
     n_attr.data_type = 'INT'
 
     # Configure Map Range node
@@ -0,0 +1,350 @@
+"""
+TRIDENT hot reload - follow input files that change while they are plotted
+
+With Watch Inputs on, a Blender timer checks the size and modification
+time of a scene's obsm and obs files. Rows appended to plain CSV inputs are
+parsed from the byte offset where the last load stopped and added to the
+plotted point cloud in place: the mesh and its label attributes grow,
+category ids of existing categories stay the same and new categories get
+the next ids. Any other change (earlier bytes rewritten, the file shrunk,
+compressed or array inputs, key joins, row filters, preview samples) falls
+back to a full reload with the scene's current settings.
+"""
+
+import os
+import json
+import time
+import hashlib
+import weakref
+import numpy as np
+import bpy
+
+from . import data_loader
+from . import array_loader
+from . import column_cache
+from . import embeddings
+
+# Seconds between timer ticks; each scene is checked every watch_interval
+TICK = 0.5
+
+# Bytes hashed at the start of a file and before its last parsed row to
+# tell appended files from rewritten ones
+HASH_BYTES = 64 << 10
+
+# Appends of at most this many rows write the new vertices and attribute
+# values one by one; Blender's foreach_set always writes whole arrays
+ELEMENT_WRITE_ROWS = 4096
+
+# Time of the last check per scene: {scene name: time.monotonic()}
+_last_check = {}
+
+# Arrays with spare rows that later appends fill: {id(buffer): weakref}
+_buffers = {}
+
+def _grow(array, rows):
+    """
+    array with rows appended along the first axis. The result is a view of
+    a buffer with room for half as many rows again, so a file followed
+    append by append is copied a bounded number of times in total.
+    """
+    n, k = len(array), len(rows)
+    base = array.base
+    ref = _buffers.get(id(base)) if base is not None else None
+    in_place = (ref is not None and ref() is base and len(base) >= n + k and array.strides == base.strides
+                and array.__array_interface__["data"][0] == base.__array_interface__["data"][0])
+    if not in_place:
+        base = np.empty((n + k + (n + k) // 2,) + array.shape[1:], dtype=array.dtype, order='F')
+        base[:n] = array
+        key = id(base)
+        _buffers[key] = weakref.ref(base, lambda _ref, key=key: _buffers.pop(key, None))
+    base[n:n + k] = rows
+    return base[:n + k]
+
+def _hash_range(filepath, start, stop):
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        return hashlib.sha1(f.read(stop - start)).hexdigest()
+
+def _file_record(filepath, offset):
+    """Size, mtime and hashes of a file parsed up to byte offset"""
+    stat = os.stat(filepath)
+    with open(filepath, 'rb') as f:
+        f.seek(max(0, offset - 1))
+        complete = offset == 0 or f.read(1) == b"\n"
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "offset": offset,
+        "complete": complete,
+        "head": _hash_range(filepath, 0, min(offset, HASH_BYTES)),
+        "tail": _hash_range(filepath, max(0, offset - HASH_BYTES), offset),
+    }
+
+def _file_status(filepath, record):
+    """'unchanged', 'appended', 'rewritten' or 'missing'"""
+    if not os.path.exists(filepath):
+        return "missing"
+    stat = os.stat(filepath)
+    offset = record["offset"]
+    if stat.st_size == record["size"] == offset and stat.st_mtime_ns == record["mtime"]:
+        return "unchanged"
+    if stat.st_size < offset:
+        return "rewritten"
+    if _hash_range(filepath, 0, min(offset, HASH_BYTES)) != record["head"] or \
+            _hash_range(filepath, max(0, offset - HASH_BYTES), offset) != record["tail"]:
+        return "rewritten"
+    if stat.st_size == offset:
+        return "unchanged"
+    # A last row without line break may have been continued
+    return "appended" if record["complete"] else "rewritten"
+
+def incremental_reason(source):
+    """Why the recorded inputs cannot be followed row by row, or "" if they can"""
+    for filepath in (source["filepath_data"], source["filepath_obs"]):
+        if array_loader.is_array_file(filepath):
+            return "array inputs"
+        if filepath.lower().endswith((".gz", ".zst")):
+            return "compressed inputs"
+    options = source["options"]
+    if options.get("key_obsm") or options.get("key_obs"):
+        return "key join"
+    if options.get("filters"):
+        return "row filters"
+    if options.get("sample"):
+        return "preview sample"
+    return ""
+
+def _get_state(scene):
+    text = scene.trident.watch_state_json
+    return json.loads(text) if text else None
+
+def _set_state(scene, state):
+    scene.trident.watch_state_json = json.dumps(state) if state else ""
+
+def record(scene):
+    """
+    Record where the scene's data ends in its input files (past the last
+    loaded row). Returns False if the files hold fewer rows than the data.
+    """
+    trident = scene.trident
+    source = column_cache.recorded_source(scene)
+    state = {"token": trident.data_token}
+    if not incremental_reason(source):
+        cpp_loader = data_loader.get_cpp_loader()
+        for name, filepath in (("obsm", source["filepath_data"]), ("obs", source["filepath_obs"])):
+            offset = cpp_loader.csv_rows_end(filepath, trident.data_shape[0])
+            if offset < 0:
+                return False
+            state[name] = _file_record(filepath, offset)
+    else:
+        for name, filepath in (("obsm", source["filepath_data"]), ("obs", source["filepath_obs"])):
+            state[name] = _file_record(filepath, os.path.getsize(filepath))
+    _set_state(scene, state)
+    return True
+
+def _recolor(scene):
+    """Apply the current coloring again after the points changed"""
+    from . import api
+
+    trident = scene.trident
+    gene, label = trident.current_color_gene, trident.current_color_label
+    try:
+        if gene:
+            api.color_by_gene(gene, scene=scene)
+        elif label and label in (data_loader.get_label_cache(scene) or []):
+            api.color_by(label, scene=scene)
+    except Exception as e:
+        print(f"[TRIDENT] Could not restore the coloring by {gene or label}: {e}")
+
+def reload(scene):
+    """Load and plot the scene's input files again from scratch"""
+    from . import api
+
+    trident = scene.trident
+    gene, label = trident.current_color_gene, trident.current_color_label
+    labels = [item.name for item in trident.labels if item.name]
+    api.load(trident.filepath_data, trident.filepath_obs, labels, scene)
+    api.plot(scene)
+    trident.current_color_gene, trident.current_color_label = gene, label
+    _recolor(scene)
+    _set_state(scene, None)
+    trident.watch_summary = f"Reloaded ({trident.data_shape[0]:,} points)"
+    print(f"[TRIDENT] Reloaded the input files of scene {scene.name}")
+
+def _write_rows(mesh, start, coords, columns):
+    """Write the vertices from start on and their label attribute values ({label: full column})"""
+    vertices = mesh.vertices
+    for i, co in enumerate(coords.tolist(), start):
+        vertices[i].co = co
+    for label, column in columns.items():
+        data = mesh.attributes[label].data
+        for i, value in enumerate(np.asarray(column[start:], dtype=np.int32).tolist(), start):
+            data[i].value = value
+
+def append_rows(scene, state):
+    """
+    Add the complete rows appended to both input files since the last load
+    to the scene's data and point cloud. Returns the number of rows added.
+    """
+    from . import api
+
+    trident = scene.trident
+    cpp_loader = data_loader.get_cpp_loader()
+    source = column_cache.recorded_source(scene)
+    old = data_loader.get_data_cache(scene)
+    labels = data_loader.get_loaded_labels(scene) or []
+    lazy = data_loader.get_lazy_columns(scene)
+    parsed = labels + list(lazy)
+
+    obs_map = data_loader.get_obs_map(scene)
+    names = {}
+    for label in parsed:
+        if obs_map.get(label):
+            table = data_loader.get_category_table(label, scene)
+            if table is None:
+                raise RuntimeError(f"No category names of '{label}' to extend")
+            names[label] = data_loader.table_names(*table)
+
+    coords, coord_ends, _, _ = cpp_loader.read_csv_range(source["filepath_data"], [], state["obsm"]["offset"], {})
+    values, obs_ends, added, new_codes = cpp_loader.read_csv_range(source["filepath_obs"], parsed,
+                                                                   state["obs"]["offset"], names)
+    # Rows are merged by position: wait for the file that is behind
+    n = min(len(coords), len(values))
+    if n == 0:
+        return 0
+
+    n_coords = old.shape[1] - len(labels)
+    if coords.shape[1] != n_coords:
+        raise RuntimeError(f"obsm rows have {coords.shape[1]} columns, the data {n_coords}")
+    n_old = old.shape[0]
+    rows = np.empty((n, old.shape[1]), dtype=np.float32, order='F')
+    rows[:, :n_coords] = coords[:n]
+    rows[:, n_coords:] = values[:n, :len(labels)]
+    data = _grow(old, rows)
+
+    for label, new_names in added.items():
+        names[label] = names[label] + new_names
+    codes = {label: _grow(data_loader.get_codes(label, scene), new_codes[label][:n]) for label in names}
+    lazy_columns = {label: _grow(np.asarray(column, dtype=np.float32), values[:n, len(labels) + j])
+                    for j, (label, column) in enumerate(lazy.items())}
+
+    # Statistics of the new rows, merged into those of the loaded ones;
+    # columns without stored statistics are read in full
+    old_stats = data_loader.get_column_stats(scene=scene) or {}
+    stats = {}
+    for j, (label, new) in enumerate(zip(parsed, cpp_loader.column_stats(values[:n, :len(parsed)]))):
+        if label in old_stats:
+            stats[label] = data_loader.merge_column_stats(old_stats[label], new)
+            if label in names:
+                # Every category name comes from a loaded row
+                stats[label]["distinct"] = len(names[label])
+        else:
+            column = data[:, n_coords + j] if j < len(labels) else lazy_columns[label]
+            stats[label] = cpp_loader.column_stats(column.reshape(-1, 1))[0]
+
+    # Store as a new data version, then carry the derived state over
+    data_loader.set_data_cache(data, scene)
+    data_loader.set_category_tables(
+        {label: (codes[label],) + data_loader.names_to_table(names[label])
+         for label in labels if label in names},
+        scene)
+    cat_map = data_loader.get_cat_map(scene=scene)
+    for label in labels:
+        if label in names:
+            small = len(names[label]) <= data_loader.MAX_OVERRIDE_CATEGORIES
+            cat_map[label] = {name: i for i, name in enumerate(names[label])} if small else None
+    data_loader.set_cat_map(cat_map, scene)
+    data_loader.set_column_stats({label: stats[label] for label in labels}, scene)
+    for label, column in lazy_columns.items():
+        data_loader.set_lazy_column(label, column, names.get(label), stats[label], scene, codes.get(label))
+
+    # Grow the point cloud in place, keeping the centering of the plot
+    points_obj = trident.points_obj
+    if points_obj and points_obj.name in bpy.data.objects:
+        # Extra embeddings have no coordinates for the new rows
+        embeddings.clear(scene)
+        mesh = points_obj.data
+        shift = np.asarray(old[0, :3], dtype=np.float32) - np.array(mesh.vertices[0].co, dtype=np.float32)
+        mesh.vertices.add(n)
+        columns = {}
+        for label in parsed:
+            if mesh.attributes.get(label) is not None:
+                label_codes = codes.get(label)
+                columns[label] = label_codes if label_codes is not None else data_loader.get_column(label, scene)
+        if n <= ELEMENT_WRITE_ROWS:
+            _write_rows(mesh, n_old, np.asarray(data[n_old:, :3], dtype=np.float32) - shift, columns)
+        else:
+            mesh.vertices.foreach_set("co", (np.ascontiguousarray(data[:, :3]) - shift).ravel())
+            for label, column in columns.items():
+                api.write_label_attribute(mesh, label, column)
+        mesh.update()
+        _recolor(scene)
+
+    column_cache.record_source(scene, source["filepath_data"], source["filepath_obs"], source["options"])
+    _set_state(scene, {
+        "token": trident.data_token,
+        "obsm": _file_record(source["filepath_data"], int(coord_ends[n - 1])),
+        "obs": _file_record(source["filepath_obs"], int(obs_ends[n - 1])),
+    })
+    trident.watch_summary = f"+{n:,} rows ({n_old + n:,} points)"
+    print(f"[TRIDENT] Appended {n} rows to scene {scene.name} ({n_old + n} points)")
+    return n
+
+def poll(scene):
+    """
+    Check the input files of a scene once. Appended rows are added in
+    place, other changes reload the data. Returns the number of rows added,
+    -1 after a full reload.
+    """
+    trident = scene.trident
+    source = column_cache.recorded_source(scene)
+    if source is None or not trident.data_loaded:
+        return 0
+
+    state = _get_state(scene)
+    if state is None or state.get("token") != trident.data_token:
+        if not record(scene):
+            reload(scene)
+            return -1
+        return 0
+
+    paths = {"obsm": source["filepath_data"], "obs": source["filepath_obs"]}
+    status = {name: _file_status(filepath, state[name]) for name, filepath in paths.items()}
+    if all(s == "unchanged" for s in status.values()):
+        # Touched but not changed: remember the new times
+        for name, filepath in paths.items():
+            stat = os.stat(filepath)
+            state[name].update(size=stat.st_size, mtime=stat.st_mtime_ns)
+        _set_state(scene, state)
+        return 0
+    if "missing" in status.values():
+        # An upstream job replacing the file; try again on the next check
+        return 0
+    if "rewritten" in status.values() or incremental_reason(source):
+        reload(scene)
+        return -1
+    return append_rows(scene, state)
+
+def _tick():
+    now = time.monotonic()
+    for scene in bpy.data.scenes:
+        trident = scene.trident
+        if not trident.watch_inputs or not trident.data_loaded or data_loader.get_plot_job(scene):
+            continue
+        if now - _last_check.get(scene.name, 0.0) < trident.watch_interval:
+            continue
+        _last_check[scene.name] = now
+        try:
+            poll(scene)
+        except Exception as e:
+            trident.watch_summary = f"Error: {e}"
+            print(f"[TRIDENT] Error watching the input files of scene {scene.name}: {e}")
+    return TICK
+
+def register_timers():
+    if not bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.register(_tick, first_interval=TICK, persistent=True)
+
+def unregister_timers():
+    if bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.unregister(_tick)
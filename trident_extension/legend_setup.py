@@ -1,9 +1,8 @@
 import bpy
-from . import data_loader, geometry_nodes
+from . import data_loader, expression, geometry_nodes
 
 def create_square_legend(context):
     """Create square format legend scene with overlay compositing"""
-    import numpy as np
     trident = context.scene.trident
     color_label = trident.current_color_label
     bpy.data.objects["TRIDENT_Gizmo"].location = (-15, 20.5, 11)
@@ -12,11 +11,8 @@ def create_square_legend(context):
         print("[TRIDENT] No color label selected.")
     
     if data_loader.get_data_type(context.scene) == True:
-        trident_data_cache = data_loader.get_data_cache(scene=context.scene)
-        trident_label_cache = data_loader.get_label_cache(scene=context.scene)
-        color_index = trident_label_cache.index(color_label)
-        column_data = trident_data_cache[:, 3 + color_index]
-        unique_values = len(sorted(set(column_data[~np.isnan(column_data)])))
+        stats = data_loader.get_column_stats(color_label, scene=context.scene)
+        unique_values = stats["distinct"] if stats else 0
 
         if unique_values > 10: # Force rectangle for too many categories
             create_rectangle_legend(context)
@@ -109,7 +105,7 @@ def create_legend_content(context, legend_scene, main_scene, format_type):
         
         # Fallback to label cache if no stored label
         if not color_label:
-            trident_label_cache = data_loader.get_label_cache(scene=main_scene)
+            trident_label_cache = data_loader.get_loaded_labels(scene=main_scene)
             if trident_label_cache:
                 color_label = trident_label_cache[0]
             else:
@@ -165,35 +161,7 @@ def create_title_text(context, title, format_type):
 
 def create_categorical_legend(context, main_scene, legend_scene, color_label, format_type):
     """Create categorical legend with labeled spheres"""
-    import numpy as np
-    import json
-    
-    # Get categorical mappings from scene storage
     trident = main_scene.trident
-    cat_map_json = trident.cat_map_json or '{}'
-
-    if not cat_map_json or cat_map_json == '{}':
-        print(f"[TRIDENT] Warning: No categorical mappings found")
-        return
-    
-    try:
-        cat_maps = json.loads(cat_map_json)
-    except json.JSONDecodeError:
-        print(f"[TRIDENT] Warning: Invalid categorical mapping JSON")
-        return
-    
-    print(f"[TRIDENT] Creating categorical legend for label: {color_label}")
-    print(f"[TRIDENT] Available categorical maps: {list(cat_maps.keys())}")
-    
-    # Check if the current color label has categorical mappings
-    if color_label not in cat_maps:
-        print(f"[TRIDENT] Warning: {color_label} not found in categorical mappings")
-        return
-    
-    # Get the category mapping for this label
-    label_categories = cat_maps[color_label] 
-    
-    # Get unique categories from the data
     trident_data_cache = data_loader.get_data_cache(scene=main_scene)
     trident_label_cache = data_loader.get_label_cache(scene=main_scene)
 
@@ -204,18 +172,24 @@ def create_categorical_legend(context, main_scene, legend_scene, color_label, fo
     if color_label not in trident_label_cache:
         print(f"[TRIDENT] Warning: {color_label} not found in label cache: {trident_label_cache}")
         return
-    
-    # Get unique values from the actual data
-    color_index = trident_label_cache.index(color_label)
-    column_data = trident_data_cache[:, 3 + color_index]
-    unique_values = sorted(set(column_data[~np.isnan(column_data)]))
-    
-    print(f"[TRIDENT] Found {len(unique_values)} unique values in data: {unique_values}")
-    print(f"[TRIDENT] Category mappings for {color_label}: {label_categories}")
-    
-    # Create reverse mapping: id -> category_name
-    id_to_category = {idx: category for category, idx in label_categories.items()}
-    
+
+    print(f"[TRIDENT] Creating categorical legend for label: {color_label}")
+
+    hashed = data_loader.is_high_cardinality(color_label, main_scene)
+    if hashed or data_loader.category_count(color_label, main_scene) > trident.legend_top_k:
+        entries, other, max_color = top_k_legend_entries(main_scene, color_label, trident.legend_top_k, hashed)
+    else:
+        entries = categorical_legend_entries(main_scene, color_label)
+        if entries is None:
+            return
+        other = 0
+        # Get max_color from the data
+        max_color = len(entries) - 1 if entries else 0
+
+    if other:
+        entries.append((None, f"other ({other} categories)"))
+    last_index = len(entries) - 1
+
     # Position settings
     start_y = 8 if format_type == "square" else 4
     spacing = 0.7 if format_type == "square" else 0.7
@@ -250,9 +224,6 @@ def create_categorical_legend(context, main_scene, legend_scene, color_label, fo
     else:
         print(f"[TRIDENT] Warning: Could not find TRIDENT_Instance material")
 
-    # Get max_color from the data
-    max_color = len(unique_values) - 1 if unique_values else 0
-    
     # Create title for legend
     bpy.ops.object.text_add(location=(x_title, start_y + 0.7, 0))
     text_obj = context.active_object
@@ -267,9 +238,9 @@ def create_categorical_legend(context, main_scene, legend_scene, color_label, fo
     if mat_title and mat_title.name in bpy.data.materials:
         text_obj.data.materials.append(mat_title)
 
-    # Create legend entries for each unique value found in data
-    for i, value_id in enumerate(unique_values):
-        if max_color < 28:
+    # Create legend entries for each category
+    for i, (value_id, category_name) in enumerate(entries):
+        if last_index < 28:
             text_size = 0.4
             spacing = 0.6
             if i > 13:
@@ -277,7 +248,7 @@ def create_categorical_legend(context, main_scene, legend_scene, color_label, fo
                 x_pos = 6
             else:
                 y_pos = start_y - (i * spacing)
-        elif max_color >= 28 and max_color < 39:
+        elif last_index >= 28 and last_index < 39:
             text_size = 0.35
             spacing = 0.55
             if i > 19:
@@ -285,7 +256,7 @@ def create_categorical_legend(context, main_scene, legend_scene, color_label, fo
                 x_pos = 5
             else:
                 y_pos = start_y - (i * spacing)
-        elif max_color > 39:
+        elif last_index > 39:
             text_size = 0.3
             spacing = 0.5
             if i > 19 and i <= 39:
@@ -298,9 +269,6 @@ def create_categorical_legend(context, main_scene, legend_scene, color_label, fo
                 y_pos = start_y - (i * spacing)
                 x_pos = 0
 
-        # Get category name for this ID
-        category_name = id_to_category.get(int(value_id), f"Unknown_{int(value_id)}")
-        
         print(f"[TRIDENT] Creating legend entry {i}: ID={value_id}, Category={category_name}")
         
         # Create text for label
@@ -329,8 +297,9 @@ def create_categorical_legend(context, main_scene, legend_scene, color_label, fo
         
         text_obj.data.materials.append(text_mat)
         
-        # Create sphere with specific value AND max_color
-        create_legend_sphere(context, legend_sphere, (x_pos, y_pos, 0), value_id, i, max_color)
+        # Create sphere with specific value AND max_color ("other" has none)
+        if value_id is not None:
+            create_legend_sphere(context, legend_sphere, (x_pos, y_pos, 0), value_id, i, max_color)
     
     title_x = title_obj.location.x
 
@@ -359,7 +328,73 @@ def create_categorical_legend(context, main_scene, legend_scene, color_label, fo
     for obj in legend_scene.objects:
         obj.select_set(False)
 
-    print(f"[TRIDENT] Created {len(unique_values)} legend entries")
+    print(f"[TRIDENT] Created {len(entries)} legend entries")
+
+def categorical_legend_entries(main_scene, color_label):
+    """(value, name) legend entries of every category of a label, or None"""
+    import numpy as np
+    import json
+
+    # Get categorical mappings from scene storage (numeric columns forced
+    # categorical get theirs derived on first use)
+    data_loader.ensure_category_map(color_label, main_scene)
+    cat_map_json = main_scene.trident.cat_map_json or '{}'
+
+    if not cat_map_json or cat_map_json == '{}':
+        print(f"[TRIDENT] Warning: No categorical mappings found")
+        return None
+    
+    try:
+        cat_maps = json.loads(cat_map_json)
+    except json.JSONDecodeError:
+        print(f"[TRIDENT] Warning: Invalid categorical mapping JSON")
+        return None
+    
+    # Check if the current color label has categorical mappings
+    if not cat_maps.get(color_label):
+        print(f"[TRIDENT] Warning: {color_label} not found in categorical mappings")
+        return None
+    
+    # Get the category mapping for this label
+    label_categories = cat_maps[color_label] 
+
+    # Get unique values from the load-time statistics (value counts are
+    # sorted by value); columns with too many values to count are scanned
+    stats = data_loader.get_column_stats(color_label, scene=main_scene)
+    if stats and stats["values"] is not None:
+        unique_values = stats["values"]
+    else:
+        column_data = data_loader.get_column(color_label, scene=main_scene)
+        unique_values = np.unique(column_data[~np.isnan(column_data)]).tolist()
+    
+    print(f"[TRIDENT] Found {len(unique_values)} unique values in data")
+    
+    # Create reverse mapping: id -> category_name
+    id_to_category = {idx: category for category, idx in label_categories.items()}
+    return [(value_id, id_to_category.get(value_id, f"Unknown_{int(value_id)}")) for value_id in unique_values]
+
+def top_k_legend_entries(main_scene, color_label, k, hashed):
+    """
+    (value, name) legend entries of the k most frequent categories of a
+    label, the number of categories left out and the legend max_color.
+    With hashed palette coloring the values are the palette slots.
+    """
+    dictionary = data_loader.get_category_dictionary(color_label, main_scene)
+    order, counts = dictionary.top_k(k)
+
+    if hashed:
+        slots = dictionary.palette_slots()
+        values = [int(slots[c]) for c in order]
+        max_color = data_loader.PALETTE_SLOTS - 1
+    else:
+        values = [float(dictionary.values[c]) for c in order]
+        stats = data_loader.get_column_stats(color_label, scene=main_scene)
+        max_color = stats["max"] if stats and stats["max"] is not None else len(dictionary) - 1
+
+    entries = [(v, dictionary.name(c)) for v, c in zip(values, order)]
+    print(f"[TRIDENT] Legend lists the top {len(entries)} of {len(dictionary)} categories "
+          f"({int(counts[order].sum())} of {int(counts.sum())} points)")
+    return entries, len(dictionary) - len(entries), max_color
 
 def create_legend_sphere(context, instance_sphere, location, value_id, index, max_color):
     """Create a sphere for legend with specific categorical value"""
@@ -535,7 +570,6 @@ def setup_legend_colorramp(colorramp_node, colors):
 
 def create_gradient_labels(context, main_scene, format_type):
     """Create min/max labels for gradient legend"""
-    import numpy as np
     
     if format_type == "rectangle":
         camera = main_scene.camera
@@ -548,14 +582,15 @@ def create_gradient_labels(context, main_scene, format_type):
     color_label = trident.current_color_label
     trident_label_cache = data_loader.get_label_cache(scene=main_scene)
 
-    if trident_data_cache is not None and color_label in trident_label_cache:
-        color_index = trident_label_cache.index(color_label)
-        column_data = trident_data_cache[:, 3 + color_index]
-        valid_data = column_data[~np.isnan(column_data)]
-        print(set(valid_data))
-        if len(valid_data) > 0:
-            min_val = float(valid_data.min())
-            max_val = float(valid_data.max())
+    if trident.current_color_gene:
+        # Gene expression range over the plotted points (cached column)
+        column = expression.gene_column(trident.current_color_gene, main_scene)
+        min_val, max_val = expression.value_range(column)
+    elif trident_data_cache is not None and color_label in trident_label_cache:
+        stats = data_loader.get_column_stats(color_label, scene=main_scene)
+        if stats and stats["count"] > 0:
+            min_val = float(stats["min"])
+            max_val = float(stats["max"])
         else:
             min_val, max_val = 0.0, 1.0
     else:
@@ -0,0 +1,169 @@
+"""
+TRIDENT live bridge - receive embeddings pushed from external Python sessions
+
+The bridge listens on a local socket (a Unix domain socket, or a loopback
+port where those are not available). A client (see live_client) copies
+coordinates and obs columns into a shared memory block and sends a small
+JSON header naming it. A Blender timer accepts connections without
+blocking the UI, reads the arrays directly from the shared memory and
+updates TRIDENT_Points of the target scene in place through api.set_points;
+the reply is sent once the scene is updated, after which the client frees
+the block. Requests without the session token written at start are refused.
+"""
+
+import os
+import selectors
+import bpy
+
+from . import data_loader
+from . import live_client
+
+# Seconds between timer ticks while the bridge is running
+TICK = 0.1
+
+# Running bridge: {"server", "selector", "address", "token", "scene", "buffers": {conn: bytes}}
+_bridge = {}
+
+def is_running():
+    return bool(_bridge)
+
+def address():
+    """Address of the running bridge, or "" """
+    return _bridge.get("address", "")
+
+def start(scene=None, bridge_address=""):
+    """Listen for pushes into scene (default: the current one). Returns the address"""
+    if scene is None:
+        scene = bpy.context.scene
+    stop()
+    bridge_address = bridge_address or live_client.default_address()
+    server = live_client.listen(bridge_address)
+    token = live_client.write_token(bridge_address)
+    server.setblocking(False)
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    _bridge.update(server=server, selector=selector, address=bridge_address, token=token,
+                   scene=scene.name, buffers={})
+    if not bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.register(_tick, first_interval=TICK, persistent=True)
+    scene.trident.bridge_summary = f"Listening on {bridge_address}"
+    print(f"[TRIDENT] Bridge listening on {bridge_address} for scene {scene.name}")
+    return bridge_address
+
+def stop():
+    """Close the bridge and its connections"""
+    if bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.unregister(_tick)
+    if not _bridge:
+        return
+    selector = _bridge["selector"]
+    for conn in list(_bridge["buffers"]):
+        selector.unregister(conn)
+        conn.close()
+    selector.unregister(_bridge["server"])
+    selector.close()
+    _bridge["server"].close()
+    bridge_address = _bridge["address"]
+    if not live_client.tcp_address(bridge_address) and os.path.exists(bridge_address):
+        os.remove(bridge_address)
+    if os.path.exists(live_client.token_path(bridge_address)):
+        os.remove(live_client.token_path(bridge_address))
+    scene = bpy.data.scenes.get(_bridge["scene"])
+    if scene is not None:
+        scene.trident.bridge_summary = ""
+    _bridge.clear()
+    print(f"[TRIDENT] Bridge on {bridge_address} stopped")
+
+def _target_scene(header):
+    name = header.get("scene") or _bridge["scene"]
+    scene = bpy.data.scenes.get(name)
+    if scene is None:
+        raise KeyError(f"No scene named '{name}'")
+    return scene
+
+def _apply_push(header):
+    """Update the target scene from a pushed block. Returns the reply"""
+    from . import api
+
+    scene = _target_scene(header)
+    shm = live_client.attach(header["shm"])
+    try:
+        # set_points copies the arrays out of the block before it is closed
+        api.set_points(*live_client.unpack(shm, header), scene)
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # Views kept alive by the traceback of a failed update; the
+            # mapping is released with them
+            pass
+    n = scene.trident.data_shape[0]
+    scene.trident.bridge_summary = f"Received {n:,} points, {len(header['categories'])} categorical labels"
+    return {"ok": True, "scene": scene.name, "points": n}
+
+def handle(message):
+    """Reply to one client message"""
+    if not live_client.valid_token(message, _bridge["token"]):
+        print("[TRIDENT] Bridge refused a request without the session token")
+        return {"ok": False, "error": "Missing or wrong session token"}
+    try:
+        if message.get("op") == "push":
+            return _apply_push(message)
+        if message.get("op") == "ping":
+            scene = _target_scene(message)
+            points = scene.trident.data_shape[0] if data_loader.get_data_cache(scene) is not None else 0
+            return {"ok": True, "scene": scene.name, "points": points}
+        return {"ok": False, "error": f"Unknown request '{message.get('op')}'"}
+    except Exception as e:
+        print(f"[TRIDENT] Bridge request failed: {e}")
+        return {"ok": False, "error": str(e)}
+
+def _close(conn):
+    _bridge["selector"].unregister(conn)
+    _bridge["buffers"].pop(conn, None)
+    conn.close()
+
+def _reply(conn, reply):
+    try:
+        conn.setblocking(True)
+        conn.settimeout(5.0)
+        conn.sendall(live_client.frame(reply))
+    except OSError as e:
+        print(f"[TRIDENT] Bridge could not reply: {e}")
+    _close(conn)
+
+def _tick():
+    if not _bridge:
+        return None
+    server, buffers = _bridge["server"], _bridge["buffers"]
+    for key, _events in _bridge["selector"].select(timeout=0):
+        conn = key.fileobj
+        if conn is server:
+            try:
+                client, _ = server.accept()
+            except BlockingIOError:
+                continue
+            client.setblocking(False)
+            _bridge["selector"].register(client, selectors.EVENT_READ)
+            buffers[client] = b""
+            continue
+        try:
+            chunk = conn.recv(65536)
+        except BlockingIOError:
+            continue
+        except OSError:
+            chunk = b""
+        if not chunk:
+            _close(conn)
+            continue
+        try:
+            message, _rest = live_client.split_frame(buffers[conn] + chunk)
+        except ValueError as e:
+            _reply(conn, {"ok": False, "error": str(e)})
+            continue
+        if message is None:
+            buffers[conn] += chunk
+            continue
+        # One request per connection
+        _reply(conn, handle(message))
+    return TICK
@@ -0,0 +1,269 @@
+"""
+TRIDENT live client - push embeddings into an open Blender scene
+
+Sends float32 coordinates and obs columns from a Jupyter/scanpy session to
+the TRIDENT bridge of a running Blender (Start Bridge in the TRIDENT panel)
+without writing files. The arrays are copied once into a shared memory
+block; only a small JSON header naming the block travels over the local
+socket, and Blender reads the arrays straight from the shared memory.
+
+This module needs only the standard library and NumPy and does not import
+bpy, so it can be used outside Blender by path:
+
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("live_client", ".../trident/live_client.py")
+    live_client = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(live_client)
+
+    live_client.push(adata.obsm["X_umap"], {"leiden": adata.obs["leiden"],
+                                            "n_genes": adata.obs["n_genes"]})
+
+Every request carries the bridge's session token, which the bridge writes
+to an owner-only file next to its address (see token_path) when it starts,
+so other local users cannot push to the loopback port used on Windows.
+"""
+
+import os
+import hmac
+import json
+import secrets
+import socket
+import struct
+import tempfile
+import numpy as np
+from multiprocessing import shared_memory
+
+# Loopback port used where Unix domain sockets are not available (Windows)
+DEFAULT_PORT = 47391
+
+# Largest JSON header accepted, in bytes
+MAX_HEADER = 64 << 20
+
+# Arrays are placed at multiples of this many bytes in the shared block
+ALIGN = 64
+
+def default_address():
+    """Socket path of the bridge (a loopback "host:port" without AF_UNIX)"""
+    if hasattr(socket, "AF_UNIX"):
+        return os.path.join(tempfile.gettempdir(), "trident_bridge.sock")
+    return f"127.0.0.1:{DEFAULT_PORT}"
+
+def _is_unix(address):
+    return hasattr(socket, "AF_UNIX") and not tcp_address(address)
+
+def tcp_address(address):
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and os.sep not in address:
+        return host or "127.0.0.1", int(port)
+    return None
+
+def token_path(address):
+    """File holding the session token of the bridge at address"""
+    tcp = tcp_address(address)
+    if tcp:
+        return os.path.join(tempfile.gettempdir(), f"trident_bridge_{tcp[1]}.token")
+    return address + ".token"
+
+def write_token(address):
+    """New session token of a bridge, written to its owner-only token file"""
+    token = secrets.token_hex(32)
+    path = token_path(address)
+    if os.path.exists(path):
+        os.remove(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(token)
+    return token
+
+def read_token(address):
+    """Session token of the bridge at address, "" if it has none"""
+    try:
+        with open(token_path(address), 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+def valid_token(message, token):
+    """Whether a message carries the session token (compared in constant time)"""
+    sent = message.get("token")
+    return isinstance(sent, str) and hmac.compare_digest(sent.encode(), token.encode())
+
+def listen(address):
+    """Listening socket bound to address; a stale Unix socket file is replaced"""
+    if _is_unix(address):
+        if os.path.exists(address):
+            os.remove(address)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Owner-only from creation on: the socket lives in the shared temp
+        # directory, and a push makes Blender attach to any named block
+        umask = os.umask(0o177)
+        try:
+            server.bind(address)
+        finally:
+            os.umask(umask)
+        os.chmod(address, 0o600)
+    else:
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(tcp_address(address))
+    server.listen(4)
+    return server
+
+def connect(address=None, timeout=30.0):
+    address = address or default_address()
+    if _is_unix(address):
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        target = address
+    else:
+        conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        target = tcp_address(address)
+    conn.settimeout(timeout)
+    conn.connect(target)
+    return conn
+
+def frame(message):
+    """A message as sent on the socket: 4-byte little-endian length + JSON"""
+    body = json.dumps(message).encode('utf-8')
+    return struct.pack("<I", len(body)) + body
+
+def split_frame(buffer):
+    """(message, rest of buffer) of the first complete frame, or (None, buffer)"""
+    if len(buffer) < 4:
+        return None, buffer
+    (size,) = struct.unpack("<I", buffer[:4])
+    if size > MAX_HEADER:
+        raise ValueError(f"Message of {size} bytes exceeds the {MAX_HEADER} byte limit")
+    if len(buffer) < 4 + size:
+        return None, buffer
+    return json.loads(bytes(buffer[4:4 + size]).decode('utf-8')), buffer[4 + size:]
+
+def _receive(conn):
+    buffer = b""
+    while True:
+        message, buffer = split_frame(buffer)
+        if message is not None:
+            return message
+        chunk = conn.recv(65536)
+        if not chunk:
+            raise ConnectionError("Connection closed by the bridge")
+        buffer += chunk
+
+def encode_column(values):
+    """
+    An obs column as float32 values or (int32 codes, category names).
+    pandas categoricals keep their categories; text columns are encoded
+    with sorted categories.
+    """
+    if hasattr(values, "cat"):
+        return (np.asarray(values.cat.codes, dtype=np.int32),
+                [str(name) for name in values.cat.categories])
+    if isinstance(values, tuple):
+        codes, names = values
+        return np.asarray(codes, dtype=np.int32), [str(name) for name in names]
+    array = np.asarray(values)
+    if array.dtype.kind in "biuf":
+        return array.astype(np.float32, copy=False)
+    names, codes = np.unique(array.astype(str), return_inverse=True)
+    return codes.astype(np.int32), [str(name) for name in names]
+
+def _layout(arrays):
+    """Byte offsets of arrays packed into one aligned block, and its size"""
+    offsets, size = [], 0
+    for array in arrays:
+        offsets.append(size)
+        size += -(-array.nbytes // ALIGN) * ALIGN
+    return offsets, max(size, ALIGN)
+
+def pack(coords, obs=None):
+    """
+    Copy coords and encoded obs columns into a new shared memory block.
+    Returns (SharedMemory, header); the caller closes and unlinks the block.
+    """
+    coords = np.asarray(coords, dtype=np.float32)
+    if coords.ndim != 2 or coords.shape[1] < 2:
+        raise ValueError(f"coords must be an [n, 2+] array, got shape {coords.shape}")
+    coords = coords[:, :3]
+    n = coords.shape[0]
+
+    names, arrays, categories = ["__coords__"], [coords], {}
+    for label, values in (obs or {}).items():
+        column = encode_column(values)
+        if isinstance(column, tuple):
+            column, categories[str(label)] = column
+        if column.shape != (n,):
+            raise ValueError(f"obs column '{label}' has shape {column.shape}, expected ({n},)")
+        names.append(str(label))
+        arrays.append(column)
+
+    offsets, size = _layout(arrays)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    entries = []
+    for name, array, offset in zip(names, arrays, offsets):
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=offset)
+        view[...] = array
+        entries.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+    header = {"op": "push", "shm": shm.name, "size": size, "n": n,
+              "arrays": entries, "categories": categories}
+    return shm, header
+
+def attach(name):
+    """Open a shared memory block created by another process, without taking ownership of it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block for removal at exit
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+def unpack(shm, header):
+    """
+    (coords, {label: float32 values or (int32 codes, names)}) of a pushed
+    block. The arrays are views of the shared memory: copy what is kept
+    before closing it.
+    """
+    coords, columns = None, {}
+    for entry in header["arrays"]:
+        array = np.ndarray(tuple(entry["shape"]), dtype=np.dtype(entry["dtype"]),
+                           buffer=shm.buf, offset=entry["offset"])
+        if entry["name"] == "__coords__":
+            coords = array
+        elif entry["name"] in header["categories"]:
+            columns[entry["name"]] = (array, header["categories"][entry["name"]])
+        else:
+            columns[entry["name"]] = array
+    if coords is None:
+        raise ValueError("Pushed block has no coordinates")
+    return coords, columns
+
+def request(message, address=None, timeout=30.0):
+    """Send one message with the bridge's session token and return its reply"""
+    address = address or default_address()
+    message = dict(message, token=read_token(address))
+    with connect(address, timeout) as conn:
+        conn.sendall(frame(message))
+        reply = _receive(conn)
+    if not reply.get("ok"):
+        raise RuntimeError(f"TRIDENT bridge: {reply.get('error', 'request failed')}")
+    return reply
+
+def ping(address=None, timeout=5.0):
+    """Reply of a running bridge: {"ok", "scene", "points"}"""
+    return request({"op": "ping"}, address, timeout)
+
+def push(coords, obs=None, scene="", address=None, timeout=60.0):
+    """
+    Replace the data of the bridge's scene (or of the named scene) with
+    coords [n, 2 or 3] and obs columns {label: values}; TRIDENT_Points is
+    updated in place. Values are numeric arrays, text arrays, pandas
+    categoricals or (codes, category names) tuples. Returns the reply.
+    """
+    shm, header = pack(coords, obs)
+    header["scene"] = scene
+    try:
+        return request(header, address, timeout)
+    finally:
+        shm.close()
+        shm.unlink()
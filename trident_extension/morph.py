@@ -0,0 +1,157 @@
+"""
+TRIDENT morph - animate TRIDENT_Points between embeddings
+
+The coordinate sets are the embeddings of the scene (see embeddings): the
+plotted positions and FLOAT_VECTOR point attributes of the shared mesh. A
+node group in front of the InstancePoints modifier interpolates between
+them with a single Factor input: 0 is the first embedding, 1 the second
+and so on, each step a chain of vector mixes. Only that factor is
+keyframed, so there are no vertex keyframes, no per-frame Python and the
+memory use does not depend on the number of frames.
+"""
+
+import json
+import bpy
+
+from . import embeddings
+from . import render_bake
+
+NODE_GROUP = "TRIDENT_Morph"
+
+MODIFIER = "TRIDENT_Morph"
+
+def _points(scene):
+    points_obj = scene.trident.points_obj
+    if not points_obj or points_obj.name not in bpy.data.objects:
+        raise RuntimeError("TRIDENT_Points object not found. Plot data first.")
+    return points_obj
+
+def _socket(sockets, name, socket_type):
+    """Socket of a data type on nodes with one socket per type, like Mix"""
+    return next(socket for socket in sockets if socket.name == name and socket.type == socket_type)
+
+def _build_node_group(targets):
+    """Node group moving the points along targets as its Factor input goes from 0 to len(targets) - 1"""
+    tree = bpy.data.node_groups.get(NODE_GROUP)
+    if tree is None:
+        tree = bpy.data.node_groups.new(name=NODE_GROUP, type='GeometryNodeTree')
+        tree.interface.new_socket(name="Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+        tree.interface.new_socket(name="Factor", in_out='INPUT', socket_type='NodeSocketFloat')
+        tree.interface.new_socket(name="Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+    tree.nodes.clear()
+
+    nodes, links = tree.nodes, tree.links
+    n_in  = nodes.new(type='NodeGroupInput');          n_in.location  = (-800,   0)
+    n_set = nodes.new(type='GeometryNodeSetPosition'); n_set.location = (300 * len(targets), 0)
+    n_out = nodes.new(type='NodeGroupOutput');         n_out.location = (300 * len(targets) + 300, 0)
+
+    def coordinates(name, x):
+        if name == embeddings.PRIMARY:
+            node = nodes.new(type='GeometryNodeInputPosition')
+        else:
+            node = nodes.new(type='GeometryNodeInputNamedAttribute')
+            node.data_type = 'FLOAT_VECTOR'
+            node.inputs["Name"].default_value = embeddings.attribute_name(name)
+        node.location = (x, -300)
+        return node.outputs[0] if name == embeddings.PRIMARY else node.outputs["Attribute"]
+
+    # Step j mixes toward target j by Factor - (j - 1) clamped to [0, 1]:
+    # earlier steps are complete, later ones have not started
+    position = coordinates(targets[0], -400)
+    for j, name in enumerate(targets[1:], start=1):
+        x = 300 * j - 400
+        n_sub = nodes.new(type='ShaderNodeMath')
+        n_sub.operation = 'SUBTRACT'
+        n_sub.use_clamp = True
+        n_sub.inputs[1].default_value = j - 1
+        n_sub.location = (x, 200)
+        links.new(n_in.outputs["Factor"], n_sub.inputs[0])
+
+        n_mix = nodes.new(type='ShaderNodeMix')
+        n_mix.data_type = 'VECTOR'
+        n_mix.location = (x + 150, 0)
+        links.new(n_sub.outputs["Value"], _socket(n_mix.inputs, "Factor", 'VALUE'))
+        links.new(position, _socket(n_mix.inputs, "A", 'VECTOR'))
+        links.new(coordinates(name, x), _socket(n_mix.inputs, "B", 'VECTOR'))
+        position = _socket(n_mix.outputs, "Result", 'VECTOR')
+
+    links.new(n_in.outputs["Geometry"], n_set.inputs["Geometry"])
+    links.new(position, n_set.inputs["Position"])
+    links.new(n_set.outputs["Geometry"], n_out.inputs["Geometry"])
+    return tree
+
+def _factor_identifier(tree):
+    for item in tree.interface.items_tree:
+        if getattr(item, "in_out", None) == 'INPUT' and item.name == "Factor":
+            return item.identifier
+    raise KeyError(f"Node group {tree.name} has no Factor input")
+
+def get_settings(scene):
+    """Targets and timing of the scene's morph, or None"""
+    text = scene.trident.morph_json
+    return json.loads(text) if text else None
+
+def create(scene, targets=None, frame_start=None, frames=60, hold=24):
+    """
+    Animate TRIDENT_Points through targets (embedding names, default all of
+    them in order): each target is held for hold frames, then the points
+    move to the next one in frames frames, starting at frame_start
+    (default: the scene start). Returns the last keyframed frame.
+    """
+    points_obj = _points(scene)
+    available = embeddings.names(scene)
+    targets = list(targets) if targets else available
+    missing = [name for name in targets if name not in available]
+    if missing:
+        raise KeyError(f"Unknown embeddings: {', '.join(missing)}")
+    if len(targets) < 2:
+        raise ValueError("Morphing needs at least two embeddings; add one under Embeddings")
+    if frames < 1 or hold < 0:
+        raise ValueError("Transitions need at least one frame and holds cannot be negative")
+    frame_start = scene.frame_start if frame_start is None else int(frame_start)
+
+    remove(scene)
+    # A render bake would show the points unmoving
+    render_bake.clear(scene)
+    tree = _build_node_group(targets)
+    mod = points_obj.modifiers.new(name=MODIFIER, type='NODES')
+    mod.node_group = tree
+    # In front of InstancePoints, which instances the moved points
+    points_obj.modifiers.move(len(points_obj.modifiers) - 1, 0)
+
+    identifier = _factor_identifier(tree)
+    path = f'modifiers["{MODIFIER}"]["{identifier}"]'
+    frame = frame_start
+    for j in range(len(targets)):
+        mod[identifier] = float(j)
+        points_obj.keyframe_insert(data_path=path, frame=frame)
+        if hold:
+            frame += hold
+            points_obj.keyframe_insert(data_path=path, frame=frame)
+        frame += frames
+    last = frame - frames
+
+    # The morph shows every embedding on TRIDENT_Points; hide the others
+    scene.trident.embedding_layout = 'TOGGLE'
+    scene.trident.active_embedding = embeddings.PRIMARY
+    if scene.frame_end < last:
+        scene.frame_end = last
+    scene.trident.morph_json = json.dumps({"targets": targets, "frame_start": frame_start,
+                                           "frames": frames, "hold": hold})
+    print(f"[TRIDENT] Morph through {', '.join(targets)} on frames {frame_start}-{last}")
+    return last
+
+def remove(scene):
+    """Remove the morph modifier and its keyframes; the points show their plotted positions again"""
+    scene.trident.morph_json = ""
+    points_obj = scene.trident.points_obj
+    if not points_obj or points_obj.name not in bpy.data.objects:
+        return
+    mod = points_obj.modifiers.get(MODIFIER)
+    if mod is None:
+        return
+    action = points_obj.animation_data.action if points_obj.animation_data else None
+    if action is not None:
+        for fcurve in [fc for fc in action.fcurves if fc.data_path.startswith(f'modifiers["{MODIFIER}"]')]:
+            action.fcurves.remove(fcurve)
+    points_obj.modifiers.remove(mod)
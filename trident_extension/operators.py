@@ -1,14 +1,13 @@
 import bpy
 import os
-import numpy as np
+import threading
 
+from . import api
 from . import data_loader
-from . import geometry_nodes
-from . import scene_environment
+from . import live_bridge
 from .properties import TRIDENT_LabelItem
 
 trident = data_loader.get_trident_module()
-cpp_loader = data_loader.get_cpp_loader()
 
 class TRIDENT_OT_AddLabel(bpy.types.Operator):
     bl_idname = "trident.add_label"
@@ -135,7 +134,7 @@ class TRIDENT_OT_ExcludeAllLabels(bpy.types.Operator):
 
 class TRIDENT_OT_LoadData(bpy.types.Operator):
     bl_idname = "trident.load_data"
-    bl_label = "Load CSV Headers"
+    bl_label = "Load Headers"
     bl_description = "Load available labels from obs file"
 
     def execute(self, context):
@@ -154,27 +153,11 @@ class TRIDENT_OT_LoadData(bpy.types.Operator):
             return {'CANCELLED'}
 
         try:
-            # Just read the header line to get available labels
-            with open(filepath_obs, 'r') as f:
-                header_line = f.readline().strip()
-                headers = [h.strip().strip('"') for h in header_line.split(',')]
-            
-            scene = context.scene
-        
-            # Populate all_labels
-            scene.trident.all_labels.clear()
-            for header in headers:
-                item = scene.trident.all_labels.add()
-                item.name = header
-            
-            # Pre-select ALL labels (exclusion-based filtering)
-            scene.trident.labels.clear()
-            scene.trident.excluded_labels.clear()
-            for header in headers:
-                item = scene.trident.labels.add()
-                item.name = header
-            
-            self.report({'INFO'}, f"Loaded {len(headers)} labels (all preselected)")
+            # Probe the header and a sample of rows, pre-select ALL labels (exclusion-based filtering)
+            headers = api.load_headers(filepath_obs, context.scene)
+            approx = "" if context.scene.trident.obs_rows_exact else "~"
+            self.report({'INFO'}, f"Loaded {len(headers)} labels (all preselected), "
+                                  f"{approx}{context.scene.trident.obs_rows_estimate:,} rows")
             
         except Exception as e:
             self.report({'ERROR'}, f"Failed to read headers: {e}")
@@ -182,170 +165,303 @@ class TRIDENT_OT_LoadData(bpy.types.Operator):
 
         return {'FINISHED'}
 
+# File browser filters of TRIDENT_OT_SelectInputFile targets
+INPUT_FILE_GLOBS = {
+    'OBSM': "*.csv;*.csv.gz;*.csv.zst;*.gz;*.zst;*.npy;*.npz;*.h5ad",
+    'OBS': "*.csv;*.csv.gz;*.csv.zst;*.gz;*.zst;*.npy;*.npz;*.h5ad",
+    'EXPRESSION': "*.mtx;*.mtx.gz;*.mtx.zst;*.npz;*.h5ad",
+    'GENES': "*.tsv;*.tsv.gz;*.txt;*.txt.gz",
+    'EMBEDDING': "*.csv;*.csv.gz;*.csv.zst;*.gz;*.zst;*.npy;*.npz;*.h5ad",
+}
+
+def input_file_glob(target):
+    """File browser filter of a target, without the formats the C++ module was built without"""
+    patterns = INPUT_FILE_GLOBS[target].split(";")
+    if not getattr(trident, "HAS_HDF5", False):
+        patterns = [p for p in patterns if p != "*.h5ad"]
+    # Gene lists are read in Python, which always has gzip
+    if not getattr(trident, "HAS_ZLIB", False) and target != 'GENES':
+        patterns = [p for p in patterns if not p.endswith(".gz")]
+    if not getattr(trident, "HAS_ZSTD", False):
+        patterns = [p for p in patterns if not p.endswith(".zst")]
+    return ";".join(patterns)
+
+class TRIDENT_OT_SelectInputFile(bpy.types.Operator):
+    bl_idname = "trident.select_input_file"
+    bl_label = "Select Input File"
+    bl_description = "Browse for an input file (CSV, compressed CSV, NumPy arrays, .h5ad or an expression matrix)"
+
+    target: bpy.props.EnumProperty(
+        items=[
+            ('OBSM', "obsm", "Embedding coordinates"),
+            ('OBS', "obs", "Cell annotations"),
+            ('EXPRESSION', "Expression", "Cells x genes expression matrix"),
+            ('GENES', "Genes", "Gene names of the expression matrix"),
+            ('EMBEDDING', "Embedding", "Coordinates of another embedding of the plotted cells"),
+        ],
+        default='OBSM'
+    )
+    filepath: bpy.props.StringProperty(subtype='FILE_PATH')
+    filter_glob: bpy.props.StringProperty(
+        default=INPUT_FILE_GLOBS['OBSM'],
+        options={'HIDDEN'}
+    )
+
+    def invoke(self, context, event):
+        self.filter_glob = input_file_glob(self.target)
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        if self.target == 'EXPRESSION':
+            context.scene.trident.expression_path = self.filepath
+            return {'FINISHED'}
+        if self.target == 'GENES':
+            context.scene.trident.expression_genes_path = self.filepath
+            return {'FINISHED'}
+        if self.target == 'EMBEDDING':
+            context.scene.trident.embedding_path = self.filepath
+            return {'FINISHED'}
+
+        if self.target == 'OBSM':
+            context.scene.trident.filepath_data = self.filepath
+        else:
+            context.scene.trident.filepath_obs = self.filepath
+
+        # An .h5ad holds both obsm and obs
+        props = context.scene.trident
+        if self.filepath.lower().endswith(".h5ad"):
+            props.filepath_data = props.filepath_data or self.filepath
+            props.filepath_obs = props.filepath_obs or self.filepath
+        return {'FINISHED'}
+
+class TRIDENT_OT_ExportSidecar(bpy.types.Operator):
+    bl_idname = "trident.export_sidecar"
+    bl_label = "Export Data Sidecar"
+    bl_description = "Parse the input files once and write a binary sidecar for memory-mapped reuse"
+
+    filepath: bpy.props.StringProperty(subtype='FILE_PATH')
+
+    def execute(self, context):
+        if not self.filepath:
+            self.report({'ERROR'}, "Please specify a sidecar path")
+            return {'CANCELLED'}
+
+        try:
+            path = api.export_sidecar(self.filepath, context.scene)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to export sidecar: {e}")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Wrote sidecar {path}")
+        return {'FINISHED'}
+
+def set_plot_view(context):
+    """Material shading and camera view in the 3D viewport, if there is one"""
+    # No viewport in background mode (render farm workers)
+    if context.space_data is not None and context.space_data.type == 'VIEW_3D':
+        context.space_data.shading.type = 'MATERIAL'
+    # Set camera perspective
+    for area in (context.screen.areas if context.screen else []):
+        if area.type == 'VIEW_3D':
+            for space in area.spaces:
+                if space.type == 'VIEW_3D':
+                    space.region_3d.view_perspective = 'CAMERA'
+                    break
+            break
+
 class TRIDENT_OT_PlotData(bpy.types.Operator):
+    """
+    Load the input files and plot them.
+
+    From the UI (invoke) this runs as a modal operator: the C++ parse runs on
+    a worker thread with the GIL released, then the mesh is built in
+    timer-driven steps on the main thread. Progress is shown in the Labels
+    panel and the job can be cancelled with ESC or the Cancel button, which
+    discards everything built so far. Scripts calling execute() stay blocking.
+    """
     bl_idname = "trident.plot_data"
     bl_label = "Plot Data"
 
+    sidecar: bpy.props.StringProperty(
+        name="Sidecar",
+        description="Plot from a binary data sidecar instead of parsing the input files",
+        default="",
+        options={'SKIP_SAVE'}
+    )
+
     def execute(self, context):
-        import numpy as np
+        scene = context.scene
+
+        try:
+            if self.sidecar:
+                # Memory-mapped sidecar written by trident.export_sidecar
+                merged_array = api.load_sidecar(self.sidecar, scene)
+            else:
+                selected_labels = [item.name for item in scene.trident.labels if item.name]
+                if not selected_labels:
+                    self.report({'WARNING'}, "No labels selected for analysis")
+                    return {'CANCELLED'}
+                merged_array = api.load(scene.trident.filepath_data, scene.trident.filepath_obs,
+                                        selected_labels, scene)
+
+            self.report({'INFO'}, f"Loaded data with {merged_array.shape[1] - 3} labels ({merged_array.shape[0]} points)")
+            if scene.trident.join_summary:
+                self.report({'INFO'}, scene.trident.join_summary)
+            if scene.trident.filter_summary:
+                self.report({'INFO'}, scene.trident.filter_summary)
+            points_obj = api.plot(scene)
+        except Exception as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
 
+        set_plot_view(context)
+
+        self.report({'INFO'}, f"Created point cloud with {len(points_obj.data.vertices)} points (instanced & realized).")
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
         scene = context.scene
-        selected_labels = [item.name for item in scene.trident.labels if item.name]
-        
-        if not selected_labels:
-            self.report({'WARNING'}, "No labels selected for analysis")
+
+        if self.sidecar:
+            return self.execute(context)
+
+        if data_loader.get_plot_job(scene) is not None:
+            self.report({'WARNING'}, "Plot Data is already running")
             return {'CANCELLED'}
-        
-        filepath_data = scene.trident.filepath_data
-        filepath_obs = scene.trident.filepath_obs
-        
-        if not filepath_data or not os.path.exists(filepath_data):
-            self.report({'ERROR'}, "Invalid obsm file path")
+
+        self._labels = [item.name for item in scene.trident.labels if item.name]
+        if not self._labels:
+            self.report({'WARNING'}, "No labels selected for analysis")
             return {'CANCELLED'}
-            
-        if not filepath_obs or not os.path.exists(filepath_obs):
-            self.report({'ERROR'}, "Invalid obs file path")
+
+        # With lazy labels only the color label is parsed now
+        self._labels = api.plot_labels(self._labels, scene)
+        self._filepath_data = scene.trident.filepath_data
+        self._filepath_obs = scene.trident.filepath_obs
+        try:
+            self._join_options = api.join_options(scene)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
             return {'CANCELLED'}
+        self._stage = "Starting"
+        self._result = None
+        self._error = None
+        self._steps = None
+        self._mesh = None
 
-        # C++ HIGH-PERFORMANCE DATA LOADING
+        # Parse on a worker thread; the C++ loader releases the GIL
+        self._thread = threading.Thread(target=self._parse, daemon=True)
+        self._thread.start()
 
-        # Load spatial coordinates - typically 2D/3D position data
-        # Returns: (numpy array, category mappings, is_categorical flags)
-        data_array, data_map, data_cat = cpp_loader.load_csv(filepath_data)
-        
-        # Load observation metadata (obs) with only user-selected labels
-        obs_array, cat_map, obs_cat = cpp_loader.load_csv(filepath_obs, selected_labels)
-        
-        # Store categorical mappings: {label_name: {category_str: int_id}}
-        cat_map = dict(zip(selected_labels, cat_map))
-        data_loader.set_cat_map(cat_map, scene)
-        data_loader.set_obs_map(selected_labels, obs_cat, scene)
-
-        # Merge coordinates + metadata horizontally (column-wise)
-        # Result shape: [n_points, 3 + n_labels] where first 3 cols are XYZ
-        merged_array = cpp_loader.merge_data(data_array, obs_array)
-        
-        # Cache the results in Blender scene for visualization
-        data_loader.set_data_cache(merged_array, scene)
-        data_loader.set_label_cache(selected_labels, scene)
+        data_loader.start_plot_job(scene)
+        self._set_progress(context, self._stage, 0.0)
 
-        self.report({'INFO'}, f"Loaded data with {len(selected_labels)} labels ({merged_array.shape[0]} points)")
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.1, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
 
-        trident_data_cache = data_loader.get_data_cache()
-        
-        if trident_data_cache is None:
-            self.report({'ERROR'}, "No data loaded. Please load data first.")
-            return {'CANCELLED'}
+    def _parse(self):
+        def progress(stage):
+            self._stage = stage
 
-        # Clear scene
-        for o in list(context.scene.objects):
-            bpy.data.objects.remove(o, do_unlink=True)
+        try:
+            self._result = api.parse_inputs(
+                self._filepath_data, self._filepath_obs, self._labels, progress, **self._join_options)
+        except Exception as e:
+            self._error = e
+
+    def _set_progress(self, context, stage, fraction):
+        job = data_loader.get_plot_job(context.scene)
+        if job is not None:
+            job["stage"] = stage
+            job["progress"] = fraction
+        for area in (context.screen.areas if context.screen else []):
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+    def _finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        data_loader.end_plot_job(context.scene)
+        self._set_progress(context, "", 0.0)
+
+    def cancel(self, context):
+        # Discard partial state: the unlinked mesh; the scene data is untouched
+        # until the build is complete. A running parse thread finishes on its
+        # own and its result is dropped.
+        if self._steps is not None:
+            self._steps.close()
+        if self._mesh is not None and self._mesh.name in bpy.data.meshes:
+            bpy.data.meshes.remove(self._mesh)
+        self._mesh = None
+        self._finish(context)
+
+    def modal(self, context, event):
+        scene = context.scene
 
-        # Coords
-        if trident_data_cache.size == 0:
-            self.report({'ERROR'}, "No points to plot.")
+        job = data_loader.get_plot_job(scene)
+        if event.type == 'ESC' or job is None or job["cancel"]:
+            self.cancel(context)
+            self.report({'INFO'}, "Plot Data cancelled")
             return {'CANCELLED'}
 
-        coords = trident_data_cache[:, :3].astype(np.float32)
-        n_points = coords.shape[0]
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
 
-        # Create the instanced object and store reference
-        inst_obj = scene.trident.instance_obj
-        if inst_obj is None or not inst_obj.name in bpy.data.objects:
-            bpy.ops.mesh.primitive_ico_sphere_add(subdivisions=0, radius=0.05, location=(0, 0, 0))
-            inst_obj = context.view_layer.objects.active
-            inst_obj.name = "TRIDENT_Instance"
-            
-            # Store reference in scene
-            scene.trident.instance_obj = inst_obj
-            
-            bpy.context.view_layer.objects.active = inst_obj
-            bpy.ops.object.shade_smooth()
-        
-        inst_obj.hide_viewport = True
-        inst_obj.hide_render = True
+        # Stage 1: parsing on the worker thread (parse = first half of the bar)
+        if self._steps is None:
+            if self._thread.is_alive():
+                self._set_progress(context, self._stage, 0.0)
+                return {'PASS_THROUGH'}
 
-        # Create mesh from coords and embed label_id attribute
-        mesh = bpy.data.meshes.new("TRIDENT_Points_Mesh")
-        mesh.from_pydata(coords.tolist(), [], [])
+            if self._error is not None:
+                self.cancel(context)
+                self.report({'ERROR'}, str(self._error))
+                return {'CANCELLED'}
+
+            self._steps = api.build_points_mesh(self._result.data, self._labels, api.result_codes(self._result))
+            self._set_progress(context, "Building point mesh", 0.5)
+            return {'PASS_THROUGH'}
 
-        trident_label_cache = data_loader.get_label_cache()
+        # Stage 2: one mesh build step per timer tick
+        try:
+            stage, fraction, self._mesh = next(self._steps)
+            self._set_progress(context, stage, 0.5 + 0.5 * fraction)
+            return {'PASS_THROUGH'}
+        except StopIteration:
+            pass
+        except Exception as e:
+            self.cancel(context)
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
 
-        n_cols = trident_data_cache.shape[1]
-        n_extra = max(0, n_cols - 3)
+        # Stage 3: commit data and replace the scene contents
+        api.store_data(scene, self._result, (self._filepath_data, self._filepath_obs, self._join_options))
+        self._result = None
+        points_obj = api.finish_plot(scene, self._mesh)
+        self._mesh = None
+        self._finish(context)
 
-        if n_extra and trident_label_cache:
-            names = list(trident_label_cache)
+        if scene.trident.join_summary:
+            self.report({'INFO'}, scene.trident.join_summary)
+        if scene.trident.filter_summary:
+            self.report({'INFO'}, scene.trident.filter_summary)
 
-            use_count = min(len(names), n_extra)
-            if len(names) != n_extra:
-                self.report({'WARNING'},
-                            f"Label names ({len(names)}) != extra columns ({n_extra}); using first {use_count}.")
+        set_plot_view(context)
+        self.report({'INFO'}, f"Created point cloud with {len(points_obj.data.vertices)} points (instanced & realized).")
+        return {'FINISHED'}
 
-            for j in range(use_count):
-                name = names[j]
-                col = trident_data_cache[:, 3 + j]
-                
-                if np.issubdtype(col.dtype, np.number):
-                    vals = np.asarray(col, dtype=np.int32)
-                else:
-                    as_str = col.astype(str)
-                    uniques, inverse = np.unique(as_str, return_inverse=True)
-                    vals = inverse.astype(np.int32)
-
-                attr = mesh.attributes.get(name)
-                if attr is not None and (attr.data_type != 'INT' or attr.domain != 'POINT'):
-                    mesh.attributes.remove(attr)
-                    attr = None
-                if attr is None:
-                    attr = mesh.attributes.new(name=name, type='INT', domain='POINT')
-                    
-                vals_view = np.asarray(vals[:n_points], dtype=np.int32)
-                try:
-                    attr.data.foreach_set("value", vals_view)
-                except Exception:
-                    for idx, v in enumerate(vals_view):
-                        attr.data[idx].value = int(v)
-
-        points_obj = bpy.data.objects.new("TRIDENT_Points", mesh)
-        context.collection.objects.link(points_obj)
-        
-        # Store reference
-        scene.trident.points_obj = points_obj
-
-        # Set correct origin for the geometry
-        if bpy.context.mode != 'OBJECT':
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-        with context.temp_override(
-            object=points_obj,
-            active_object=points_obj,
-            selected_objects=[points_obj],
-            selected_editable_objects=[points_obj],
-        ):
-            bpy.ops.object.origin_set(type='GEOMETRY_ORIGIN')
-
-        # Geometry Nodes setup (Object Info → Instance on Points → Realize → Output)
-        max_color = trident_data_cache[:, 3].max() if trident_data_cache.shape[1] > 3 else 10
-        geometry_nodes.setup_geometry_nodes(points_obj, inst_obj, context, max_color)
-        scene_environment.setup_scene_environment(context)
-
-        # Store initial color label for legend use
-        trident_label_cache = data_loader.get_label_cache()
-        if trident_label_cache:
-            context.scene.trident.current_color_label = trident_label_cache[0]
-        
-        bpy.context.space_data.shading.type = 'MATERIAL'
-        # Set camera perspective
-        for area in bpy.context.screen.areas:
-            if area.type == 'VIEW_3D':
-                for space in area.spaces:
-                    if space.type == 'VIEW_3D':
-                        space.region_3d.view_perspective = 'CAMERA'
-                        break
-                break
+class TRIDENT_OT_CancelPlot(bpy.types.Operator):
+    bl_idname = "trident.cancel_plot"
+    bl_label = "Cancel Plot"
+    bl_description = "Cancel the running Plot Data job and discard partial results"
 
-        self.report({'INFO'}, f"Created point cloud with {n_points} points (instanced & realized).")
+    def execute(self, context):
+        job = data_loader.get_plot_job(context.scene)
+        if job is not None:
+            job["cancel"] = True
         return {'FINISHED'}
 
 class TRIDENT_OT_UpdateColors(bpy.types.Operator):
@@ -359,114 +475,226 @@ class TRIDENT_OT_UpdateColors(bpy.types.Operator):
         palette = scene.trident.color_palette
 
         try:
-            context.scene.trident.current_color_label = color_label
-        except:
-            trident_label_cache = data_loader.get_label_cache(scene=scene)
-            if trident_label_cache:
-                context.scene.trident.current_color_label = trident_label_cache[0]
-            else:
-                context.scene.trident.current_color_label = ""
-        
-        trident_data_cache = data_loader.get_data_cache(scene)
-        trident_label_cache = data_loader.get_label_cache(scene)
-        
-        # Fix the NaN handling issue
-        if not color_label or color_label == 'NONE':
-            self.report({'WARNING'}, "No color label selected")
+            max_color = api.color_by(color_label, palette, scene)
+        except Exception as e:
+            self.report({'ERROR'}, str(e))
             return {'CANCELLED'}
         
-        if trident_data_cache is None or trident_label_cache is None:
-            self.report({'ERROR'}, "No data loaded. Plot data first.")
+        self.report({'INFO'}, f"Updated colors: {color_label} with {palette} palette (max: {max_color})")
+        return {'FINISHED'}
+
+class TRIDENT_OT_AttachExpression(bpy.types.Operator):
+    bl_idname = "trident.attach_expression"
+    bl_label = "Attach Expression Matrix"
+    bl_description = "Index the expression matrix by gene for gene coloring"
+
+    def execute(self, context):
+        trident = context.scene.trident
+        if not trident.expression_path:
+            self.report({'ERROR'}, "Please specify an expression matrix")
             return {'CANCELLED'}
-        
-        # Calculate max color with proper NaN handling
-        if color_label in trident_label_cache:
-            color_index = trident_label_cache.index(color_label)
-            column_data = trident_data_cache[:, 3 + color_index]
-            
-            # Filter out NaN values
-            valid_data = column_data[~np.isnan(column_data)]
-            
-            if len(valid_data) > 0:
-                max_color = float(valid_data.max())
-                print(f"[DEBUG] Color Index: {color_index}, Color Label: {color_label}")
-                print(f"[DEBUG] Valid data points: {len(valid_data)}/{len(column_data)}")
-                print(f"[DEBUG] Max Color: {max_color}")
-            else:
-                max_color = 1.0
-                self.report({'WARNING'}, f"No valid data found for {color_label}")
-        else:
-            self.report({'ERROR'}, f"Label '{color_label}' not found in {trident_label_cache}")
+
+        try:
+            summary = api.attach_expression(trident.expression_path, trident.expression_genes_path,
+                                            trident.expression_matrix.strip() or "X", context.scene)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to attach expression matrix: {e}")
             return {'CANCELLED'}
 
-        # Find the TRIDENT points object
-        points_obj = scene.trident.points_obj
-        if not points_obj or points_obj.name not in bpy.data.objects:
-            self.report({'ERROR'}, "TRIDENT_Points object not found. Plot data first.")
+        self.report({'INFO'}, f"Attached {summary}")
+        return {'FINISHED'}
+
+class TRIDENT_OT_ColorByGene(bpy.types.Operator):
+    bl_idname = "trident.color_by_gene"
+    bl_label = "Color by Gene"
+    bl_description = "Color the points by the expression of a gene"
+
+    gene: bpy.props.StringProperty(
+        name="Gene",
+        description="Gene to color by (default: the gene picked in the panel)",
+        default="",
+        options={'SKIP_SAVE'}
+    )
+
+    def execute(self, context):
+        scene = context.scene
+        gene = self.gene or scene.trident.expression_gene
+        if not gene:
+            self.report({'WARNING'}, "No gene selected")
             return {'CANCELLED'}
-        
-        # Use stored reference
-        inst_obj = scene.trident.instance_obj
-        if inst_obj and inst_obj.name in bpy.data.objects:
-            geometry_nodes.setup_instance_material(inst_obj, scene, max_label=max_color, palette_name=palette, points_obj=points_obj)
-        else:
-            self.report({'WARNING'}, "Instance object not found")
-        
-        # Find the geometry nodes modifier
-        gn_mod = None
-        for mod in points_obj.modifiers:
-            if mod.type == 'NODES' and mod.name in ["TRIDENT_GeoNodes", "InstancePoints"]:
-                gn_mod = mod
-                break
-        
-        if not gn_mod or not gn_mod.node_group:
-            self.report({'ERROR'}, "Geometry nodes modifier not found")
+
+        try:
+            max_value = api.color_by_gene(gene, scene.trident.color_palette, scene)
+        except Exception as e:
+            self.report({'ERROR'}, str(e))
             return {'CANCELLED'}
-        
-        # Update the named attribute node
-        tree = gn_mod.node_group
-        attr_node = None
 
-        for node in tree.nodes:
-            if hasattr(node, 'bl_idname') and node.bl_idname == 'GeometryNodeInputNamedAttribute':
-                attr_node = node
-                break
-            elif hasattr(node, 'inputs') and len(node.inputs) > 0:
-                if hasattr(node.inputs[0], 'name') and 'Name' in node.inputs[0].name:
-                    attr_node = node
-                    break
-                    
-        if attr_node:
-            attr_node.inputs[0].default_value = color_label
-            self.report({'INFO'}, f"Updated color attribute to: {color_label}")
-        else:
-            self.report({'WARNING'}, "Named attribute node not found in geometry nodes")
+        self.report({'INFO'}, f"Updated colors: {gene} with {scene.trident.color_palette} palette (max: {max_value:g})")
+        return {'FINISHED'}
+
+class TRIDENT_OT_AddEmbedding(bpy.types.Operator):
+    bl_idname = "trident.add_embedding"
+    bl_label = "Add Embedding"
+    bl_description = "Show another embedding of the plotted cells, sharing their labels"
+
+    def execute(self, context):
+        trident = context.scene.trident
+        if not trident.embedding_path:
+            self.report({'ERROR'}, "Please specify an embedding file")
             return {'CANCELLED'}
-        
-        # Find ShaderNodeMapRange and change max
-        map_range_node = None
-        for node in tree.nodes:
-            if hasattr(node, 'bl_idname') and node.bl_idname == 'ShaderNodeMapRange':
-                map_range_node = node
-                break
-        
-        data_type = data_loader.get_data_type(scene)
 
-        if map_range_node:
-            if max_color < 32:
-                map_range_node.inputs['From Max'].default_value = max_color
-            else:
-                if data_type == True:
-                    map_range_node.inputs['From Max'].default_value = 32
-                else:
-                    map_range_node.inputs['From Max'].default_value = max_color
-            self.report({'INFO'}, f"Updated Map Range max to: {max_color}")
-        else:
-            self.report({'WARNING'}, "Map Range node not found in geometry nodes")
-        
-        # Final success message
-        self.report({'INFO'}, f"Updated colors: {color_label} with {palette} palette (max: {max_color})")
-        
+        try:
+            obj = api.load_embedding(trident.embedding_path, trident.embedding_name.strip(),
+                                     trident.embedding_obsm_key.strip(), context.scene)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to add embedding: {e}")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Added embedding {obj.name}")
+        return {'FINISHED'}
+
+class TRIDENT_OT_RemoveEmbedding(bpy.types.Operator):
+    bl_idname = "trident.remove_embedding"
+    bl_label = "Remove Embedding"
+    bl_description = "Remove this embedding"
+
+    name: bpy.props.StringProperty()
+
+    def execute(self, context):
+        try:
+            api.remove_embedding(self.name, context.scene)
+        except Exception as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Removed embedding {self.name}")
+        return {'FINISHED'}
+
+class TRIDENT_OT_CreateMorph(bpy.types.Operator):
+    bl_idname = "trident.create_morph"
+    bl_label = "Morph Embeddings"
+    bl_description = "Animate the points through all embeddings, interpolated in geometry nodes"
+
+    def execute(self, context):
+        trident = context.scene.trident
+        try:
+            last = api.morph(frames=trident.morph_frames, hold=trident.morph_hold, scene=context.scene)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to create morph: {e}")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Morph keyframed up to frame {last}")
+        return {'FINISHED'}
+
+class TRIDENT_OT_RemoveMorph(bpy.types.Operator):
+    bl_idname = "trident.remove_morph"
+    bl_label = "Remove Morph"
+    bl_description = "Remove the morph animation"
+
+    def execute(self, context):
+        api.remove_morph(context.scene)
+        self.report({'INFO'}, "Removed morph")
+        return {'FINISHED'}
+
+class TRIDENT_OT_StartBridge(bpy.types.Operator):
+    bl_idname = "trident.start_bridge"
+    bl_label = "Start Bridge"
+    bl_description = "Accept embeddings pushed into this scene from Python sessions through live_client"
+
+    def execute(self, context):
+        try:
+            address = live_bridge.start(context.scene, context.scene.trident.bridge_address)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to start the bridge: {e}")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Bridge listening on {address}")
+        return {'FINISHED'}
+
+class TRIDENT_OT_StopBridge(bpy.types.Operator):
+    bl_idname = "trident.stop_bridge"
+    bl_label = "Stop Bridge"
+    bl_description = "Stop accepting pushed embeddings"
+
+    def execute(self, context):
+        live_bridge.stop()
+        self.report({'INFO'}, "Bridge stopped")
+        return {'FINISHED'}
+
+class TRIDENT_OT_BakeForRender(bpy.types.Operator):
+    bl_idname = "trident.bake_for_render"
+    bl_label = "Bake for Render"
+    bl_description = "Evaluate the points once and render from the result instead of the geometry nodes"
+
+    def execute(self, context):
+        try:
+            vertices = api.bake_for_render(context.scene)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to bake: {e}")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Baked {vertices:,} vertices for rendering")
+        return {'FINISHED'}
+
+class TRIDENT_OT_ClearRenderBake(bpy.types.Operator):
+    bl_idname = "trident.clear_render_bake"
+    bl_label = "Clear Bake"
+    bl_description = "Render the points from their geometry nodes again"
+
+    def execute(self, context):
+        api.clear_render_bake(context.scene)
+        self.report({'INFO'}, "Removed the render bake")
+        return {'FINISHED'}
+
+class TRIDENT_OT_CreateCameraPath(bpy.types.Operator):
+    bl_idname = "trident.create_camera_path"
+    bl_label = "Create Camera Path"
+    bl_description = "Keyframe the camera along the selected turntable, cluster tour or zoom preset"
+
+    preset: bpy.props.StringProperty(
+        name="Preset",
+        description="Camera path preset (default: the one selected in the panel)",
+        default=""
+    )
+
+    def execute(self, context):
+        trident = context.scene.trident
+        try:
+            last = api.camera_path(self.preset or trident.camera_path_preset,
+                                   frames=trident.camera_path_frames or None,
+                                   clusters=trident.camera_path_clusters, scene=context.scene)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to create camera path: {e}")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Camera path keyframed up to frame {last}")
+        return {'FINISHED'}
+
+class TRIDENT_OT_RemoveCameraPath(bpy.types.Operator):
+    bl_idname = "trident.remove_camera_path"
+    bl_label = "Remove Camera Path"
+    bl_description = "Remove the camera rig and its keyframes"
+
+    def execute(self, context):
+        api.remove_camera_path(context.scene)
+        self.report({'INFO'}, "Removed camera path")
+        return {'FINISHED'}
+
+class TRIDENT_OT_RenderFrames(bpy.types.Operator):
+    bl_idname = "trident.render_frames"
+    bl_label = "Render Frames"
+    bl_description = "Render the frame range to the output directory, skipping frames already rendered"
+
+    def execute(self, context):
+        trident = context.scene.trident
+        try:
+            rendered = api.render_frames(trident.render_output_dir, trident.render_name or "trident",
+                                         scene=context.scene)
+        except Exception as e:
+            self.report({'ERROR'}, f"Rendering failed: {e}")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Rendered {rendered} frames")
         return {'FINISHED'}
 
 class TRIDENT_OT_ToggleTransparentEnvironment(bpy.types.Operator):
@@ -476,14 +704,9 @@ class TRIDENT_OT_ToggleTransparentEnvironment(bpy.types.Operator):
 
     def execute(self, context):
         scene = context.scene
-        if scene.trident.environment_transparent:
-            scene_environment.disable_transparent_environment()
-            scene.trident.environment_transparent = False
-            self.report({'INFO'}, "Disabled transparent environment")
-        else:
-            scene_environment.set_transparent_environment()
-            scene.trident.environment_transparent = True
-            self.report({'INFO'}, "Enabled transparent environment")
+        enabled = not scene.trident.environment_transparent
+        api.set_transparent_environment(enabled, scene)
+        self.report({'INFO'}, "Enabled transparent environment" if enabled else "Disabled transparent environment")
 
         return {'FINISHED'}
 
@@ -493,9 +716,7 @@ class TRIDENT_OT_CreateSquareLegend(bpy.types.Operator):
     bl_description = "Create square format legend (1080x1080)"
 
     def execute(self, context):
-        # Import the legend_setup module and create legend
-        from . import legend_setup
-        legend_setup.create_square_legend(context)
+        api.legend("square", context.scene)
         
         self.report({'INFO'}, "Created square legend setup")
         return {'FINISHED'}
@@ -506,10 +727,7 @@ class TRIDENT_OT_CreateRectangleLegend(bpy.types.Operator):
     bl_description = "Create rectangle format legend (1920x1080)"
 
     def execute(self, context):
-        
-        # Import the legend_setup module and create legend
-        from . import legend_setup
-        legend_setup.create_rectangle_legend(context)
+        api.legend("rectangle", context.scene)
         
         self.report({'INFO'}, "Created rectangle legend setup")
         return {'FINISHED'}
@@ -527,9 +745,36 @@ def register_operators():
     bpy.utils.register_class(TRIDENT_OT_CreateSquareLegend)
     bpy.utils.register_class(TRIDENT_OT_CreateRectangleLegend)
     bpy.utils.register_class(TRIDENT_OT_PlotData)
+    bpy.utils.register_class(TRIDENT_OT_CancelPlot)
+    bpy.utils.register_class(TRIDENT_OT_ExportSidecar)
+    bpy.utils.register_class(TRIDENT_OT_SelectInputFile)
     bpy.utils.register_class(TRIDENT_OT_UpdateColors)
+    bpy.utils.register_class(TRIDENT_OT_AttachExpression)
+    bpy.utils.register_class(TRIDENT_OT_ColorByGene)
+    bpy.utils.register_class(TRIDENT_OT_StartBridge)
+    bpy.utils.register_class(TRIDENT_OT_StopBridge)
+    bpy.utils.register_class(TRIDENT_OT_BakeForRender)
+    bpy.utils.register_class(TRIDENT_OT_ClearRenderBake)
+    bpy.utils.register_class(TRIDENT_OT_CreateCameraPath)
+    bpy.utils.register_class(TRIDENT_OT_RemoveCameraPath)
+    bpy.utils.register_class(TRIDENT_OT_RenderFrames)
+    bpy.utils.register_class(TRIDENT_OT_AddEmbedding)
+    bpy.utils.register_class(TRIDENT_OT_RemoveEmbedding)
+    bpy.utils.register_class(TRIDENT_OT_CreateMorph)
+    bpy.utils.register_class(TRIDENT_OT_RemoveMorph)
 
 def unregister_operators():
+    bpy.utils.unregister_class(TRIDENT_OT_RemoveMorph)
+    bpy.utils.unregister_class(TRIDENT_OT_CreateMorph)
+    bpy.utils.unregister_class(TRIDENT_OT_RemoveEmbedding)
+    bpy.utils.unregister_class(TRIDENT_OT_AddEmbedding)
+    bpy.utils.unregister_class(TRIDENT_OT_RenderFrames)
+    bpy.utils.unregister_class(TRIDENT_OT_RemoveCameraPath)
+    bpy.utils.unregister_class(TRIDENT_OT_CreateCameraPath)
+    bpy.utils.unregister_class(TRIDENT_OT_ClearRenderBake)
+    bpy.utils.unregister_class(TRIDENT_OT_BakeForRender)
+    bpy.utils.unregister_class(TRIDENT_OT_StopBridge)
+    bpy.utils.unregister_class(TRIDENT_OT_StartBridge)
     bpy.utils.unregister_class(TRIDENT_OT_LoadData)
     bpy.utils.unregister_class(TRIDENT_OT_RemoveLabel)
     bpy.utils.unregister_class(TRIDENT_OT_AddLabel)
@@ -540,7 +785,12 @@ def unregister_operators():
     bpy.utils.unregister_class(TRIDENT_OT_ToggleTransparentEnvironment)
     bpy.utils.unregister_class(TRIDENT_OT_CreateRectangleLegend)
     bpy.utils.unregister_class(TRIDENT_OT_CreateSquareLegend)
+    bpy.utils.unregister_class(TRIDENT_OT_ExportSidecar)
+    bpy.utils.unregister_class(TRIDENT_OT_SelectInputFile)
+    bpy.utils.unregister_class(TRIDENT_OT_CancelPlot)
     bpy.utils.unregister_class(TRIDENT_OT_PlotData)
     bpy.utils.unregister_class(TRIDENT_OT_UpdateColors)
+    bpy.utils.unregister_class(TRIDENT_OT_ColorByGene)
+    bpy.utils.unregister_class(TRIDENT_OT_AttachExpression)
     
 
@@ -1,5 +1,6 @@
 import bpy
 from . import data_loader
+from . import live_bridge
 
 trident = data_loader.get_trident_module()
 
@@ -20,25 +21,61 @@ class TRIDENT_PT_DataInput(TRIDENT_PT_Base, bpy.types.Panel):
         layout = self.layout
         scene = context.scene
 
-        # File path input for obsm
+        # File path input for obsm (CSV, .npy/.npz or .h5ad)
         layout.label(text="adata.obsm:")
-        layout.prop(scene.trident, "filepath_data", text="")
+        row = layout.row(align=True)
+        row.prop(scene.trident, "filepath_data", text="")
+        row.operator("trident.select_input_file", text="", icon='FILEBROWSER').target = 'OBSM'
+        if scene.trident.filepath_data.lower().endswith((".npz", ".h5ad")):
+            layout.prop(scene.trident, "obsm_key", text="Array")
 
         # File path input for obs
         layout.label(text="adata.obs:")
-        layout.prop(scene.trident, "filepath_obs", text="")
+        row = layout.row(align=True)
+        row.prop(scene.trident, "filepath_obs", text="")
+        row.operator("trident.select_input_file", text="", icon='FILEBROWSER').target = 'OBS'
+
+        # Optional key-based row matching
+        box = layout.box()
+        box.label(text="Match rows by key (optional):")
+        row = box.row(align=True)
+        row.prop(scene.trident, "join_key_obsm", text="obsm")
+        row.prop(scene.trident, "join_key_obs", text="obs")
+        row = box.row()
+        row.prop(scene.trident, "join_how", expand=True)
+        if scene.trident.join_summary:
+            box.label(text=scene.trident.join_summary, icon='INFO')
+
+        # Optional row filter on obs columns
+        box = layout.box()
+        box.label(text="Filter rows (optional):")
+        box.prop(scene.trident, "row_filter", text="", icon='FILTER')
+        if scene.trident.filter_summary:
+            box.label(text=scene.trident.filter_summary, icon='INFO')
 
         # Load headers only
         row = layout.row()
         row.operator("trident.load_data", text="Load Headers", icon='TEXT')
+        if scene.trident.obs_rows_estimate:
+            approx = "" if scene.trident.obs_rows_exact else "~"
+            layout.label(text=f"{approx}{scene.trident.obs_rows_estimate:,} rows", icon='INFO')
+
+def draw_label_schema(layout, context, name):
+    """Type and approximate size of a label from the header probe"""
+    info = context.scene.trident.all_labels.get(name)
+    if info is None or not info.kind:
+        return
+    icon = 'OUTLINER_DATA_FONT' if info.kind == 'categorical' else 'LINENUMBERS_ON'
+    layout.label(text=f"~{info.cardinality:,}", icon=icon)
 
 class TRIDENT_UL_IncludedLabelsList(bpy.types.UIList):
     """Custom UIList for included labels with exclude buttons"""
     
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
         if self.layout_type in {'DEFAULT', 'COMPACT'}:
-            # Show label name
+            # Show label name, type and size
             layout.label(text=item.name, icon='NONE')
+            draw_label_schema(layout, context, item.name)
             
             # Exclude button
             exclude_op = layout.operator("trident.exclude_single_label", text="", icon='X', emboss=False)
@@ -52,8 +89,9 @@ class TRIDENT_UL_ExcludedLabelsList(bpy.types.UIList):
     
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
         if self.layout_type in {'DEFAULT', 'COMPACT'}:
-            # Show label name
+            # Show label name, type and size
             layout.label(text=item.name, icon='NONE')
+            draw_label_schema(layout, context, item.name)
             
             # Include button
             include_op = layout.operator("trident.include_single_label", text="", icon='ADD', emboss=False)
@@ -125,10 +163,53 @@ class TRIDENT_PT_Labels(TRIDENT_PT_Base, bpy.types.Panel):
                     maxrows=3
                 )
 
-            # Plot data
-            row = layout.row()
-            row.operator("trident.plot_data", text="Plot Data", icon='GRAPH')
-            row.enabled = len(included_labels) > 0
+            # Plot data (progress and cancel while running)
+            plot_job = data_loader.get_plot_job(scene)
+            if plot_job is not None:
+                layout.progress(factor=plot_job["progress"],
+                                type='BAR',
+                                text=plot_job["stage"] or "Plotting...")
+                row = layout.row()
+                row.operator("trident.cancel_plot", text="Cancel", icon='CANCEL')
+            else:
+                # Optional preview subsample
+                box = layout.box()
+                box.prop(scene.trident, "preview_enabled", text="Preview Subsample")
+                if scene.trident.preview_enabled:
+                    col = box.column(align=True)
+                    col.prop(scene.trident, "preview_fraction", text="Fraction")
+                    col.prop(scene.trident, "preview_max_points")
+                    col.prop_search(scene.trident, "preview_stratify", scene.trident, "labels", text="Stratify")
+                    if scene.trident.preview_stratify:
+                        col.prop(scene.trident, "preview_min_per_category")
+                    col.prop(scene.trident, "preview_seed")
+
+                # Wide obs tables: parse only the color label, the rest on demand
+                layout.prop(scene.trident, "lazy_labels")
+
+                # Follow input files written by an upstream job
+                row = layout.row(align=True)
+                row.prop(scene.trident, "watch_inputs")
+                sub = row.row(align=True)
+                sub.enabled = scene.trident.watch_inputs
+                sub.prop(scene.trident, "watch_interval", text="Every")
+                if scene.trident.watch_inputs and scene.trident.watch_summary:
+                    layout.label(text=scene.trident.watch_summary, icon='FILE_REFRESH')
+
+                # Embeddings pushed from a Python session (see live_client)
+                row = layout.row(align=True)
+                if live_bridge.is_running():
+                    row.operator("trident.stop_bridge", text="Stop Bridge", icon='UNLINKED')
+                else:
+                    row.prop(scene.trident, "bridge_address", text="")
+                    row.operator("trident.start_bridge", text="Start Bridge", icon='LINKED')
+                if live_bridge.is_running() and scene.trident.bridge_summary:
+                    layout.label(text=scene.trident.bridge_summary, icon='INFO')
+
+                row = layout.row()
+                row.operator("trident.plot_data", text="Plot Preview" if scene.trident.preview_enabled else "Plot Data",
+                             icon='GRAPH')
+                row.enabled = len(included_labels) > 0
 
 class TRIDENT_PT_Visualization(TRIDENT_PT_Base, bpy.types.Panel):
     bl_label = "Visualization"
@@ -173,11 +254,115 @@ class TRIDENT_PT_Color_Configuration(TRIDENT_PT_Base, bpy.types.Panel):
         row = layout.row()
         row.operator("trident.update_colors", text="Update Colors", icon='COLOR')
 
+class TRIDENT_PT_Gene_Expression(TRIDENT_PT_Base, bpy.types.Panel):
+    bl_label = "Gene Expression"
+    bl_idname = "TRIDENT_PT_gene_expression"
+    bl_parent_id = "TRIDENT_PT_visualization"
+    bl_order = 1
+
+    def draw(self, context):
+        s = context.scene
+        layout = self.layout
+
+        # Expression matrix and its gene names
+        layout.label(text="Expression matrix:")
+        row = layout.row(align=True)
+        row.prop(s.trident, "expression_path", text="")
+        row.operator("trident.select_input_file", text="", icon='FILEBROWSER').target = 'EXPRESSION'
+        path = s.trident.expression_path.lower()
+        if path.endswith(".h5ad"):
+            layout.prop(s.trident, "expression_matrix", text="Matrix")
+        elif path:
+            row = layout.row(align=True)
+            row.prop(s.trident, "expression_genes_path", text="Genes")
+            row.operator("trident.select_input_file", text="", icon='FILEBROWSER').target = 'GENES'
+
+        row = layout.row()
+        row.operator("trident.attach_expression", text="Attach Matrix", icon='LINKED')
+        row.enabled = bool(path)
+
+        if s.trident.expression_summary:
+            layout.label(text=s.trident.expression_summary, icon='INFO')
+            # Searchable gene picker; picking a gene recolors the points
+            layout.prop(s.trident, "expression_gene", text="Gene", icon='VIEWZOOM')
+            row = layout.row()
+            row.operator("trident.color_by_gene", text="Color by Gene", icon='COLOR')
+            row.enabled = bool(s.trident.expression_gene)
+
+class TRIDENT_PT_Embeddings(TRIDENT_PT_Base, bpy.types.Panel):
+    bl_label = "Embeddings"
+    bl_idname = "TRIDENT_PT_embeddings"
+    bl_parent_id = "TRIDENT_PT_visualization"
+    bl_order = 2
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        s = context.scene
+        layout = self.layout
+
+        # Another obsm file of the plotted cells
+        layout.label(text="Embedding file:")
+        row = layout.row(align=True)
+        row.prop(s.trident, "embedding_path", text="")
+        row.operator("trident.select_input_file", text="", icon='FILEBROWSER').target = 'EMBEDDING'
+        if s.trident.embedding_path.lower().endswith((".npz", ".h5ad")):
+            layout.prop(s.trident, "embedding_obsm_key", text="obsm Key")
+        layout.prop(s.trident, "embedding_name", text="Name")
+        row = layout.row()
+        row.operator("trident.add_embedding", text="Add Embedding", icon='ADD')
+        row.enabled = bool(s.trident.embedding_path)
+
+        if len(s.trident.embeddings):
+            box = layout.box()
+            for item in s.trident.embeddings:
+                row = box.row()
+                row.label(text=item.name, icon='OUTLINER_OB_POINTCLOUD')
+                row.operator("trident.remove_embedding", text="", icon='X').name = item.name
+            layout.prop(s.trident, "embedding_layout", expand=True)
+            if s.trident.embedding_layout == 'TOGGLE':
+                layout.prop(s.trident, "active_embedding", text="Show")
+
+            # Animate TRIDENT_Points through the embeddings
+            box = layout.box()
+            col = box.column(align=True)
+            col.prop(s.trident, "morph_frames", text="Transition")
+            col.prop(s.trident, "morph_hold", text="Hold")
+            row = box.row(align=True)
+            row.operator("trident.create_morph", text="Morph Embeddings", icon='ANIM')
+            if s.trident.morph_json:
+                row.operator("trident.remove_morph", text="", icon='X')
+
+class TRIDENT_PT_Time_Series(TRIDENT_PT_Base, bpy.types.Panel):
+    bl_label = "Time Series"
+    bl_idname = "TRIDENT_PT_time_series"
+    bl_parent_id = "TRIDENT_PT_visualization"
+    bl_order = 3
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw_header(self, context):
+        self.layout.prop(context.scene.trident, "series_enabled", text="")
+
+    def draw(self, context):
+        s = context.scene
+        layout = self.layout
+
+        # Coordinates per timepoint, read from disk while playing
+        layout.label(text="Series (array, directory or pattern):")
+        row = layout.row(align=True)
+        row.prop(s.trident, "series_path", text="")
+        if s.trident.series_path.lower().endswith(".npz"):
+            layout.prop(s.trident, "series_key", text="Array")
+        col = layout.column(align=True)
+        col.prop(s.trident, "series_frame_start", text="Start Frame")
+        col.prop(s.trident, "series_frames_per_step", text="Frames per Timepoint")
+        if s.trident.series_summary:
+            layout.label(text=s.trident.series_summary, icon='TIME')
+
 class TRIDENT_PT_Visualization_Override(TRIDENT_PT_Base, bpy.types.Panel):
     bl_label = "Override Label Treatment"
     bl_idname = "TRIDENT_PT_visualization_override"
     bl_parent_id = "TRIDENT_PT_visualization"
-    bl_order = 1
+    bl_order = 4
     bl_options = {'DEFAULT_CLOSED'}
 
     def draw(self, context):
@@ -200,11 +385,38 @@ class TRIDENT_PT_Visualization_Override(TRIDENT_PT_Base, bpy.types.Panel):
         row = col.row(align=True)
         row.prop(s.trident, "label_treatment_override", expand=True)
 
+class TRIDENT_PT_Camera_Paths(TRIDENT_PT_Base, bpy.types.Panel):
+    bl_label = "Camera Paths"
+    bl_idname = "TRIDENT_PT_camera_paths"
+    bl_parent_id = "TRIDENT_PT_visualization"
+    bl_order = 6
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        s = context.scene
+        layout = self.layout
+
+        layout.prop(s.trident, "camera_path_preset", text="")
+        col = layout.column(align=True)
+        col.prop(s.trident, "camera_path_frames", text="Frames per Move")
+        col.prop(s.trident, "camera_path_clusters", text="Clusters")
+        row = layout.row(align=True)
+        row.operator("trident.create_camera_path", text="Create Camera Path", icon='CAMERA_DATA')
+        if s.trident.camera_path_summary:
+            row.operator("trident.remove_camera_path", text="", icon='X')
+            layout.label(text=s.trident.camera_path_summary, icon='ANIM')
+
+        # Frames already in the output directory are skipped
+        layout.separator()
+        layout.prop(s.trident, "render_output_dir", text="Output")
+        layout.prop(s.trident, "render_name", text="Name")
+        layout.operator("trident.render_frames", text="Render Missing Frames", icon='RENDER_ANIMATION')
+
 class TRIDENT_PT_Customization(TRIDENT_PT_Base, bpy.types.Panel):
     bl_label = "Customization"
     bl_idname = "TRIDENT_PT_customization"
     bl_parent_id = "TRIDENT_PT_visualization"
-    bl_order = 2
+    bl_order = 5
 
     def draw(self, context):
         s = context.scene
@@ -221,11 +433,20 @@ class TRIDENT_PT_Customization(TRIDENT_PT_Base, bpy.types.Panel):
         row = layout.row()
         row.operator("trident.toggle_transparent_environment", text="Transparency", icon='WORLD')
 
+        layout.separator()
+        layout.label(text="Render:")
+        row = layout.row(align=True)
+        row.operator("trident.bake_for_render", text="Bake for Render", icon='RENDER_ANIMATION')
+        if s.trident.bake_json:
+            row.operator("trident.clear_render_bake", text="", icon='X')
+            layout.label(text=s.trident.bake_summary, icon='CHECKMARK')
+
         layout.separator()
         layout.label(text="Legend:")
         layout.prop(s.trident, "show_gizmo", text="Show Gizmo", icon='GIZMO')
         layout.prop(s.trident, "legend_title", text="Title")
         layout.prop(s.trident, "title_size", text="Title Size")
+        layout.prop(s.trident, "legend_top_k", text="Max Categories")
 
         # Legend format buttons
         row = layout.row()
@@ -260,12 +481,20 @@ def register_panel():
     bpy.utils.register_class(TRIDENT_PT_Visualization)
     bpy.utils.register_class(TRIDENT_PT_Visualization_Override)
     bpy.utils.register_class(TRIDENT_PT_Color_Configuration)
+    bpy.utils.register_class(TRIDENT_PT_Gene_Expression)
+    bpy.utils.register_class(TRIDENT_PT_Embeddings)
+    bpy.utils.register_class(TRIDENT_PT_Time_Series)
     bpy.utils.register_class(TRIDENT_PT_Customization)
+    bpy.utils.register_class(TRIDENT_PT_Camera_Paths)
     bpy.utils.register_class(TRIDENT_PT_Error)
 
 def unregister_panel():
     bpy.utils.unregister_class(TRIDENT_PT_Error)
+    bpy.utils.unregister_class(TRIDENT_PT_Camera_Paths)
     bpy.utils.unregister_class(TRIDENT_PT_Customization)
+    bpy.utils.unregister_class(TRIDENT_PT_Time_Series)
+    bpy.utils.unregister_class(TRIDENT_PT_Embeddings)
+    bpy.utils.unregister_class(TRIDENT_PT_Gene_Expression)
     bpy.utils.unregister_class(TRIDENT_PT_Color_Configuration)
     bpy.utils.unregister_class(TRIDENT_PT_Visualization_Override)
     bpy.utils.unregister_class(TRIDENT_PT_Visualization)
@@ -2,6 +2,16 @@ import bpy
 
 class TRIDENT_LabelItem(bpy.types.PropertyGroup):
     name: bpy.props.StringProperty(name="Label")
+    # Schema from the header probe (set on all_labels items)
+    kind: bpy.props.StringProperty(name="Type", default="")
+    cardinality: bpy.props.IntProperty(name="Distinct Values", default=0)
+
+class TRIDENT_EmbeddingItem(bpy.types.PropertyGroup):
+    name: bpy.props.StringProperty(name="Embedding")
+    filepath: bpy.props.StringProperty(name="Source", default="")
+    obsm_key: bpy.props.StringProperty(name="obsm Key", default="")
+    # Extent of the centered coordinates, for the side-by-side layout
+    extent: bpy.props.FloatVectorProperty(name="Extent", size=3, default=(0.0, 0.0, 0.0))
 
 def get_color_label_items(self, context):
     """Dynamic enum items based on loaded labels"""
@@ -29,6 +39,77 @@ def get_palette_items(self, context):
         print(f"[TRIDENT] Error loading palettes: {e}")
         return [('Viridis', 'Viridis', 'Default palette')]
 
+def get_camera_path_items(self, context):
+    """Enum items of the camera path presets (see camera_paths)"""
+    from . import camera_paths
+    return [(name, name.replace("_", " ").title(), preset["description"])
+            for name, preset in camera_paths.PRESETS.items()]
+
+def get_embedding_items(self, context):
+    """Dynamic enum items: the plotted embedding and the extra ones (see embeddings)"""
+    from . import embeddings
+    return [(name, name, f"Show the {name} embedding") for name in embeddings.names(self.id_data)]
+
+def update_embedding_layout(self, context):
+    from . import embeddings
+    try:
+        embeddings.layout(self.id_data)
+    except Exception as e:
+        print(f"[TRIDENT] Error laying out embeddings: {e}")
+
+def update_series_enabled(self, context):
+    """Start or stop the time series playback (see timeseries)"""
+    from . import timeseries
+    scene = self.id_data
+    try:
+        if not self.series_enabled:
+            timeseries.stop(scene)
+        elif not timeseries.is_playing(scene):
+            timeseries.start(scene)
+    except Exception as e:
+        self.series_summary = f"Error: {e}"
+        print(f"[TRIDENT] Error starting the time series: {e}")
+
+def update_label_treatment(self, context):
+    """Derive the category mapping of a numeric color label when it is forced categorical"""
+    if self.label_treatment_override != 'CATEGORICAL':
+        return
+    label = self.current_color_label or self.color_label
+    if label and label != 'NONE':
+        from . import data_loader
+        data_loader.ensure_category_map(label, self.id_data)
+
+def update_color_label(self, context):
+    """Load a label left out of a lazy plot as soon as it is picked (see column_cache)"""
+    label = self.color_label
+    if not label or label == 'NONE' or not self.data_loaded:
+        return
+    from . import column_cache
+    try:
+        column_cache.ensure_label(label, self.id_data)
+    except Exception as e:
+        print(f"[TRIDENT] Error loading label {label}: {e}")
+
+def search_expression_genes(self, context, edit_text):
+    """Gene picker: genes of the attached expression matrix matching the typed text"""
+    from . import expression
+    try:
+        return expression.search_genes(edit_text, self.id_data)
+    except Exception as e:
+        print(f"[TRIDENT] Error searching genes: {e}")
+        return []
+
+def update_expression_gene(self, context):
+    """Color the points by a gene as soon as it is picked"""
+    points_obj = self.points_obj
+    if not self.expression_gene or not points_obj or points_obj.name not in bpy.data.objects:
+        return
+    from . import api
+    try:
+        api.color_by_gene(self.expression_gene, scene=self.id_data)
+    except Exception as e:
+        print(f"[TRIDENT] Error coloring by gene {self.expression_gene}: {e}")
+
 def update_point_size(self, context):
     points_obj = context.scene.trident.points_obj
     if not points_obj or points_obj.name not in bpy.data.objects:
@@ -69,24 +150,334 @@ class TRIDENT_Properties(bpy.types.PropertyGroup):
     
     # File paths
     filepath_data: bpy.props.StringProperty(name="obsm File Path",
-        description="Path to the obsm CSV file",
+        description="Path to the obsm file (CSV, optionally gzip/zstd compressed, NumPy .npy/.npz or AnnData .h5ad)",
         default="",
         subtype='FILE_PATH'
     )
     
     filepath_obs: bpy.props.StringProperty(
         name="obs File Path", 
-        description="Path to the obs CSV file",
+        description="Path to the obs file (CSV, optionally gzip/zstd compressed, NumPy .npz columns / structured .npy or AnnData .h5ad)",
         default="",
         subtype='FILE_PATH'
     )
     
+    obsm_key: bpy.props.StringProperty(
+        name="obsm Array",
+        description="Array to plot from an obsm .npz or .h5ad file (e.g. X_umap); empty for X_umap if present, else the first array",
+        default=""
+    )
+
+    # Key-based join of obsm and obs (positional merge when both keys are empty)
+    join_key_obsm: bpy.props.StringProperty(
+        name="obsm Key Column",
+        description="Index column of the obsm file (name or 0-based position, e.g. 0 for a pandas index)",
+        default=""
+    )
+
+    join_key_obs: bpy.props.StringProperty(
+        name="obs Key Column",
+        description="Index column of the obs file (name or 0-based position)",
+        default=""
+    )
+
+    join_how: bpy.props.EnumProperty(
+        name="Join Type",
+        description="How to treat obsm rows without a matching obs row",
+        items=[
+            ('INNER', "Inner", "Keep only obsm rows with a matching obs row"),
+            ('LEFT', "Left", "Keep all obsm rows, unmatched obs values become NaN")
+        ],
+        default='INNER'
+    )
+
+    join_summary: bpy.props.StringProperty(
+        name="Join Summary",
+        description="Match statistics of the last key-based join",
+        default=""
+    )
+
+    # Rows of obs (and the matching obsm rows) to load, e.g. "tissue == liver; 200 <= n_genes <= 5000"
+    row_filter: bpy.props.StringProperty(
+        name="Row Filter",
+        description="Load only rows passing all ';'-separated clauses: "
+                    "'col == value', 'col in {a, b}', 'lo <= col <= hi'",
+        default=""
+    )
+
+    filter_summary: bpy.props.StringProperty(
+        name="Filter Summary",
+        description="Rows kept by the row filter and preview sampling in the last load",
+        default=""
+    )
+
+    # Preview plots: a reproducible subsample drawn while parsing
+    preview_enabled: bpy.props.BoolProperty(
+        name="Preview",
+        description="Plot a random subsample of the rows instead of all of them",
+        default=False
+    )
+
+    preview_fraction: bpy.props.FloatProperty(
+        name="Preview Fraction",
+        description="Fraction of the rows to plot (of the row count estimated by Load Headers)",
+        default=0.1,
+        min=0.0001,
+        max=1.0,
+        subtype='FACTOR'
+    )
+
+    preview_max_points: bpy.props.IntProperty(
+        name="Max Points",
+        description="Upper limit on the number of preview points (0 for no limit)",
+        default=200000,
+        min=0
+    )
+
+    preview_stratify: bpy.props.StringProperty(
+        name="Stratify By",
+        description="obs label sampled per category, so rare categories survive (empty for uniform sampling)",
+        default=""
+    )
+
+    preview_min_per_category: bpy.props.IntProperty(
+        name="Min per Category",
+        description="Points kept from every category of the stratification label (all of smaller ones)",
+        default=100,
+        min=0
+    )
+
+    # Lazy labels: only the color label is parsed at plot time (see column_cache)
+    lazy_labels: bpy.props.BoolProperty(
+        name="Lazy Labels",
+        description="Plot only the coordinates and the color label; other labels are loaded "
+                    "from a column cache the first time they are colored by",
+        default=False
+    )
+
+    preview_seed: bpy.props.IntProperty(
+        name="Seed",
+        description="Random seed; the same seed and settings give the same sample",
+        default=0,
+        min=0
+    )
+    
+    obs_rows_estimate: bpy.props.IntProperty(
+        name="obs Rows",
+        description="Row count of the obs file estimated by the header probe",
+        default=0
+    )
+
+    obs_rows_exact: bpy.props.BoolProperty(
+        name="obs Rows Exact",
+        description="Whether the probed row count is exact",
+        default=False
+    )
+    
+    # Hot reload of changed input files (see hot_reload)
+    watch_inputs: bpy.props.BoolProperty(
+        name="Watch Inputs",
+        description="Follow rows appended to the input CSV files and reload the plot when they change otherwise",
+        default=False
+    )
+
+    watch_interval: bpy.props.FloatProperty(
+        name="Watch Interval",
+        description="Seconds between checks of the input files",
+        default=2.0,
+        min=0.5,
+        max=600.0,
+        subtype='TIME_ABSOLUTE',
+        unit='TIME_ABSOLUTE'
+    )
+
+    watch_summary: bpy.props.StringProperty(
+        name="Watch Summary",
+        description="Last change of the watched input files",
+        default=""
+    )
+
+    watch_state_json: bpy.props.StringProperty(
+        name="Watch State JSON",
+        description="Parsed extent, size, modification time and hashes of the watched input files",
+        default=""
+    )
+
+    # Live bridge from external Python sessions (see live_bridge)
+    bridge_address: bpy.props.StringProperty(
+        name="Bridge Address",
+        description="Socket path (or host:port) the bridge listens on. Empty: the default address of live_client",
+        default=""
+    )
+
+    bridge_summary: bpy.props.StringProperty(
+        name="Bridge Summary",
+        description="State of the live bridge and the last data received",
+        default=""
+    )
+
+    # Extra embeddings sharing the obs columns of TRIDENT_Points (see embeddings)
+    embeddings: bpy.props.CollectionProperty(type=TRIDENT_EmbeddingItem)
+
+    embedding_layout: bpy.props.EnumProperty(
+        name="Layout",
+        description="How the embeddings are shown",
+        items=[
+            ('SIDE_BY_SIDE', "Side by Side", "Show all embeddings in a row"),
+            ('TOGGLE', "Toggle", "Show only the active embedding"),
+        ],
+        default='SIDE_BY_SIDE',
+        update=update_embedding_layout
+    )
+
+    active_embedding: bpy.props.EnumProperty(
+        name="Active Embedding",
+        description="Embedding shown in the Toggle layout",
+        items=get_embedding_items,
+        update=update_embedding_layout
+    )
+
+    embedding_path: bpy.props.StringProperty(
+        name="Embedding File",
+        description="obsm file of another embedding of the plotted cells (CSV, NumPy array or .h5ad)",
+        default="",
+        subtype='FILE_PATH'
+    )
+
+    embedding_obsm_key: bpy.props.StringProperty(
+        name="obsm Key",
+        description="Array of an .npz or .h5ad embedding file, e.g. X_tsne",
+        default=""
+    )
+
+    embedding_name: bpy.props.StringProperty(
+        name="Embedding Name",
+        description="Name of the added embedding (default: the obsm key or file name)",
+        default=""
+    )
+
+    # Morph between embeddings (see morph)
+    morph_frames: bpy.props.IntProperty(
+        name="Transition Frames",
+        description="Frames to move from one embedding to the next",
+        default=60,
+        min=1
+    )
+
+    morph_hold: bpy.props.IntProperty(
+        name="Hold Frames",
+        description="Frames each embedding is shown before moving on",
+        default=24,
+        min=0
+    )
+
+    morph_json: bpy.props.StringProperty(
+        name="Morph JSON",
+        description="Embeddings and timing of the morph animation",
+        default=""
+    )
+
+    # Time series playback from disk (see timeseries)
+    series_enabled: bpy.props.BoolProperty(
+        name="Play Time Series",
+        description="Show the timepoint of the current frame from the time series files",
+        default=False,
+        update=update_series_enabled
+    )
+
+    series_path: bpy.props.StringProperty(
+        name="Time Series",
+        description="[T, N, 3] array (.npy/.npz), a directory of per-timepoint coordinate files or a glob pattern",
+        default="",
+        subtype='FILE_PATH'
+    )
+
+    series_key: bpy.props.StringProperty(
+        name="Array Key",
+        description="Array of a .npz series (default: its first array)",
+        default=""
+    )
+
+    series_frame_start: bpy.props.IntProperty(
+        name="Start Frame",
+        description="Frame showing the first timepoint",
+        default=1
+    )
+
+    series_frames_per_step: bpy.props.IntProperty(
+        name="Frames per Timepoint",
+        description="Frames from one timepoint to the next; the points are blended in between",
+        default=1,
+        min=1
+    )
+
+    series_summary: bpy.props.StringProperty(
+        name="Time Series Summary",
+        description="Size of the playing time series",
+        default=""
+    )
+
+    # Render bake (see render_bake)
+    bake_json: bpy.props.StringProperty(
+        name="Render Bake",
+        description="State the render bake was made from and the modifiers it disabled",
+        default=""
+    )
+
+    bake_summary: bpy.props.StringProperty(
+        name="Render Bake Summary",
+        description="Size of the render bake",
+        default=""
+    )
+
+    # Camera paths and resumable rendering (see camera_paths)
+    camera_path_preset: bpy.props.EnumProperty(
+        name="Camera Path",
+        description="Turntable, cluster tour or zoom preset for the camera",
+        items=get_camera_path_items
+    )
+
+    camera_path_frames: bpy.props.IntProperty(
+        name="Frames",
+        description="Frames of each camera move (0: the preset's)",
+        default=0,
+        min=0
+    )
+
+    camera_path_clusters: bpy.props.IntProperty(
+        name="Clusters",
+        description="Largest categories of the color label visited by a cluster tour",
+        default=6,
+        min=1
+    )
+
+    camera_path_summary: bpy.props.StringProperty(
+        name="Camera Path Summary",
+        description="Preset and frames of the camera path",
+        default=""
+    )
+
+    render_output_dir: bpy.props.StringProperty(
+        name="Output Directory",
+        description="Directory of the rendered frames; frames already there are skipped",
+        default="//renders/",
+        subtype='DIR_PATH'
+    )
+
+    render_name: bpy.props.StringProperty(
+        name="Name",
+        description="Prefix of the rendered frame files (<name>_<frame>.png)",
+        default="trident"
+    )
+
     # Label collections
     all_labels: bpy.props.CollectionProperty(type=TRIDENT_LabelItem)
     labels: bpy.props.CollectionProperty(type=TRIDENT_LabelItem)
     labels_index: bpy.props.IntProperty(default=0)
     excluded_labels: bpy.props.CollectionProperty(type=TRIDENT_LabelItem)
     excluded_labels_index: bpy.props.IntProperty(default=0)
+    # Labels held in the data array, in column order (see get_loaded_labels)
+    column_labels: bpy.props.CollectionProperty(type=TRIDENT_LabelItem)
 
     show_treatment_override: bpy.props.BoolProperty(
         name="Show Treatment Override",
@@ -102,14 +493,16 @@ class TRIDENT_Properties(bpy.types.PropertyGroup):
             ('CATEGORICAL', "Categorical", "Force categorical treatment"),
             ('CONTINUOUS', "Continuous", "Force continuous treatment")
         ],
-        default='AUTO'
+        default='AUTO',
+        update=update_label_treatment
     )
     
     # Color settings
     color_label: bpy.props.EnumProperty(
         name="Color Label",
         description="Label to use for coloring points",
-        items=get_color_label_items
+        items=get_color_label_items,
+        update=update_color_label
     )
     
     color_palette: bpy.props.EnumProperty(
@@ -118,6 +511,49 @@ class TRIDENT_Properties(bpy.types.PropertyGroup):
         items=get_palette_items
     )
     
+    # Gene expression coloring (see expression.py)
+    expression_path: bpy.props.StringProperty(
+        name="Expression Matrix",
+        description="Cells x genes expression matrix: Matrix Market .mtx (optionally .gz/.zst), "
+                    "sparse .npz (scipy.sparse.save_npz) or AnnData .h5ad",
+        default="",
+        subtype='FILE_PATH'
+    )
+
+    expression_genes_path: bpy.props.StringProperty(
+        name="Gene Names",
+        description="Gene names of an .mtx/.npz matrix, one per line or a 10x features.tsv(.gz); "
+                    "empty to look for features.tsv.gz / genes.tsv next to the matrix",
+        default="",
+        subtype='FILE_PATH'
+    )
+
+    expression_matrix: bpy.props.StringProperty(
+        name="h5ad Matrix",
+        description="Matrix of an .h5ad file: X, raw/X or layers/<name>",
+        default="X"
+    )
+
+    expression_summary: bpy.props.StringProperty(
+        name="Expression Summary",
+        description="Size of the attached expression matrix",
+        default=""
+    )
+
+    expression_gene: bpy.props.StringProperty(
+        name="Gene",
+        description="Gene to color the points by (type to search)",
+        default="",
+        search=search_expression_genes,
+        update=update_expression_gene
+    )
+
+    current_color_gene: bpy.props.StringProperty(
+        name="Current Color Gene",
+        description="Gene the points are currently colored by, empty when colored by an obs label",
+        default=""
+    )
+
     # Environment
     environment_transparent: bpy.props.BoolProperty(default=False)
     
@@ -130,9 +566,22 @@ class TRIDENT_Properties(bpy.types.PropertyGroup):
     
     data_serialized: bpy.props.StringProperty(
         name="Serialized Data",
-        description="Serialized numpy array data",
+        description="Serialized numpy array data (legacy, read-only for files saved by older versions)",
         default=""
     )
+
+    data_token: bpy.props.StringProperty(
+        name="Data Token",
+        description="Key of this scene's array in the in-memory data cache",
+        default=""
+    )
+    
+    data_sidecar: bpy.props.StringProperty(
+        name="Data Sidecar",
+        description="Binary sidecar (.npy) backing the data cache, written on save and memory-mapped on load",
+        default="",
+        subtype='FILE_PATH'
+    )
     
     data_shape: bpy.props.IntVectorProperty(
         name="Data Shape",
@@ -152,6 +601,18 @@ class TRIDENT_Properties(bpy.types.PropertyGroup):
         description="Serialized category mapping",
         default=""
     )
+
+    stats_json: bpy.props.StringProperty(
+        name="Column Statistics JSON",
+        description="Serialized per-label statistics computed at load time",
+        default=""
+    )
+
+    lazy_source_json: bpy.props.StringProperty(
+        name="Lazy Source JSON",
+        description="Input files and load settings of the data, for loading labels left out of the plot",
+        default=""
+    )
     
     # Legend settings
     legend_title: bpy.props.StringProperty(
@@ -159,6 +620,14 @@ class TRIDENT_Properties(bpy.types.PropertyGroup):
         description="Title for the legend",
         default="TRIDENT Visualization"
     )
+
+    legend_top_k: bpy.props.IntProperty(
+        name="Legend Categories",
+        description="Categorical legends with more categories list only the most frequent ones plus \"other\"",
+        default=60,
+        min=1,
+        max=60
+    )
     
     show_gizmo: bpy.props.BoolProperty(
         name="Show Gizmo",
@@ -242,6 +711,7 @@ class TRIDENT_Properties(bpy.types.PropertyGroup):
 
 def register_properties():
     bpy.utils.register_class(TRIDENT_LabelItem)
+    bpy.utils.register_class(TRIDENT_EmbeddingItem)
     bpy.utils.register_class(TRIDENT_Properties)
     
     # Register the single property group on Scene
@@ -252,4 +722,5 @@ def unregister_properties():
     del bpy.types.Scene.trident
     
     bpy.utils.unregister_class(TRIDENT_Properties)
+    bpy.utils.unregister_class(TRIDENT_EmbeddingItem)
     bpy.utils.unregister_class(TRIDENT_LabelItem)
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+TRIDENT render bake - render TRIDENT_Points from geometry evaluated once
+
+The InstancePoints node group (bounding boxes, instancing, realize,
+transform) is evaluated a single time into a mesh, TRIDENT_Baked, parented
+to TRIDENT_Points. The modifiers of TRIDENT_Points are then disabled for
+rendering, so the vertex-only points render nothing and every render frame
+of a turntable or flythrough only draws the baked mesh. The viewport keeps
+the live points. The material is shared, so palette changes still apply.
+
+The bake records the state it was made from (data, color label and point
+size); a depsgraph handler drops it as soon as that state changes, and the
+points render from their modifiers again.
+"""
+
+import json
+import functools
+import bpy
+
+BAKED_OBJECT = "TRIDENT_Baked"
+
+def _points(scene):
+    points_obj = scene.trident.points_obj
+    if not points_obj or points_obj.name not in bpy.data.objects:
+        raise RuntimeError("TRIDENT_Points object not found. Plot data first.")
+    return points_obj
+
+def _state(scene, points_obj):
+    """What the baked geometry depends on"""
+    trident = scene.trident
+    return [trident.data_token, trident.current_color_label or trident.color_label,
+            trident.current_color_gene, trident.label_treatment_override,
+            round(trident.point_size, 6), len(points_obj.data.vertices)]
+
+def get_settings(scene):
+    """State and disabled modifiers of the scene's bake, or None"""
+    text = scene.trident.bake_json
+    return json.loads(text) if text else None
+
+def is_baked(scene):
+    return get_settings(scene) is not None and bpy.data.objects.get(BAKED_OBJECT) is not None
+
+def bake(scene, depsgraph=None):
+    """
+    Evaluate TRIDENT_Points once into TRIDENT_Baked and render from it,
+    through depsgraph or the scene's own (first view layer), which need not
+    be the context's. Returns the number of baked vertices.
+    """
+    trident = scene.trident
+    points_obj = _points(scene)
+    if trident.morph_json or trident.series_enabled:
+        raise RuntimeError("The points are animated (morph or time series); a bake would freeze them")
+    clear(scene)
+
+    if depsgraph is None:
+        depsgraph = scene.view_layers[0].depsgraph
+        depsgraph.update()
+    evaluated = points_obj.evaluated_get(depsgraph)
+    mesh = bpy.data.meshes.new_from_object(evaluated, preserve_all_data_layers=True, depsgraph=depsgraph)
+    mesh.name = BAKED_OBJECT
+    obj = bpy.data.objects.new(BAKED_OBJECT, mesh)
+    scene.collection.objects.link(obj)
+    # Follows the points, e.g. in a side-by-side embedding layout
+    obj.parent = points_obj
+    obj.hide_select = True
+    obj.hide_viewport = True
+    obj.hide_render = points_obj.hide_render
+
+    disabled = [mod.name for mod in points_obj.modifiers if mod.show_render]
+    for name in disabled:
+        points_obj.modifiers[name].show_render = False
+
+    trident.bake_json = json.dumps({"state": _state(scene, points_obj), "modifiers": disabled})
+    trident.bake_summary = f"Baked {len(mesh.vertices):,} vertices for rendering"
+    print(f"[TRIDENT] {trident.bake_summary}")
+    return len(mesh.vertices)
+
+def clear(scene):
+    """Remove the bake; the points render from their modifiers again"""
+    settings = get_settings(scene)
+    scene.trident.bake_json = ""
+    scene.trident.bake_summary = ""
+    obj = bpy.data.objects.get(BAKED_OBJECT)
+    if obj is not None:
+        mesh = obj.data
+        bpy.data.objects.remove(obj, do_unlink=True)
+        if mesh is not None and mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+    points_obj = scene.trident.points_obj
+    if settings and points_obj and points_obj.name in bpy.data.objects:
+        for name in settings["modifiers"]:
+            mod = points_obj.modifiers.get(name)
+            if mod is not None:
+                mod.show_render = True
+
+def _invalidate(scene_name):
+    scene = bpy.data.scenes.get(scene_name)
+    if scene is not None and get_settings(scene) is not None:
+        clear(scene)
+        print("[TRIDENT] The points changed; removed the render bake")
+    return None
+
+@bpy.app.handlers.persistent
+def _depsgraph_update(scene, depsgraph=None):
+    settings = get_settings(scene)
+    if settings is None:
+        return
+    points_obj = scene.trident.points_obj
+    obj = bpy.data.objects.get(BAKED_OBJECT)
+    if obj is None or not points_obj or points_obj.name not in bpy.data.objects or \
+            settings["state"] != _state(scene, points_obj):
+        # Objects are not removed while the depsgraph is being updated
+        bpy.app.timers.register(functools.partial(_invalidate, scene.name), first_interval=0.0)
+        return
+    if obj.hide_render != points_obj.hide_render:
+        obj.hide_render = points_obj.hide_render
+
+def register_handlers():
+    bpy.app.handlers.depsgraph_update_post.append(_depsgraph_update)
+
+def unregister_handlers():
+    if _depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_depsgraph_update)
@@ -0,0 +1,318 @@
+"""
+TRIDENT render farm - run many render jobs in parallel on one machine
+
+A single Blender process renders one still at a time. This module fans a job
+list out to a pool of headless Blender workers that all memory-map the same
+binary data sidecar, so the CSV files are parsed exactly once.
+
+The driver is plain Python (no bpy) and is started from a shell:
+
+    python render_farm.py --blender /path/to/blender \\
+        --obsm obsm.csv --obs obs.csv --jobs jobs.json \\
+        --output renders/ --workers 8 --retries 2
+
+The jobs file is a JSON list, one object per job:
+
+    [
+        {"name": "leiden", "label": "leiden", "palette": "Viridis",
+         "camera": "square", "frame_start": 1, "frame_end": 1},
+        {"name": "turntable", "label": "n_genes", "palette": "Magma",
+         "camera": "rectangle", "camera_path": "turntable",
+         "frame_start": 1, "frame_end": 240}
+    ]
+
+camera_path optionally animates the camera along a preset of
+camera_paths.PRESETS before rendering the frame range.
+
+Outputs are written as <output>/<name>_<frame>.png. Jobs whose outputs all
+exist are skipped, frames that already exist are skipped inside a job, and
+failed jobs are retried. Workers re-run this same file inside Blender
+(`blender -b -P render_farm.py -- worker ...`), which requires the TRIDENT
+add-on to be enabled in the user preferences.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Camera presets: location, focal length and resolution.
+# Match the main scene camera and the legend formats in legend_setup.
+CAMERA_PRESETS = {
+    "default": {
+        "location": (-31.3817, 32.3135, 9.39782),
+        "lens": 50,
+        "resolution": (1080, 1080),
+    },
+    "square": {
+        "location": (-32.412, 31.3021, 9.39782),
+        "lens": 50,
+        "resolution": (1080, 1080),
+    },
+    "rectangle": {
+        "location": (-39.9231, 24.1237, 9.39782),
+        "lens": 31,
+        "resolution": (1920, 1080),
+    },
+}
+
+def frame_output_path(output_dir, job, frame):
+    """Output image path of one frame of a job"""
+    return os.path.join(output_dir, f"{job['name']}_{frame:04d}.png")
+
+def job_frames(job):
+    """Frame numbers rendered by a job (a single still if no range is given)"""
+    start = int(job.get("frame_start", 1))
+    end = int(job.get("frame_end", start))
+    return range(start, end + 1)
+
+def missing_frames(output_dir, job):
+    """Frames of a job whose output does not exist yet"""
+    return [f for f in job_frames(job) if not os.path.exists(frame_output_path(output_dir, job, f))]
+
+def load_jobs(filepath):
+    """Read and validate the job list"""
+    with open(filepath, 'r') as f:
+        jobs = json.load(f)
+
+    names = set()
+    for i, job in enumerate(jobs):
+        job.setdefault("name", f"job_{i:03d}")
+        if job["name"] in names:
+            raise ValueError(f"Duplicate job name: {job['name']}")
+        names.add(job["name"])
+        if job.get("camera", "default") not in CAMERA_PRESETS:
+            raise ValueError(f"Unknown camera preset '{job['camera']}' in job {job['name']}")
+    return jobs
+
+# ============================================================================
+# DRIVER - plain Python, spawns Blender processes
+# ============================================================================
+
+def blender_command(blender, mode_args, threads=0):
+    """Command line running this file inside a headless Blender"""
+    cmd = [blender, "-b"]
+    if threads > 0:
+        cmd += ["-t", str(threads)]
+    return cmd + ["-P", os.path.abspath(__file__), "--"] + mode_args
+
+def sidecar_inputs(args):
+    """Input files (path, size, mtime) and labels a sidecar is built from"""
+    inputs = {"labels": args.labels}
+    for name, path in (("obsm", args.obsm), ("obs", args.obs)):
+        stat = os.stat(path)
+        inputs[name] = {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+    return inputs
+
+def prepare_sidecar(args):
+    """
+    Parse the input files once in a Blender process and write the sidecar.
+    An existing sidecar is reused if it was built from the same input
+    files, unchanged since, and the same labels.
+    """
+    npy_path = os.path.splitext(args.sidecar)[0] + ".npy"
+    meta_path = os.path.splitext(args.sidecar)[0] + ".json"
+    inputs = sidecar_inputs(args)
+    if os.path.exists(npy_path) and os.path.exists(meta_path) and not args.rebuild_sidecar:
+        with open(meta_path, 'r') as f:
+            if json.load(f).get("inputs") == inputs:
+                print(f"[TRIDENT] Reusing sidecar: {npy_path}")
+                return npy_path
+        print(f"[TRIDENT] Inputs or labels changed since the sidecar was built, rebuilding: {npy_path}")
+
+    mode_args = ["prepare", "--obsm", args.obsm, "--obs", args.obs, "--sidecar", args.sidecar]
+    if args.labels:
+        mode_args += ["--labels", ",".join(args.labels)]
+
+    result = subprocess.run(blender_command(args.blender, mode_args))
+    if result.returncode != 0 or not os.path.exists(npy_path):
+        raise RuntimeError(f"Sidecar preparation failed (exit code {result.returncode})")
+
+    # Record what the sidecar was built from, for the next run
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    meta["inputs"] = inputs
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return npy_path
+
+def run_job(args, job, sidecar, threads):
+    """Run one job in a worker process, retrying until its outputs exist"""
+    log_dir = os.path.join(args.output, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    mode_args = ["worker", "--sidecar", sidecar, "--output", args.output, "--job", json.dumps(job)]
+
+    for attempt in range(1, args.retries + 2):
+        log_path = os.path.join(log_dir, f"{job['name']}.{attempt}.log")
+        start = time.time()
+        with open(log_path, 'w') as log:
+            result = subprocess.run(blender_command(args.blender, mode_args, threads),
+                                    stdout=log, stderr=subprocess.STDOUT)
+        missing = missing_frames(args.output, job)
+        if result.returncode == 0 and not missing:
+            return job["name"], True, attempt, time.time() - start
+        print(f"[TRIDENT] Job '{job['name']}' attempt {attempt} failed "
+              f"(exit code {result.returncode}, {len(missing)} frames missing), see {log_path}")
+
+    return job["name"], False, args.retries + 1, 0.0
+
+def run_driver(args):
+    jobs = load_jobs(args.jobs)
+    os.makedirs(args.output, exist_ok=True)
+
+    pending = [job for job in jobs if missing_frames(args.output, job)]
+    skipped = len(jobs) - len(pending)
+    if skipped:
+        print(f"[TRIDENT] Skipping {skipped} jobs with existing outputs")
+    if not pending:
+        return 0
+
+    sidecar = prepare_sidecar(args)
+
+    # Split the machine's cores between the workers
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run_job, args, job, sidecar, threads) for job in pending]
+        for future in as_completed(futures):
+            name, ok, attempts, elapsed = future.result()
+            if ok:
+                print(f"[TRIDENT] Job '{name}' done in {elapsed:.1f}s (attempt {attempts})")
+            else:
+                failed.append(name)
+
+    print(f"[TRIDENT] Render farm finished: {len(pending) - len(failed)} done, "
+          f"{skipped} skipped, {len(failed)} failed")
+    if failed:
+        print(f"[TRIDENT] Failed jobs: {', '.join(failed)}")
+        return 1
+    return 0
+
+# ============================================================================
+# BLENDER SIDE - runs inside `blender -b -P render_farm.py -- <mode>`
+# ============================================================================
+
+def run_prepare(args):
+    import bpy
+
+    scene = bpy.context.scene
+    scene.trident.filepath_data = args.obsm
+    scene.trident.filepath_obs = args.obs
+    bpy.ops.trident.load_data()
+
+    if args.labels:
+        scene.trident.labels.clear()
+        for name in args.labels:
+            scene.trident.labels.add().name = name
+
+    result = bpy.ops.trident.export_sidecar(filepath=args.sidecar)
+    return 0 if result == {'FINISHED'} else 1
+
+def apply_camera_preset(scene, name):
+    preset = CAMERA_PRESETS[name]
+    camera = scene.camera
+    if camera is not None:
+        camera.location = preset["location"]
+        camera.data.lens = preset["lens"]
+    scene.render.resolution_x, scene.render.resolution_y = preset["resolution"]
+    scene.render.resolution_percentage = 100
+
+def render_missing_frames(scene, output_dir, job):
+    """
+    Render the frames of a job whose output does not exist yet. Each frame
+    is written under a temporary name and renamed when complete, so an
+    interrupted render never leaves a truncated image that would be
+    skipped on the next run. Returns the number of rendered frames.
+    """
+    import bpy
+
+    os.makedirs(output_dir, exist_ok=True)
+    scene.render.image_settings.file_format = 'PNG'
+    frames = missing_frames(output_dir, job)
+    for frame in frames:
+        path = frame_output_path(output_dir, job, frame)
+        partial = os.path.splitext(path)[0] + ".partial.png"
+        scene.frame_set(frame)
+        scene.render.filepath = partial
+        bpy.ops.render.render(write_still=True, scene=scene.name)
+        os.replace(partial, path)
+        print(f"[TRIDENT] Rendered {path}")
+    return len(frames)
+
+def run_worker(args):
+    import bpy
+
+    job = json.loads(args.job)
+    scene = bpy.context.scene
+
+    if bpy.ops.trident.plot_data(sidecar=args.sidecar) != {'FINISHED'}:
+        return 1
+
+    if job.get("label"):
+        scene.trident.color_label = job["label"]
+    if job.get("palette"):
+        scene.trident.color_palette = job["palette"]
+    if bpy.ops.trident.update_colors() != {'FINISHED'}:
+        return 1
+
+    apply_camera_preset(scene, job.get("camera", "default"))
+    if job.get("camera_path"):
+        if bpy.ops.trident.create_camera_path(preset=job["camera_path"]) != {'FINISHED'}:
+            return 1
+
+    render_missing_frames(scene, args.output, job)
+    return 0
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="TRIDENT multi-process render farm")
+    sub = parser.add_subparsers(dest="mode")
+
+    drive = sub.add_parser("drive", help="Fan a job list out to Blender workers (default)")
+    drive.add_argument("--blender", default="blender", help="Blender executable")
+    drive.add_argument("--obsm", required=True, help="obsm CSV file")
+    drive.add_argument("--obs", required=True, help="obs CSV file")
+    drive.add_argument("--labels", type=lambda s: s.split(","), default=None,
+                       help="Comma separated obs labels to load (default: all)")
+    drive.add_argument("--jobs", required=True, help="JSON job list")
+    drive.add_argument("--output", required=True, help="Output directory")
+    drive.add_argument("--sidecar", default=None, help="Sidecar path (default: <output>/trident_data)")
+    drive.add_argument("--rebuild-sidecar", action="store_true",
+                       help="Re-parse inputs even if the sidecar is up to date")
+    drive.add_argument("--workers", type=int, default=4, help="Number of parallel Blender processes")
+    drive.add_argument("--threads", type=int, default=0, help="Threads per worker (default: cores / workers)")
+    drive.add_argument("--retries", type=int, default=1, help="Retries per failed job")
+
+    prepare = sub.add_parser("prepare")
+    prepare.add_argument("--obsm", required=True)
+    prepare.add_argument("--obs", required=True)
+    prepare.add_argument("--labels", type=lambda s: s.split(","), default=None)
+    prepare.add_argument("--sidecar", required=True)
+
+    worker = sub.add_parser("worker")
+    worker.add_argument("--sidecar", required=True)
+    worker.add_argument("--output", required=True)
+    worker.add_argument("--job", required=True)
+
+    if not argv or argv[0] not in ("drive", "prepare", "worker"):
+        argv = ["drive"] + list(argv)
+    args = parser.parse_args(argv)
+    if args.mode == "drive" and args.sidecar is None:
+        args.sidecar = os.path.join(args.output, "trident_data")
+    return args
+
+def main(argv):
+    args = parse_args(argv)
+    if args.mode == "prepare":
+        return run_prepare(args)
+    if args.mode == "worker":
+        return run_worker(args)
+    return run_driver(args)
+
+if __name__ == "__main__":
+    # Inside Blender the script arguments follow "--"
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    sys.exit(main(argv))
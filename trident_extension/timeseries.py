@@ -0,0 +1,335 @@
+"""
+TRIDENT time series - play back the embedding of a time course from disk
+
+A series is a memory-mapped [T, N, 2 or 3] array (.npy, or an array of a
+.npz) or one coordinate file per timepoint (a directory or a glob pattern
+of .npy/.npz/CSV files, in natural order). Frame f shows timepoint
+(f - start) / frames_per_step. A frame change handler writes only the
+current timepoint to the TRIDENT_Points positions and, when stepping over
+several frames, the next one to a point attribute, both by bulk buffer
+assignment; a node group blends between the two, so frames between
+timepoints cost no loading. Upcoming timepoints are read on a background
+thread into a small cache, so memory stays bounded whatever the length of
+the series.
+"""
+
+import os
+import re
+import glob
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import bpy
+
+from . import data_loader
+from . import array_loader
+from . import render_bake
+
+SERIES_EXTENSIONS = (".npy", ".npz", ".csv", ".csv.gz", ".csv.zst")
+
+# Timepoints read ahead in the playback direction
+PREFETCH_STEPS = 4
+
+# Point attribute with the next timepoint, blended in by the node group
+NEXT_ATTRIBUTE = "TRIDENT_Series_Next"
+
+NODE_GROUP = "TRIDENT_Series"
+
+MODIFIER = "TRIDENT_Series"
+
+# Open series: {scene name: Series}
+_players = {}
+
+def _natural_key(path):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", os.path.basename(path))]
+
+def series_files(path):
+    """Per-timepoint coordinate files of a directory or glob pattern, or None for a single array file"""
+    if os.path.isdir(path):
+        files = [os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(SERIES_EXTENSIONS)]
+    elif any(c in path for c in "*?["):
+        files = glob.glob(path)
+    else:
+        return None
+    if not files:
+        raise FileNotFoundError(f"No coordinate files in {path}")
+    return sorted(files, key=_natural_key)
+
+def _stacked_array(path, key):
+    """[T, N, 2+] array of a .npy, or of the array key of a .npz (its first array if key is empty)"""
+    if path.lower().endswith(".npz"):
+        names = array_loader.npz_names(path)
+        if not names:
+            raise ValueError(f"No arrays in {path}")
+        array = array_loader.npz_member(path, key or names[0])
+    else:
+        array = np.load(path, mmap_mode='r', allow_pickle=False)
+    if array.ndim != 3 or array.shape[2] < 2 or array.dtype.kind not in "iuf":
+        raise ValueError(f"A series array must be numeric with shape (T, N, 2+), got {array.dtype} {array.shape}")
+    return array
+
+class Series:
+    """Timepoints of a series with a bounded cache of loaded, centered coordinates"""
+
+    def __init__(self, path, key, rows, n_points, token):
+        self.path = path
+        self.rows = rows
+        self.n_points = n_points
+        self.token = token
+        self.key = key
+        self.files = series_files(path)
+        self.stacked = _stacked_array(path, key) if self.files is None else None
+        self.steps = len(self.files) if self.files is not None else self.stacked.shape[0]
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trident_series")
+        # (step, blend) written to the mesh, and the step of the last frame
+        self.loaded = None
+        self.last_step = 0
+        # Every timepoint is centered on the mean of the first one
+        self.center = None
+        self.center = self._read(0).mean(axis=0, dtype=np.float64).astype(np.float32)
+
+    def _read(self, step):
+        """Coordinates [n_points, 3] of a timepoint, centered on the first one"""
+        if self.stacked is not None:
+            array = self.stacked[step]
+            n_cells, where = array.shape[0], f"Timepoint {step}"
+            reader = lambda rows: array if rows is None else array[rows]
+        else:
+            n_cells, reader = array_loader.obsm_reader(self.files[step], self.key)
+            where = self.files[step]
+        rows = data_loader.match_obs_rows(self.rows, self.n_points, n_cells, where)
+        coords = data_loader.read_obs_rows(reader, rows)
+        positions = np.zeros((self.n_points, 3), dtype=np.float32)
+        dims = min(coords.shape[1], 3)
+        positions[:, :dims] = coords[:, :dims]
+        if self.center is not None:
+            positions -= self.center
+        return positions
+
+    def get(self, step):
+        """Coordinates of a timepoint: from the cache, a running prefetch or read now"""
+        with self.lock:
+            if step in self.cache:
+                self.cache.move_to_end(step)
+                return self.cache[step]
+            future = self.pending.get(step)
+        positions = future.result() if future is not None else self._read(step)
+        self._store(step, positions)
+        return positions
+
+    def _store(self, step, positions):
+        with self.lock:
+            self.pending.pop(step, None)
+            self.cache[step] = positions
+            self.cache.move_to_end(step)
+            # Current, next and the prefetched timepoints
+            while len(self.cache) > PREFETCH_STEPS + 2:
+                self.cache.popitem(last=False)
+
+    def prefetch(self, steps):
+        """Read timepoints on the background thread"""
+        for step in steps:
+            if not 0 <= step < self.steps:
+                continue
+            with self.lock:
+                if step in self.cache or step in self.pending:
+                    continue
+                self.pending[step] = self.executor.submit(self._prefetched, step)
+
+    def _prefetched(self, step):
+        positions = self._read(step)
+        self._store(step, positions)
+        return positions
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def _node_group():
+    """Node group blending the positions toward the next timepoint by its Factor input"""
+    tree = bpy.data.node_groups.get(NODE_GROUP)
+    if tree is not None:
+        return tree
+    tree = bpy.data.node_groups.new(name=NODE_GROUP, type='GeometryNodeTree')
+    tree.interface.new_socket(name="Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+    tree.interface.new_socket(name="Factor", in_out='INPUT', socket_type='NodeSocketFloat')
+    tree.interface.new_socket(name="Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+
+    nodes, links = tree.nodes, tree.links
+    n_in   = nodes.new(type='NodeGroupInput');                  n_in.location   = (-700,    0)
+    n_pos  = nodes.new(type='GeometryNodeInputPosition');       n_pos.location  = (-500, -150)
+    n_attr = nodes.new(type='GeometryNodeInputNamedAttribute'); n_attr.location = (-500, -300)
+    n_mix  = nodes.new(type='ShaderNodeMix');                   n_mix.location  = (-250, -200)
+    n_set  = nodes.new(type='GeometryNodeSetPosition');         n_set.location  = (   0,    0)
+    n_out  = nodes.new(type='NodeGroupOutput');                 n_out.location  = ( 250,    0)
+    n_attr.data_type = 'FLOAT_VECTOR'
+    n_attr.inputs["Name"].default_value = NEXT_ATTRIBUTE
+    n_mix.data_type = 'VECTOR'
+
+    def socket(sockets, name, socket_type):
+        return next(s for s in sockets if s.name == name and s.type == socket_type)
+
+    links.new(n_in.outputs["Factor"], socket(n_mix.inputs, "Factor", 'VALUE'))
+    links.new(n_pos.outputs["Position"], socket(n_mix.inputs, "A", 'VECTOR'))
+    links.new(n_attr.outputs["Attribute"], socket(n_mix.inputs, "B", 'VECTOR'))
+    links.new(n_in.outputs["Geometry"], n_set.inputs["Geometry"])
+    links.new(socket(n_mix.outputs, "Result", 'VECTOR'), n_set.inputs["Position"])
+    links.new(n_attr.outputs["Exists"], n_set.inputs["Selection"])
+    links.new(n_set.outputs["Geometry"], n_out.inputs["Geometry"])
+    return tree
+
+def _factor_identifier(tree):
+    for item in tree.interface.items_tree:
+        if getattr(item, "in_out", None) == 'INPUT' and item.name == "Factor":
+            return item.identifier
+    raise KeyError(f"Node group {tree.name} has no Factor input")
+
+def _points(scene):
+    points_obj = scene.trident.points_obj
+    if not points_obj or points_obj.name not in bpy.data.objects:
+        raise RuntimeError("TRIDENT_Points object not found. Plot data first.")
+    return points_obj
+
+def _player(scene):
+    """Open series of a scene, opened again after the plotted points changed"""
+    trident = scene.trident
+    player = _players.get(scene.name)
+    if player is not None and (player.token != trident.data_token or
+                               player.path != bpy.path.abspath(trident.series_path)):
+        player.close()
+        player = None
+    if player is None:
+        points_obj = _points(scene)
+        rows = data_loader.known_obs_rows(scene)
+        if rows is not None and (rows < 0).any():
+            raise ValueError("Some points have no obs row (left join); a series needs one for every point")
+        player = Series(bpy.path.abspath(trident.series_path), trident.series_key.strip(),
+                        rows, len(points_obj.data.vertices), trident.data_token)
+        _players[scene.name] = player
+        trident.series_summary = f"{player.steps} timepoints of {player.n_points:,} points"
+    return player
+
+def is_playing(scene):
+    return scene.name in _players
+
+def start(scene):
+    """Set up playback of the scene's series_path. Returns the number of timepoints"""
+    from . import morph
+
+    trident = scene.trident
+    if not trident.series_path:
+        raise ValueError("No time series path set")
+    points_obj = _points(scene)
+    stop(scene, restore=False)
+    player = _player(scene)
+
+    # The series replaces the plotted positions, so a morph would fight it
+    # and a render bake would show the first timepoint only
+    morph.remove(scene)
+    render_bake.clear(scene)
+    mod = points_obj.modifiers.get(MODIFIER)
+    if mod is None:
+        mod = points_obj.modifiers.new(name=MODIFIER, type='NODES')
+        mod.node_group = _node_group()
+        points_obj.modifiers.move(len(points_obj.modifiers) - 1, 0)
+
+    last = trident.series_frame_start + (player.steps - 1) * trident.series_frames_per_step
+    if scene.frame_end < last:
+        scene.frame_end = last
+    apply_frame(scene, scene.frame_current)
+    print(f"[TRIDENT] Playing {player.steps} timepoints of {trident.series_path} on frames "
+          f"{trident.series_frame_start}-{last}")
+    return player.steps
+
+def stop(scene, restore=True):
+    """Close the scene's series; with restore the plotted positions come back"""
+    player = _players.pop(scene.name, None)
+    if player is not None:
+        player.close()
+    points_obj = scene.trident.points_obj
+    if not points_obj or points_obj.name not in bpy.data.objects:
+        return
+    mod = points_obj.modifiers.get(MODIFIER)
+    if mod is not None:
+        points_obj.modifiers.remove(mod)
+    mesh = points_obj.data
+    attr = mesh.attributes.get(NEXT_ATTRIBUTE)
+    if attr is not None:
+        mesh.attributes.remove(attr)
+    data = data_loader.get_data_cache(scene)
+    if restore and data is not None and data.shape[0] == len(mesh.vertices):
+        # Centered like build_points_mesh
+        coords = np.ascontiguousarray(data[:, :3], dtype=np.float32)
+        coords -= coords.mean(axis=0, dtype=np.float64).astype(np.float32)
+        mesh.vertices.foreach_set("co", coords.ravel())
+        mesh.update()
+    scene.trident.series_summary = ""
+
+def apply_frame(scene, frame):
+    """Show the timepoint of a frame: load it (and the next) if needed and set the blend factor"""
+    trident = scene.trident
+    player = _player(scene)
+    points_obj = _points(scene)
+    mesh = points_obj.data
+    if len(mesh.vertices) != player.n_points:
+        raise RuntimeError("The plotted points changed; enable the time series again")
+
+    per_step = max(1, trident.series_frames_per_step)
+    position = min(max((frame - trident.series_frame_start) / per_step, 0.0), player.steps - 1)
+    step = int(position)
+    factor = position - step
+    blend = per_step > 1 and step + 1 < player.steps
+
+    if player.loaded != (step, blend):
+        mesh.vertices.foreach_set("co", player.get(step).ravel())
+        attr = mesh.attributes.get(NEXT_ATTRIBUTE)
+        if blend:
+            if attr is None:
+                attr = mesh.attributes.new(name=NEXT_ATTRIBUTE, type='FLOAT_VECTOR', domain='POINT')
+            attr.data.foreach_set("vector", player.get(step + 1).ravel())
+        elif attr is not None:
+            mesh.attributes.remove(attr)
+        mesh.update()
+        player.loaded = (step, blend)
+
+    mod = points_obj.modifiers.get(MODIFIER)
+    if mod is not None and mod.node_group is not None:
+        identifier = _factor_identifier(mod.node_group)
+        if abs(mod[identifier] - factor) > 1e-6:
+            mod[identifier] = factor
+
+    # Read ahead in the direction of playback (backwards when scrubbing back)
+    direction = -1 if step < player.last_step else 1
+    player.last_step = step
+    first = step + 2 if direction > 0 else step - 1
+    player.prefetch(range(first, first + direction * PREFETCH_STEPS, direction))
+
+@bpy.app.handlers.persistent
+def _frame_change(scene, depsgraph=None):
+    if not scene.trident.series_enabled:
+        return
+    try:
+        apply_frame(scene, scene.frame_current)
+    except Exception as e:
+        scene.trident.series_summary = f"Error: {e}"
+        print(f"[TRIDENT] Error playing the time series of scene {scene.name}: {e}")
+
+@bpy.app.handlers.persistent
+def _load_post(*args):
+    for player in _players.values():
+        player.close()
+    _players.clear()
+
+def register_handlers():
+    bpy.app.handlers.frame_change_pre.append(_frame_change)
+    bpy.app.handlers.load_post.append(_load_post)
+
+def unregister_handlers():
+    if _frame_change in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.remove(_frame_change)
+    if _load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_load_post)
+    _load_post()